@@ -0,0 +1,86 @@
+"""
+This is a benchmark of the group commit of the master.
+
+Three servers (from Server.py) are started in different
+processes on the default server list. After the election,
+the batch window and the batch size of all servers are changed
+step by step and for every combination a number of clients
+write to the master concurrently. The throughput of committed
+writes and the latency of a single write are printed, which
+maps the tradeoff between both. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Benchmark_replication
+
+"""
+Note:
+Consider the notes in 'Benchmark_replication.py'.
+A batch size of 1 and a window of 0 ms replicates every write on its own.
+"""
+
+BATCH_WINDOWS = [0, 0.001, 0.002, 0.005, 0.01]
+BATCH_SIZES = [1, 16, 64, 256]
+CLIENTS = 16
+
+def server_process(ip, commands):
+    s = Server.Server(ip)
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        s.set_batch_window(command[0])
+        s.set_batch_size(command[1])
+    s.shutdown()
+    thread.join()
+
+def main():
+    port = Benchmark_replication.get_port()
+    processes = []
+    queues = []
+    for ip in Server.DEFAULT_SERVER_LIST:
+        commands = multiprocessing.Queue()
+        p = multiprocessing.Process(target=server_process, args=(ip, commands))
+        p.start()
+        processes.append(p)
+        queues.append(commands)
+
+    print("waiting for the election....")
+    master = Benchmark_replication.wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        print("master = " + master + " ; clients = " + str(CLIENTS))
+        print("window ms ; size ; writes/s ; p50 ms ; p99 ms ; errors")
+        for window in BATCH_WINDOWS:
+            for size in BATCH_SIZES:
+                for commands in queues:
+                    commands.put((window, size))
+                # give the servers time to apply the new setting
+                Benchmark_replication.wait_for_master(port)
+                throughput, latencies, errors = Benchmark_replication.measure(master, port, CLIENTS)
+                if latencies:
+                    print(str(window * 1000) + " ; " + str(size) + " ; " + str(round(throughput, 1))
+                          + " ; " + str(round(Benchmark_replication.percentile(latencies, 50) * 1000, 2))
+                          + " ; " + str(round(Benchmark_replication.percentile(latencies, 99) * 1000, 2))
+                          + " ; " + str(len(errors)))
+                else:
+                    print(str(window * 1000) + " ; " + str(size) + " ; no write has been committed ; "
+                          + str(len(errors)))
+
+    for commands in queues:
+        commands.put(None)
+    for p in processes:
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+This is a benchmark of the broadcast of the master.
+
+A large network cannot be started like in the example, so the members
+are simulated. Every member is a server (from Server.py) on its own
+IP address that only handles incoming connections (-> Server.handle_client)
+and does not take part in the election. The members are spread over
+a few processes. The master broadcasts a message to 10, 100 and 1000
+members, directly and over relaying members (-> Server.broadcast_tree).
+The first broadcast establishes the connections, the following ones use
+the pooled connections. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import selectors
+import resource
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+
+"""
+Note:
+Every member needs a few file descriptors, the limit of open files is
+raised to the hard limit. If the hard limit is too low for 1000 members,
+reduce MEMBERS. The simulated members log every connection they handle,
+so it is recommended to redirect the output into a file.
+"""
+
+MEMBERS = [10, 100, 1000]
+FANOUTS = [None, 8, 32]
+MEMBER_PROCESSES = 4
+BROADCASTS = 5
+
+def member_ip(i):
+    return "127.0." + str(10 + int(i / 250)) + "." + str(1 + i % 250)
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def member_process(ips, ready, stop):
+    raise_file_limit()
+    selector = selectors.DefaultSelector()
+    members = []
+    for ip in ips:
+        s = Server.Server(ip)
+        s.server.listen()
+        selector.register(s.server, selectors.EVENT_READ, s)
+        members.append(s)
+    ready.set()
+    while not stop.is_set():
+        for key, events in selector.select(0.5):
+            conn, addr = key.fileobj.accept()
+            threading.Thread(target=key.data.handle_client, args=(conn, addr), daemon=True).start()
+    for s in members:
+        s.close()
+
+def main():
+    raise_file_limit()
+    stop = multiprocessing.Event()
+    processes = []
+    ips = [member_ip(i) for i in range(max(MEMBERS))]
+    for p in range(MEMBER_PROCESSES):
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=member_process, args=(ips[p::MEMBER_PROCESSES], ready, stop))
+        process.start()
+        processes.append((process, ready))
+    for process, ready in processes:
+        ready.wait()
+
+    master = Server.Server("127.0.0.9")
+    # only the master broadcasts, the election is skipped
+    master.master_server = master.ip
+    master.term = 1
+    print("members ; fanout ; first broadcast ms ; pooled broadcast ms ; acknowledged")
+    for members in MEMBERS:
+        master.network = [master.ip] + ips[:members]
+        for fanout in FANOUTS:
+            fanout = members if fanout is None else fanout
+            master.close_broadcast_clients()
+            durations = []
+            for i in range(BROADCASTS):
+                start = time.perf_counter()
+                acks = master.broadcast("benchmark " + str(i), Server.BROADCAST_TIMEOUT, fanout)
+                durations.append(time.perf_counter() - start)
+            pooled = sorted(durations[1:])[int(len(durations[1:]) / 2)]
+            print(str(members) + " ; " + str(fanout) + " ; " + str(round(durations[0] * 1000, 1)) + " ; "
+                  + str(round(pooled * 1000, 1)) + " ; " + str(list(acks.values()).count(True)))
+    master.close_broadcast_clients()
+    master.close()
+
+    stop.set()
+    for process, ready in processes:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+This is a benchmark of the catch-up of a restarted follower.
+
+Three servers (from Server.py) are started in different
+processes on the default server list. After the election, the
+store is filled with a given number of keys. Then a follower is
+shut down and restarted and the time it needs to catch up with
+the master is measured. Without a data directory the follower
+receives the newest snapshot and the log after it, with a data
+directory it recovers its store from disk and only receives the
+entries that have been written while it was offline. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import tempfile
+import shutil
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Benchmark_replication
+
+"""
+Note:
+Consider the notes in 'Benchmark_replication.py'.
+The restarted follower searches the network first
+(-> Server.INITIAL_NETWORK_SEARCH_TIMEOUT) and is caught up
+by the master when it sends its first ping. The catch-up time
+is measured from the first data the follower receives.
+"""
+
+STATE_SIZES = [1000, 10000, 50000]
+VALUE_SIZE = 100
+SNAPSHOT_INTERVAL = 1000
+CLIENTS = 16
+CATCH_UP_TIMEOUT = 120
+
+def server_process(ip, data_dir, commands, results):
+    s = Server.Server(ip, data_dir)
+    s.set_snapshot_interval(SNAPSHOT_INTERVAL)
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        if command[0] == "commit":
+            results.put(s.get_store().get_commit_index())
+        elif command[0] == "stop":
+            s.shutdown()
+        elif command[0] == "restart":
+            results.put(catch_up(s, command[1]))
+    s.shutdown()
+
+def catch_up(s, target):
+    start = time.time()
+    threading.Thread(target=s.restart, args = ()).start()
+    time.sleep(0.5)
+    # the store is recovered from disk during the restart
+    recovered = s.get_store().get_commit_index()
+    first_data = None
+    while time.time() - start < CATCH_UP_TIMEOUT:
+        store = s.get_store()
+        if first_data is None and (s.snapshot_buffer is not None or store.get_commit_index() > recovered):
+            first_data = time.time()
+        if store.get_commit_index() >= target:
+            if first_data is None:
+                first_data = time.time()
+            return (recovered, first_data - start, time.time() - first_data)
+        time.sleep(0.005)
+    return None
+
+def fill(master, port, size):
+    value = "x" * VALUE_SIZE
+    threads = []
+    for c in range(CLIENTS):
+        keys = range(c, size, CLIENTS)
+        t = threading.Thread(target=fill_keys, args=(master, port, keys, value))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+def fill_keys(master, port, keys, value):
+    for key in keys:
+        Benchmark_replication.write(master, port, "key" + str(key), value)
+
+def run(data_dir):
+    port = Benchmark_replication.get_port()
+    processes = {}
+    for ip in Server.DEFAULT_SERVER_LIST:
+        commands = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        p = multiprocessing.Process(target=server_process, args=(ip, data_dir, commands, results))
+        p.start()
+        processes[ip] = (p, commands, results)
+
+    master = Benchmark_replication.wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        follower = min([ip for ip in Server.DEFAULT_SERVER_LIST if ip != master])
+        for size in STATE_SIZES:
+            fill(master, port, size)
+            processes[follower][1].put(("stop",))
+            time.sleep(2)
+            # these writes are missed by the follower
+            fill(master, port, int(size / 10))
+            processes[master][1].put(("commit",))
+            target = processes[master][2].get()
+            processes[follower][1].put(("restart", target))
+            result = processes[follower][2].get()
+            if result is None:
+                print(str(size) + " ; the follower did not catch up in time")
+            else:
+                print(str(size) + " ; " + str(target) + " ; " + str(result[0]) + " ; "
+                      + str(round(result[1], 2)) + " ; " + str(round(result[2] * 1000, 1)))
+            # wait until the follower pings the master again
+            time.sleep(Server.SEND_PING_TIME)
+
+    for p, commands, results in processes.values():
+        commands.put(None)
+    for p, commands, results in processes.values():
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+def main():
+    print("keys written ; master commit index ; recovered index ; until first data s ; catch-up ms")
+    print("follower without data directory (snapshot and log tail):")
+    run(None)
+    data_dir = tempfile.mkdtemp()
+    print("follower with data directory (recovery and missed entries):")
+    try:
+        run(data_dir)
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    main()
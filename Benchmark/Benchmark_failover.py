@@ -0,0 +1,426 @@
+"""
+This is a benchmark of the elections and failovers.
+
+A number of servers (from Server.py) are started in different processes on
+127.0.0.x, every server sends its events (-> Events.py) with their time to this
+process. Every scenario is repeated several times with new processes:
+    cold start      : all servers start at once.
+    master kill     : the process of the master is killed.
+    follower kill   : the process of a follower is killed.
+    restart         : the master is shut down and restarted.
+    partition       : the master cannot reach the other servers and the other way around.
+For every repetition the time until a majority agrees on a master after the start
+(time to master), until another server notices the fault (time to detect) and until
+a majority agrees on a master again (time to recover) are recorded. The percentiles
+are printed and all times are stored as JSON, so that the results of two versions
+can be compared:
+    python3 Benchmark_failover.py [<result file> [<former result file>]]
+To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import subprocess
+import threading
+import queue
+import time
+import json
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Client
+import Events
+import Benchmark_replication
+
+"""
+Note:
+The times are taken by the clocks of the processes, which are the same
+clock on one machine. A killed process closes its sockets, so the other
+servers notice it faster than a machine that is switched off.
+With SCALE < 1 all timeouts of the election (-> Server.INITIAL_NETWORK_SEARCH_TIMEOUT,
+Server.MASTER_VOTE_TIMEOUT, Server.SEND_PING_TIME, Server.WAIT_PING_TIME) are shortened,
+which makes the benchmark faster, but only results with the same scale can be compared.
+The restarted master has to follow a master again to recover. It is often back
+before the other servers notice that it was gone, then no time to detect is measured.
+A failover that does not end with a master (e.g. the remaining servers shut down)
+is counted as missing, like a time that expired.
+A partition is simulated inside the processes: the connections to and from the
+servers on the other side are refused.
+"""
+
+SERVERS = 3
+REPETITIONS = 5
+SCALE = 1.0
+FIRST_IP = 7
+SCENARIOS = ["cold start", "master kill", "follower kill", "restart", "partition"]
+METRICS = ["time_to_master", "time_to_detect", "time_to_recover"]
+SCENARIO_TIMEOUT = 120
+# scaled like the timeouts of the election
+PERCENTILES = [50, 90, 99]
+RESULT_FILE = "failover.json"
+DETECTING_EVENTS = [Events.MASTER_LOST, Events.MEMBER_LEFT, Events.QUORUM_LOST, Events.SHUTDOWN]
+
+blocked = []
+# the servers that are on the other side of a partition, one list per process
+
+def server_ips(servers=SERVERS):
+    return ["127.0.0." + str(FIRST_IP + i) for i in range(servers)]
+
+def scale_timeouts(scale):
+    # shortens the timeouts of the election in the process of a server
+    Server.INITIAL_NETWORK_SEARCH_TIMEOUT *= scale
+    Server.MASTER_VOTE_TIMEOUT *= scale
+    Server.SEND_PING_TIME *= scale
+    Server.WAIT_PING_TIME *= scale
+    Server.MASTER_LEASE_TIME *= scale
+
+def partitioned(connect):
+    # refuses the connections to servers on the other side of a partition
+    def partitioned_connect(self, ip, port):
+        if ip in blocked:
+            self.client.close()
+            return False
+        return connect(self, ip, port)
+    return partitioned_connect
+
+def server_process(ip, ips, scale, commands, events):
+    Server.DEFAULT_SERVER_LIST = list(ips)
+    scale_timeouts(scale)
+    Client.Client.connect = partitioned(Client.Client.connect)
+    s = Server.Server(ip)
+    s.get_events().subscribe(lambda event: events.put((ip, event)))
+    handle_client = s.handle_client
+    def partitioned_handle_client(conn, addr):
+        # refuses the connections from servers on the other side of a partition
+        if addr[0] in blocked:
+            conn.close()
+            return
+        handle_client(conn, addr)
+    s.handle_client = partitioned_handle_client
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        if command[0] == "block":
+            blocked.extend(command[1])
+        elif command[0] == "restart":
+            s.shutdown()
+            settle()
+            thread = threading.Thread(target=s.restart, args = ())
+            thread.start()
+    s.shutdown()
+    settle()
+    s.close()
+
+def settle():
+    # waits for the threads of the server to end, the search for the network of a
+    # server that has been shut down must not interfere with its restart
+    for t in threading.enumerate():
+        if t is not threading.current_thread() and not t.daemon:
+            t.join(SCENARIO_TIMEOUT)
+
+def agreed_master(masters, live):
+    """
+    Return the master a majority of all servers agrees on.
+
+    Parameters
+    ----------
+    masters : dict
+        the master of every server, 'None' if a server has no master.
+    live : list of str
+        the servers that can be counted, the master must be one of them.
+
+    Returns
+    -------
+    str
+        The IP address of the master or 'None' if there is no majority.
+    """
+    for master in set(masters[ip] for ip in live):
+        if master in live and [masters[ip] for ip in live].count(master) >= int(len(masters) / 2) + 1:
+            return master
+    return None
+
+class Watcher:
+    """
+    Note:
+    The watcher applies the events of all servers in the order they arrive,
+    which may differ from the order they happened in slightly. The times are
+    taken from the events, so they are not delayed by the queue.
+    """
+
+    events = None
+    masters = {}
+    members = {}
+
+    def __init__(self, events, ips):
+        self.events = events
+        self.masters = {ip : None for ip in ips}
+        self.members = {ip : [] for ip in ips}
+
+    def next(self, deadline):
+        # applies the next event and returns it, 'None' at the deadline
+        try:
+            ip, event = self.events.get(timeout=max(0, deadline - time.time()))
+        except queue.Empty:
+            return None
+        if event["type"] == Events.MASTER_ELECTED:
+            self.masters[ip] = event["master"]
+        elif event["type"] in [Events.MASTER_LOST, Events.SHUTDOWN]:
+            self.masters[ip] = None
+        if event["type"] == Events.MEMBER_JOINED and event["ip"] not in self.members[ip]:
+            self.members[ip].append(event["ip"])
+        elif event["type"] == Events.MEMBER_LEFT and event["ip"] in self.members[ip]:
+            self.members[ip].remove(event["ip"])
+        return ip, event
+
+    def wait_for_master(self, start, timeout):
+        """
+        Wait until a majority agrees on a master.
+
+        Parameters
+        ----------
+        start : float
+            the time the servers have been started.
+        timeout : float
+            the maximum time to wait in seconds.
+
+        Returns
+        -------
+        tuple
+            The master and the time it took, both 'None' if the timeout expired.
+        """
+        deadline = start + timeout
+        while True:
+            result = self.next(deadline)
+            if result is None:
+                return None, None
+            master = agreed_master(self.masters, list(self.masters))
+            if master is not None:
+                return master, result[1]["time"] - start
+
+    def wait_until_stable(self, master, timeout):
+        """
+        Wait until all servers follow the master and the master counts them as members.
+
+        Parameters
+        ----------
+        master : str
+            the IP address of the master.
+        timeout : float
+            the maximum time to wait in seconds.
+
+        Returns
+        -------
+        bool
+            True if the servers are stable, False if the timeout expired.
+        """
+        deadline = time.time() + timeout
+        while not (all(m == master for m in self.masters.values()) and len(self.members[master]) == len(self.masters) - 1):
+            if self.next(deadline) is None:
+                return False
+        return True
+
+    def wait_for_recovery(self, fault, target, live, rejoin, timeout):
+        """
+        Wait until the other servers notice a fault and a majority agrees on a master again.
+
+        A restarted server may be back before the other servers notice that it was gone,
+        then it has recovered as soon as it follows the master again.
+
+        Parameters
+        ----------
+        fault : float
+            the time of the fault.
+        target : str
+            the server of the fault, its events do not count as noticed.
+        live : list of str
+            the servers that can be counted after the fault.
+        rejoin : bool
+            if the target is restarted and has to follow the master again to recover.
+        timeout : float
+            the maximum time to wait in seconds.
+
+        Returns
+        -------
+        tuple
+            The time to detect and the time to recover, 'None' if the timeout expired
+            or the fault has not been noticed.
+        """
+        deadline = fault + timeout
+        detected = None
+        restarted = False
+        while True:
+            result = self.next(deadline)
+            if result is None:
+                return detected, None
+            ip, event = result
+            if event["time"] < fault:
+                continue
+            if detected is None and ip != target and event["type"] in DETECTING_EVENTS:
+                detected = event["time"] - fault
+            if rejoin and ip == target and event["type"] == Events.SHUTDOWN:
+                restarted = True
+            master = agreed_master(self.masters, live)
+            if (detected is not None or restarted) and master is not None and (not rejoin or self.masters[target] == master):
+                return detected, event["time"] - fault
+
+def repetition(scenario, ips, scale):
+    """
+    Start the servers, run one scenario and stop the servers again.
+
+    Parameters
+    ----------
+    scenario : str
+        the scenario of the repetition (-> SCENARIOS).
+    ips : list of str
+        the IP addresses of the servers.
+    scale : float
+        the factor of the timeouts of the election.
+
+    Returns
+    -------
+    dict
+        The times of the repetition in seconds, 'None' if a timeout expired.
+    """
+    events = multiprocessing.Queue()
+    processes = {}
+    watcher = Watcher(events, ips)
+    timeout = SCENARIO_TIMEOUT * scale
+    start = time.time()
+    for ip in ips:
+        commands = multiprocessing.Queue()
+        p = multiprocessing.Process(target=server_process, args=(ip, ips, scale, commands, events))
+        p.start()
+        processes[ip] = (p, commands)
+    master, time_to_master = watcher.wait_for_master(start, timeout)
+    result = {"time_to_master" : time_to_master}
+    if master is not None and scenario != "cold start" and watcher.wait_until_stable(master, timeout):
+        target = master
+        if scenario == "follower kill":
+            target = min([ip for ip in ips if ip != master])
+        live = [ip for ip in ips if ip != target]
+        fault = time.time()
+        if scenario in ["master kill", "follower kill"]:
+            processes[target][0].kill()
+        elif scenario == "restart":
+            processes[target][1].put(("restart",))
+            live = list(ips)
+        elif scenario == "partition":
+            processes[target][1].put(("block", live))
+            for ip in live:
+                processes[ip][1].put(("block", [target]))
+        result["time_to_detect"], result["time_to_recover"] = \
+            watcher.wait_for_recovery(fault, target, live, scenario == "restart", timeout)
+    for p, commands in processes.values():
+        if p.is_alive():
+            commands.put(None)
+    for p, commands in processes.values():
+        p.join(timeout)
+        if p.is_alive():
+            p.terminate()
+            p.join()
+    return result
+
+def summarize(values):
+    # percentiles of the measured times, the others expired or were not noticed
+    measured = [v for v in values if v is not None]
+    summary = {"count" : len(measured), "missing" : len(values) - len(measured)}
+    if measured:
+        for p in PERCENTILES:
+            summary["p" + str(p)] = Benchmark_replication.percentile(measured, p)
+        summary["max"] = max(measured)
+    return summary
+
+def version():
+    # the commit of the measured version, if the project is a git repository
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode(Server.FORMAT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(scenarios=SCENARIOS, repetitions=REPETITIONS, servers=SERVERS, scale=SCALE):
+    """
+    Run every scenario several times.
+
+    Parameters
+    ----------
+    scenarios : list of str
+        the scenarios to run (-> SCENARIOS).
+    repetitions : int
+        how often every scenario is run.
+    servers : int
+        the number of servers.
+    scale : float
+        the factor of the timeouts of the election.
+
+    Returns
+    -------
+    dict
+        The settings, all times and their summary of every scenario and metric.
+    """
+    ips = server_ips(servers)
+    times = {}
+    for scenario in scenarios:
+        times[scenario] = {}
+        for i in range(repetitions):
+            result = repetition(scenario, ips, scale)
+            print(scenario + " " + str(i + 1) + "/" + str(repetitions) + " ; "
+                  + " ; ".join(m + " " + str(None if result[m] is None else round(result[m], 3)) for m in result))
+            for metric, value in result.items():
+                times[scenario].setdefault(metric, []).append(value)
+    summary = {scenario : {metric : summarize(values) for metric, values in metrics.items()}
+               for scenario, metrics in times.items()}
+    return {"version" : version(), "date" : time.strftime("%Y-%m-%d %H:%M:%S"), "servers" : servers,
+            "repetitions" : repetitions, "scale" : scale, "times" : times, "summary" : summary}
+
+def report(results):
+    print("scenario ; metric ; count ; missing ; " + " ; ".join("p" + str(p) + " s" for p in PERCENTILES) + " ; max s")
+    for scenario, metrics in results["summary"].items():
+        for metric in METRICS:
+            if metric in metrics:
+                summary = metrics[metric]
+                line = scenario + " ; " + metric + " ; " + str(summary["count"]) + " ; " + str(summary["missing"])
+                for key in ["p" + str(p) for p in PERCENTILES] + ["max"]:
+                    line += " ; " + (str(round(summary[key], 3)) if key in summary else "-")
+                print(line)
+
+def compare(results, former):
+    """
+    Print how the percentiles changed compared to a former result.
+
+    Parameters
+    ----------
+    results : dict
+        the current result (-> run).
+    former : dict
+        the former result, e.g. of another version.
+    """
+    if former["scale"] != results["scale"] or former["servers"] != results["servers"]:
+        print("the former result has been measured with other settings and cannot be compared")
+        return
+    print("compared to " + str(former["version"]) + " of " + former["date"] + ":")
+    print("scenario ; metric ; percentile ; former s ; current s ; change %")
+    for scenario, metrics in results["summary"].items():
+        for metric, summary in metrics.items():
+            before = former["summary"].get(scenario, {}).get(metric, {})
+            for key in ["p" + str(p) for p in PERCENTILES]:
+                if key in summary and key in before:
+                    change = (summary[key] / before[key] - 1) * 100 if before[key] > 0 else 0
+                    print(scenario + " ; " + metric + " ; " + key + " ; " + str(round(before[key], 3)) + " ; "
+                          + str(round(summary[key], 3)) + " ; " + ("+" if change >= 0 else "") + str(round(change, 1)))
+
+def main(path=RESULT_FILE, former_path=None):
+    results = run()
+    report(results)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+    print("results written to " + path)
+    if former_path is not None:
+        with open(former_path) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
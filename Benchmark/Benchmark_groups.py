@@ -0,0 +1,114 @@
+"""
+This is a benchmark of the groups.
+
+Three nodes (from Groups.py) are started in different processes on the default
+server list, every node runs the servers of all groups. As soon as every group
+has elected its master, the same number of writes is sent with a group session
+that keeps a number of writes in flight. The keys are spread over the groups by
+the ring, so every group gets its share of the writes. This is repeated for a
+growing number of groups and the aggregate throughput is printed:
+    python3 Benchmark_groups.py [<groups> ...]
+To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Groups
+import Session
+import Benchmark_replication
+
+"""
+Note:
+Consider the notes in 'Benchmark_replication.py'.
+With one group every write passes the same master, with three or more groups
+every node is the master of some groups. The nodes share the CPUs of the machine,
+so the throughput only grows as long as the master of one group is the limit and
+not the machine.
+"""
+
+GROUPS = [1, 2, 3, 6, 12]
+WRITES = 3000
+DEPTH = 64
+ELECTION_TIMEOUT = 120
+
+def node_process(ip, groups, stop):
+    node = Groups.GroupNode(ip, groups)
+    for s in node.get_servers():
+        s.get_log().set_level("election", 100)
+        s.get_log().set_level("server", 100)
+        s.get_log().set_level("replication", 100)
+    node.start()
+    stop.wait()
+    node.stop()
+
+def wait_for_groups(port, groups):
+    """
+    Wait until every group has a master that accepts writes.
+
+    Returns
+    -------
+    list
+        The IP address of the master of every group or 'None' if the time expired.
+    """
+    masters = [None] * groups
+    start = time.time()
+    while None in masters and time.time() - start < ELECTION_TIMEOUT:
+        for group in range(groups):
+            for ip in Server.DEFAULT_SERVER_LIST:
+                if masters[group] is not None:
+                    break
+                try:
+                    answer = Benchmark_replication.write(ip, Groups.group_port(port, group), "benchmark", "ready")
+                except OSError:
+                    answer = None
+                if answer == Server.WRITE_COMMITTED_MESSAGE:
+                    masters[group] = ip
+        time.sleep(1)
+    return None if None in masters else masters
+
+def throughput(port, groups):
+    session = Groups.GroupSession(groups, port)
+    committed = 0
+    futures = []
+    start = time.perf_counter()
+    for i in range(WRITES):
+        if len(futures) == DEPTH:
+            if futures.pop(0).result() == Server.WRITE_COMMITTED_MESSAGE:
+                committed += 1
+        key = "key" + str(i % 1000)
+        futures.append(session.submit(key, Session.write_message(key, str(i))))
+    for future in futures:
+        if future.result() == Server.WRITE_COMMITTED_MESSAGE:
+            committed += 1
+    duration = time.perf_counter() - start
+    session.close()
+    return committed / duration, committed
+
+def main(groups_list):
+    port = Benchmark_replication.get_port()
+    print("groups ; masters ; writes/s ; committed")
+    for groups in groups_list:
+        stop = multiprocessing.Event()
+        processes = []
+        for ip in Server.DEFAULT_SERVER_LIST:
+            p = multiprocessing.Process(target=node_process, args=(ip, groups, stop))
+            p.start()
+            processes.append(p)
+        masters = wait_for_groups(port, groups)
+        if masters is None:
+            print(str(groups) + " ; no master has been elected in every group")
+        else:
+            rate, committed = throughput(port, groups)
+            print(str(groups) + " ; " + str(len(set(masters))) + " ; " + str(round(rate, 1)) + " ; " + str(committed))
+        stop.set()
+        for p in processes:
+            p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+            if p.is_alive():
+                p.terminate()
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or GROUPS)
@@ -0,0 +1,190 @@
+"""
+This is a benchmark of the memory that a server needs.
+
+Networks of three servers (from Server.py) are started on their own addresses
+(127.1.<network>.7 - 127.1.<network>.9) in two ways:
+    process : every server runs in a process of its own, like a node of its own.
+    host    : all servers run in one process and are accepted by one host (-> Host.py).
+After all networks have elected a master, the proportional set size (PSS) and the
+threads of the processes are read from /proc, the total and the amount per server
+are printed. An empty process that has only imported the modules is measured as well,
+it is the cost of the interpreter that every process of its own pays again.
+    python3 Benchmark_hosting.py [<networks> ...]
+To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import queue
+import time
+import sys
+import os
+
+sys.path.insert(1, '../src')
+import Server
+import Host
+
+"""
+Note:
+The processes are spawned and not forked, so they do not share the pages of this
+process and every process loads the interpreter and the modules itself, like a
+server that has been started from the shell. The PSS splits the pages that are
+still shared (e.g. the libraries) between the processes, so the sizes of all
+processes can be added. Without /proc/<pid>/smaps_rollup the resident set size
+is used instead.
+The servers of a host still have their own log writer and their own threads for
+the election and the connections, only the thread that accepts is shared.
+"""
+
+NETWORKS = [1, 3, 9]
+NETWORK_SIZE = 3
+PREFIX = "127.1."
+FIRST_HOST = 7
+ELECTION_TIMEOUT = 120
+MEASURE_DELAY = 2
+# the servers exchange their first pings before they are measured
+STOP_TIMEOUT = 60
+
+def server_lists(networks):
+    # the server lists of the networks (e.g. 127.1.0.7 - 127.1.0.9 for the first)
+    return [[PREFIX + str(n) + "." + str(FIRST_HOST + i) for i in range(NETWORK_SIZE)] for n in range(networks)]
+
+def memory(pid):
+    """
+    Return the memory and the threads of a process.
+
+    Parameters
+    ----------
+    pid : int
+        the ID of the process.
+
+    Returns
+    -------
+    tuple of int and int
+        The proportional set size in bytes and the number of threads.
+    """
+    size = None
+    try:
+        with open("/proc/" + str(pid) + "/smaps_rollup") as file:
+            for line in file:
+                if line.startswith("Pss:"):
+                    size = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    threads = 0
+    with open("/proc/" + str(pid) + "/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:") and size is None:
+                size = int(line.split()[1]) * 1024
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return size, threads
+
+def wait_for_masters(servers, lists):
+    # waits until every server follows the last server of its list
+    masters = {ip : server_list[-1] for server_list in lists for ip in server_list}
+    deadline = time.time() + ELECTION_TIMEOUT
+    while time.time() < deadline:
+        if all(s.get_master() == masters[s.ip] for s in servers):
+            return True
+        time.sleep(0.1)
+    return False
+
+def quiet(s):
+    s.get_log().set_level("election", 100)
+    s.get_log().set_level("server", 100)
+
+def empty_process(reports, commands):
+    reports.put((os.getpid(), True))
+    commands.get()
+
+def server_process(ip, server_list, reports, commands):
+    s = Server.Server(ip, server_list=server_list)
+    quiet(s)
+    start = threading.Thread(target=s.start, args = ())
+    start.start()
+    elected = wait_for_masters([s], [server_list])
+    time.sleep(MEASURE_DELAY)
+    reports.put((os.getpid(), elected))
+    commands.get()
+    s.shutdown()
+    start.join()
+
+def host_process(lists, reports, commands):
+    host = Host.Host()
+    servers = []
+    for server_list in lists:
+        for ip in server_list:
+            s = host.add(Server.Server(ip, server_list=server_list))
+            quiet(s)
+            servers.append(s)
+    host.start()
+    for s in servers:
+        s.start()
+    elected = wait_for_masters(servers, lists)
+    time.sleep(MEASURE_DELAY)
+    reports.put((os.getpid(), elected))
+    commands.get()
+    host.stop()
+
+def measure(context, targets):
+    """
+    Run processes and measure them once all of them have reported.
+
+    Parameters
+    ----------
+    context : multiprocessing context
+        the context that spawns the processes.
+    targets : list of tuple
+        the function and the arguments of every process, the reports and the
+        commands queue are appended to the arguments.
+
+    Returns
+    -------
+    tuple
+        The summed size in bytes, the summed threads and True if all networks elected a master.
+    """
+    reports = context.Queue()
+    commands = context.Queue()
+    processes = [context.Process(target=target, args=args + (reports, commands)) for target, args in targets]
+    for p in processes:
+        p.start()
+    results = []
+    for p in processes:
+        try:
+            results.append(reports.get(timeout=ELECTION_TIMEOUT + MEASURE_DELAY + 30))
+        except queue.Empty:
+            results.append((p.pid, False))
+    size = 0
+    threads = 0
+    for pid, elected in results:
+        process_size, process_threads = memory(pid)
+        size += process_size
+        threads += process_threads
+    for p in processes:
+        commands.put(None)
+    for p in processes:
+        p.join(STOP_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+    return size, threads, all(elected for pid, elected in results)
+
+def main(networks_list):
+    context = multiprocessing.get_context("spawn")
+    interpreter, interpreter_threads, _ = measure(context, [(empty_process, ())])
+    print("interpreter with the modules: " + str(round(interpreter / 2 ** 20, 2)) + " MiB ; "
+          + str(interpreter_threads) + " threads")
+    print("mode ; servers ; total MiB ; MiB per server ; threads ; threads per server ; elected")
+    for networks in networks_list:
+        lists = server_lists(networks)
+        servers = networks * NETWORK_SIZE
+        modes = [("process", [(server_process, (ip, server_list)) for server_list in lists for ip in server_list]),
+                 ("host", [(host_process, (lists,))])]
+        for mode, targets in modes:
+            size, threads, elected = measure(context, targets)
+            print(mode + " ; " + str(servers) + " ; " + str(round(size / 2 ** 20, 2)) + " ; "
+                  + str(round(size / servers / 2 ** 20, 2)) + " ; " + str(threads) + " ; "
+                  + str(round(threads / servers, 1)) + " ; " + str(elected))
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or NETWORKS)
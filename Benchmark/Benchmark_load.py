@@ -0,0 +1,282 @@
+"""
+This is a load generator for the messages of the election.
+
+Three servers (from Server.py) are started in different processes on the
+default server list, just like in the example. As soon as a master has been
+elected, the master receives a mix of pings, questions for its master and
+junk messages (-> Server.handle_client) at a given rate over a number of
+concurrent connections. The rate is increased step by step and for every
+rate the achieved throughput, the latency percentiles, the errors and the
+largest number of threads of the master are printed. The first rate the
+master cannot keep up with is its saturation point.
+The load can also be sent to a server that is already running:
+    python3 Benchmark_load.py [<ip> <port>]
+then the threads of the server are not counted. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import random
+import string
+import queue
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Client
+import Benchmark_replication
+
+"""
+Note:
+The load is sent open-loop: the messages are scheduled at the rate no matter
+how fast the server answers, and the latency is measured from the scheduled time.
+So if all connections are busy, the waiting time counts as latency like it does
+for a server whose pings are delayed. Every message uses a connection of its own,
+because the server closes the connection after answering these messages.
+The generator needs CPU time as well, on a machine with few cores it may
+saturate before the server does.
+The pings carry the IP of a follower, a ping of an unknown server would make
+the master replicate its store to it.
+"""
+
+RATES = [100, 200, 400, 800, 1600, 3200, 6400, 12800, 25600]
+# messages per second
+DURATION = 5
+CONNECTIONS = 32
+MIX = {"ping" : 0.6, "ask master" : 0.3, "junk" : 0.1}
+JUNK_SIZE = 32
+TIMEOUT = 5
+# seconds until a message without an answer counts as an error
+SAMPLE_INTERVAL = 0.01
+SATURATION_THROUGHPUT = 0.9
+# saturated if less than this part of the rate is answered...
+SATURATION_LATENCY = 10
+# ...or the p99 latency is this many times the one of the lowest rate
+LOAD_IP = "127.0.0.100"
+
+def server_process(ip, commands, results):
+    s = Server.Server(ip)
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    peak = [threading.active_count()]
+    stopped = threading.Event()
+    sampler = threading.Thread(target=sample_threads, args=(peak, stopped), daemon=True)
+    sampler.start()
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        if command[0] == "threads":
+            # the largest number of threads since the last question
+            results.put(peak[0])
+            peak[0] = threading.active_count()
+    stopped.set()
+    s.shutdown()
+    thread.join()
+
+def sample_threads(peak, stopped):
+    while not stopped.wait(SAMPLE_INTERVAL):
+        peak[0] = max(peak[0], threading.active_count())
+
+def message(kind, follower):
+    """
+    Return a message of the given kind.
+
+    Parameters
+    ----------
+    kind : str
+        the kind of the message (-> MIX).
+    follower : str
+        the IP address a ping is sent for.
+
+    Returns
+    -------
+    str
+        The message that is sent to the server.
+    """
+    if kind == "ping":
+        return Server.PING_MESSAGE + follower
+    if kind == "ask master":
+        return Server.ASK_MASTER_MESSAGE
+    return "".join(random.choice(string.ascii_letters) for _ in range(JUNK_SIZE))
+
+def send(ip, port, msg):
+    # sends one message on a connection of its own and returns the answer
+    c = Client.Client(LOAD_IP)
+    c.client.settimeout(TIMEOUT)
+    if not c.connect(ip, port):
+        raise OSError("connection refused")
+    return c.send(msg)
+
+def connection(ip, port, scheduled, latencies, errors, lock):
+    # sends the scheduled messages until it gets 'None'
+    while True:
+        item = scheduled.get()
+        if item is None:
+            break
+        scheduled_time, kind, msg = item
+        try:
+            answer = send(ip, port, msg)
+            error = None if answer else "no answer"
+        except OSError as err:
+            error = str(err) or type(err).__name__
+        duration = time.perf_counter() - scheduled_time
+        lock.acquire()
+        if error is None:
+            latencies.append((kind, duration))
+        else:
+            errors[error] = errors.get(error, 0) + 1
+        lock.release()
+
+def generate(ip, port, rate, follower, duration=DURATION, connections=CONNECTIONS, mix=MIX):
+    """
+    Send messages open-loop at the rate and measure their latencies.
+
+    Parameters
+    ----------
+    ip : str
+        the IP address of the server.
+    port : int
+        the port number of the server.
+    rate : float
+        the messages per second.
+    follower : str
+        the IP address the pings are sent for.
+    duration : float
+        how long messages are scheduled in seconds.
+    connections : int
+        the number of concurrent connections.
+    mix : dict
+        the share of every kind of message.
+
+    Returns
+    -------
+    tuple
+        The achieved throughput, the latencies of the answered messages with their
+        kind and the number of every error.
+    """
+    scheduled = queue.Queue()
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=connection, args=(ip, port, scheduled, latencies, errors, lock))
+               for _ in range(connections)]
+    for t in threads:
+        t.start()
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    count = int(rate * duration)
+    start = time.perf_counter()
+    for i in range(count):
+        scheduled_time = start + i / rate
+        delay = scheduled_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        kind = random.choices(kinds, weights)[0]
+        scheduled.put((scheduled_time, kind, message(kind, follower)))
+    for _ in threads:
+        scheduled.put(None)
+    for t in threads:
+        t.join()
+    return len(latencies) / (time.perf_counter() - start), latencies, errors
+
+def saturated(rate, throughput, p99, first_p99):
+    return throughput < rate * SATURATION_THROUGHPUT or p99 > first_p99 * SATURATION_LATENCY
+
+def run(ip, port, follower, threads=None):
+    """
+    Increase the rate step by step and print the results of every rate.
+
+    Parameters
+    ----------
+    ip : str
+        the IP address of the server.
+    port : int
+        the port number of the server.
+    follower : str
+        the IP address the pings are sent for.
+    threads : function
+        returns the largest number of threads of the server since its last call,
+        'None' if the threads cannot be counted.
+
+    Returns
+    -------
+    float
+        The highest throughput before the server saturated, 'None' if it
+        saturated at the lowest rate.
+    """
+    print("rate/s ; answered/s ; p50 ms ; p90 ms ; p99 ms ; errors ; server threads ; "
+          + " ; ".join(kind + " p99 ms" for kind in MIX))
+    first_p99 = None
+    best = None
+    for rate in RATES:
+        if threads is not None:
+            threads()
+        throughput, latencies, errors = generate(ip, port, rate, follower)
+        peak = threads() if threads is not None else None
+        durations = [d for kind, d in latencies]
+        line = str(rate) + " ; " + str(round(throughput, 1))
+        if durations:
+            p99 = Benchmark_replication.percentile(durations, 99)
+            for p in [50, 90, 99]:
+                line += " ; " + str(round(Benchmark_replication.percentile(durations, p) * 1000, 2))
+        else:
+            p99 = float("inf")
+            line += " ; - ; - ; -"
+        line += " ; " + str(sum(errors.values())) + " ; " + ("-" if peak is None else str(peak))
+        for kind in MIX:
+            kind_durations = [d for k, d in latencies if k == kind]
+            line += " ; " + (str(round(Benchmark_replication.percentile(kind_durations, 99) * 1000, 2))
+                             if kind_durations else "-")
+        print(line)
+        if errors:
+            print("  errors: " + ", ".join(error + " " + str(count) for error, count in errors.items()))
+        if first_p99 is None:
+            first_p99 = p99
+        if saturated(rate, throughput, p99, first_p99):
+            print("saturated at " + str(rate) + " messages/s")
+            return best
+        best = throughput
+    print("not saturated up to " + str(RATES[-1]) + " messages/s")
+    return best
+
+def main():
+    port = Benchmark_replication.get_port()
+    processes = {}
+    for ip in Server.DEFAULT_SERVER_LIST:
+        commands = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        p = multiprocessing.Process(target=server_process, args=(ip, commands, results))
+        p.start()
+        processes[ip] = (p, commands, results)
+
+    print("waiting for the election....")
+    master = Benchmark_replication.wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        print("master = " + master)
+        follower = min([ip for ip in Server.DEFAULT_SERVER_LIST if ip != master])
+        p, commands, results = processes[master]
+        def threads():
+            commands.put(("threads",))
+            return results.get()
+        best = run(master, port, follower, threads)
+        if best is not None:
+            print("highest throughput before the saturation: " + str(round(best, 1)) + " messages/s")
+
+    for p, commands, results in processes.values():
+        commands.put(None)
+    for p, commands, results in processes.values():
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        # a server that is already running, the pings are sent for the first other server of the list
+        target = sys.argv[1]
+        run(target, int(sys.argv[2]), min([ip for ip in Server.DEFAULT_SERVER_LIST if ip != target]))
+    else:
+        main()
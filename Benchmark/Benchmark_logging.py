@@ -0,0 +1,78 @@
+"""
+This is a benchmark of the log of the server.
+
+Several threads log messages like the threads of a server do
+(from ServerLog.py) into a file in a temporary directory. The log is
+disabled, written directly by the logging threads, written by the
+writer thread and written by the writer thread with the default
+sampling of the pings. For every setup the time the logging threads
+spend per message and the number of written messages are printed.
+To get more information see
+-> Projekt/Readme.txt
+"""
+import logging
+import tempfile
+import threading
+import shutil
+import time
+import os
+import sys
+
+sys.path.insert(1, '../src')
+import ServerLog
+
+"""
+Note:
+The writer thread writes the remaining messages when it is stopped,
+so the time per message only contains the time of the logging threads.
+The threads log as fast as they can, so the writer thread cannot keep
+up and the queue drops messages; a server logs far less often.
+The results depend on the disk of the machine.
+"""
+
+MESSAGES = 20000
+THREADS = [1, 4]
+SETUPS = ["disabled", "direct", "writer thread", "writer thread, sampled"]
+
+def log(server_log):
+    for i in range(MESSAGES):
+        server_log.debug("ping", "Ping received = %s", i)
+
+def run(setup, thread_count, directory):
+    path = os.path.join(directory, "server.log")
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(ServerLog.LOG_FORMAT))
+    server_log = ServerLog.ServerLog("127.0.0.9", handler=handler)
+    if setup == "disabled":
+        server_log.set_level("ping", logging.INFO)
+    if setup != "writer thread, sampled":
+        server_log.set_sampling("ping", None)
+    if setup.startswith("writer thread"):
+        server_log.start()
+    threads = [threading.Thread(target=log, args=(server_log,)) for _ in range(thread_count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+    server_log.stop()
+    handler.close()
+    with open(path) as f:
+        written = sum(1 for _ in f)
+    os.remove(path)
+    return duration, written
+
+def main():
+    directory = tempfile.mkdtemp()
+    print("setup ; threads ; us per message ; written messages ; dropped messages")
+    for setup in SETUPS:
+        for thread_count in THREADS:
+            duration, written = run(setup, thread_count, directory)
+            print(setup + " ; " + str(thread_count) + " ; " + str(round(duration / (MESSAGES * thread_count) * 1e6, 2))
+                  + " ; " + str(written) + " ; " + str(MESSAGES * thread_count - written if setup != "disabled" and
+                  setup != "writer thread, sampled" else "-"))
+    shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
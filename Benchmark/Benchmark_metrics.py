@@ -0,0 +1,50 @@
+"""
+This is a benchmark of the metrics registry.
+
+The server records a counter for every message it handles and a
+duration for every ping (from Metrics.py). This benchmark measures
+how long recording a counter and a duration takes, with one thread
+and with several threads that record at the same time, like the
+threads of the server do. To get more information see
+-> Projekt/Readme.txt
+"""
+import threading
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Metrics
+
+"""
+Note:
+The threads share one lock, so the time per record increases with
+the number of threads. The results depend on the python version.
+"""
+
+RECORDS = 200000
+THREADS = [1, 4]
+
+def record(metrics, kind):
+    if kind == "count":
+        for _ in range(RECORDS):
+            metrics.count("messages", "write")
+    else:
+        for _ in range(RECORDS):
+            metrics.observe("ping_rtt", 0.0005)
+
+def main():
+    print("record ; threads ; ns per record")
+    for kind in ["count", "observe"]:
+        for thread_count in THREADS:
+            metrics = Metrics.Metrics()
+            threads = [threading.Thread(target=record, args=(metrics, kind)) for _ in range(thread_count)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            duration = time.perf_counter() - start
+            print(kind + " ; " + str(thread_count) + " ; " + str(round(duration / (RECORDS * thread_count) * 1e9)))
+
+if __name__ == "__main__":
+    main()
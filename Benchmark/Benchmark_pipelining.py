@@ -0,0 +1,106 @@
+"""
+This is a benchmark of the pipelined sessions.
+
+Three servers (from Server.py) are started in different
+processes on the default server list, just like in the example.
+As soon as a master has been elected, the same number of writes
+is sent once with the one-shot client (one connection per write,
+see Benchmark_replication.py) and once with a session for every
+pipeline depth, which is the number of writes that are sent
+without waiting for their answers. The sessions are connected
+to a follower first, so they are redirected to the master.
+To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import asyncio
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Session
+import Benchmark_replication
+
+"""
+Note:
+Consider the notes in 'Benchmark_replication.py'.
+"""
+
+WRITES = 2000
+DEPTHS = [1, 4, 16, 64, 256]
+
+def one_shot(master, port):
+    committed = 0
+    start = time.perf_counter()
+    for i in range(WRITES):
+        if Benchmark_replication.write(master, port, "key" + str(i % 100), str(i)) == Server.WRITE_COMMITTED_MESSAGE:
+            committed += 1
+    return committed / (time.perf_counter() - start)
+
+def pipelined(follower, port, depth):
+    s = Session.Session(follower, port)
+    committed = 0
+    futures = []
+    start = time.perf_counter()
+    for i in range(WRITES):
+        if len(futures) == depth:
+            if futures.pop(0).result() == Server.WRITE_COMMITTED_MESSAGE:
+                committed += 1
+        futures.append(s.submit(Session.write_message("key" + str(i % 100), str(i))))
+    for future in futures:
+        if future.result() == Server.WRITE_COMMITTED_MESSAGE:
+            committed += 1
+    duration = time.perf_counter() - start
+    s.close()
+    return committed / duration
+
+async def pipelined_async(follower, port, depth):
+    s = Session.AsyncSession(follower, port)
+    committed = 0
+    futures = []
+    start = time.perf_counter()
+    for i in range(WRITES):
+        if len(futures) == depth:
+            if await futures.pop(0) == Server.WRITE_COMMITTED_MESSAGE:
+                committed += 1
+        futures.append(await s.submit(Session.write_message("key" + str(i % 100), str(i))))
+    for answer in await asyncio.gather(*futures):
+        if answer == Server.WRITE_COMMITTED_MESSAGE:
+            committed += 1
+    duration = time.perf_counter() - start
+    await s.close()
+    return committed / duration
+
+def main():
+    port = Benchmark_replication.get_port()
+    stop = multiprocessing.Event()
+    processes = []
+    for ip in Server.DEFAULT_SERVER_LIST:
+        p = multiprocessing.Process(target=Benchmark_replication.server_process, args=(ip, stop))
+        p.start()
+        processes.append(p)
+
+    print("waiting for the election....")
+    master = Benchmark_replication.wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        print("master = " + master)
+        follower = min([ip for ip in Server.DEFAULT_SERVER_LIST if ip != master])
+        print("client ; depth ; writes/s")
+        print("one-shot ; 1 ; " + str(round(one_shot(master, port), 1)))
+        for depth in DEPTHS:
+            print("session ; " + str(depth) + " ; " + str(round(pipelined(follower, port, depth), 1)))
+        for depth in DEPTHS:
+            throughput = asyncio.run(pipelined_async(follower, port, depth))
+            print("async session ; " + str(depth) + " ; " + str(round(throughput, 1)))
+
+    stop.set()
+    for p in processes:
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
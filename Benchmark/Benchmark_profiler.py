@@ -0,0 +1,76 @@
+"""
+This is a benchmark of the sampling profiler.
+
+The profiler samples the stacks of all threads while the server is running
+(from Profiler.py). This benchmark measures how long one sample takes and
+how much slower a thread that handles messages gets while the profiler
+samples it in several intervals.
+Further threads wait like the threads of a server do (e.g. the ping check),
+because every thread makes a sample more expensive. To get more information see
+-> Projekt/Readme.txt
+"""
+import threading
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Profiler
+import Client
+
+"""
+Note:
+The slowdown is the best time of the work with the profiler compared to the
+best time without it, it is less accurate than the time of a sample divided
+by the interval. The results depend on the python version and the number
+of cores, because the sampling thread needs the global interpreter lock.
+"""
+
+MESSAGES = 300000
+REPETITIONS = 3
+SAMPLES = 2000
+WAITING_THREADS = 20
+INTERVALS = [None, 0.02, 0.005, 0.001]
+
+def work():
+    # frames and parses messages like a handler does
+    for i in range(MESSAGES):
+        message = Client.frame("write = " + str(i))
+        int(message[:Client.HEADER].decode(Client.FORMAT))
+
+def main():
+    stop = threading.Event()
+    waiting = [threading.Thread(target=stop.wait, name='Waiting') for _ in range(WAITING_THREADS)]
+    for t in waiting:
+        t.start()
+    profiler = Profiler.Profiler()
+    start = time.perf_counter()
+    for _ in range(SAMPLES):
+        profiler.sample()
+    print("us per sample of " + str(WAITING_THREADS + 1) + " threads ; "
+          + str(round((time.perf_counter() - start) / SAMPLES * 1e6, 1)))
+    baseline = None
+    print("interval in ms ; seconds ; slowdown in % ; samples ; stacks")
+    for interval in INTERVALS:
+        profiler = None
+        if interval is not None:
+            profiler = Profiler.Profiler(interval)
+            profiler.start()
+        duration = None
+        for _ in range(REPETITIONS):
+            start = time.perf_counter()
+            work()
+            duration = min(duration or float("inf"), time.perf_counter() - start)
+        if profiler is None:
+            baseline = duration
+            print("off ; " + str(round(duration, 3)) + " ; 0 ; 0 ; 0")
+        else:
+            profiler.stop()
+            print(str(interval * 1000) + " ; " + str(round(duration, 3)) + " ; "
+                  + str(round((duration / baseline - 1) * 100, 1)) + " ; " + str(profiler.get_samples())
+                  + " ; " + str(len(profiler.get_stacks())))
+    stop.set()
+    for t in waiting:
+        t.join()
+
+if __name__ == "__main__":
+    main()
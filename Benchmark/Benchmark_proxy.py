@@ -0,0 +1,193 @@
+"""
+This is a benchmark of the fault-injecting proxy.
+
+First the overhead of the proxy itself is measured: an echo server answers
+messages that are sent directly and through the proxy without any rule, once on
+one kept connection and once on a new connection per message (like the
+messages of the election). The percentiles of both and how late the proxy
+delivered compared to its rules are printed.
+Then three servers (from Server.py) are started in different processes on the
+default server list, their connections pass the proxy, and a scenario of rules
+is replayed (-> Proxy.replay). The events of the servers are printed with their
+time since the start of the scenario. A scenario can be given as JSON file:
+    python3 Benchmark_proxy.py [overhead | <scenario file>]
+'overhead' only measures the overhead. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import socket
+import queue
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Client
+import Proxy
+import Benchmark_replication
+
+"""
+Note:
+The proxy runs in this process, so it competes with the servers and the
+generator for the CPU like a busy network device would. The overhead is the
+difference of the percentiles, it includes the second connection the proxy
+opens for every connection.
+The default scenario adds a small normal delay to all links, cuts the first
+master (the highest IP address of the list) off in both directions and heals
+the network after a while.
+"""
+
+MESSAGES = 2000
+MESSAGE_SIZE = 64
+ECHO_IP = "127.0.0.20"
+PROXY_IP = "127.0.0.21"
+SCENARIO_DURATION = 150
+SCENARIO = [{"at" : 0, "rule" : {"delay" : 0.002, "jitter" : 0.001, "distribution" : "normal"}},
+            {"at" : 45, "partition" : [max(Server.DEFAULT_SERVER_LIST), Proxy.ANY], "both" : True},
+            {"at" : 105, "clear" : True},
+            {"at" : 105, "rule" : {"delay" : 0.002, "jitter" : 0.001, "distribution" : "normal"}}]
+
+def echo_server(ip):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((ip, 0))
+    server.listen(socket.SOMAXCONN)
+    threading.Thread(target=serve, args=(server,), daemon=True).start()
+    return server
+
+def serve(server):
+    while True:
+        try:
+            conn, addr = server.accept()
+        except OSError:
+            return
+        threading.Thread(target=echo, args=(conn,), daemon=True).start()
+
+def echo(conn):
+    while True:
+        try:
+            msg = Client.receive(conn)
+        except OSError:
+            msg = None
+        if msg is None:
+            conn.close()
+            return
+        conn.sendall(Client.frame(msg))
+
+def round_trips(address, transport, kept):
+    """
+    Return the durations of the round trips to the echo server.
+
+    Parameters
+    ----------
+    address : tuple
+        the address of the echo server.
+    transport : Transport object
+        the transport of the client ('None' to connect directly).
+    kept : bool
+        True to send all messages on one connection, False to open a connection per message.
+
+    Returns
+    -------
+    list of float
+        The duration of every round trip in seconds, with the connect if it is not kept.
+    """
+    msg = "x" * MESSAGE_SIZE
+    durations = []
+    c = None
+    for i in range(MESSAGES):
+        start = time.perf_counter()
+        if c is None:
+            c = Client.Client(ECHO_IP, transport)
+            if not c.connect(*address):
+                raise OSError("the echo server is not available")
+        if c.exchange(msg) != msg:
+            raise OSError("wrong answer")
+        if not kept:
+            c.close()
+            c = None
+        durations.append(time.perf_counter() - start)
+    if c is not None:
+        c.close()
+    return durations
+
+def overhead():
+    server = echo_server(ECHO_IP)
+    proxy = Proxy.Proxy(PROXY_IP)
+    proxy.start()
+    print("connection ; path ; p50 ms ; p90 ms ; p99 ms")
+    for kept in [True, False]:
+        results = {}
+        for path, transport in [("direct", None), ("proxy", proxy.transport(ECHO_IP))]:
+            durations = round_trips(server.getsockname(), transport, kept)
+            results[path] = [Benchmark_replication.percentile(durations, p) for p in [50, 90, 99]]
+            print(("kept" if kept else "new") + " ; " + path + " ; "
+                  + " ; ".join(str(round(d * 1000, 3)) for d in results[path]))
+        print(("kept" if kept else "new") + " ; overhead ; "
+              + " ; ".join(str(round((p - d) * 1000, 3)) for p, d in zip(results["proxy"], results["direct"])))
+    lateness = proxy.get_metrics().get_histogram("proxy_lateness")
+    print("proxy lateness ms: p50 " + str(round(proxy.get_metrics().percentile("proxy_lateness", 50) * 1000, 3))
+          + " ; p99 " + str(round(proxy.get_metrics().percentile("proxy_lateness", 99) * 1000, 3))
+          + " ; max " + str(round(lateness["max"] * 1000, 3)) + " ; chunks " + str(lateness["count"]))
+    proxy.stop()
+    server.close()
+
+def server_process(ip, proxy_address, commands, events):
+    s = Server.Server(ip, transport=Proxy.ProxyTransport(proxy_address, ip))
+    s.get_events().subscribe(lambda event: events.put((ip, event)))
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    commands.get()
+    s.shutdown()
+    thread.join()
+
+def scenario(steps, duration=SCENARIO_DURATION):
+    """
+    Replay a scenario between three servers and print their events.
+
+    Parameters
+    ----------
+    steps : list
+        the steps of the scenario (-> Proxy.replay).
+    duration : float
+        how long the servers run in seconds.
+    """
+    proxy = Proxy.Proxy(PROXY_IP)
+    proxy_address = proxy.start()
+    events = multiprocessing.Queue()
+    processes = []
+    for ip in Server.DEFAULT_SERVER_LIST:
+        commands = multiprocessing.Queue()
+        p = multiprocessing.Process(target=server_process, args=(ip, proxy_address, commands, events))
+        processes.append((p, commands))
+    start_time = time.time()
+    replay = proxy.replay(steps)
+    for p, commands in processes:
+        p.start()
+    print("seconds ; server ; event ; detail")
+    while time.time() < start_time + duration:
+        try:
+            ip, event = events.get(timeout=1)
+        except queue.Empty:
+            continue
+        detail = event.get("master", event.get("ip", event.get("reason", "")))
+        print(str(round(event["time"] - start_time, 2)) + " ; " + ip + " ; " + event["type"] + " ; " + str(detail))
+    for p, commands in processes:
+        commands.put(None)
+    for p, commands in processes:
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+    proxy.stop()
+    replay.join()
+    counters = proxy.get_metrics().get_counters()
+    print("proxy connections: " + str(counters.get("proxy_connections", {}))
+          + " ; retransmissions: " + str(proxy.get_metrics().get_counter("proxy_retransmissions")))
+
+if __name__ == "__main__":
+    overhead()
+    if len(sys.argv) == 1:
+        scenario(SCENARIO)
+    elif sys.argv[1] != "overhead":
+        scenario(Proxy.load_scenario(sys.argv[1]))
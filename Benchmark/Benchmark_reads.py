@@ -0,0 +1,99 @@
+"""
+This is a benchmark of the reads of the replicated store.
+
+Three servers (from Server.py) are started in different
+processes on the default server list, just like in the example.
+As soon as a master has been elected, a number of clients
+read from the servers concurrently. Linearizable reads are only
+answered by the master, stale reads are spread over the master
+and an increasing number of followers. For every setup the
+throughput of answered reads is printed. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import time
+import json
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Client
+import Benchmark_replication
+
+"""
+Note:
+Consider the notes in 'Benchmark_replication.py'.
+The master only answers linearizable reads while it holds the lease,
+which needs the first pings of the followers (-> Server.SEND_PING_TIME).
+"""
+
+READS = 3000
+CLIENTS = 16
+MAX_STALENESS = 2 * Server.SEND_PING_TIME
+
+def read(ip, port, key, consistency):
+    c = Client.Client(ip)
+    if not c.connect(ip, port):
+        return None
+    return c.request(Server.READ_MESSAGE + json.dumps({"key" : key, "consistency" : consistency,
+                                                       "max_staleness" : MAX_STALENESS}))
+
+def reader(targets, port, count, consistency, answered, errors):
+    for i in range(count):
+        answer = read(targets[i % len(targets)], port, "benchmark", consistency)
+        if answer == '"ready"':
+            answered.append(1)
+        else:
+            errors.append(answer)
+
+def measure(targets, port, consistency):
+    answered = []
+    errors = []
+    threads = []
+    start = time.perf_counter()
+    for c in range(CLIENTS):
+        # every client starts with another server
+        shifted = targets[c % len(targets):] + targets[:c % len(targets)]
+        t = threading.Thread(target=reader, args=(shifted, port, int(READS / CLIENTS), consistency, answered, errors))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+    return len(answered) / duration, len(errors)
+
+def main():
+    port = Benchmark_replication.get_port()
+    stop = multiprocessing.Event()
+    processes = []
+    for ip in Server.DEFAULT_SERVER_LIST:
+        p = multiprocessing.Process(target=Benchmark_replication.server_process, args=(ip, stop))
+        p.start()
+        processes.append(p)
+
+    print("waiting for the election....")
+    master = Benchmark_replication.wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        print("master = " + master)
+        # the followers have to ping the master to renew its lease
+        time.sleep(Server.SEND_PING_TIME + 1)
+        followers = [ip for ip in Server.DEFAULT_SERVER_LIST if ip != master]
+        print("consistency ; servers ; reads/s ; errors")
+        throughput, errors = measure([master], port, Server.LINEARIZABLE_READ)
+        print(Server.LINEARIZABLE_READ + " ; 1 ; " + str(round(throughput, 1)) + " ; " + str(errors))
+        for count in range(len(followers) + 1):
+            targets = [master] + followers[:count]
+            throughput, errors = measure(targets, port, Server.STALE_READ)
+            print(Server.STALE_READ + " ; " + str(len(targets)) + " ; " + str(round(throughput, 1)) + " ; " + str(errors))
+
+    stop.set()
+    for p in processes:
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
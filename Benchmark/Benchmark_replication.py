@@ -0,0 +1,134 @@
+"""
+This is a benchmark of the replicated store.
+
+Three servers (from Server.py) are started in different
+processes on the default server list, just like in the example.
+As soon as a master has been elected, a number of clients
+write to the master concurrently. For every number of clients
+the throughput of committed writes and the latency of a single
+write are printed. To get more information see
+-> Projekt/Readme.txt
+"""
+import multiprocessing
+import threading
+import subprocess
+import time
+import json
+import sys
+
+sys.path.insert(1, '../src')
+import Server
+import Client
+
+"""
+Note:
+The election takes some time (-> Server.INITIAL_NETWORK_SEARCH_TIMEOUT,
+Server.MASTER_VOTE_TIMEOUT). The benchmark waits for it before measuring.
+It is recommended to redirect the server output into a file, because
+every server logs its messages into the terminal.
+"""
+
+WRITES = 600
+CLIENTS = [1, 4, 16]
+ELECTION_TIMEOUT = 120
+
+def server_process(ip, stop):
+    s = Server.Server(ip)
+    thread = threading.Thread(target=s.start, args = ())
+    thread.start()
+    stop.wait()
+    s.shutdown()
+    thread.join()
+
+def get_port():
+    # the same port the servers use
+    uid = subprocess.check_output(['id','-u']).decode(Server.FORMAT).strip()
+    return 20000 + (int(uid) - 1000) * 50
+
+def write(ip, port, key, value):
+    c = Client.Client(ip)
+    if not c.connect(ip, port):
+        return None
+    return c.request(Server.WRITE_MESSAGE + json.dumps({"key" : key, "value" : value}))
+
+def wait_for_master(port):
+    """
+    Wait until a master accepts writes and return its IP address.
+
+    The servers are asked by a write, because asking for the master
+    interferes with the requests counted in Server.find_network.
+    """
+    start = time.time()
+    while time.time() - start < ELECTION_TIMEOUT:
+        for ip in Server.DEFAULT_SERVER_LIST:
+            try:
+                answer = write(ip, port, "benchmark", "ready")
+            except OSError:
+                answer = None
+            if answer == Server.WRITE_COMMITTED_MESSAGE:
+                return ip
+        time.sleep(1)
+    return None
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def writer(ip, port, count, latencies, errors):
+    for i in range(count):
+        start = time.perf_counter()
+        answer = write(ip, port, "key" + str(i % 100), str(i))
+        if answer == Server.WRITE_COMMITTED_MESSAGE:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(answer)
+
+def measure(master, port, clients):
+    latencies = []
+    errors = []
+    threads = []
+    start = time.perf_counter()
+    for _ in range(clients):
+        t = threading.Thread(target=writer, args=(master, port, int(WRITES / clients), latencies, errors))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    duration = time.perf_counter() - start
+    return len(latencies) / duration, latencies, errors
+
+def main():
+    port = get_port()
+    stop = multiprocessing.Event()
+    processes = []
+    for ip in Server.DEFAULT_SERVER_LIST:
+        p = multiprocessing.Process(target=server_process, args=(ip, stop))
+        p.start()
+        processes.append(p)
+
+    print("waiting for the election....")
+    master = wait_for_master(port)
+    if master is None:
+        print("no master has been elected")
+    else:
+        print("master = " + master)
+        print("clients ; writes/s ; p50 ms ; p90 ms ; p99 ms ; errors")
+        for clients in CLIENTS:
+            throughput, latencies, errors = measure(master, port, clients)
+            if latencies:
+                print(str(clients) + " ; " + str(round(throughput, 1))
+                      + " ; " + str(round(percentile(latencies, 50) * 1000, 2))
+                      + " ; " + str(round(percentile(latencies, 90) * 1000, 2))
+                      + " ; " + str(round(percentile(latencies, 99) * 1000, 2))
+                      + " ; " + str(len(errors)))
+            else:
+                print(str(clients) + " ; no write has been committed ; " + str(len(errors)))
+
+    stop.set()
+    for p in processes:
+        p.join(Server.SEND_PING_TIME + Server.INITIAL_NETWORK_SEARCH_TIMEOUT)
+        if p.is_alive():
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+This is a benchmark of the write-ahead log.
+
+Records of different sizes are appended to a write-ahead log
+(from WriteAheadLog.py) in a temporary directory with different
+fsync intervals. Afterwards the records are read sequentially
+and randomly and the log is recovered from disk. For every step
+the throughput is printed. To get more information see
+-> Projekt/Readme.txt
+"""
+import tempfile
+import shutil
+import random
+import time
+import sys
+
+sys.path.insert(1, '../src')
+import WriteAheadLog
+
+"""
+Note:
+The fsync interval of 1 synchronizes every record on its own,
+which is the most expensive but also the safest setting.
+The results heavily depend on the disk of the machine.
+"""
+
+RECORDS = 20000
+PAYLOAD_SIZES = [64, 1024]
+FSYNC_INTERVALS = [1, 64, 1024]
+
+def append(directory, payload_size, fsync_interval):
+    wal = WriteAheadLog.WriteAheadLog(directory, fsync_interval=fsync_interval)
+    payload = b"x" * payload_size
+    start = time.perf_counter()
+    for _ in range(RECORDS):
+        wal.append(payload)
+    wal.sync()
+    duration = time.perf_counter() - start
+    wal.close()
+    return duration
+
+def read(directory):
+    wal = WriteAheadLog.WriteAheadLog(directory)
+    start = time.perf_counter()
+    for _ in wal.records():
+        pass
+    sequential = time.perf_counter() - start
+    numbers = [random.randrange(wal.end()) for _ in range(RECORDS)]
+    start = time.perf_counter()
+    for number in numbers:
+        wal.read(number)
+    randomly = time.perf_counter() - start
+    wal.close()
+    return sequential, randomly
+
+def recover(directory):
+    start = time.perf_counter()
+    wal = WriteAheadLog.WriteAheadLog(directory)
+    duration = time.perf_counter() - start
+    wal.close()
+    return duration
+
+def main():
+    print("records = " + str(RECORDS))
+    print("payload B ; fsync interval ; append rec/s ; append MB/s ; seq read rec/s ; random read rec/s ; recovery ms")
+    for payload_size in PAYLOAD_SIZES:
+        for fsync_interval in FSYNC_INTERVALS:
+            directory = tempfile.mkdtemp()
+            try:
+                appending = append(directory, payload_size, fsync_interval)
+                sequential, randomly = read(directory)
+                recovery = recover(directory)
+            finally:
+                shutil.rmtree(directory)
+            print(str(payload_size) + " ; " + str(fsync_interval)
+                  + " ; " + str(round(RECORDS / appending))
+                  + " ; " + str(round(RECORDS * payload_size / appending / 1024 / 1024, 1))
+                  + " ; " + str(round(RECORDS / sequential))
+                  + " ; " + str(round(RECORDS / randomly))
+                  + " ; " + str(round(recovery * 1000, 1)))
+
+if __name__ == "__main__":
+    main()
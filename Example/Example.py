@@ -9,6 +9,7 @@ on different times. To get more information see
 import multiprocessing
 import time
 import threading
+import queue
 import sys
 
 sys.path.insert(1, '../src')
@@ -19,10 +20,15 @@ Note:
 To improve the overview in the terminal
 it is recommended to redirect the server
 output into a 'server.log' file. If you
-want to run this example go into src/Server.py
-and remove the '#' in line 44. To get a glimpse
-of what the server is doing you can open this file
-and enable all loggin calls in Server.py.
+want to run this example go into src/ServerLog.py
+and set LOG_FILE to '../Example/server.log'. To get
+a glimpse of what the server is doing you can open
+this file. Only every 10th answer to a ping is
+logged (-> ServerLog.DEFAULT_SAMPLING).
+Every server writes its journal (e.g. '127.0.0.9.journal')
+into this directory. Afterwards the elections and failovers
+of the example can be analyzed with
+'python3 ../src/Analyzer.py 127.0.0.9.journal 127.0.0.8.journal 127.0.0.7.journal'.
 --------
 WARNING:
 The behavior differs from try to try because
@@ -33,15 +39,23 @@ would go beyond the scope of this project.
 """
 
 def logger(server, start_time, server_name):
+    # prints every event of the server as soon as it happens instead of asking the server again and again
+    events = server.get_events().queue()
     while (time.time() - start_time) <= 180:
-        time.sleep(21)
-        print("after " + str(time.time()-start_time) + " seconds on " + server_name + " ; Master = " + str(server.get_master()) + " ; Online = " + str(server.is_online()))
+        try:
+            event = events.get(timeout=max(0, 180 - (time.time() - start_time)))
+        except queue.Empty:
+            break
+        print("after " + str(round(event["time"]-start_time, 2)) + " seconds on " + server_name + " ; Event = " + event["type"]
+              + " ; Master = " + str(server.get_master()) + " ; Online = " + str(server.is_online()))
+    server.get_events().unsubscribe_queue(events)
         
 
 
 def server_one(start):
     server_name = "server 1"
     s = Server.Server("127.0.0.9")
+    s.start_journal("127.0.0.9.journal")
     thread = threading.Thread(target=s.start, args = ())
     thread.start()
     log = threading.Thread(target=logger, args = (s, start, server_name))
@@ -59,11 +73,13 @@ def server_one(start):
     print("after " + str(time.time()-start) + " seconds on " + server_name + " ; removing two server from network (first)")
     s.shutdown()
     thread.join()
+    s.stop_journal()
 
 
 def server_two(start):
     server_name = "server 2"
     s = Server.Server("127.0.0.8")
+    s.start_journal("127.0.0.8.journal")
     thread = threading.Thread(target=s.start, args = ())
     thread.start()
     log = threading.Thread(target=logger, args = (s, start, server_name))
@@ -74,10 +90,12 @@ def server_two(start):
     print("after " + str(time.time()-start) + " seconds on " + server_name + " ; removing two server from network (second)")
     s.shutdown()
     thread.join()
+    s.stop_journal()
 
 def server_three(start):
     server_name = "server 3"
     s = Server.Server("127.0.0.7")
+    s.start_journal("127.0.0.7.journal")
     thread = threading.Thread(target=s.start, args = ())
     thread.start()
     log = threading.Thread(target=logger, args = (s, start, server_name))
@@ -93,6 +111,7 @@ def server_three(start):
 
     time.sleep(35)
     print("after " + str(time.time()-start) + " seconds on " + server_name + " ; i will not be shut down manually")
+    s.get_journal().flush()
     thread.join()
 
 
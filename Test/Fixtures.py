@@ -0,0 +1,180 @@
+"""
+The fixtures of the tests.
+
+Every test that builds servers gets a network of its own: a block of loopback
+addresses (127.<a>.<b>.0/24) and a block of ports. Its servers are built
+against it (-> Network.server) and are closed after the test, even if the test
+failed (-> isolate). So two test runs or the test classes of one run can be
+executed at the same time without binding the same address. To run every test
+class of the given files in a process of its own type in
+    python3 Fixtures.py Test_Server_incoming.py Test_Server_outgoing.py [-jobs <n>]
+"""
+import unittest
+import multiprocessing
+import importlib
+import random
+import socket
+import time
+import io
+import os
+import sys
+sys.path.insert(1, '../src')
+import Server
+
+FIRST_PORT = 21000
+LAST_PORT = 32000
+# below the ephemeral ports of the clients
+PORT_BLOCK = 50
+# like the block of a user (-> Server.__init__), the exporter uses the next port of the server
+RESERVED_HOST = 1
+# the address that holds the reservation of the block
+HOSTS = [7, 8, 9]
+# the hosts of the server list, like Server.DEFAULT_SERVER_LIST
+ATTEMPTS = 100
+RANDOM = random.SystemRandom()
+# the processes of a parallel run are forked and would draw the same blocks otherwise
+
+"""
+Note:
+A block is reserved by binding a socket to its first address and its port without
+SO_REUSEADDR, the servers bind their addresses with it. Another test that draws
+the same addresses and port cannot bind the reservation and draws again. The
+addresses start with 127.1 or higher, so they never meet the servers of the
+default server list that may be running on the same machine.
+"""
+
+class Network:
+
+    prefix = ""
+    port = 0
+    server_list = []
+    servers = []
+    reservation = None
+
+    def __init__(self, hosts=HOSTS):
+        for attempt in range(ATTEMPTS):
+            prefix = "127." + str(RANDOM.randint(1, 254)) + "." + str(RANDOM.randint(0, 255)) + "."
+            port = RANDOM.randrange(FIRST_PORT, LAST_PORT, PORT_BLOCK)
+            reservation = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                reservation.bind((prefix + str(RESERVED_HOST), port))
+            except OSError:
+                reservation.close()
+                continue
+            self.prefix = prefix
+            self.port = port
+            self.reservation = reservation
+            self.server_list = [self.ip(host) for host in hosts]
+            self.servers = []
+            return
+        raise OSError("no free block of addresses and ports")
+
+    def ip(self, host):
+        # the address of the host in the block (e.g. 9 -> 127.<a>.<b>.9)
+        return self.prefix + str(host)
+
+    def server(self, host, **kwargs):
+        """
+        Build a server on an address of the block.
+
+        Parameters
+        ----------
+        host : int
+            the last part of the address of the server.
+        kwargs : dict
+            further arguments of the server (e.g. clock, data_dir).
+
+        Returns
+        -------
+        Server object
+            The server, it uses the port and the server list of the block.
+        """
+        s = Server.Server(self.ip(host), port=self.port, server_list=self.server_list, **kwargs)
+        self.servers.append(s)
+        return s
+
+    def close(self):
+        # closes the servers of the block and releases it
+        for s in self.servers:
+            s.close()
+        self.servers = []
+        self.reservation.close()
+
+def isolate(test, hosts=HOSTS):
+    """
+    Give a test a network of its own.
+
+    Parameters
+    ----------
+    test : unittest.TestCase
+        the test that uses the network, it is closed after the test (-> unittest.TestCase.addCleanup).
+    hosts : list
+        the hosts of the server list.
+
+    Returns
+    -------
+    Network object
+        The block of addresses and ports of the test.
+    """
+    network = Network(hosts)
+    test.addCleanup(network.close)
+    return network
+
+def test_classes(files):
+    # the names of the test classes of the files
+    names = []
+    for file in files:
+        module = importlib.import_module(os.path.splitext(os.path.basename(file))[0])
+        for name, value in vars(module).items():
+            if isinstance(value, type) and issubclass(value, unittest.TestCase) and value.__module__ == module.__name__:
+                names.append(module.__name__ + "." + name)
+    return names
+
+def run_class(name):
+    # runs the tests of a class and returns the outcome
+    stream = io.StringIO()
+    start = time.time()
+    result = unittest.TextTestRunner(stream=stream).run(unittest.defaultTestLoader.loadTestsFromName(name))
+    failed = len(result.failures) + len(result.errors)
+    return name, result.testsRun, failed, time.time() - start, stream.getvalue() if failed else ""
+
+def main(files, jobs):
+    """
+    Run the test classes of the files in parallel.
+
+    Parameters
+    ----------
+    files : list
+        the test files (e.g. Test_Server_incoming.py).
+    jobs : int
+        the number of processes that run at the same time.
+
+    Returns
+    -------
+    bool
+        True if all tests passed, False otherwise.
+    """
+    names = test_classes(files)
+    start = time.time()
+    tests = 0
+    failed = 0
+    print("class ; tests ; failed ; seconds")
+    # every class gets a fresh process, because the tests count the threads of the process
+    with multiprocessing.Pool(jobs, maxtasksperchild=1) as pool:
+        for name, count, failures, duration, output in pool.imap_unordered(run_class, names):
+            print(name + " ; " + str(count) + " ; " + str(failures) + " ; " + str(round(duration, 1)))
+            if output:
+                print(output)
+            tests += count
+            failed += failures
+    print("Ran " + str(tests) + " tests in " + str(round(time.time() - start, 1)) + "s, " + str(failed) + " failed")
+    return failed == 0
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    jobs = os.cpu_count()
+    if "-jobs" in arguments:
+        position = arguments.index("-jobs")
+        jobs = int(arguments[position + 1])
+        del arguments[position:position + 2]
+    sys.exit(0 if main(arguments, jobs) else 1)
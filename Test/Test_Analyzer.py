@@ -0,0 +1,104 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+sys.path.insert(1, '../src')
+import Journal
+import Analyzer
+
+WALL_CLOCK = 1700000000 * 10**9
+SKEW = 0.2
+# the wall clock of 127.0.0.8 is ahead by SKEW seconds
+
+def write_journal(path, ip, skew, records):
+    # writes a journal with records of (seconds, kind, detail, peer, value)
+    with open(path, "wb") as f:
+        f.write(Journal.HEADER.pack(Journal.MAGIC, Journal.VERSION, Journal.ip_to_int(ip),
+                                    WALL_CLOCK + int(skew * 1e9), 0))
+        for seconds, kind, detail, peer, value in records:
+            f.write(Journal.RECORD.pack(int(seconds * 1e9), kind, detail, Journal.ip_to_int(peer), value))
+
+class Test_analyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        ping, answer = Journal.message_type("ping"), Journal.message_type("ping answer")
+        master, follower, other = [], [], []
+        for node in [master, follower, other]:
+            node.append((5, Journal.STATE_CHANGE, Journal.MASTER_ELECTED, "127.0.0.9", 0))
+        for t in [10, 16.1, 22, 28.3]:
+            # the follower pings the master, which answers after 1 ms, every message takes 1 ms
+            follower.append((t, Journal.MESSAGE_SENT, ping, "127.0.0.9", 0))
+            master.append((t + 0.001, Journal.MESSAGE_RECEIVED, ping, "127.0.0.8", 0))
+            master.append((t + 0.002, Journal.MESSAGE_SENT, answer, "127.0.0.8", 0))
+            follower.append((t + 0.003, Journal.MESSAGE_RECEIVED, answer, "127.0.0.9", 0))
+        master.append((15, Journal.PING_TICK, 0, None, 3))
+        master.append((30, Journal.SHUTDOWN, Journal.shutdown_reason("manual"), None, 0))
+        master.append((30, Journal.STATE_CHANGE, Journal.MASTER_LOST, "127.0.0.9", 0))
+        follower.append((35, Journal.STATE_CHANGE, Journal.MASTER_LOST, "127.0.0.9", 0))
+        other.append((36, Journal.STATE_CHANGE, Journal.MASTER_LOST, "127.0.0.9", 0))
+        follower.append((59, Journal.VOTE, Journal.VOTE_RECEIVED, "127.0.0.7", 0))
+        follower.append((60, Journal.STATE_CHANGE, Journal.MASTER_ELECTED, "127.0.0.8", 0))
+        other.append((60.5, Journal.STATE_CHANGE, Journal.MASTER_ELECTED, "127.0.0.8", 0))
+        self.paths = [os.path.join(self.directory, ip + ".journal") for ip in ["127.0.0.9", "127.0.0.8", "127.0.0.7"]]
+        write_journal(self.paths[0], "127.0.0.9", 0, master)
+        write_journal(self.paths[1], "127.0.0.8", SKEW, [(t - SKEW if t >= 10 else t, k, d, p, v)
+                                                         for t, k, d, p, v in follower])
+        write_journal(self.paths[2], "127.0.0.7", 0, other)
+        self.ips, self.start, self.columns = Analyzer.load(self.paths)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        self.assertEqual(self.ips, ["127.0.0.9", "127.0.0.8", "127.0.0.7"])
+        self.assertEqual(self.start, WALL_CLOCK)
+        self.assertEqual(len(self.columns["time"]), 27)
+        # an incomplete record at the end is left out
+        with open(self.paths[2], "ab") as f:
+            f.write(b"\x00" * 5)
+        ips, start, columns = Analyzer.load(self.paths)
+        self.assertEqual(len(columns["time"]), 27)
+
+    def test_align(self):
+        offsets = Analyzer.align(self.ips, self.columns)
+        self.assertAlmostEqual(offsets[0], 0)
+        self.assertAlmostEqual(offsets[1], 0, places=6)
+        self.assertAlmostEqual(offsets[2], 0)
+
+    def test_align_skewed_clock(self):
+        # the follower wrote its records with its own clock that is ahead
+        path = os.path.join(self.directory, "skewed.journal")
+        with open(self.paths[1], "rb") as f:
+            Journal.read_header(f)
+            records = f.read()
+        with open(path, "wb") as f:
+            f.write(Journal.HEADER.pack(Journal.MAGIC, Journal.VERSION, Journal.ip_to_int("127.0.0.8"),
+                                        WALL_CLOCK + int(2 * SKEW * 1e9), 0))
+            f.write(records)
+        ips, start, columns = Analyzer.load([self.paths[0], path])
+        offsets = Analyzer.align(ips, columns)
+        self.assertAlmostEqual(offsets[1], -SKEW, places=6)
+
+    def test_timeline_and_failovers(self):
+        Analyzer.align(self.ips, self.columns)
+        timeline = Analyzer.election_timeline(self.ips, self.columns)
+        self.assertEqual(timeline[-3:], [(timeline[-3][0], "127.0.0.8", "vote received from 127.0.0.7"),
+                                         (timeline[-2][0], "127.0.0.8", "master elected 127.0.0.8"),
+                                         (timeline[-1][0], "127.0.0.7", "master elected 127.0.0.8")])
+        self.assertIn((30, "127.0.0.9", "shutdown (manual)"), timeline)
+        failovers = Analyzer.failovers(self.ips, self.columns)
+        self.assertEqual(len(failovers), 1)
+        start, former, new, duration = failovers[0]
+        self.assertEqual((former, new), ("127.0.0.9", "127.0.0.8"))
+        self.assertAlmostEqual(start, 30)
+        self.assertAlmostEqual(duration, 30.5)
+
+    def test_jitter(self):
+        jitter = Analyzer.jitter(self.ips, self.columns)
+        self.assertEqual(list(jitter.keys()), [("ping sent", "127.0.0.8")])
+        summary = jitter[("ping sent", "127.0.0.8")]
+        self.assertEqual(summary["count"], 3)
+        self.assertAlmostEqual(summary["p50"], 0.1)
+        self.assertAlmostEqual(summary["max"], 0.3)
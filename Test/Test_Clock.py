@@ -0,0 +1,65 @@
+import unittest
+import threading
+import time
+import os
+import sys
+sys.path.insert(1, '../src')
+import Clock
+
+class Test_clock(unittest.TestCase):
+
+    def test_wait_for_channel(self):
+        clock = Clock.Clock()
+        r_channel, w_channel = os.pipe()
+        self.assertFalse(clock.wait(r_channel, 0.01))
+        os.write(w_channel, b'shutdown')
+        self.assertTrue(clock.wait(r_channel, 10))
+        os.close(r_channel)
+        os.close(w_channel)
+
+class Test_fake_clock(unittest.TestCase):
+
+    clock = None
+
+    def setUp(self):
+        self.clock = Clock.FakeClock(start=100.0)
+
+    def tearDown(self):
+        del self.clock
+
+    def test_sleep_is_virtual(self):
+        start = time.monotonic()
+        self.clock.sleep(3600)
+        self.assertEqual(self.clock.time(), 3700.0)
+        self.assertEqual(self.clock.monotonic(), 3700.0)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_earliest_deadline_first(self):
+        woken = []
+        lock = threading.Lock()
+        def sleeper(seconds):
+            self.clock.sleep(seconds)
+            lock.acquire()
+            woken.append((seconds, self.clock.time()))
+            lock.release()
+        threads = [threading.Thread(target=sleeper, args=(seconds,)) for seconds in [20, 5, 10]]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(woken, [(5, 105.0), (10, 110.0), (20, 120.0)])
+
+    def test_wait_for_channel(self):
+        r_channel, w_channel = os.pipe()
+        self.assertFalse(self.clock.wait(r_channel, 15))
+        self.assertEqual(self.clock.time(), 115.0)
+        os.write(w_channel, b'shutdown')
+        self.assertTrue(self.clock.wait(r_channel, 15))
+        self.assertEqual(self.clock.time(), 115.0)
+        os.close(r_channel)
+        os.close(w_channel)
+
+    def test_zero_timeout(self):
+        self.clock.sleep(0)
+        self.assertEqual(self.clock.time(), 100.0)
+        self.assertEqual(self.clock.deadlines, [])
@@ -0,0 +1,130 @@
+import unittest
+import threading
+import asyncio
+import queue
+import time
+import sys
+from unittest import mock
+sys.path.insert(1, '../src')
+import Events
+import Server
+import Fixtures
+
+class Test_publish(unittest.TestCase):
+
+    e = None
+
+    def setUp(self):
+        self.e = Events.EventStream()
+
+    def tearDown(self):
+        del self.e
+
+    def test_version_increases(self):
+        first = self.e.publish(Events.MASTER_ELECTED, master="127.0.0.9")
+        second = self.e.publish(Events.MASTER_LOST, master="127.0.0.9")
+        self.assertEqual(first["version"], 1)
+        self.assertEqual(second["version"], 2)
+        self.assertEqual(first["master"], "127.0.0.9")
+        self.assertLessEqual(first["time"], second["time"])
+        self.assertEqual(self.e.get_version(), 2)
+
+    def test_callbacks(self):
+        received = []
+        self.e.subscribe(received.append)
+        self.e.publish(Events.SHUTDOWN)
+        self.e.unsubscribe(received.append)
+        self.e.publish(Events.SHUTDOWN)
+        self.assertEqual([event["type"] for event in received], [Events.SHUTDOWN])
+
+    def test_failing_callback(self):
+        received = []
+        self.e.subscribe(lambda event: 1 / 0)
+        self.e.subscribe(received.append)
+        self.e.publish(Events.SHUTDOWN)
+        self.assertEqual(len(received), 1)
+
+    def test_failing_callback_logged(self):
+        log = mock.Mock()
+        e = Events.EventStream(log)
+        e.subscribe(lambda event: 1 / 0)
+        e.publish(Events.SHUTDOWN)
+        log.debug.assert_called_once_with("server", "event subscriber failed: %s", mock.ANY)
+
+    def test_queue(self):
+        events = self.e.queue()
+        threading.Timer(0.1, self.e.publish, args=(Events.QUORUM_LOST,)).start()
+        self.assertEqual(events.get(timeout=5)["type"], Events.QUORUM_LOST)
+        self.e.unsubscribe_queue(events)
+        self.assertEqual(self.e.subscribers, [])
+
+    def test_stream(self):
+        async def run():
+            received = []
+            async def consume():
+                async for event in self.e.stream():
+                    received.append(event["type"])
+                    if len(received) == 2:
+                        break
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.1)
+            t = threading.Thread(target=lambda: [self.e.publish(Events.MEMBER_JOINED, ip="127.0.0.8"),
+                                                 self.e.publish(Events.MEMBER_LEFT, ip="127.0.0.8")])
+            t.start()
+            await asyncio.wait_for(task, 5)
+            t.join()
+            return received
+        self.assertEqual(asyncio.run(run()), [Events.MEMBER_JOINED, Events.MEMBER_LEFT])
+        self.assertEqual(self.e.subscribers, [])
+
+class Test_server_events(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.events = self.s.get_events().queue()
+
+    def tearDown(self):
+        self.s.get_events().unsubscribe_queue(self.events)
+        self.s.close()
+        del self.s
+
+    def received(self):
+        events = []
+        while not self.events.empty():
+            events.append(self.events.get())
+        return [(event["type"], event.get("master", event.get("ip"))) for event in events]
+
+    def test_set_master(self):
+        self.s.set_master(self.net.ip(8))
+        self.s.set_master(self.net.ip(8))
+        self.s.set_master(self.net.ip(9))
+        self.s.set_master(None)
+        self.assertEqual(self.received(), [(Events.MASTER_ELECTED, self.net.ip(8)), (Events.MASTER_LOST, self.net.ip(8)),
+                                           (Events.MASTER_ELECTED, self.net.ip(9)), (Events.MASTER_LOST, self.net.ip(9))])
+
+    def test_update_members(self):
+        self.s.update_members([self.net.ip(7), self.net.ip(8)])
+        self.s.update_members([self.net.ip(8)])
+        self.assertEqual(self.received(), [(Events.MEMBER_JOINED, self.net.ip(7)), (Events.MEMBER_JOINED, self.net.ip(8)),
+                                           (Events.MEMBER_LEFT, self.net.ip(7))])
+
+    def test_wait_for_master(self):
+        self.assertIsNone(self.s.wait_for_master(0.1))
+        t = threading.Timer(0.1, self.s.set_master, args=(self.net.ip(8),))
+        t.start()
+        self.assertEqual(self.s.wait_for_master(5), self.net.ip(8))
+        t.join()
+        # a known master is returned at once
+        self.assertEqual(self.s.wait_for_master(0), self.net.ip(8))
+
+    def test_wait_for_master_on_the_clock(self):
+        # the timeout has expired on the clock of the server before the first look
+        self.s.clock = mock.Mock()
+        self.s.clock.monotonic.side_effect = [0, 60]
+        start = time.time()
+        self.assertIsNone(self.s.wait_for_master(30))
+        self.assertLess(time.time() - start, 1)
@@ -0,0 +1,87 @@
+import unittest
+import urllib.request
+import urllib.error
+import threading
+import sys
+sys.path.insert(1, '../src')
+import Server
+import Fixtures
+import Exporter
+
+
+class Test_render(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.network = list(self.net.server_list)
+        self.e = Exporter.Exporter(self.s, 0)
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_master(self):
+        self.s.master_server = self.net.ip(9)
+        self.s.ping_targets = {self.net.ip(9) : 1, self.net.ip(8) : 1, self.net.ip(7) : 0}
+        lines = self.e.render().splitlines()
+        self.assertIn('server_role{role="master"} 1', lines)
+        self.assertIn('server_role{role="follower"} 0', lines)
+        self.assertIn('server_master_info{master="' + self.net.ip(9) + '"} 1', lines)
+        self.assertIn('server_network_size 3', lines)
+        # the master and one server are online, the quorum is two
+        self.assertIn('server_quorum_margin 0', lines)
+
+    def test_follower_without_master(self):
+        lines = self.e.render().splitlines()
+        self.assertIn('server_role{role="searching"} 1', lines)
+        self.s.master_server = self.net.ip(8)
+        lines = self.e.render().splitlines()
+        self.assertIn('server_role{role="follower"} 1', lines)
+        self.assertIn('server_quorum_margin 1', lines)
+
+    def test_metrics(self):
+        self.s.get_metrics().count("messages", "write")
+        self.s.get_metrics().count("discovery_retries")
+        self.s.get_metrics().observe("ping_rtt", 0.001)
+        lines = self.e.render().splitlines()
+        self.assertIn('# TYPE server_messages_total counter', lines)
+        self.assertIn('server_messages_total{type="write"} 1', lines)
+        self.assertIn('server_discovery_retries_total 1', lines)
+        self.assertIn('# TYPE server_ping_rtt_seconds summary', lines)
+        self.assertIn('server_ping_rtt_seconds{quantile="0.5"} 0.001', lines)
+        self.assertIn('server_ping_rtt_seconds_count 1', lines)
+
+class Test_scrape(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_scrape(self):
+        self.assertTrue(self.s.start_exporter())
+        self.assertEqual(self.s.get_exporter().port, self.s.port + Server.METRICS_PORT_OFFSET)
+        url = "http://" + self.net.ip(9) + ":" + str(self.s.get_exporter().port)
+        with urllib.request.urlopen(url + Exporter.METRICS_PATH, timeout=5) as answer:
+            self.assertEqual(answer.headers["Content-Type"], Exporter.CONTENT_TYPE)
+            self.assertIn("server_uptime_seconds", answer.read().decode("utf-8"))
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other", timeout=5)
+        self.s.stop_exporter()
+        self.assertIsNone(self.s.get_exporter())
+        self.assertEqual([t.name for t in threading.enumerate() if t.name == 'Exporter'], [])
+
+    def test_port_not_available(self):
+        self.s.server.listen()
+        self.assertFalse(self.s.start_exporter(self.s.port))
+        self.assertIsNone(self.s.get_exporter())
@@ -0,0 +1,39 @@
+import unittest
+from unittest import mock
+import socket
+import sys
+sys.path.insert(1, '../src')
+import Fixtures
+
+class Test_network(unittest.TestCase):
+
+    def test_addresses_and_port(self):
+        net = Fixtures.isolate(self)
+        self.assertTrue(net.prefix.startswith("127."))
+        self.assertFalse(net.prefix.startswith("127.0."))
+        self.assertEqual(net.server_list, [net.ip(7), net.ip(8), net.ip(9)])
+        self.assertEqual((net.port - Fixtures.FIRST_PORT) % Fixtures.PORT_BLOCK, 0)
+        s = net.server(9)
+        self.assertEqual((s.ip, s.port), (net.ip(9), net.port))
+        self.assertEqual(s.get_server_list(), net.server_list)
+
+    def test_reserved_block_is_not_drawn_twice(self):
+        first = Fixtures.Network()
+        draws = [int(part) for part in first.prefix.split(".")[1:3]] + [1, 2]
+        with mock.patch.object(Fixtures, "RANDOM") as mock_random:
+            mock_random.randint.side_effect = draws
+            mock_random.randrange.side_effect = [first.port, first.port]
+            second = Fixtures.Network()
+        self.assertEqual(second.prefix, "127.1.2.")
+        first.close()
+        second.close()
+
+    def test_close(self):
+        net = Fixtures.Network([9, 8])
+        s = net.server(9)
+        net.close()
+        self.assertEqual(s.server.fileno(), -1)
+        # the block is free again
+        reservation = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        reservation.bind((net.ip(Fixtures.RESERVED_HOST), net.port))
+        reservation.close()
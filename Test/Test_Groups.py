@@ -0,0 +1,123 @@
+import unittest
+from unittest import mock
+import threading
+import time
+import sys
+sys.path.insert(1, '../src')
+import Groups
+import Server
+import Fixtures
+
+SEARCH_TIMEOUT = 0.5
+ELECTION_TIMEOUT = 60
+GROUPS = 3
+KEYS = 3000
+
+"""
+Note:
+The nodes of the tests run in the process of the test, every node has a host
+of its own (-> Host.py) that accepts the connections of its groups. The search
+for the network is only delayed by SEARCH_TIMEOUT.
+"""
+
+class Test_ring(unittest.TestCase):
+
+    def test_spread(self):
+        ring = Groups.Ring(GROUPS)
+        counts = [0] * GROUPS
+        for i in range(KEYS):
+            counts[ring.group("key" + str(i))] += 1
+        for count in counts:
+            self.assertGreater(count, KEYS / GROUPS / 2)
+        # the mapping does not depend on the process
+        self.assertEqual(Groups.Ring(GROUPS).group("key1"), ring.group("key1"))
+
+    def test_added_group_moves_few_keys(self):
+        before = Groups.Ring(GROUPS)
+        after = Groups.Ring(GROUPS + 1)
+        moved = [i for i in range(KEYS) if before.group("key" + str(i)) != after.group("key" + str(i))]
+        # only keys of the new group move
+        self.assertTrue(all(after.group("key" + str(i)) == GROUPS for i in moved))
+        self.assertLess(len(moved), KEYS / (GROUPS + 1) * 1.5)
+
+    def test_group_port(self):
+        self.assertEqual(Groups.group_port(20000, 0), 20000)
+        self.assertEqual(Groups.group_port(20000, 2), 20000 + 2 * Groups.GROUP_PORT_STEP)
+        with self.assertRaises(ValueError):
+            Groups.group_port(20000, Groups.MAXIMUM_GROUPS)
+
+    def test_candidates(self):
+        server_list = ["127.0.0.7", "127.0.0.8", "127.0.0.9"]
+        self.assertEqual(Server.candidate(server_list, server_list), max(server_list))
+        self.assertEqual([Server.candidate(server_list, server_list, group) for group in range(GROUPS)],
+                         ["127.0.0.9", "127.0.0.7", "127.0.0.8"])
+        # a missing server is replaced by the next one of the order
+        self.assertEqual(Server.candidate(["127.0.0.8", "127.0.0.9"], server_list, 1), "127.0.0.9")
+
+@mock.patch.object(Server, "INITIAL_NETWORK_SEARCH_TIMEOUT", SEARCH_TIMEOUT)
+class Test_groups(unittest.TestCase):
+
+    net = None
+    nodes = []
+    session = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.nodes = [Groups.GroupNode(ip, GROUPS, self.net.port, self.net.server_list) for ip in self.net.server_list]
+        for node in self.nodes:
+            for s in node.get_servers():
+                s.get_log().set_level("election", 100)
+                s.get_log().set_level("server", 100)
+                s.get_log().set_level("replication", 100)
+            node.start()
+        self.session = Groups.GroupSession(GROUPS, self.net.port, self.net.server_list)
+
+    def tearDown(self):
+        self.session.close()
+        for node in self.nodes:
+            node.stop()
+            node.close()
+        # waits for the threads of the servers to end
+        for t in threading.enumerate():
+            if t is not threading.current_thread() and not t.daemon:
+                t.join(Server.SEND_PING_TIME + 5)
+
+    def wait_for_masters(self):
+        masters = [Server.candidate(self.net.server_list, self.net.server_list, group) for group in range(GROUPS)]
+        deadline = time.time() + ELECTION_TIMEOUT
+        while time.time() < deadline:
+            if all(node.get_masters() == masters for node in self.nodes):
+                return masters
+            time.sleep(0.1)
+        return None
+
+    def test_masters_per_group(self):
+        masters = self.wait_for_masters()
+        self.assertIsNotNone(masters)
+        # every node is the master of one group
+        self.assertEqual(sorted(masters), sorted(self.net.server_list))
+
+    def test_routing(self):
+        masters = self.wait_for_masters()
+        self.assertIsNotNone(masters)
+        for i in range(30):
+            self.assertEqual(self.session.write("key" + str(i), str(i), 10), Server.WRITE_COMMITTED_MESSAGE)
+        self.assertEqual(self.session.get_routes(), masters)
+        nodes = {node.ip : node for node in self.nodes}
+        for i in range(30):
+            group = self.session.group("key" + str(i))
+            self.assertEqual(nodes[masters[group]].get_server(group).get_store().get("key" + str(i)), str(i))
+            # the other groups do not hold the key
+            for other in range(GROUPS):
+                if other != group:
+                    self.assertIsNone(nodes[masters[other]].get_server(other).get_store().get("key" + str(i)))
+
+    def test_refresh(self):
+        masters = self.wait_for_masters()
+        self.assertIsNotNone(masters)
+        group = self.session.group("key")
+        # a route to a server that is not available is refreshed, a follower redirects to the master
+        self.session.sessions[group].set_server(self.net.ip(6))
+        self.assertEqual(self.session.write("key", "value", 10), Server.WRITE_COMMITTED_MESSAGE)
+        self.assertEqual(self.session.get_routes()[group], masters[group])
+        self.assertEqual(self.session.get_refreshes(), {group : 1})
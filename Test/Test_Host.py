@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+import threading
+import time
+import sys
+sys.path.insert(1, '../src')
+import Host
+import Server
+import Fixtures
+import Client
+import Clock
+
+SEARCH_TIMEOUT = 0.5
+ELECTION_TIMEOUT = 60
+RESTARTS = 20
+
+"""
+Note:
+The servers of a host run in the process of the test, so every test checks
+that they do not share any state: two servers of one network, two vote checks
+at the same time and two networks that elect their masters next to each other.
+The search for the network is only delayed by SEARCH_TIMEOUT.
+"""
+
+class Test_isolation(unittest.TestCase):
+
+    def test_state_per_server(self):
+        net = Fixtures.isolate(self)
+        s9 = net.server(9)
+        s8 = net.server(8)
+        s9.votes.append(net.ip(7))
+        s9.network.append(net.ip(7))
+        s9.network_masters[net.ip(7)] = net.ip(9)
+        s9.next_index[net.ip(7)] = 1
+        for name in ["votes", "network", "requests", "network_masters", "ping_targets", "next_index",
+                     "match_index", "replication_locks", "replication_clients"]:
+            self.assertIsNot(getattr(s9, name), getattr(s8, name))
+        self.assertEqual((s8.votes, s8.network, s8.network_masters, s8.next_index), ([], [], {}, {}))
+
+    def test_vote_checks_apart(self):
+        # before, the second vote waited for the vote check of the other server
+        clock = Clock.FakeClock()
+        first = Fixtures.isolate(self)
+        second = Fixtures.isolate(self)
+        servers = [first.server(9, clock=clock), second.server(9, clock=clock)]
+        threads = []
+        for s, net in zip(servers, [first, second]):
+            s.network = list(net.server_list)
+            conn = mock.Mock()
+            threads.append(threading.Thread(target=s.handle_votes, args=(net.ip(8), conn)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([s.vote_check_thread for s in servers], threads)
+        for s in servers:
+            self.assertEqual(s.get_metrics().get_histogram("election_vote_check")["count"], 1)
+
+@mock.patch.object(Server, "INITIAL_NETWORK_SEARCH_TIMEOUT", SEARCH_TIMEOUT)
+class Test_host(unittest.TestCase):
+
+    host = None
+    networks = []
+
+    def setUp(self):
+        self.host = Host.Host()
+        self.networks = [Fixtures.isolate(self), Fixtures.isolate(self)]
+
+    def tearDown(self):
+        self.host.stop()
+        # waits for the threads of the servers to end
+        for t in threading.enumerate():
+            if t is not threading.current_thread() and not t.daemon:
+                t.join(Server.SEND_PING_TIME + 5)
+
+    def wait_for_masters(self, servers, master):
+        deadline = time.time() + ELECTION_TIMEOUT
+        while time.time() < deadline:
+            if all(s.get_master() == master for s in servers):
+                return True
+            time.sleep(0.1)
+        return False
+
+    def test_two_networks(self):
+        servers = []
+        for net in self.networks:
+            for host in Fixtures.HOSTS:
+                s = self.host.add(net.server(host))
+                s.get_log().set_level("election", 100)
+                s.get_log().set_level("server", 100)
+                servers.append(s)
+        self.host.start()
+        for s in servers:
+            s.start()
+        for net in self.networks:
+            self.assertTrue(self.wait_for_masters(servers[:3] if net is self.networks[0] else servers[3:],
+                                                  net.ip(max(Fixtures.HOSTS))))
+        # one thread accepts the connections of all six servers
+        self.assertEqual([t.name for t in threading.enumerate()].count("Host"), 1)
+        c = Client.Client(self.networks[1].ip(7))
+        self.assertTrue(c.connect(self.networks[1].ip(8), self.networks[1].port))
+        self.assertEqual(c.send(Server.ASK_MASTER_MESSAGE), self.networks[1].ip(9))
+        self.host.stop()
+        self.assertFalse(any(s.is_online() for s in servers))
+        self.assertEqual([t.name for t in threading.enumerate()].count("Host"), 0)
+
+    def test_restart(self):
+        net = self.networks[0]
+        s = self.host.add(net.server(9))
+        s.get_log().set_level("election", 100)
+        s.get_log().set_level("server", 100)
+        self.host.start()
+        s.start()
+        s.shutdown()
+        self.assertTrue(self.host.join(s, 5))
+        self.assertEqual(s.server.fileno(), -1)
+        s.restart()
+        self.assertTrue(self.host.is_registered(s))
+        c = Client.Client(net.ip(7))
+        self.assertTrue(c.connect(net.ip(9), net.port))
+        c.close()
+
+    def test_restart_loop(self):
+        # the join returns only after the listener has been closed and the log writer has stopped
+        net = self.networks[0]
+        s = self.host.add(net.server(9))
+        s.get_log().set_level("election", 100)
+        s.get_log().set_level("server", 100)
+        self.host.start()
+        s.start()
+        for i in range(RESTARTS):
+            s.shutdown()
+            self.assertTrue(self.host.join(s, 5))
+            self.assertEqual(s.server.fileno(), -1)
+            s.restart()
+            self.assertTrue(self.host.is_registered(s))
+            self.assertLessEqual([t.name for t in threading.enumerate()].count("Log_Writer"), 1)
+        c = Client.Client(net.ip(7))
+        self.assertTrue(c.connect(net.ip(9), net.port))
+        c.close()
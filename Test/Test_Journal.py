@@ -0,0 +1,97 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+sys.path.insert(1, '../src')
+import Journal
+import Server
+import Fixtures
+
+class Test_journal(unittest.TestCase):
+
+    j = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "127.0.0.9.journal")
+        self.j = Journal.Journal(self.path, "127.0.0.9")
+
+    def tearDown(self):
+        self.j.close()
+        shutil.rmtree(self.directory)
+        del self.j
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            header = Journal.read_header(f)
+            data = f.read()
+        return header, [Journal.RECORD.unpack_from(data, i) for i in range(0, len(data), Journal.RECORD.size)]
+
+    def test_records(self):
+        self.j.record(Journal.MESSAGE_RECEIVED, Journal.message_type("ping"), "127.0.0.8")
+        self.j.record(Journal.PING_TICK, value=2)
+        self.j.close()
+        self.j.record(Journal.SHUTDOWN)
+        header, records = self.read()
+        self.assertEqual(header[0], "127.0.0.9")
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0][1:], (Journal.MESSAGE_RECEIVED, Journal.message_type("ping"),
+                                          Journal.ip_to_int("127.0.0.8"), 0))
+        self.assertEqual(records[1][1:], (Journal.PING_TICK, 0, 0, 2))
+        self.assertLessEqual(header[2], records[0][0])
+        self.assertLessEqual(records[0][0], records[1][0])
+
+    def test_ips_and_details(self):
+        self.assertEqual(Journal.int_to_ip(Journal.ip_to_int("127.0.0.8")), "127.0.0.8")
+        self.assertIsNone(Journal.int_to_ip(Journal.ip_to_int("None")))
+        self.assertIsNone(Journal.int_to_ip(Journal.ip_to_int("not an ip")))
+        self.assertEqual(Journal.message_type("something else"), 0)
+        self.assertEqual(Journal.SHUTDOWN_REASONS[Journal.shutdown_reason("invalid network")], "invalid network")
+
+    def test_not_a_journal(self):
+        with open(self.path, "wb") as f:
+            f.write(b"free text log")
+        with open(self.path, "rb") as f:
+            with self.assertRaises(ValueError):
+                Journal.read_header(f)
+
+class Test_server_journal(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "127.0.0.9.journal")
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+
+    def tearDown(self):
+        self.s.close()
+        shutil.rmtree(self.directory)
+        del self.s
+
+    def test_state_changes_and_shutdown(self):
+        self.s.set_master(self.net.ip(8))
+        self.assertTrue(self.s.start_journal(self.path))
+        self.s.count_message("ping", self.net.ip(7))
+        self.s.set_master(self.net.ip(9))
+        self.s.shutdown("invalid network")
+        self.s.stop_journal()
+        self.assertIsNone(self.s.get_journal())
+        self.s.set_master(self.net.ip(8))
+        with open(self.path, "rb") as f:
+            Journal.read_header(f)
+            data = f.read()
+        records = [Journal.RECORD.unpack_from(data, i)[1:4] for i in range(0, len(data), Journal.RECORD.size)]
+        self.assertEqual(records, [(Journal.MESSAGE_RECEIVED, Journal.message_type("ping"), Journal.ip_to_int(self.net.ip(7))),
+                                   (Journal.STATE_CHANGE, Journal.MASTER_LOST, Journal.ip_to_int(self.net.ip(8))),
+                                   (Journal.STATE_CHANGE, Journal.MASTER_ELECTED, Journal.ip_to_int(self.net.ip(9))),
+                                   (Journal.SHUTDOWN, Journal.shutdown_reason("invalid network"), 0),
+                                   (Journal.STATE_CHANGE, Journal.MASTER_LOST, Journal.ip_to_int(self.net.ip(9)))])
+        self.assertEqual(self.s.get_metrics().get_counter("messages", "ping"), 1)
+
+    def test_journal_not_available(self):
+        self.assertFalse(self.s.start_journal(os.path.join(self.directory, "missing", "journal")))
+        self.assertIsNone(self.s.get_journal())
@@ -0,0 +1,210 @@
+import unittest
+from unittest import mock
+import threading
+import json
+import time
+import sys
+sys.path.insert(1, '../src')
+import Server
+import Events
+import Fixtures
+
+SEARCH_TIMEOUT = 0.5
+TIMEOUT = 60
+
+"""
+Note:
+The changes of the servers are tested once on a single server that gets the
+configurations written into its store, and once in a running network of three
+servers that gets a fourth server and loses another one without a restart.
+A removed master shuts down and the remaining servers elect a new one. The search
+for the network is only delayed by SEARCH_TIMEOUT.
+"""
+
+def wait_until(condition, timeout=TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+class Test_configuration(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def commit(self, configuration):
+        entry = self.s.get_store().append(1, Server.CONFIGURATION_KEY, configuration)
+        self.s.get_store().commit(entry["index"])
+        self.s.update_configuration()
+        return entry
+
+    def test_majority(self):
+        self.assertTrue(self.s.has_majority([self.net.ip(9), self.net.ip(8)]))
+        self.assertFalse(self.s.has_majority([self.net.ip(9)]))
+        # servers outside the server list do not count
+        self.assertFalse(self.s.has_majority([self.net.ip(9), self.net.ip(5)]))
+
+    def test_joint_majority(self):
+        old = list(self.net.server_list)
+        new = old + [self.net.ip(6)]
+        self.commit({"servers" : new, "joint" : old})
+        self.assertEqual((self.s.get_server_list(), self.s.get_joint_list()), (new, old))
+        self.assertTrue(self.s.has_majority([self.net.ip(8), self.net.ip(9), self.net.ip(6)]))
+        # a majority of the old list, but not of the new one
+        self.assertFalse(self.s.has_majority([self.net.ip(8), self.net.ip(9)]))
+        # a majority of the new list, but not of the old one
+        self.s.joint_list = [self.net.ip(7), self.net.ip(8), self.net.ip(5)]
+        self.assertFalse(self.s.has_majority([self.net.ip(9), self.net.ip(6), self.net.ip(7)]))
+
+    def test_master_commits_by_written_configuration(self):
+        new = [self.net.ip(9), self.net.ip(6), self.net.ip(5)]
+        self.s.configuration_changes = [(5, {"servers" : new, "joint" : list(self.net.server_list)})]
+        ips = [self.net.ip(9), self.net.ip(8)]
+        self.assertTrue(self.s.has_majority(ips, 4))
+        self.assertFalse(self.s.has_majority(ips, 5))
+        self.assertTrue(self.s.has_majority(ips + [self.net.ip(6)], 6))
+
+    def test_switch_is_published(self):
+        events = []
+        self.s.get_events().subscribe(events.append)
+        new = list(self.net.server_list) + [self.net.ip(6)]
+        self.commit({"servers" : new, "joint" : None})
+        self.commit({"servers" : new, "joint" : None})
+        self.assertEqual([(e["type"], e["servers"], e["joint"]) for e in events], [(Events.MEMBERSHIP_CHANGED, new, False)])
+        self.assertEqual(self.s.get_metrics().get_counter("configurations", "new"), 1)
+
+    def test_removed_server_shuts_down(self):
+        self.s.master_server = self.net.ip(8)
+        self.commit({"servers" : [self.net.ip(7), self.net.ip(8)], "joint" : None})
+        self.assertTrue(wait_until(lambda: not self.s.is_online(), 5))
+        self.assertTrue(wait_until(lambda: self.s.get_metrics().get_counter("shutdowns", "removed") == 1, 5))
+
+    def test_reserved_key_and_not_master(self):
+        self.assertEqual(self.s.change_membership(json.dumps({"append" : self.net.ip(6)})),
+                         Server.NOT_MASTER_MESSAGE + "None")
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        self.assertEqual(self.s.write(json.dumps({"key" : Server.CONFIGURATION_KEY, "value" : []})),
+                         Server.WRITE_DECLINED_MESSAGE)
+        self.assertIsNone(self.s.get_store().get(Server.CONFIGURATION_KEY))
+
+    def test_malformed_change(self):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        for payload in ['{"append" : ', '["' + self.net.ip(6) + '"]', '{"append" : 6}']:
+            self.assertEqual(self.s.change_membership(payload), Server.MEMBERSHIP_DECLINED_MESSAGE)
+        self.assertFalse(self.s.membership_lock.locked())
+        self.assertEqual(self.s.get_store().last(), (0, 0))
+
+    @mock.patch('Client.Client', autospec=True)
+    def test_request_follows_redirect(self, mock_client):
+        # the master of this server is outdated, the change is sent to the master the answer names
+        self.s.master_server = self.net.ip(8)
+        mock_instance = mock_client.return_value
+        mock_instance.connect.return_value = True
+        mock_instance.request.side_effect = [Server.NOT_MASTER_MESSAGE + self.net.ip(7),
+                                             Server.MEMBERSHIP_COMMITTED_MESSAGE]
+        self.assertEqual(self.s.request_membership({"append" : self.net.ip(6)}), Server.MEMBERSHIP_COMMITTED_MESSAGE)
+        self.assertEqual([c.args[0] for c in mock_instance.connect.call_args_list], [self.net.ip(8), self.net.ip(7)])
+        # only one redirect is followed
+        mock_instance.request.side_effect = [Server.NOT_MASTER_MESSAGE + self.net.ip(7),
+                                             Server.NOT_MASTER_MESSAGE + self.net.ip(8)]
+        self.assertEqual(self.s.request_membership({"append" : self.net.ip(6)}),
+                         Server.NOT_MASTER_MESSAGE + self.net.ip(8))
+        self.assertEqual(mock_instance.request.call_count, 4)
+
+@mock.patch.object(Server, "INITIAL_NETWORK_SEARCH_TIMEOUT", SEARCH_TIMEOUT)
+class Test_membership(unittest.TestCase):
+
+    net = None
+    servers = {}
+    threads = []
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.servers = {}
+        self.threads = []
+        for host in Fixtures.HOSTS:
+            self.start(self.net.server(host))
+
+    def tearDown(self):
+        for s in self.servers.values():
+            if s.is_online():
+                s.shutdown()
+        for t in self.threads:
+            t.join()
+        # waits for the threads of the servers to end
+        for t in threading.enumerate():
+            if t is not threading.current_thread() and not t.daemon:
+                t.join(Server.SEND_PING_TIME + 5)
+
+    def start(self, s):
+        for category in ["election", "server", "replication", "ping"]:
+            s.get_log().set_level(category, 100)
+        self.servers[s.ip] = s
+        t = threading.Thread(target=s.start, args = ())
+        t.start()
+        self.threads.append(t)
+
+    def server_lists(self):
+        return [(s.get_server_list(), s.get_joint_list()) for s in self.servers.values() if s.is_online()]
+
+    def test_scale_up_and_down(self):
+        master = self.net.ip(9)
+        self.assertTrue(wait_until(lambda: all(s.get_master() == master for s in self.servers.values())))
+        # the new server is started with the new server list and joins the master
+        new = list(self.net.server_list) + [self.net.ip(6)]
+        s6 = Server.Server(self.net.ip(6), port=self.net.port, server_list=new)
+        self.addCleanup(s6.close)
+        self.start(s6)
+        self.assertTrue(wait_until(lambda: s6.get_master() == master))
+        answer = self.servers[self.net.ip(7)].request_membership({"append" : self.net.ip(6)})
+        self.assertEqual(answer, Server.MEMBERSHIP_COMMITTED_MESSAGE)
+        self.assertTrue(wait_until(lambda: self.server_lists() == [(new, None)] * 4, 10))
+        # all servers hold the configuration at the same entry
+        configurations = [s.get_store().entries_from(1)[2] for s in self.servers.values()]
+        indexes = [[e["index"] for e in entries if e["key"] == Server.CONFIGURATION_KEY] for entries in configurations]
+        self.assertEqual(len(set(map(tuple, indexes))), 1)
+        self.assertEqual(len(indexes[0]), 2)
+
+        # the network shrinks without a restart, the removed server shuts down
+        answer = self.servers[self.net.ip(8)].request_membership({"remove" : self.net.ip(7)})
+        self.assertEqual(answer, Server.MEMBERSHIP_COMMITTED_MESSAGE)
+        remaining = [self.net.ip(8), self.net.ip(9), self.net.ip(6)]
+        self.assertTrue(wait_until(lambda: not self.servers[self.net.ip(7)].is_online(), 10))
+        self.assertTrue(wait_until(lambda: self.server_lists() == [(remaining, None)] * 3, 10))
+        m = self.servers[master]
+        self.assertEqual(m.get_master(), master)
+        self.assertEqual(m.write(json.dumps({"key" : "k", "value" : "v"})), Server.WRITE_COMMITTED_MESSAGE)
+        self.assertEqual(m.get_metrics().get_counters().get("shutdowns", {}), {})
+
+    def test_one_change_at_a_time(self):
+        master = self.servers[self.net.ip(9)]
+        self.assertTrue(wait_until(lambda: all(s.get_master() == master.ip for s in self.servers.values())))
+        master.membership_lock.acquire()
+        self.assertEqual(master.request_membership({"remove" : self.net.ip(7)}), Server.MEMBERSHIP_DECLINED_MESSAGE)
+        master.membership_lock.release()
+        # nothing to change
+        self.assertEqual(master.request_membership({"append" : self.net.ip(8)}), Server.MEMBERSHIP_DECLINED_MESSAGE)
+        self.assertEqual(self.server_lists(), [(list(self.net.server_list), None)] * 3)
+
+    def test_remove_master(self):
+        master = self.servers[self.net.ip(9)]
+        self.assertTrue(wait_until(lambda: all(s.get_master() == master.ip for s in self.servers.values())))
+        self.assertEqual(master.request_membership({"remove" : master.ip}), Server.MEMBERSHIP_COMMITTED_MESSAGE)
+        self.assertTrue(wait_until(lambda: not master.is_online(), 10))
+        # the others elect a new master of the new server list
+        remaining = [self.servers[self.net.ip(7)], self.servers[self.net.ip(8)]]
+        self.assertTrue(wait_until(lambda: all(s.get_master() == self.net.ip(8) for s in remaining)))
+        self.assertEqual(self.server_lists(), [([self.net.ip(7), self.net.ip(8)], None)] * 2)
+        self.assertEqual(master.get_metrics().get_counter("shutdowns", "removed"), 1)
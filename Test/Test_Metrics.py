@@ -0,0 +1,67 @@
+import unittest
+import threading
+import sys
+sys.path.insert(1, '../src')
+import Metrics
+
+class Test_count(unittest.TestCase):
+
+    m = None
+
+    def setUp(self):
+        self.m = Metrics.Metrics()
+
+    def tearDown(self):
+        del self.m
+
+    def test_count(self):
+        self.m.count("messages", "write")
+        self.m.count("messages", "write")
+        self.m.count("messages", "ping")
+        self.m.count("discovery_retries", amount=3)
+        self.assertEqual(self.m.get_counters(), {"messages" : {"write" : 2, "ping" : 1}, "discovery_retries" : {None : 3}})
+        self.assertEqual(self.m.get_counter("messages", "write"), 2)
+        self.assertEqual(self.m.get_counter("messages", "read"), 0)
+
+    def test_count_from_threads(self):
+        threads = [threading.Thread(target=lambda: [self.m.count("messages", "write") for i in range(1000)])
+                   for t in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.m.get_counter("messages", "write"), 4000)
+
+class Test_observe(unittest.TestCase):
+
+    m = None
+
+    def setUp(self):
+        self.m = Metrics.Metrics()
+
+    def tearDown(self):
+        del self.m
+
+    def test_percentiles(self):
+        for i in range(1, 101):
+            self.m.observe("ping_rtt", i / 1000)
+        # the percentile is the upper bound of its bucket, which is at most 19% above the duration
+        self.assertGreaterEqual(self.m.percentile("ping_rtt", 50), 0.050)
+        self.assertLessEqual(self.m.percentile("ping_rtt", 50), 0.050 * 1.19)
+        self.assertGreaterEqual(self.m.percentile("ping_rtt", 99), 0.099)
+        self.assertEqual(self.m.percentile("ping_rtt", 100), 0.1)
+        summary = self.m.summary()["ping_rtt"]
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["max"], 0.1)
+        self.assertEqual(summary["p90"], self.m.percentile("ping_rtt", 90))
+
+    def test_outside_of_buckets(self):
+        self.m.observe("election_vote", 0)
+        self.m.observe("election_vote", 5000)
+        self.assertEqual(self.m.percentile("election_vote", 50), Metrics.BUCKET_START)
+        self.assertEqual(self.m.percentile("election_vote", 99), 5000)
+
+    def test_empty(self):
+        self.assertIsNone(self.m.percentile("ping_rtt", 50))
+        self.assertIsNone(self.m.get_histogram("ping_rtt"))
+        self.assertEqual(self.m.summary(), {})
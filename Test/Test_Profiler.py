@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+import shutil
+import threading
+import os
+import sys
+sys.path.insert(1, '../src')
+import Profiler
+
+class Test_profiler(unittest.TestCase):
+
+    p = None
+
+    def setUp(self):
+        self.p = Profiler.Profiler(0.001)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.p.stop()
+        shutil.rmtree(self.directory)
+        del self.p
+
+    def test_role(self):
+        self.assertEqual(Profiler.role([("/src/Server.py", "handle_votes"), ("/src/Server.py", "handle_client"),
+                                        ("/lib/threading.py", "run")]), "handler")
+        # the innermost method counts, the ping runs in the thread of the search for the network
+        self.assertEqual(Profiler.role([("/lib/selectors.py", "select"), ("/src/Server.py", "ping"),
+                                        ("/src/Server.py", "calc_master"), ("/src/Server.py", "find_network")]), "ping")
+        self.assertEqual(Profiler.role([("/src/Server.py", "ping_check")]), "ping check")
+        self.assertEqual(Profiler.role([("/src/Exporter.py", "start"), ("/lib/threading.py", "run")]),
+                         Profiler.OTHER_ROLE)
+
+    def test_sample_and_export(self):
+        stop = threading.Event()
+        waiting = threading.Thread(target=stop.wait, name='Waiting')
+        waiting.start()
+        self.p.start()
+        self.assertTrue(self.p.is_running())
+        while self.p.get_samples() < 5:
+            stop.wait(0.01)
+        self.p.stop()
+        stop.set()
+        waiting.join()
+        self.assertFalse(self.p.is_running())
+        self.assertEqual([t.name for t in threading.enumerate() if t.name == 'Profiler'], [])
+        stacks = self.p.get_stacks()
+        self.assertTrue(any(stack.endswith("threading.py:wait") for stack in stacks))
+        self.assertFalse(any("Profiler.py:run" in stack for stack in stacks))
+        self.assertEqual(self.p.get_roles(), {Profiler.OTHER_ROLE : sum(stacks.values())})
+        path = os.path.join(self.directory, "profile.folded")
+        self.assertEqual(self.p.export(path), len(stacks))
+        with open(path) as f:
+            lines = f.read().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertEqual(stacks[stack], int(count))
+        self.assertTrue(stack.startswith(Profiler.OTHER_ROLE + ";"))
@@ -0,0 +1,195 @@
+import unittest
+import threading
+import socket
+import time
+import sys
+sys.path.insert(1, '../src')
+import Proxy
+import Client
+import Fixtures
+
+"""
+Note:
+The proxy is tested between clients and an echo server that answers every
+message of a connection with the same message.
+"""
+
+def echo_server(ip, port):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((ip, port))
+    server.listen()
+    threading.Thread(target=serve, args=(server,), daemon=True).start()
+    return server
+
+def serve(server):
+    while True:
+        try:
+            conn, addr = server.accept()
+        except OSError:
+            return
+        threading.Thread(target=echo, args=(conn,), daemon=True).start()
+
+def echo(conn):
+    while True:
+        try:
+            msg = Client.receive(conn)
+        except OSError:
+            msg = None
+        if msg is None:
+            conn.close()
+            return
+        conn.sendall(Client.frame(msg))
+
+class Test_proxy(unittest.TestCase):
+
+    proxy = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.echo = echo_server(self.net.ip(9), self.net.port)
+        self.proxy = Proxy.Proxy(self.net.ip(Fixtures.RESERVED_HOST + 1), seed=1)
+        self.proxy.start()
+
+    def tearDown(self):
+        self.proxy.stop()
+        self.echo.close()
+
+    def client(self, source=7):
+        c = Client.Client(self.net.ip(source), self.proxy.transport(self.net.ip(source)))
+        c.client.settimeout(5)
+        return c
+
+    def round_trip(self, c, msg="hello"):
+        start = time.monotonic()
+        self.assertEqual(c.exchange(msg), msg)
+        return time.monotonic() - start
+
+    def test_relay(self):
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        for i in range(3):
+            self.round_trip(c, "hello " + str(i))
+        c.close()
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_connections", "relayed"), 1)
+        self.assertGreater(self.proxy.get_metrics().get_counter("proxy_bytes", self.net.ip(7) + " -> " + self.net.ip(9)), 0)
+
+    def test_destination_unavailable(self):
+        self.assertFalse(self.client().connect(self.net.ip(8), self.net.port))
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_connections", "unavailable"), 1)
+
+    def test_invalid_handshake(self):
+        for handshake in ["junk", self.net.ip(7) + " " + self.net.ip(9), self.net.ip(7) + " " + self.net.ip(9) + " port",
+                          self.net.ip(7) + " " + self.net.ip(9) + " 70000"]:
+            conn = socket.create_connection((self.proxy.ip, self.proxy.port), 5)
+            conn.sendall(Client.frame(Proxy.PROXY_MESSAGE + handshake))
+            self.assertEqual(conn.recv(1), Proxy.REFUSED)
+            # the proxy closes the connection
+            self.assertEqual(conn.recv(1), b"")
+            conn.close()
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_connections", "invalid"), 4)
+
+    def test_delay_per_direction(self):
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9), delay=0.1)
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.assertGreaterEqual(self.round_trip(c), 0.1)
+        c.close()
+        # the other direction and the other links are not delayed
+        self.proxy.set_rule(self.net.ip(9), self.net.ip(7), delay=0.1)
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9))
+        c = self.client(8)
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.assertLess(self.round_trip(c), 0.1)
+        c.close()
+
+    def test_rules(self):
+        with self.assertRaises(ValueError):
+            self.proxy.set_rule(delay=0.1, latency=0.1)
+        with self.assertRaises(ValueError):
+            self.proxy.set_rule(distribution="pareto")
+        with self.assertRaises(ValueError):
+            self.proxy.set_rule(loss=2)
+        self.proxy.set_rule(delay=0.3)
+        self.proxy.set_rule(destination=self.net.ip(9), delay=0.2)
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9), delay=0.1)
+        self.assertEqual(self.proxy.get_rule(self.net.ip(7), self.net.ip(9))["delay"], 0.1)
+        self.assertEqual(self.proxy.get_rule(self.net.ip(8), self.net.ip(9))["delay"], 0.2)
+        self.assertEqual(self.proxy.get_rule(self.net.ip(8), self.net.ip(7))["delay"], 0.3)
+        self.proxy.clear()
+        self.assertEqual(self.proxy.get_rule(self.net.ip(7), self.net.ip(9)), Proxy.DEFAULT_RULE)
+
+    def test_distributions(self):
+        for distribution in Proxy.DISTRIBUTIONS:
+            rule = dict(Proxy.DEFAULT_RULE, delay=0.01, jitter=0.005, distribution=distribution)
+            samples = [self.proxy.sample(rule) for i in range(1000)]
+            self.assertGreaterEqual(min(samples), 0)
+            if distribution == "constant":
+                self.assertEqual(set(samples), {0.01})
+            else:
+                self.assertGreater(len(set(samples)), 1)
+
+    def test_one_way_partition(self):
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.proxy.partition(self.net.ip(9), self.net.ip(7))
+        # the message reaches the server, but the answer is held
+        c.client.sendall(Client.frame("hello"))
+        c.client.settimeout(0.3)
+        with self.assertRaises(socket.timeout):
+            Client.receive(c.client)
+        # a new connection needs both directions
+        self.assertFalse(self.client().connect(self.net.ip(9), self.net.port))
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_connections", "partitioned"), 1)
+        self.proxy.clear()
+        c.client.settimeout(5)
+        self.assertEqual(Client.receive(c.client), "hello")
+        c.close()
+
+    def test_loss_retransmits(self):
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9), loss=0.5)
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        for i in range(10):
+            self.round_trip(c)
+        c.close()
+        self.assertGreater(self.proxy.get_metrics().get_counter("proxy_retransmissions"), 0)
+
+    def test_total_loss_resets(self):
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9), loss=1)
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.assertIsNone(c.exchange("hello"))
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_connections", "reset"), 1)
+        c.close()
+
+    def test_bandwidth(self):
+        self.proxy.set_rule(self.net.ip(7), self.net.ip(9), bandwidth=20000)
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.assertGreaterEqual(self.round_trip(c, "x" * 4000), 0.2)
+        c.close()
+
+    def test_replay(self):
+        steps = [{"at" : 0.2, "partition" : [self.net.ip(7), self.net.ip(9)], "both" : True},
+                 {"at" : 0, "source" : self.net.ip(7), "rule" : {"delay" : 0.05}},
+                 {"at" : 0.4, "clear" : True}]
+        thread = self.proxy.replay(sorted(steps, key=lambda step: step["at"]))
+        time.sleep(0.1)
+        self.assertEqual(self.proxy.get_rule(self.net.ip(7), self.net.ip(9))["delay"], 0.05)
+        time.sleep(0.2)
+        self.assertTrue(self.proxy.get_rule(self.net.ip(9), self.net.ip(7))["partitioned"])
+        thread.join()
+        self.assertEqual(self.proxy.get_rules(), {})
+        self.assertEqual(self.proxy.get_metrics().get_counter("proxy_steps"), 3)
+
+    def test_stop_resets_connections(self):
+        c = self.client()
+        self.assertTrue(c.connect(self.net.ip(9), self.net.port))
+        self.round_trip(c)
+        self.assertEqual(self.proxy.get_connections(), 1)
+        self.proxy.stop()
+        self.assertEqual(self.proxy.get_connections(), 0)
+        self.assertIsNone(c.exchange("hello"))
+        c.close()
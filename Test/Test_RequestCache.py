@@ -0,0 +1,74 @@
+import unittest
+import threading
+import time
+import sys
+sys.path.insert(1, '../src')
+import RequestCache
+
+class Test_begin(unittest.TestCase):
+
+    c = None
+
+    def setUp(self):
+        self.c = RequestCache.RequestCache(10 * 1024, 60)
+
+    def tearDown(self):
+        del self.c
+
+    def test_retry_is_answered_from_cache(self):
+        self.assertEqual(self.c.begin("a", 1), (False, None))
+        self.c.finish("a", 1, "committed")
+        self.assertEqual(self.c.begin("a", 1), (True, "committed"))
+        self.assertEqual(self.c.begin("b", 1), (False, None))
+        self.assertEqual(self.c.get_counters()["hits"], 1)
+        self.assertEqual(self.c.get_counters()["misses"], 2)
+
+    def test_retry_waits_for_running_request(self):
+        self.c.begin("a", 1)
+        t = threading.Timer(0.2, self.c.finish, args=("a", 1, "committed"))
+        t.start()
+        self.assertEqual(self.c.begin("a", 1, 5), (True, "committed"))
+        t.join()
+
+    def test_retry_timeout(self):
+        self.c.begin("a", 1)
+        self.assertEqual(self.c.begin("a", 1, 0.1), (True, None))
+
+    def test_abort(self):
+        self.c.begin("a", 1)
+        self.c.abort("a", 1)
+        self.assertEqual(self.c.begin("a", 1), (False, None))
+
+class Test_evict(unittest.TestCase):
+
+    def test_least_recently_used(self):
+        c = RequestCache.RequestCache(3 * (RequestCache.ENTRY_OVERHEAD + len("a") + len("ok")), 60)
+        for sequence in range(3):
+            c.begin("a", sequence)
+            c.finish("a", sequence, "ok")
+        # the first answer is used again, so the second one is evicted
+        c.begin("a", 0)
+        c.begin("a", 3)
+        c.finish("a", 3, "ok")
+        self.assertEqual(c.begin("a", 0), (True, "ok"))
+        self.assertEqual(c.begin("a", 1), (False, None))
+        self.assertEqual(c.get_counters()["evictions"], 1)
+
+    def test_time_to_live(self):
+        c = RequestCache.RequestCache(10 * 1024, 0.1)
+        c.begin("a", 1)
+        c.finish("a", 1, "ok")
+        time.sleep(0.2)
+        self.assertEqual(c.begin("a", 1), (False, None))
+        self.assertEqual(c.get_counters()["evictions"], 1)
+
+    def test_time_to_live_behind_running_request(self):
+        c = RequestCache.RequestCache(10 * 1024, 0.1)
+        c.begin("a", 1)
+        c.begin("a", 2)
+        c.finish("a", 2, "ok")
+        time.sleep(0.2)
+        # the first request is still handled, the answer behind it expires anyway
+        self.assertEqual(c.begin("a", 3), (False, None))
+        self.assertEqual(c.get_counters()["evictions"], 1)
+        self.assertEqual(c.begin("a", 1, 0.1), (True, None))
@@ -0,0 +1,142 @@
+import unittest
+from unittest import mock
+import threading
+import socket
+import time
+import os
+import sys
+sys.path.insert(1, '../src')
+import Resources
+import Server
+import Fixtures
+import Client
+
+FAILOVERS = 200
+WARMUP = 10
+SEARCH_TIMEOUT = 0.05
+
+"""
+Note:
+The soak test lets a server go through FAILOVERS elections that fail,
+because the other server of its list is not running: the server searches
+the network, loses the quorum, shuts down and is restarted. Every round also
+keeps a connection to the server open and sends a message to a server that
+crashes (resets the connection), which are the paths that used to leak.
+The search for the network is only delayed by SEARCH_TIMEOUT, so the test takes
+less than a minute.
+"""
+
+def snapshots(values):
+    return [{"time" : i, "counts" : {"sockets" : v, "threads" : 5}, "roles" : {}} for i, v in enumerate(values)]
+
+class Test_resources(unittest.TestCase):
+
+    def test_descriptors(self):
+        before = Resources.descriptors()
+        r, w = os.pipe()
+        s = socket.socket()
+        after = Resources.descriptors()
+        self.assertEqual(after["pipes"], before["pipes"] + 2)
+        self.assertEqual(after["sockets"], before["sockets"] + 1)
+        os.close(r)
+        os.close(w)
+        s.close()
+        self.assertEqual(Resources.descriptors(), before)
+
+    def test_threads_by_role(self):
+        stop = threading.Event()
+        t = threading.Thread(target=stop.wait)
+        t.start()
+        counts = Resources.threads()
+        stop.set()
+        t.join()
+        self.assertEqual(sum(counts.values()), threading.active_count() + 1)
+
+    def test_growth(self):
+        self.assertEqual(Resources.growth(snapshots(range(30)), 30, 10), {"sockets" : 29})
+        # a count that decreased in between is not growing steadily
+        self.assertEqual(Resources.growth(snapshots(list(range(15)) + [3] + list(range(15, 29))), 30, 10), {})
+        self.assertEqual(Resources.growth(snapshots([4] * 29 + [20]), 30, 10), {"sockets" : 16})
+        self.assertEqual(Resources.growth(snapshots(range(5)), 30, 10), {})
+
+    def test_warn_once(self):
+        warnings = []
+        tracker = Resources.ResourceTracker(warn=warnings.append)
+        sockets = []
+        try:
+            for _ in range(Resources.GROWTH_WINDOW + 5):
+                sockets.append(socket.socket())
+                tracker.track()
+        finally:
+            for s in sockets:
+                s.close()
+        self.assertEqual(len(warnings), 1)
+        self.assertIn("sockets", warnings[0])
+        self.assertEqual([name for _, name, _ in tracker.get_warnings()], ["sockets"])
+        self.assertIn("sockets", tracker.get_growing())
+
+    def test_start_and_stop(self):
+        tracker = Resources.ResourceTracker(0.01)
+        tracker.start()
+        while len(tracker.get_history()) < 3:
+            time.sleep(0.01)
+        tracker.stop()
+        self.assertEqual([t.name for t in threading.enumerate() if t.name == 'Resource_Tracker'], [])
+
+@mock.patch.object(Server, "INITIAL_NETWORK_SEARCH_TIMEOUT", SEARCH_TIMEOUT)
+class Test_soak(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self, [9, 8])
+        self.s = self.net.server(9)
+        self.s.get_log().set_level("election", 100)
+        self.s.get_log().set_level("server", 100)
+        # a server that crashes as soon as a connection is accepted
+        self.crashing = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.crashing.bind((self.net.ip(6), 0))
+        self.crashing.listen()
+
+    def tearDown(self):
+        self.crashing.close()
+        self.s.close()
+        del self.s
+
+    def failover(self, target):
+        thread = threading.Thread(target=target)
+        thread.start()
+        # keep a connection open, like the master keeps its replication connection
+        idle = Client.Client(self.net.ip(8))
+        while not idle.connect(self.s.ip, self.s.port):
+            time.sleep(0.001)
+            idle = Client.Client(self.net.ip(8))
+        c = Client.Client(self.net.ip(9))
+        c.connect(*self.crashing.getsockname())
+        conn, addr = self.crashing.accept()
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00")
+        conn.close()
+        with self.assertRaises(OSError):
+            c.send(Server.ASK_MASTER_MESSAGE)
+        thread.join()
+        idle.close()
+        # the search that shut the server down must have finished before it is restarted
+        self.settle()
+
+    def settle(self):
+        # waits for the threads of the server to end
+        for t in threading.enumerate():
+            if t is not threading.current_thread() and not t.daemon:
+                t.join(5)
+
+    def test_failovers(self):
+        for i in range(FAILOVERS):
+            self.failover(self.s.start if i == 0 else self.s.restart)
+            if i == WARMUP:
+                before = Resources.snapshot()
+        after = Resources.snapshot()
+        self.assertFalse(self.s.is_online())
+        self.assertEqual(self.s.get_metrics().get_counter("shutdowns", "network attempts"), FAILOVERS)
+        self.assertEqual(after["counts"], before["counts"])
+        self.assertEqual(after["roles"], before["roles"])
@@ -0,0 +1,100 @@
+import unittest
+import logging
+import threading
+import tempfile
+import os
+import sys
+from unittest import mock
+sys.path.insert(1, '../src')
+import ServerLog
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append((record.name, record.getMessage(), record.threadName))
+
+class Test_log(unittest.TestCase):
+
+    l = None
+
+    def setUp(self):
+        self.handler = ListHandler()
+        self.l = ServerLog.ServerLog("127.0.0.9", handler=self.handler)
+
+    def tearDown(self):
+        self.l.stop()
+        del self.l
+
+    def test_direct(self):
+        self.l.debug("election", "%s server is available.", "127.0.0.8")
+        self.assertEqual(self.handler.messages,
+                         [("Server.127.0.0.9.election", "127.0.0.8 server is available.", threading.current_thread().name)])
+
+    def test_levels(self):
+        self.l.set_level("election", logging.INFO)
+        self.l.debug("election", "hidden")
+        self.l.info("election", "shown")
+        self.l.debug("server", "shown too")
+        self.assertEqual([message for name, message, thread in self.handler.messages], ["shown", "shown too"])
+
+    def test_sampling(self):
+        for i in range(25):
+            self.l.debug("ping", "ping %s", i)
+        self.assertEqual([message for name, message, thread in self.handler.messages], ["ping 0", "ping 10", "ping 20"])
+        self.l.set_sampling("ping", None)
+        self.l.debug("ping", "ping")
+        self.assertEqual(len(self.handler.messages), 4)
+
+    def test_rate_limit(self):
+        self.l.set_rate_limit("client", 3)
+        for i in range(10):
+            self.l.debug("client", "write %s", i)
+        # all messages are logged within the same second in most cases
+        self.assertLessEqual(len(self.handler.messages), 6)
+        self.assertEqual(len(self.handler.messages) + self.l.get_counters()["suppressed"]["client"], 10)
+
+    def test_writer_thread(self):
+        self.l.start()
+        def log():
+            threading.current_thread().name = 'Ping'
+            self.l.debug("server", "from %s", "ping thread")
+        t = threading.Thread(target=log)
+        t.start()
+        t.join()
+        self.l.stop()
+        # the message is written by the writer thread, but keeps the name of the thread that logged it
+        self.assertEqual(self.handler.messages, [("Server.127.0.0.9.server", "from ping thread", "Ping")])
+        self.assertEqual(threading.active_count(), 1)
+
+    def test_stop_while_logging(self):
+        self.l.start()
+        def log():
+            for i in range(200):
+                self.l.debug("server", "message %s", i)
+        t = threading.Thread(target=log)
+        t.start()
+        self.l.stop()
+        t.join()
+        # no message is put behind the end of the queue, the later ones are written directly
+        self.assertEqual(len(self.handler.messages), 200)
+        self.assertTrue(self.l.records.empty())
+
+    def test_own_handler_closed(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with mock.patch.object(ServerLog, "LOG_FILE", os.path.join(directory.name, "server.log")):
+            l = ServerLog.ServerLog("127.0.0.8")
+        l.start()
+        l.debug("server", "written")
+        l.stop()
+        self.assertIsNone(l.handler.stream)
+        # a given handler is left to its owner
+        with mock.patch.object(self.handler, "close") as mock_close:
+            self.l.stop()
+        mock_close.assert_not_called()
+        with open(os.path.join(directory.name, "server.log")) as f:
+            self.assertEqual(f.read(), "MainThread:written\n")
@@ -1,23 +1,32 @@
 import unittest
 from unittest import mock
 import time
+import itertools
 import logging
 import threading
 import sys
 sys.path.insert(1, '../src')
 import Server
+import Fixtures
+import Client
+import Clock
+import Bash
 
 FORMAT = 'UTF-8'
 HEADER = 64
 
 ASK_MASTER_MESSAGE = "Your master?"
 VOTE_MASTER_MESSAGE = "vote = "
+NOT_MASTER_MESSAGE = "not master = "
+WRITE_COMMITTED_MESSAGE = "The write has been committed"
+WRITE_DECLINED_MESSAGE = "The write has been declined"
+READ_DECLINED_MESSAGE = "The read has been declined"
 
 WAIT_PING_TIME = 15
 
-DEFAULT_SERVER_LIST = ["127.0.0.7", "127.0.0.8", "127.0.0.9"]
 PAUSE = 1
 LONG_PAUSE = 2
+BATCH = 5
 
 logging.basicConfig(
     format='%(threadName)s:%(message)s',
@@ -26,21 +35,21 @@ logging.basicConfig(
 
 """
 Note:
-The test will take some time, because the connection has to be
-based on different timings to ensure connections with delays.
-To reduce the time the test need to evaluate, you may want to
-decrease the timeouts here and in the 'Server.py'.
-(For example: MASTER_VOTE_TIMEOUT : 30 -> MASTER_VOTE_TIMEOUT : 10)
-But remember to postpone!
+The tests of the election and the heartbeat run on a fake clock (-> Clock.FakeClock),
+the servers and the tests wait for the timeouts of the 'Server.py' in virtual time.
+The clock jumps to the next timeout as soon as no thread has used it for a moment,
+so a test with a lot of work between two waits may have to increase Clock.QUIET_TIME.
 """
 
 @mock.patch('socket.socket', autospec=True)
 class Test_handle_client(unittest.TestCase):
 
     s = None
+    net = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
 
     def tearDown(self):
         self.s.close()
@@ -55,19 +64,21 @@ class Test_handle_client(unittest.TestCase):
         send_length += b' ' * (HEADER - len(send_length))
         mock_socket.recv.side_effect = [send_length, message]
 
-        self.s.handle_client(mock_socket, ("127.0.0.7", 26450))
-        self.assertEqual(self.s.requests, ["127.0.0.7"])
+        self.s.handle_client(mock_socket, (self.net.ip(7), 26450))
+        self.assertEqual(self.s.requests, [self.net.ip(7)])
+        self.assertEqual(self.s.get_metrics().get_counters()["messages"], {"ask master" : 1})
 
     def test_ping_message(self, mock_socket):
         # copied from Client.py to reproduce the message format
-        message = "ip = 127.0.0.7".encode(FORMAT)
+        message = ("ip = " + self.net.ip(7)).encode(FORMAT)
         msg_length = len(message)
         send_length = str(msg_length).encode(FORMAT)
         send_length += b' ' * (HEADER - len(send_length))
         mock_socket.recv.side_effect = [send_length, message]
 
-        self.s.handle_client(mock_socket, ("127.0.0.7", 26450))
-        self.assertEqual(self.s.ping_targets, {"127.0.0.7" : 1})
+        self.s.handle_client(mock_socket, (self.net.ip(7), 26450))
+        self.assertEqual(self.s.ping_targets, {self.net.ip(7) : 1})
+        self.assertEqual(self.s.get_metrics().get_counter("messages", "ping"), 1)
 
     @mock.patch.object(Server.Server, "handle_votes")
     def test_vote_master_message(self, mock_votes, mock_socket):
@@ -78,18 +89,298 @@ class Test_handle_client(unittest.TestCase):
         send_length += b' ' * (HEADER - len(send_length))
         mock_socket.recv.side_effect = [send_length, message]
 
-        self.s.handle_client(mock_socket, ("127.0.0.7", 26450))
+        self.s.handle_client(mock_socket, (self.net.ip(7), 26450))
         mock_votes.assert_called()
 
+@mock.patch('socket.socket', autospec=True)
+class Test_handle_write(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.network = list(self.net.server_list)
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_not_master(self, mock_socket):
+        self.s.master_server = self.net.ip(8)
+        self.s.handle_write('{"key" : "a", "value" : "1"}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame(NOT_MASTER_MESSAGE + self.net.ip(8)))
+
+    @mock.patch.object(Server.Server, "replicate")
+    def test_write_committed(self, mock_replicate, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        mock_replicate.return_value = True
+        self.s.handle_write('{"key" : "a", "value" : "1"}', mock_socket)
+        mock_replicate.assert_called_with(1)
+        mock_socket.sendall.assert_called_with(Client.frame(WRITE_COMMITTED_MESSAGE))
+
+    def test_request_answered_with_id(self, mock_socket):
+        self.s.master_server = self.net.ip(8)
+        self.s.handle_request('{"id" : 7, "message" : "write = {\\"key\\" : \\"a\\", \\"value\\" : \\"1\\"}"}',
+            mock_socket, threading.Lock())
+        mock_socket.sendall.assert_called_with(Client.frame('{"id": 7, "answer": "not master = ' + self.net.ip(8) + '"}'))
+
+    def test_malformed_request(self, mock_socket):
+        self.s.handle_request('{"id" : 7, "message" : 5}', mock_socket, threading.Lock())
+        mock_socket.sendall.assert_called_with(Client.frame('{"id": 7, "answer": "' + Server.REQUEST_DECLINED_MESSAGE + '"}'))
+        # without an id the answer cannot be matched, the connection is closed
+        for payload in ['{"id" : 8', '{"message" : "read = {}"}', '[8]']:
+            mock_socket.reset_mock()
+            self.s.handle_request(payload, mock_socket, threading.Lock())
+            mock_socket.sendall.assert_not_called()
+            mock_socket.shutdown.assert_called()
+
+    @mock.patch.object(Server.Server, "replicate")
+    def test_retried_write_is_not_handled_twice(self, mock_replicate, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        mock_replicate.return_value = True
+        write = '{"key" : "a", "value" : "1", "client" : "c", "sequence" : 1}'
+        self.s.handle_write(write, mock_socket)
+        self.s.handle_write(write, mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame(WRITE_COMMITTED_MESSAGE))
+        self.assertEqual(self.s.get_store().last(), (1, 1))
+        self.assertEqual(self.s.get_request_cache().get_counters()["hits"], 1)
+
+    def test_replicate(self, mock_socket):
+        self.s.handle_replicate('{"term" : 1, "master" : "' + self.net.ip(8) + '", "prev_index" : 0, "prev_term" : 0, "entries" : '
+            + '[{"index" : 1, "term" : 1, "key" : "a", "value" : "1"}], "commit_index" : 1}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('{"success": true, "index": 1}'))
+        self.assertEqual(self.s.get_store().get("a"), "1")
+
+    def test_malformed_write(self, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        for payload in ['{"key" : "a"', '[1, 2]', '{"value" : "1"}']:
+            self.s.handle_write(payload, mock_socket)
+            mock_socket.sendall.assert_called_with(Client.frame(WRITE_DECLINED_MESSAGE))
+        self.assertEqual(self.s.get_store().last(), (0, 0))
+
+    def test_malformed_read(self, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        for payload in ['{"key" : "a"', '[1, 2]', '{"consistency" : "stale"}', '{"key" : "a", "max_staleness" : "x"}']:
+            self.s.handle_read(payload, mock_socket)
+            mock_socket.sendall.assert_called_with(Client.frame(READ_DECLINED_MESSAGE))
+
+    def test_malformed_replicate(self, mock_socket):
+        # the connection is closed instead of waiting for the next replication
+        message = (Server.REPLICATE_MESSAGE + '{"term" : 1}').encode(FORMAT)
+        send_length = str(len(message)).encode(FORMAT)
+        send_length += b' ' * (HEADER - len(send_length))
+        mock_socket.recv.side_effect = [send_length, message]
+        self.s.handle_client(mock_socket, (self.net.ip(8), 26450))
+        mock_socket.sendall.assert_called_with(Client.frame('{"success": false, "index": 0}'))
+        mock_socket.close.assert_called()
+
+    def test_malformed_log_request(self, mock_socket):
+        message = (Server.LOG_MESSAGE + 'x').encode(FORMAT)
+        send_length = str(len(message)).encode(FORMAT)
+        send_length += b' ' * (HEADER - len(send_length))
+        mock_socket.recv.side_effect = [send_length, message]
+        self.s.handle_client(mock_socket, (self.net.ip(8), 26450))
+        mock_socket.sendall.assert_not_called()
+        mock_socket.close.assert_called()
+
+    def test_replicate_old_term(self, mock_socket):
+        self.s.get_store().term = 2
+        self.s.handle_replicate('{"term" : 1, "master" : "' + self.net.ip(8) + '", "prev_index" : 0, "prev_term" : 0, "entries" : [], "commit_index" : 0}',
+            mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('{"success": false, "index": 0}'))
+
+    def test_snapshot_in_chunks(self, mock_socket):
+        header = '{"term" : 1, "master" : "' + self.net.ip(8) + '", "index" : 5, "last_term" : 1, "offset" : %d, "done" : %s}\n'
+        self.s.handle_snapshot(header % (0, "false") + '{"a" : "1", ', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('{"success": true, "offset": 12}'))
+        self.s.handle_snapshot(header % (12, "true") + '"b" : "2"}', mock_socket)
+        self.assertEqual(self.s.get_store().get("b"), "2")
+        self.assertEqual(self.s.get_store().get_commit_index(), 5)
+
+    def test_snapshot_chunk_missing(self, mock_socket):
+        header = '{"term" : 1, "master" : "' + self.net.ip(8) + '", "index" : 5, "last_term" : 1, "offset" : %d, "done" : %s}\n'
+        self.s.handle_snapshot(header % (0, "false") + '{"a" : "1", ', mock_socket)
+        self.s.handle_snapshot(header % (20, "true") + '}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('{"success": false, "offset": 12}'))
+        self.assertEqual(self.s.get_store().get_commit_index(), 0)
+
+    def test_malformed_snapshot(self, mock_socket):
+        for payload in ['{"term" : 1}', '{"term" : 1\n{}', '{"term" : 1}\n{}', '{"term" : "1", "master" : "", "index" : 5, '
+                        + '"last_term" : 1, "offset" : 0, "done" : true}\n{}']:
+            self.s.handle_snapshot(payload, mock_socket)
+            mock_socket.sendall.assert_called_with(Client.frame('{"success": false, "offset": 0}'))
+        self.assertEqual(self.s.get_store().get_commit_index(), 0)
+
+@mock.patch.object(Server.Server, "replicate")
+class Test_group_commit(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def write_concurrently(self, count):
+        answers = []
+        threads = [threading.Thread(target=lambda i=i: answers.append(self.s.write('{"key" : "k%d", "value" : "1"}' % i)))
+                   for i in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return answers
+
+    def test_one_replication_per_batch(self, mock_replicate):
+        mock_replicate.return_value = True
+        self.s.set_batch_window(LONG_PAUSE)
+        self.s.set_batch_size(2 * BATCH)
+        answers = self.write_concurrently(BATCH)
+        self.assertEqual(answers, [WRITE_COMMITTED_MESSAGE] * BATCH)
+        # the log is replicated once up to the last write of the batch
+        mock_replicate.assert_called_once_with(BATCH)
+
+    def test_batch_closes_on_size(self, mock_replicate):
+        mock_replicate.return_value = True
+        self.s.set_batch_window(60)
+        self.s.set_batch_size(BATCH)
+        start = time.time()
+        self.assertEqual(self.write_concurrently(BATCH), [WRITE_COMMITTED_MESSAGE] * BATCH)
+        # the full batch does not wait for the window
+        self.assertLess(time.time() - start, LONG_PAUSE)
+        mock_replicate.assert_called_once_with(BATCH)
+
+    def test_batch_closes_on_window(self, mock_replicate):
+        mock_replicate.return_value = True
+        self.s.set_batch_window(PAUSE / 2)
+        start = time.time()
+        self.assertEqual(self.s.write('{"key" : "a", "value" : "1"}'), WRITE_COMMITTED_MESSAGE)
+        self.assertGreaterEqual(time.time() - start, PAUSE / 2)
+        mock_replicate.assert_called_once_with(1)
+
+    def test_batch_window_on_the_clock(self, mock_replicate):
+        mock_replicate.return_value = True
+        self.s.set_batch_window(60)
+        # every look at the clock of the server takes half of the window
+        self.s.clock = mock.Mock()
+        self.s.clock.monotonic.side_effect = itertools.count(0, 30)
+        start = time.time()
+        self.assertEqual(self.s.write('{"key" : "a", "value" : "1"}'), WRITE_COMMITTED_MESSAGE)
+        self.assertLess(time.time() - start, LONG_PAUSE)
+
+    def test_shutdown_stops_the_batch(self, mock_replicate):
+        mock_replicate.return_value = True
+        self.s.set_batch_window(60)
+        answers = []
+        t = threading.Thread(target=lambda: answers.append(self.s.write('{"key" : "a", "value" : "1"}')))
+        t.start()
+        while not self.s.pending_writes:
+            time.sleep(0.01)
+        thread = self.s.group_commit_thread
+        self.s.shutdown()
+        # the waiting write is declined and the thread has ended
+        self.assertFalse(thread.is_alive())
+        t.join()
+        self.assertEqual(answers, [WRITE_DECLINED_MESSAGE])
+        self.assertIsNone(self.s.group_commit_thread)
+        mock_replicate.assert_not_called()
+
+    @mock.patch("builtins.print")
+    def test_batch_command(self, mock_print, mock_replicate):
+        Bash.server = self.s
+        Bash.batch(["batch", "-window", "5"])
+        Bash.batch(["batch", "-size", "8"])
+        self.assertEqual((self.s.get_batch_window(), self.s.get_batch_size()), (0.005, 8))
+        # wrong values do not change the batch
+        Bash.batch(["batch", "-window", "-1"])
+        Bash.batch(["batch", "-size", "0"])
+        self.assertEqual((self.s.get_batch_window(), self.s.get_batch_size()), (0.005, 8))
+        mock_print.assert_called_with(Bash.WRONG_COMMAND)
+        Bash.server = None
+
+@mock.patch('socket.socket', autospec=True)
+class Test_handle_read(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.network = list(self.net.server_list)
+        self.s.get_store().append(1, "a", "1")
+        self.s.get_store().commit(1)
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_linearizable_with_lease(self, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        self.s.lease_pings = {self.net.ip(8) : time.monotonic()}
+        self.s.handle_read('{"key" : "a", "consistency" : "linearizable"}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('"1"'))
+
+    def test_linearizable_lease_expired(self, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        self.s.lease_pings = {self.net.ip(8) : time.monotonic() - WAIT_PING_TIME}
+        self.s.handle_read('{"key" : "a"}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame(READ_DECLINED_MESSAGE))
+
+    def test_linearizable_not_master(self, mock_socket):
+        self.s.master_server = self.net.ip(8)
+        self.s.synced_time = time.monotonic()
+        self.s.handle_read('{"key" : "a", "consistency" : "linearizable"}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame(NOT_MASTER_MESSAGE + self.net.ip(8)))
+
+    def test_stale_read_in_bound(self, mock_socket):
+        self.s.master_server = self.net.ip(8)
+        self.s.synced_time = time.monotonic()
+        self.s.handle_read('{"key" : "a", "consistency" : "stale", "max_staleness" : 5}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame('"1"'))
+
+    def test_stale_read_too_stale(self, mock_socket):
+        self.s.master_server = self.net.ip(8)
+        self.s.synced_time = time.monotonic() - 10
+        self.s.handle_read('{"key" : "a", "consistency" : "stale", "max_staleness" : 5}', mock_socket)
+        mock_socket.sendall.assert_called_with(Client.frame(NOT_MASTER_MESSAGE + self.net.ip(8)))
+
+    def test_ping_renews_lease(self, mock_socket):
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+        self.s.match_index = {self.net.ip(8) : 1}
+        self.assertFalse(self.s.has_lease())
+        self.s.handle_ping(self.net.ip(8), mock_socket)
+        self.assertTrue(self.s.has_lease())
+        mock_socket.send.assert_called_with("Ping received = 1".encode(FORMAT))
+
 @mock.patch('socket.socket', autospec=True)
 class Test_handle_votes(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s= Server.Server("127.0.0.9")
-        self.s.server_list = list(DEFAULT_SERVER_LIST)
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7"]
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s= self.net.server(9, clock=self.clock)
+        self.s.server_list = list(self.net.server_list)
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7)]
         self.s.votes = []
         self.s.master_server = None
 
@@ -98,37 +389,37 @@ class Test_handle_votes(unittest.TestCase):
         del self.s
 
     def test_one_vote_out_of_three(self, mock_socket):
-        thread = threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket))
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
         thread.start()
         thread.join()
 
         self.assertIsNone(self.s.master_server)
 
     def test_two_votes_out_of_five(self, mock_socket):
-        self.s.add_server_to_list("127.0.0.6")
-        self.s.add_server_to_list("127.0.0.5")
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7", "127.0.0.6", "127.0.0.5"]
+        self.s.add_server_to_list(self.net.ip(6))
+        self.s.add_server_to_list(self.net.ip(5))
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7), self.net.ip(6), self.net.ip(5)]
 
-        thread = threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket))
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
         thread.start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.7", mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(7), mock_socket)).start()
         thread.join()
 
         self.assertIsNone(self.s.master_server)
 
     @mock.patch.object(Server.Server, "ping_check")
     def test_three_votes_out_of_five(self, mock_ping, mock_socket):
-        self.s.add_server_to_list("127.0.0.6")
-        self.s.add_server_to_list("127.0.0.5")
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7", "127.0.0.6", "127.0.0.5"]
+        self.s.add_server_to_list(self.net.ip(6))
+        self.s.add_server_to_list(self.net.ip(5))
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7), self.net.ip(6), self.net.ip(5)]
 
-        thread = threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket))
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
         thread.start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.7", mock_socket)).start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.8", mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(7), mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(8), mock_socket)).start()
         thread.join()
         logging.debug(self.s.master_server)
         self.assertIsNotNone(self.s.master_server)
@@ -136,24 +427,42 @@ class Test_handle_votes(unittest.TestCase):
 
     @mock.patch.object(Server.Server, "ping_check")
     def test_three_votes_out_of_three(self, mock_ping, mock_socket):
-        thread = threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket))
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
         thread.start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.7", mock_socket)).start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.8", mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(7), mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(8), mock_socket)).start()
         thread.join()
 
         self.assertIsNotNone(self.s.master_server)
         mock_ping.assert_called()
 
+    @mock.patch.object(Server.Server, "ping_check")
+    def test_traced_votes(self, mock_ping, mock_socket):
+        self.s.get_tracer().enabled = True
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
+        thread.start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(7) + " trace = " + self.net.ip(7) + "-4", mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(8) + " trace = " + self.net.ip(8) + "-4", mock_socket)).start()
+        thread.join()
+        self.clock.sleep(PAUSE)
+
+        self.assertEqual(sorted(self.s.votes), [self.net.ip(7), self.net.ip(8), self.net.ip(9)])
+        spans = self.s.get_tracer().get_spans()
+        vote_check = [span for span in spans if span["name"] == "vote_check"][0]
+        self.assertEqual(vote_check["links"], [self.net.ip(7) + "-4", self.net.ip(8) + "-4"])
+        self.assertEqual(len([span for span in spans if span["name"] == "handle_votes"]), 3)
+
     def test_invalid_votes(self, mock_socket):
-        thread = threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket))
+        thread = threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket))
         thread.start()
-        time.sleep(PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket)).start()
-        time.sleep(LONG_PAUSE)
-        threading.Thread(target=self.s.handle_votes, args = ("127.0.0.9", mock_socket)).start()
+        self.clock.sleep(PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket)).start()
+        self.clock.sleep(LONG_PAUSE)
+        threading.Thread(target=self.s.handle_votes, args = (self.net.ip(9), mock_socket)).start()
         thread.join()
 
         self.assertIsNone(self.s.master_server)
@@ -161,12 +470,16 @@ class Test_handle_votes(unittest.TestCase):
 class Test_ping_check_with_three(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s= Server.Server("127.0.0.9")
-        self.s.server_list = list(DEFAULT_SERVER_LIST)
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7"]
-        self.s.ping_targets = {"127.0.0.9" : 1, "127.0.0.8" : 1, "127.0.0.7" : 1}
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s= self.net.server(9, clock=self.clock)
+        self.s.server_list = list(self.net.server_list)
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7)]
+        self.s.ping_targets = {self.net.ip(9) : 1, self.net.ip(8) : 1, self.net.ip(7) : 1}
 
     def tearDown(self):
         self.s.close()
@@ -175,12 +488,12 @@ class Test_ping_check_with_three(unittest.TestCase):
     def test_one_out_of_three_offline(self):
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(PAUSE)
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(PAUSE)
+        self.clock.sleep(WAIT_PING_TIME)
         self.s.ping_lock.acquire()
-        self.s.ping_targets["127.0.0.8"] = 1
+        self.s.ping_targets[self.net.ip(8)] = 1
         self.s.ping_lock.release()
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(WAIT_PING_TIME)
 
         self.assertTrue(self.s.server_online)
         self.s.server_online = False
@@ -189,7 +502,7 @@ class Test_ping_check_with_three(unittest.TestCase):
     def test_two_out_of_three_offline(self):
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(2 * WAIT_PING_TIME + PAUSE)
+        self.clock.sleep(2 * WAIT_PING_TIME + PAUSE)
 
         self.assertFalse(self.s.server_online)
         thread.join()
@@ -197,14 +510,18 @@ class Test_ping_check_with_three(unittest.TestCase):
 class Test_ping_check_with_five(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s= Server.Server("127.0.0.9")
-        self.s.server_list = list(DEFAULT_SERVER_LIST)
-        self.s.add_server_to_list("127.0.0.6")
-        self.s.add_server_to_list("127.0.0.5")
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7", "127.0.0.6", "127.0.0.5"]
-        self.s.ping_targets = {"127.0.0.9" : 1, "127.0.0.8" : 1, "127.0.0.7" : 1, "127.0.0.6" : 1, "127.0.0.5" : 1}
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s= self.net.server(9, clock=self.clock)
+        self.s.server_list = list(self.net.server_list)
+        self.s.add_server_to_list(self.net.ip(6))
+        self.s.add_server_to_list(self.net.ip(5))
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7), self.net.ip(6), self.net.ip(5)]
+        self.s.ping_targets = {self.net.ip(9) : 1, self.net.ip(8) : 1, self.net.ip(7) : 1, self.net.ip(6) : 1, self.net.ip(5) : 1}
 
     def tearDown(self):
         self.s.close()
@@ -213,13 +530,13 @@ class Test_ping_check_with_five(unittest.TestCase):
     def test_two_out_of_five_offline(self):
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(PAUSE)
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(PAUSE)
+        self.clock.sleep(WAIT_PING_TIME)
         self.s.ping_lock.acquire()
-        self.s.ping_targets["127.0.0.8"] = 1
-        self.s.ping_targets["127.0.0.7"] = 1
+        self.s.ping_targets[self.net.ip(8)] = 1
+        self.s.ping_targets[self.net.ip(7)] = 1
         self.s.ping_lock.release()
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(WAIT_PING_TIME)
 
         self.assertTrue(self.s.server_online)
         self.s.server_online = False
@@ -228,12 +545,12 @@ class Test_ping_check_with_five(unittest.TestCase):
     def test_three_out_of_five_offline(self):
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(PAUSE)
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(PAUSE)
+        self.clock.sleep(WAIT_PING_TIME)
         self.s.ping_lock.acquire()
-        self.s.ping_targets["127.0.0.8"] = 1
+        self.s.ping_targets[self.net.ip(8)] = 1
         self.s.ping_lock.release()
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(WAIT_PING_TIME)
 
         self.assertFalse(self.s.server_online)
         thread.join()
@@ -241,42 +558,47 @@ class Test_ping_check_with_five(unittest.TestCase):
 class Test_ping_check_other_occurences(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s= Server.Server("127.0.0.9")
-        self.s.server_list = list(DEFAULT_SERVER_LIST)
-        self.s.network = ["127.0.0.9", "127.0.0.8", "127.0.0.7"]
-        self.s.ping_targets = {"127.0.0.9" : 1, "127.0.0.8" : 1, "127.0.0.7" : 1}
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s= self.net.server(9, clock=self.clock)
+        self.s.server_list = list(self.net.server_list)
+        self.s.network = [self.net.ip(9), self.net.ip(8), self.net.ip(7)]
+        self.s.ping_targets = {self.net.ip(9) : 1, self.net.ip(8) : 1, self.net.ip(7) : 1}
 
     def tearDown(self):
         self.s.close()
         del self.s
 
     def test_new_server(self):
-        self.s.add_server_to_list("127.0.0.6")
+        self.s.add_server_to_list(self.net.ip(6))
 
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(PAUSE)
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(PAUSE)
+        self.clock.sleep(WAIT_PING_TIME)
         self.s.ping_lock.acquire()
-        self.s.ping_targets["127.0.0.8"] = 1
-        self.s.ping_targets["127.0.0.7"] = 1
-        self.s.ping_targets["127.0.0.6"] = 1
+        self.s.ping_targets[self.net.ip(8)] = 1
+        self.s.ping_targets[self.net.ip(7)] = 1
+        self.s.ping_targets[self.net.ip(6)] = 1
         self.s.ping_lock.release()
-        time.sleep(WAIT_PING_TIME)
+        self.clock.sleep(WAIT_PING_TIME)
 
         self.assertTrue(self.s.server_online)
-        self.assertEqual(self.s.network, ["127.0.0.9", "127.0.0.8", "127.0.0.7", "127.0.0.6"])
+        self.assertEqual(self.s.network, [self.net.ip(9), self.net.ip(8), self.net.ip(7), self.net.ip(6)])
         self.s.server_online = False
         thread.join()
 
     def test_shutdown(self):
         thread = threading.Thread(target=self.s.ping_check, args = ())
         thread.start()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
         self.s.shutdown()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
 
         self.assertFalse(self.s.server_online)
+        self.assertEqual(self.s.get_metrics().get_counter("shutdowns", "manual"), 1)
         thread.join()
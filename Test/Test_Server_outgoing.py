@@ -1,12 +1,13 @@
 import unittest
 from unittest import mock
-import time
 import logging
 import threading
 import sys
 sys.path.insert(1, '../src')
 import Server
+import Fixtures
 import Client
+import Clock
 
 FORMAT = 'UTF-8'
 HEADER = 64
@@ -21,16 +22,14 @@ SEND_PING_TIME = 6
 MASTER_VOTE_TIMEOUT = 20
 INITIAL_NETWORK_SEARCH_TIMEOUT = 10
 
-DEFAULT_SERVER_LIST = ["127.0.0.7", "127.0.0.8", "127.0.0.9"]
 PAUSE = 1
 
 """
 Note:
-The test will take some time, because the connection has to be
-based on different timings to ensure connections with delays.
-To reduce the time the test need to evaluate, you may want to
-decrease the timeouts in the 'Server.py'.
-(For example: MASTER_VOTE_TIMEOUT : 30 -> MASTER_VOTE_TIMEOUT : 10)
+The tests of the election and the heartbeat run on a fake clock (-> Clock.FakeClock),
+the servers and the tests wait for the timeouts of the 'Server.py' in virtual time.
+The clock jumps to the next timeout as soon as no thread has used it for a moment,
+so a test with a lot of work between two waits may have to increase Clock.QUIET_TIME.
 """
 
 logging.basicConfig(
@@ -41,51 +40,57 @@ logging.basicConfig(
 class Test_check_network_masters(unittest.TestCase):
 
     s = None
+    net = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
 
     def tearDown(self):
         self.s.close()
         del self.s
 
     def test_no_master_in_network(self):
-        self.s.network_masters = {"127.0.0.9" : None, "127.0.0.8" : None, "127.0.0.7" : None}
+        self.s.network_masters = {self.net.ip(9) : None, self.net.ip(8) : None, self.net.ip(7) : None}
         result = self.s.check_network_masters()
 
         self.assertIsNone(result)
 
     def test_valid_master_in_network_with_two(self):
-        self.s.network_masters = {"127.0.0.9" : None, "127.0.0.8" : "127.0.0.8", "127.0.0.7" : "127.0.0.8"}
+        self.s.network_masters = {self.net.ip(9) : None, self.net.ip(8) : self.net.ip(8), self.net.ip(7) : self.net.ip(8)}
         result = self.s.check_network_masters()
 
         self.assertIsNotNone(result)
 
     def test_valid_master_in_network_with_three(self):
-        self.s.network_masters = {"127.0.0.9" : "127.0.0.8", "127.0.0.8" : "127.0.0.8", "127.0.0.7" : "127.0.0.8"}
+        self.s.network_masters = {self.net.ip(9) : self.net.ip(8), self.net.ip(8) : self.net.ip(8), self.net.ip(7) : self.net.ip(8)}
         result = self.s.check_network_masters()
 
         self.assertIsNotNone(result)
 
     def test_invalid_master_in_network(self):
-        self.s.network_masters = {"127.0.0.9" : None, "127.0.0.8" : "127.0.0.8", "127.0.0.7" : None}
+        self.s.network_masters = {self.net.ip(9) : None, self.net.ip(8) : self.net.ip(8), self.net.ip(7) : None}
         result = self.s.check_network_masters()
 
         self.assertIsNone(result)
 
     def test_invalid_and_valid_master_in_network(self):
-        self.s.network_masters = {"127.0.0.9" : "127.0.0.8", "127.0.0.8" : "127.0.0.8", "127.0.0.7" : "127.0.0.8", "127.0.0.6" : "127.0.0.6", "127.0.0.5" : "127.0.0.6"}
+        self.s.network_masters = {self.net.ip(9) : self.net.ip(8), self.net.ip(8) : self.net.ip(8), self.net.ip(7) : self.net.ip(8), self.net.ip(6) : self.net.ip(6), self.net.ip(5) : self.net.ip(6)}
         result = self.s.check_network_masters()
 
-        self.assertEqual(result, "127.0.0.8")
+        self.assertEqual(result, self.net.ip(8))
 
 class Test_calc_master_self(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
-        self.s.network = list(DEFAULT_SERVER_LIST)
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9, clock=self.clock)
+        self.s.network = list(self.net.server_list)
         self.s.votes = []
         self.master_server = None
 
@@ -95,27 +100,29 @@ class Test_calc_master_self(unittest.TestCase):
 
     def test_self_master_and_voting(self):
         threading.Thread(target=self.s.calc_master, args = ()).start()
-        time.sleep(3)
-        self.s.votes.append("127.0.0.8")
-        self.s.votes.append("127.0.0.7")
-        time.sleep(MASTER_VOTE_TIMEOUT)
+        self.clock.sleep(3)
+        self.s.votes.append(self.net.ip(8))
+        self.s.votes.append(self.net.ip(7))
+        self.clock.sleep(MASTER_VOTE_TIMEOUT)
         # passes the test if thread terminates
         self.assertEqual(len(threading.enumerate()), 1)
 
     def test_self_master_and_no_votes(self):
         threading.Thread(target=self.s.calc_master, args = ()).start()
-        time.sleep(MASTER_VOTE_TIMEOUT)
-        time.sleep(3)
+        self.clock.sleep(MASTER_VOTE_TIMEOUT)
+        self.clock.sleep(3)
         self.assertFalse(self.s.server_online)
 
 @mock.patch('Client.Client', autospec=True)
 class Test_calc_master_other(unittest.TestCase):
 
     s = None
+    net = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.7")
-        self.s.network = list(DEFAULT_SERVER_LIST)
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(7)
+        self.s.network = list(self.net.server_list)
         self.s.master_server = None
 
     def tearDown(self):
@@ -131,6 +138,18 @@ class Test_calc_master_other(unittest.TestCase):
         self.assertEqual(self.s.master_server, max(self.s.network))
         mock_ping.assert_called()
 
+    @mock.patch.object(Server.Server, "ping")
+    def test_vote_carries_span(self, mock_ping, mock_client):
+        mock_instance = mock_client.return_value
+        mock_instance.connect.return_value = True
+        mock_instance.send.return_value = MASTER_CONFIRMED_MESSAGE
+        self.s.get_tracer().enabled = True
+        self.s.calc_master()
+        span = self.s.get_tracer().get_spans()[0]
+        self.assertEqual(span["name"], "calc_master")
+        self.assertEqual(span["attributes"]["answer"], MASTER_CONFIRMED_MESSAGE)
+        mock_instance.send.assert_called_with(VOTE_MASTER_MESSAGE + self.net.ip(7) + " trace = " + span["id"])
+
     @mock.patch.object(Server.Server, "find_network")
     def test_master_declined(self, mock_find_network, mock_client):
         mock_instance = mock_client.return_value
@@ -139,21 +158,34 @@ class Test_calc_master_other(unittest.TestCase):
         self.s.calc_master()
         self.assertEqual(self.s.master_server, None)
         mock_find_network.assert_called()
+        self.assertEqual(self.s.get_metrics().get_histogram("election_vote")["count"], 1)
 
     @mock.patch.object(Server.Server, "find_network")
     def test_master_not_available(self, mock_find_network, mock_client):
         mock_client.return_value.connect.return_value = False
         self.s.calc_master()
         mock_find_network.assert_called()
+        self.assertEqual(self.s.get_metrics().get_histogram("election_vote")["count"], 1)
+
+    def test_vote_failed(self, mock_client):
+        # the vote is recorded, even if the connection breaks
+        mock_instance = mock_client.return_value
+        mock_instance.connect.return_value = True
+        mock_instance.send.side_effect = OSError("connection reset")
+        with self.assertRaises(OSError):
+            self.s.calc_master()
+        self.assertEqual(self.s.get_metrics().get_histogram("election_vote")["count"], 1)
 
 @mock.patch('Client.Client', autospec=True)
 class Test_client_Thread(unittest.TestCase):
 
     s = None
+    net = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.7")
-        self.s.network = list(DEFAULT_SERVER_LIST)
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(7)
+        self.s.network = list(self.net.server_list)
         self.s.network_masters = {}
 
     def tearDown(self):
@@ -166,7 +198,7 @@ class Test_client_Thread(unittest.TestCase):
         mock_instance.send.return_value = None
         cond = threading.Condition()
         delay = 0
-        sip = "127.0.0.8"
+        sip = self.net.ip(8)
 
         self.s.client_thread(cond, sip, delay)
         self.assertEqual(self.s.network_masters[sip], 'None')
@@ -177,19 +209,19 @@ class Test_client_Thread(unittest.TestCase):
         mock_instance.connect.return_value = False
         cond = threading.Condition()
         delay = 0
-        sip = "127.0.0.8"
+        sip = self.net.ip(8)
 
         self.s.client_thread(cond, sip, delay)
         self.assertEqual(len(self.s.network), 2)
 
     def test_master_of_sip(self, mock_client):
-        mocked_ip = "127.0.0.9"
+        mocked_ip = self.net.ip(9)
         mock_instance = mock_client.return_value
         mock_instance.connect.return_value = True
         mock_instance.send.return_value = mocked_ip
         cond = threading.Condition()
         delay = 0
-        sip = "127.0.0.8"
+        sip = self.net.ip(8)
 
         self.s.client_thread(cond, sip, delay)
         self.assertEqual(self.s.network_masters[sip], mocked_ip)
@@ -199,10 +231,14 @@ class Test_client_Thread(unittest.TestCase):
 class Test_find_network_with_three(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
-        self.s.requests = ["127.0.0.8", "127.0.0.7"]
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9, clock=self.clock)
+        self.s.requests = [self.net.ip(8), self.net.ip(7)]
         self.s.network_masters = {}
         self.s.network = []
 
@@ -219,7 +255,7 @@ class Test_find_network_with_three(unittest.TestCase):
         mock_check_network_masters.return_value = None
 
         self.s.find_network()
-        self.assertEqual(self.s.network, ["127.0.0.7", "127.0.0.8", "127.0.0.9"])
+        self.assertEqual(self.s.network, [self.net.ip(7), self.net.ip(8), self.net.ip(9)])
         mock_calc_master.assert_called()
         mock_check_network_masters.assert_called()
 
@@ -229,7 +265,7 @@ class Test_find_network_with_three(unittest.TestCase):
         mock_client_instance.connect.return_value = True
         mock_client_instance.send.side_effect = ['None', 'None']
 
-        self.s.requests = ["127.0.0.8"]
+        self.s.requests = [self.net.ip(8)]
         self.s.find_network()
         mock_retry.assert_called()
 
@@ -237,17 +273,17 @@ class Test_find_network_with_three(unittest.TestCase):
     def test_network_with_active_master(self, mock_ping, mock_client):
         mock_client_instance = mock_client.return_value
         mock_client_instance.connect.return_value = True
-        mock_client_instance.send.side_effect = ["127.0.0.8", "127.0.0.8"]
+        mock_client_instance.send.side_effect = [self.net.ip(8), self.net.ip(8)]
 
         self.s.find_network()
-        self.assertEqual(self.s.master_server, "127.0.0.8")
+        self.assertEqual(self.s.master_server, self.net.ip(8))
         mock_ping.assert_called()
 
     @mock.patch.object(Server.Server, "calc_master")
     def test_network_with_invalid_master(self, mock_calc_master, mock_client):
         mock_client_instance = mock_client.return_value
         mock_client_instance.connect.return_value = True
-        mock_client_instance.send.side_effect = [None, "127.0.0.8"]
+        mock_client_instance.send.side_effect = [None, self.net.ip(8)]
 
         self.s.find_network()
         self.assertIsNone(self.s.master_server)
@@ -257,12 +293,16 @@ class Test_find_network_with_three(unittest.TestCase):
 class Test_find_network_with_five(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
-        self.s.add_server_to_list("127.0.0.6")
-        self.s.add_server_to_list("127.0.0.5")
-        self.s.requests = ["127.0.0.8", "127.0.0.7", "127.0.0.5", "127.0.0.6"]
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9, clock=self.clock)
+        self.s.add_server_to_list(self.net.ip(6))
+        self.s.add_server_to_list(self.net.ip(5))
+        self.s.requests = [self.net.ip(8), self.net.ip(7), self.net.ip(5), self.net.ip(6)]
         self.s.network_masters = {}
         self.s.network = []
 
@@ -279,7 +319,7 @@ class Test_find_network_with_five(unittest.TestCase):
         mock_check_network_masters.return_value = None
 
         self.s.find_network()
-        self.assertEqual(self.s.network, ["127.0.0.7", "127.0.0.8", "127.0.0.9","127.0.0.6", "127.0.0.5"])
+        self.assertEqual(self.s.network, [self.net.ip(7), self.net.ip(8), self.net.ip(9),self.net.ip(6), self.net.ip(5)])
         mock_calc_master.assert_called()
         mock_check_network_masters.assert_called()
 
@@ -300,16 +340,23 @@ class Test_find_network_with_five(unittest.TestCase):
 
         self.s.find_network()
         self.assertFalse(self.s.server_online)
+        self.assertEqual(self.s.get_metrics().get_counter("discovery_retries"), 3)
+        self.assertEqual(self.s.get_metrics().get_counter("shutdowns", "network attempts"), 1)
+        self.assertEqual(self.s.get_metrics().get_histogram("election_discovery")["count"], 3)
 
 @mock.patch('Client.Client', autospec=True)
 class Test_ping(unittest.TestCase):
 
     s = None
+    net = None
+    clock = None
 
     def setUp(self):
-        self.s = Server.Server("127.0.0.9")
-        self.s.network = list(DEFAULT_SERVER_LIST)
-        self.s.master_server = "127.0.0.8"
+        self.clock = Clock.FakeClock()
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9, clock=self.clock)
+        self.s.network = list(self.net.server_list)
+        self.s.master_server = self.net.ip(8)
 
     def tearDown(self):
         self.s.close()
@@ -318,9 +365,9 @@ class Test_ping(unittest.TestCase):
     def test_shutdown(self, mock_client):
         thread = threading.Thread(target=self.s.ping, args = ())
         thread.start()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
         self.s.shutdown()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
 
         self.assertFalse(self.s.server_online)
         self.assertEqual(len(threading.enumerate()), 1)
@@ -331,11 +378,11 @@ class Test_ping(unittest.TestCase):
         message = PING_MESSAGE + self.s.ip
         thread = threading.Thread(target=self.s.ping, args = ())
         thread.start()
-        time.sleep(SEND_PING_TIME + 3)
+        self.clock.sleep(SEND_PING_TIME + 3)
 
         mock_instance.send.assert_called_with(message)
         self.s.shutdown()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
         self.assertFalse(self.s.server_online)
 
     @mock.patch.object(Server.Server, "find_network")
@@ -343,18 +390,140 @@ class Test_ping(unittest.TestCase):
         mock_client.return_value.connect.return_value = False
         thread = threading.Thread(target=self.s.ping, args = ())
         thread.start()
-        time.sleep(SEND_PING_TIME + 3)
+        self.clock.sleep(SEND_PING_TIME + 3)
 
         mock_find_network.assert_called()
         self.s.shutdown()
-        time.sleep(PAUSE)
+        self.clock.sleep(PAUSE)
         self.assertFalse(self.s.server_online)
 
+@mock.patch('Client.Client', autospec=True)
+class Test_broadcast(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.network = list(self.net.server_list)
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_broadcast_tree(self, mock_client):
+        targets = ["127.0.1." + str(i) for i in range(10)]
+        self.assertEqual(self.s.broadcast_tree(targets, 16), [(sip, []) for sip in targets])
+        tree = self.s.broadcast_tree(targets, 3)
+        self.assertEqual([relay for relay, subtree in tree], ["127.0.1.0", "127.0.1.4", "127.0.1.8"])
+        self.assertEqual(tree[0][1], ["127.0.1.1", "127.0.1.2", "127.0.1.3"])
+
+    def test_acknowledged(self, mock_client):
+        mock_instance = mock_client.return_value
+        mock_instance.connect.side_effect = lambda sip, port: sip == self.net.ip(8)
+        mock_instance.exchange.return_value = '{"acks": {"' + self.net.ip(8) + '": true}}'
+        acks = self.s.broadcast("hello", 1)
+        self.assertEqual(acks, {self.net.ip(8) : True, self.net.ip(7) : False})
+        # the connection is kept for the next broadcast
+        self.assertEqual(len(self.s.broadcast_clients[self.net.ip(8)]), 1)
+
+    def test_pooled_connection_closed(self, mock_client):
+        # the server has closed the pooled connection, a new one is established once
+        pooled = mock.Mock()
+        pooled.exchange.return_value = None
+        self.s.broadcast_clients[self.net.ip(8)] = [pooled]
+        mock_instance = mock_client.return_value
+        mock_instance.connect.side_effect = lambda sip, port: sip == self.net.ip(8)
+        mock_instance.exchange.return_value = '{"acks": {"' + self.net.ip(8) + '": true}}'
+        acks = self.s.broadcast("hello", 1)
+        self.assertEqual(acks[self.net.ip(8)], True)
+        pooled.close.assert_called()
+        self.assertEqual(self.s.broadcast_clients[self.net.ip(8)], [mock_instance])
+
+    def test_invalid_answer(self, mock_client):
+        mock_instance = mock_client.return_value
+        mock_instance.connect.side_effect = lambda sip, port: sip == self.net.ip(8)
+        mock_instance.exchange.return_value = 'junk'
+        acks = self.s.broadcast("hello", 1)
+        self.assertEqual(acks, {self.net.ip(8) : False, self.net.ip(7) : False})
+        mock_instance.close.assert_called()
+        self.assertEqual(self.s.broadcast_clients.get(self.net.ip(8), []), [])
+
+    def test_not_master(self, mock_client):
+        self.s.master_server = self.net.ip(8)
+        self.assertEqual(self.s.broadcast("hello", 1), {})
+        mock_client.assert_not_called()
+
+    def test_relayed(self, mock_client):
+        received = []
+        self.s.add_broadcast_listener(received.append)
+        mock_socket = mock.Mock()
+        self.s.handle_broadcast('{"message" : "hello", "relay" : [], "fanout" : 16, "deadline" : 1}', mock_socket)
+        self.assertEqual(received, ["hello"])
+        mock_socket.sendall.assert_called_with(Client.frame('{"acks": {"' + self.net.ip(9) + '": true}}'))
+
+    def test_malformed_relay(self, mock_client):
+        received = []
+        self.s.add_broadcast_listener(received.append)
+        mock_socket = mock.Mock()
+        for payload in ['{"message" : "hello"', '{"message" : "hello", "relay" : [], "fanout" : 16}',
+                        '{"message" : "hello", "relay" : "x", "fanout" : 16, "deadline" : 1}',
+                        '{"message" : "hello", "relay" : [], "fanout" : 0, "deadline" : 1}']:
+            self.assertFalse(self.s.handle_broadcast(payload, mock_socket))
+            mock_socket.sendall.assert_called_with(Client.frame('{"acks": {}}'))
+        self.assertEqual(received, [])
+        mock_client.assert_not_called()
+
+@mock.patch('Client.Client', autospec=True)
+class Test_snapshot_transfer(unittest.TestCase):
+
+    s = None
+    net = None
+
+    def setUp(self):
+        self.net = Fixtures.isolate(self)
+        self.s = self.net.server(9)
+        self.s.master_server = self.s.ip
+        self.s.term = 1
+
+    def tearDown(self):
+        self.s.close()
+        del self.s
+
+    def test_one_transfer_per_server(self, mock_client):
+        release = threading.Event()
+        mock_client.return_value.connect.side_effect = lambda sip, port: release.wait(5) and False
+        threads = []
+        with mock.patch.object(self.s.get_store(), "entries_from", return_value=None):
+            for i in range(5):
+                # a new term replaces the replication locks (-> sync_store)
+                self.s.replication_locks = {}
+                threads.append(threading.Thread(target=self.s.replicate_to, args=(self.net.ip(8),)))
+                threads[-1].start()
+            for t in threads:
+                t.join()
+            self.assertEqual(mock_client.call_count, 1)
+            release.set()
+            for t in threading.enumerate():
+                if t.name == "Snapshot_Transfer":
+                    t.join()
+            self.assertEqual(self.s.snapshot_transfers, [])
+            # the next transfer starts after the former one ended
+            self.s.replicate_to(self.net.ip(8))
+            for t in threading.enumerate():
+                if t.name == "Snapshot_Transfer":
+                    t.join()
+            self.assertEqual(mock_client.call_count, 2)
+
 class Test_eliminate_dublicates(unittest.TestCase):
 
     def Test_eliminate_dublicates(self):
         with_dublicates = [1,2,3,1,1,6,4,6,3,3,4,9,8,8]
         without_dublicates = [1,2,3,4,6,8,9]
-        s = Server.Server("127.0.0.9")
+        self.net = Fixtures.isolate(self)
+        s = self.net.server(9)
         result = list(s.eliminate_dublicates(with_dublicates))
         self.assertItemsEqual(result, without_dublicates)
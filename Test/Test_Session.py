@@ -0,0 +1,136 @@
+import unittest
+import socket
+import threading
+import asyncio
+import json
+import sys
+sys.path.insert(1, '../src')
+import Client
+import Session
+
+REQUEST_MESSAGE = "request = "
+NOT_MASTER_MESSAGE = "not master = "
+WRITE_COMMITTED_MESSAGE = "The write has been committed"
+
+FOLLOWER = "127.0.0.2"
+MASTER = "127.0.0.3"
+
+"""
+Note:
+The sessions are tested against a fake server that answers the requests
+of a connection in reverse order. The follower redirects every request
+to the master. The first connections can be dropped without an answer.
+"""
+
+def fake_server(ip, port, answer, requests_per_connection, dropped=0):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((ip, port))
+    server.listen()
+    received = []
+    thread = threading.Thread(target=serve, args=(server, answer, requests_per_connection, dropped, received), daemon=True)
+    thread.start()
+    return server, received
+
+def serve(server, answer, requests_per_connection, dropped, received):
+    for connection in range(dropped + 1):
+        try:
+            conn, addr = server.accept()
+        except OSError:
+            return
+        requests = []
+        while len(requests) < requests_per_connection:
+            msg = Client.receive(conn)
+            if msg is None:
+                break
+            requests.append(json.loads(msg[len(REQUEST_MESSAGE):]))
+        received.extend(requests)
+        if connection == dropped:
+            for request in reversed(requests):
+                conn.sendall(Client.frame(json.dumps({"id" : request["id"], "answer" : answer(request["message"])})))
+        conn.close()
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((MASTER, 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+class Test_messages(unittest.TestCase):
+
+    def test_read_message(self):
+        self.assertEqual(Session.read_message("a", "stale", 5),
+                         'read = {"key": "a", "consistency": "stale", "max_staleness": 5}')
+
+    def test_redirect(self):
+        request = {"redirects" : 0}
+        self.assertEqual(Session.redirect(NOT_MASTER_MESSAGE + MASTER, request), MASTER)
+        self.assertIsNone(Session.redirect(NOT_MASTER_MESSAGE + "None", request))
+        self.assertIsNone(Session.redirect(WRITE_COMMITTED_MESSAGE, request))
+        request["redirects"] = Session.MAXIMUM_REDIRECTS
+        self.assertIsNone(Session.redirect(NOT_MASTER_MESSAGE + MASTER, request))
+
+class Test_session(unittest.TestCase):
+
+    servers = []
+
+    def setUp(self):
+        self.port = free_port()
+        self.servers = [fake_server(MASTER, self.port, lambda message: message, 3)[0]]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def test_pipelined_answers_are_matched(self):
+        s = Session.Session(MASTER, self.port)
+        futures = [s.submit("message " + str(i)) for i in range(3)]
+        self.assertEqual([f.result(5) for f in futures], ["message 0", "message 1", "message 2"])
+        s.close()
+
+    def test_redirect_to_master(self):
+        self.servers.append(fake_server(FOLLOWER, self.port, lambda message: NOT_MASTER_MESSAGE + MASTER, 3)[0])
+        s = Session.Session(FOLLOWER, self.port)
+        futures = [s.submit("message " + str(i)) for i in range(3)]
+        self.assertEqual([f.result(5) for f in futures], ["message 0", "message 1", "message 2"])
+        self.assertEqual(s.ip, MASTER)
+        s.close()
+
+    def test_retry_after_closed_connection(self):
+        server, received = fake_server(FOLLOWER, self.port, lambda message: message, 1, 1)
+        self.servers.append(server)
+        s = Session.Session(FOLLOWER, self.port)
+        self.assertEqual(s.submit("message").result(5), "message")
+        # the retry carries the same id, so the server recognizes it
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[0], received[1])
+        self.assertEqual(received[0]["client"], s.client_id)
+        s.close()
+
+    def test_server_not_available(self):
+        s = Session.Session(FOLLOWER, self.port)
+        with self.assertRaises(ConnectionError):
+            s.submit("message").result(5)
+
+class Test_async_session(unittest.TestCase):
+
+    servers = []
+
+    def setUp(self):
+        self.port = free_port()
+        self.servers = [fake_server(MASTER, self.port, lambda message: message, 3)[0],
+                        fake_server(FOLLOWER, self.port, lambda message: NOT_MASTER_MESSAGE + MASTER, 3)[0]]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def test_pipelined_with_redirect(self):
+        async def run():
+            s = Session.AsyncSession(FOLLOWER, self.port)
+            futures = [await s.submit("message " + str(i)) for i in range(3)]
+            answers = await asyncio.wait_for(asyncio.gather(*futures), 5)
+            await s.close()
+            return answers
+        self.assertEqual(asyncio.run(run()), ["message 0", "message 1", "message 2"])
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+import sys
+sys.path.insert(1, '../src')
+import Simulator
+import Server
+import Events
+
+class Test_simulator(unittest.TestCase):
+
+    def test_election(self):
+        simulation = Simulator.Simulation(3)
+        simulation.run(60)
+        summary = simulation.summary()
+        self.assertEqual(summary["master"], "127.0.0.9")
+        self.assertEqual(summary["online"], 3)
+        self.assertEqual(summary["shutdowns"], {})
+        # the search for the network, the questions for the master and one check of the votes
+        self.assertAlmostEqual(summary["agreed"][0], Server.INITIAL_NETWORK_SEARCH_TIMEOUT
+                               + Simulator.CLIENT_THREAD_DELAY + Simulator.VOTE_POLL_TIME, places=1)
+        self.assertEqual([n.master_server for n in simulation.nodes.values()], ["127.0.0.9"] * 3)
+
+    def test_crash_master(self):
+        simulation = Simulator.Simulation(3)
+        simulation.crash_master(100)
+        simulation.run(300)
+        summary = simulation.summary()
+        self.assertEqual(summary["master"], "127.0.0.8")
+        self.assertEqual(summary["online"], 2)
+        self.assertEqual(summary["shutdowns"], {"crash" : 1})
+        self.assertEqual(len(summary["agreed"]), 2)
+        self.assertGreater(summary["agreed"][1], 100)
+
+    def test_restart_follower(self):
+        simulation = Simulator.Simulation(5)
+        follower = Simulator.addresses(5)[0]
+        simulation.crash(follower, 100, restart_after=30)
+        simulation.run(300)
+        self.assertEqual(simulation.nodes[follower].master_server, simulation.agreed)
+        lost = [t for t, ip, kind, detail in simulation.timeline if ip == follower and kind == Events.MASTER_LOST]
+        self.assertEqual(len(lost), 1)
+
+    def test_loss(self):
+        simulation = Simulator.Simulation(3, loss=1.0)
+        simulation.run(300)
+        summary = simulation.summary()
+        self.assertIsNone(summary["master"])
+        self.assertEqual(summary["online"], 0)
+        self.assertEqual(summary["shutdowns"], {"network attempts" : 3})
+
+    def test_large_cluster(self):
+        count = 300
+        simulation = Simulator.Simulation(count, jitter=0.001)
+        simulation.run(200)
+        summary = simulation.summary()
+        # the addresses are compared as strings
+        self.assertEqual(summary["master"], Server.candidate(Simulator.addresses(count), Simulator.addresses(count)))
+        self.assertEqual(summary["online"], count)
+        self.assertEqual(summary["messages"]["ask master"], count * (count - 1))
+
+    def test_rules_of_the_server(self):
+        # the nodes vote the candidate of the server, a changed rule changes the simulation
+        with mock.patch.object(Server, "candidate", lambda network, server_list, group=0: min(network)):
+            simulation = Simulator.Simulation(3)
+            simulation.run(60)
+        self.assertEqual(simulation.summary()["master"], "127.0.0.7")
+        node = simulation.nodes["127.0.0.9"]
+        self.assertTrue(node.has_majority(["127.0.0.7", "127.0.0.8"]))
+        # servers that are not listed do not count, like at the server
+        self.assertFalse(node.has_majority(["127.0.0.7", "10.0.0.1"]))
@@ -0,0 +1,138 @@
+import unittest
+import sys
+sys.path.insert(1, '../src')
+import Store
+
+class Test_append(unittest.TestCase):
+
+    s = None
+
+    def setUp(self):
+        self.s = Store.Store()
+
+    def tearDown(self):
+        del self.s
+
+    def test_ordered_log(self):
+        self.s.append(1, "a", "1")
+        entry = self.s.append(1, "b", "2")
+        self.assertEqual(entry["index"], 2)
+        self.assertEqual(self.s.last(), (2, 1))
+
+    def test_uncommitted_write_not_visible(self):
+        self.s.append(1, "a", "1")
+        self.assertIsNone(self.s.get("a"))
+        self.s.commit(1)
+        self.assertEqual(self.s.get("a"), "1")
+
+class Test_append_entries(unittest.TestCase):
+
+    s = None
+
+    def setUp(self):
+        self.s = Store.Store()
+
+    def tearDown(self):
+        del self.s
+
+    def test_default(self):
+        entries = [{"index" : 1, "term" : 1, "key" : "a", "value" : "1"},
+                   {"index" : 2, "term" : 1, "key" : "b", "value" : "2"}]
+        result = self.s.append_entries(0, 0, entries, 1)
+        self.assertEqual(result, (True, 2))
+        self.assertEqual(self.s.get("a"), "1")
+        self.assertIsNone(self.s.get("b"))
+
+    def test_missing_entries(self):
+        entries = [{"index" : 3, "term" : 1, "key" : "a", "value" : "1"}]
+        result = self.s.append_entries(2, 1, entries, 0)
+        self.assertEqual(result, (False, 0))
+        self.assertEqual(self.s.last(), (0, 0))
+
+    def test_duplicate_entries(self):
+        entries = [{"index" : 1, "term" : 1, "key" : "a", "value" : "1"}]
+        self.s.append_entries(0, 0, entries, 0)
+        result = self.s.append_entries(0, 0, entries, 1)
+        self.assertEqual(result, (True, 1))
+        self.assertEqual(self.s.last(), (1, 1))
+
+    def test_conflicting_entries(self):
+        self.s.append(1, "a", "1")
+        self.s.append(1, "b", "2")
+        self.s.commit(1)
+        entries = [{"index" : 2, "term" : 2, "key" : "c", "value" : "3"}]
+        result = self.s.append_entries(1, 1, entries, 2)
+        self.assertEqual(result, (True, 2))
+        self.assertEqual(self.s.last(), (2, 2))
+        self.assertEqual(self.s.get("c"), "3")
+        self.assertIsNone(self.s.get("b"))
+
+    def test_conflicting_previous_entry(self):
+        self.s.append(1, "a", "1")
+        self.s.append(1, "b", "2")
+        self.s.commit(1)
+        result = self.s.append_entries(2, 2, [], 2)
+        self.assertEqual(result, (False, 1))
+
+class Test_adopt(unittest.TestCase):
+
+    def test_keep_committed(self):
+        s = Store.Store()
+        s.append(1, "a", "1")
+        s.append(1, "b", "2")
+        s.commit(1)
+        s.adopt([{"index" : 2, "term" : 2, "key" : "c", "value" : "3"}])
+        self.assertEqual(s.entries_from(1), (0, 0, [{"index" : 1, "term" : 1, "key" : "a", "value" : "1"},
+                                                    {"index" : 2, "term" : 2, "key" : "c", "value" : "3"}]))
+
+class Test_snapshot(unittest.TestCase):
+
+    s = None
+
+    def setUp(self):
+        self.s = Store.Store()
+        for i in range(10):
+            self.s.append(1, "key" + str(i), str(i))
+        self.s.commit(8)
+
+    def tearDown(self):
+        del self.s
+
+    def test_compact(self):
+        self.assertFalse(self.s.compact(10))
+        self.assertTrue(self.s.compact(5))
+        self.assertEqual(self.s.get_snapshot()[:2], (8, 1))
+        self.assertEqual(self.s.last(), (10, 1))
+        self.assertIsNone(self.s.entries_from(8))
+        self.assertEqual(self.s.entries_from(9)[:2], (8, 1))
+        self.assertEqual(len(self.s.entries_from(9)[2]), 2)
+
+    def test_append_after_compact(self):
+        self.s.compact(5)
+        entry = self.s.append(2, "new", "11")
+        self.assertEqual(entry["index"], 11)
+        self.s.commit(11)
+        self.assertEqual(self.s.get("new"), "11")
+        self.assertEqual(self.s.get("key9"), "9")
+
+    def test_install_snapshot_keeps_matching_entries(self):
+        follower = Store.Store()
+        follower.append_entries(0, 0, self.s.entries_from(1)[2], 0)
+        self.s.compact(5)
+        index, term, snapshot_data = self.s.get_snapshot()
+        follower.install_snapshot(index, term, snapshot_data)
+        self.assertEqual(follower.get("key7"), "7")
+        self.assertEqual(follower.last(), (10, 1))
+        self.assertEqual(follower.get_commit_index(), 8)
+
+    def test_install_snapshot_replaces_log(self):
+        follower = Store.Store()
+        follower.append(0, "old", "0")
+        self.s.compact(5)
+        index, term, snapshot_data = self.s.get_snapshot()
+        follower.install_snapshot(index, term, snapshot_data)
+        self.assertEqual(follower.last(), (8, 1))
+        self.assertIsNone(follower.get("old"))
+        result = follower.append_entries(8, 1, self.s.entries_from(9)[2], 10)
+        self.assertEqual(result, (True, 10))
+        self.assertEqual(follower.get("key9"), "9")
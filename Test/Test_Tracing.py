@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+import shutil
+import json
+import os
+import sys
+sys.path.insert(1, '../src')
+import Tracing
+
+class Test_tracer(unittest.TestCase):
+
+    t = None
+
+    def setUp(self):
+        self.t = Tracing.Tracer("127.0.0.9", True)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        del self.t
+
+    def test_disabled(self):
+        self.t.enabled = False
+        span = self.t.start("election")
+        self.assertIsNone(span)
+        self.t.link(span, "127.0.0.8-1")
+        self.t.end(span)
+        self.assertEqual(self.t.get_spans(), [])
+
+    def test_parent_and_trace(self):
+        election = self.t.start("election")
+        probe = self.t.start("client_thread", election, ip="127.0.0.8")
+        self.t.end(probe, available=True)
+        self.t.end(election)
+        self.t.end(election)
+        self.assertEqual([span["name"] for span in self.t.get_spans()], ["client_thread", "election"])
+        self.assertEqual(probe["parent"], election["id"])
+        self.assertEqual(probe["trace"], election["id"])
+        self.assertEqual(probe["attributes"], {"ip" : "127.0.0.8", "available" : True})
+        self.assertLessEqual(probe["start"], probe["end"])
+
+    def test_inject_and_extract(self):
+        span = self.t.start("calc_master")
+        message = Tracing.inject("vote = 127.0.0.9", span)
+        self.assertEqual(Tracing.extract(message), ("vote = 127.0.0.9", span["id"]))
+        self.assertEqual(Tracing.extract("vote = 127.0.0.9"), ("vote = 127.0.0.9", None))
+        self.assertEqual(Tracing.inject("vote = 127.0.0.9", None), "vote = 127.0.0.9")
+
+    def test_export_and_merge(self):
+        span = self.t.start("vote_check")
+        self.t.link(span, "127.0.0.8-1")
+        self.t.end(span)
+        other = Tracing.Tracer("127.0.0.8", True)
+        other.end(other.start("calc_master"))
+        self.assertEqual(self.t.export(os.path.join(self.directory, "9.json")), 1)
+        other.export(os.path.join(self.directory, "8.json"))
+        Tracing.merge([os.path.join(self.directory, "9.json"), os.path.join(self.directory, "8.json")],
+                      os.path.join(self.directory, "merged.json"))
+        with open(os.path.join(self.directory, "merged.json")) as f:
+            events = json.load(f)["traceEvents"]
+        spans = [event for event in events if event["ph"] == "X"]
+        self.assertEqual([event["name"] for event in spans], ["vote_check", "calc_master"])
+        self.assertEqual(spans[0]["args"]["links"], ["127.0.0.8-1"])
+        self.assertEqual(spans[1]["args"]["id"], "127.0.0.8-1")
+        self.assertNotEqual(spans[0]["pid"], spans[1]["pid"])
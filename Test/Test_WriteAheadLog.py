@@ -0,0 +1,161 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+from unittest import mock
+sys.path.insert(1, '../src')
+import WriteAheadLog
+import Store
+
+SEGMENT_SIZE = 4096
+
+class Test_append(unittest.TestCase):
+
+    directory = None
+    wal = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+
+    def tearDown(self):
+        self.wal.close()
+        shutil.rmtree(self.directory)
+
+    def test_read(self):
+        first = self.wal.append(b"first")
+        second = self.wal.append(b"second")
+        self.assertEqual(self.wal.read(first), b"first")
+        self.assertEqual(self.wal.read(second), b"second")
+        self.assertEqual(list(self.wal.records()), [b"first", b"second"])
+
+    def test_rotation(self):
+        for i in range(100):
+            self.wal.append(str(i).encode() * 20)
+        self.assertGreater(len(os.listdir(self.directory)), 1)
+        self.assertEqual(self.wal.read(99), b"99" * 20)
+
+    def test_record_too_large(self):
+        with self.assertRaises(ValueError):
+            self.wal.append(bytes(SEGMENT_SIZE))
+
+    def test_truncate_before(self):
+        for i in range(300):
+            self.wal.append(str(i).encode() * 20)
+        segments = len(os.listdir(self.directory))
+        self.wal.truncate_before(250)
+        self.assertLess(len(os.listdir(self.directory)), segments)
+        self.assertLessEqual(self.wal.get_first(), 250)
+        self.assertEqual(self.wal.read(250), b"250" * 20)
+        self.assertEqual(list(self.wal.records(299)), [b"299" * 20])
+
+    def test_directory_synchronized(self):
+        with mock.patch.object(WriteAheadLog.WriteAheadLog, "sync_directory", autospec=True) as mock_sync:
+            # the first segment of the log is created
+            wal = WriteAheadLog.WriteAheadLog(tempfile.mkdtemp(dir=self.directory), SEGMENT_SIZE, 4)
+            self.assertEqual(mock_sync.call_count, 1)
+            for i in range(100):
+                wal.append(str(i).encode() * 20)
+            created = len(os.listdir(wal.directory))
+            self.assertEqual(mock_sync.call_count, created)
+            wal.truncate_before(99)
+            self.assertEqual(mock_sync.call_count, created + 1)
+            wal.close()
+            # reopening creates nothing
+            WriteAheadLog.WriteAheadLog(wal.directory, SEGMENT_SIZE, 4).close()
+            self.assertEqual(mock_sync.call_count, created + 1)
+        # the directory can be synchronized for real
+        self.wal.sync_directory()
+
+class Test_recover(unittest.TestCase):
+
+    directory = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, count):
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        for i in range(count):
+            wal.append(str(i).encode() * 20)
+        wal.close()
+
+    def last_segment(self):
+        return os.path.join(self.directory, sorted(os.listdir(self.directory))[-1])
+
+    def test_reopen(self):
+        self.fill(100)
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        self.assertEqual(wal.end(), 100)
+        self.assertEqual(wal.append(b"new"), 100)
+        wal.close()
+
+    def test_segment_cut_off_within_record(self):
+        self.fill(10)
+        # the process crashed while the last record was written
+        os.truncate(self.last_segment(), 9 * 28 + 20)
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        self.assertEqual(wal.end(), 9)
+        self.assertEqual(wal.read(8), b"8" * 20)
+        self.assertEqual(wal.append(b"new"), 9)
+        wal.close()
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        self.assertEqual(list(wal.records(8)), [b"8" * 20, b"new"])
+        wal.close()
+
+    def test_segment_cut_off_within_header(self):
+        self.fill(10)
+        os.truncate(self.last_segment(), 5 * 28 + 3)
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        self.assertEqual(wal.end(), 5)
+        wal.close()
+
+    def test_corrupted_segment_removes_later_segments(self):
+        self.fill(200)
+        names = sorted(os.listdir(self.directory))
+        # three records and a part of the fourth are left
+        os.truncate(os.path.join(self.directory, names[0]), 100)
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        self.assertEqual(wal.end(), 3)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        wal.close()
+
+    def test_recover_store(self):
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        s = Store.Store(wal)
+        s.set_term(1, "127.0.0.9")
+        s.append(1, "a", "1")
+        s.append(1, "b", "2")
+        s.commit(1)
+        s.close()
+        s = Store.Store(WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4))
+        self.assertEqual(s.get("a"), "1")
+        self.assertIsNone(s.get("b"))
+        self.assertEqual(s.last(), (2, 1))
+        self.assertEqual(s.term, 1)
+        s.close()
+
+    def test_recover_store_with_snapshot(self):
+        wal = WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4)
+        s = Store.Store(wal)
+        s.set_term(1, "127.0.0.9")
+        for i in range(200):
+            s.append(1, "key" + str(i % 20), str(i))
+        s.commit(150)
+        segments = len(os.listdir(self.directory))
+        s.compact(100)
+        self.assertLess(len(os.listdir(self.directory)), segments)
+        s.append(1, "key0", "new")
+        s.commit(201)
+        s.close()
+        s = Store.Store(WriteAheadLog.WriteAheadLog(self.directory, SEGMENT_SIZE, 4))
+        self.assertEqual(s.get_snapshot()[:2], (150, 1))
+        self.assertEqual(s.get_commit_index(), 201)
+        self.assertEqual(s.get("key0"), "new")
+        self.assertEqual(s.get("key19"), "199")
+        self.assertEqual(s.last(), (201, 1))
+        s.close()
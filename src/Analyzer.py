@@ -0,0 +1,239 @@
+"""
+The analyzer of the journals.
+
+The analyzer loads the journals of several servers (-> Journal.py) into
+columns (NumPy arrays), puts them on the same time line and reports
+the elections of the network, how long a failover took and how regular
+the pings were. It is run from the command line after the servers have
+written their journals, e.g. after the example (-> Example.py):
+
+    python3 Analyzer.py ../Example/127.0.0.9.journal ../Example/127.0.0.8.journal ...
+
+Note:
+The clocks are aligned in two steps. First the monotonic time of every
+record is converted into the wall clock of its server with the header of
+the journal. Then the clock of every server is corrected by the messages it
+exchanged with the first server: a message cannot be received before it
+was sent, and if messages were exchanged in both directions, the delay is
+assumed to be the same in both directions (like NTP does).
+"""
+# -*- coding: utf-8 -*-
+import sys
+import time
+import numpy as np
+import Journal
+
+RECORD_DTYPE = np.dtype([("time", "<i8"), ("kind", "u1"), ("detail", "u1"), ("peer", "<u4"), ("value", "<i8")])
+# the same layout as Journal.RECORD
+MATCH_WINDOW = 1.0
+# a received message is matched to the latest message that was sent before it, so the
+# wall clocks of the servers may differ by less than this many seconds
+# copied from Server.py to compare the pings with their intended interval
+SEND_PING_TIME = 6
+WAIT_PING_TIME = 15
+PERCENTILES = [50, 90, 99]
+
+def load(paths):
+    """
+    Load the journals into columns.
+
+    Parameters
+    ----------
+    paths : list of str
+        the files of the journals.
+
+    Returns
+    -------
+    tuple of list of str, int and dict
+        The IPs of the servers, the wall clock of the first journal in nanoseconds and the columns
+        of all records: 'time' (seconds on the wall clock of the server since the wall clock of the
+        first journal), 'node' (index into the IPs), 'kind', 'detail', 'peer' and 'value'.
+    """
+    ips = []
+    start = None
+    columns = {"time" : [], "node" : [], "kind" : [], "detail" : [], "peer" : [], "value" : []}
+    for node, path in enumerate(paths):
+        with open(path, "rb") as f:
+            ip, wall_clock, monotonic_clock = Journal.read_header(f)
+            data = f.read()
+        # an incomplete last record is left out
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // RECORD_DTYPE.itemsize)
+        ips.append(ip)
+        if start is None:
+            # the seconds since 1970 as float would be too coarse for the delays of the messages
+            start = wall_clock
+        columns["time"].append((wall_clock - start + (records["time"] - monotonic_clock)) / 1e9)
+        columns["node"].append(np.full(len(records), node, dtype=np.int32))
+        for name in ["kind", "detail", "peer", "value"]:
+            columns[name].append(records[name])
+    columns = {name : np.concatenate(column) if column else np.array([]) for name, column in columns.items()}
+    return ips, start, columns
+
+def one_way_delays(ips, columns, sender, receiver):
+    # returns the differences between every message the receiver got from the sender and the latest one the sender sent
+    sent = (columns["node"] == sender) & (columns["kind"] == Journal.MESSAGE_SENT) & \
+           (columns["peer"] == Journal.ip_to_int(ips[receiver]))
+    received = (columns["node"] == receiver) & (columns["kind"] == Journal.MESSAGE_RECEIVED) & \
+               (columns["peer"] == Journal.ip_to_int(ips[sender]))
+    delays = []
+    for detail in np.unique(columns["detail"][received]):
+        send_times = np.sort(columns["time"][sent & (columns["detail"] == detail)])
+        receive_times = columns["time"][received & (columns["detail"] == detail)]
+        if len(send_times) == 0:
+            continue
+        latest = np.searchsorted(send_times, receive_times + MATCH_WINDOW, side="right") - 1
+        matched = latest >= 0
+        delays.append(receive_times[matched] - send_times[latest[matched]])
+    delays = np.concatenate(delays) if delays else np.array([])
+    return delays[np.abs(delays) <= MATCH_WINDOW]
+
+def align(ips, columns):
+    """
+    Correct the clocks of all servers to the clock of the first server.
+
+    Returns
+    -------
+    numpy.ndarray
+        The correction of every server in seconds, that has been added to the time column.
+    """
+    offsets = np.zeros(len(ips))
+    for node in range(1, len(ips)):
+        there = one_way_delays(ips, columns, 0, node)
+        back = one_way_delays(ips, columns, node, 0)
+        if len(there) > 0 and len(back) > 0:
+            # the same delay in both directions
+            offsets[node] = -(there.min() - back.min()) / 2
+        elif len(there) > 0:
+            # a message cannot be received before it was sent
+            offsets[node] = max(0.0, -there.min())
+        elif len(back) > 0:
+            offsets[node] = min(0.0, back.min())
+    columns["time"] = columns["time"] + offsets[columns["node"]]
+    return offsets
+
+def election_timeline(ips, columns):
+    """
+    Return the state changes, votes and shutdowns of all servers in the order they happened.
+
+    Returns
+    -------
+    list of tuple
+        The time, the IP of the server and a description of the event.
+    """
+    events = np.isin(columns["kind"], [Journal.STATE_CHANGE, Journal.VOTE, Journal.SHUTDOWN])
+    timeline = []
+    for i in np.flatnonzero(events)[np.argsort(columns["time"][events], kind="stable")]:
+        kind, detail, peer = columns["kind"][i], columns["detail"][i], Journal.int_to_ip(int(columns["peer"][i]))
+        if kind == Journal.STATE_CHANGE:
+            description = Journal.STATES.get(detail, "state " + str(detail)) + " " + str(peer)
+        elif kind == Journal.VOTE:
+            description = "vote " + Journal.VOTES.get(detail, str(detail)) + " " + ("" if peer is None else "from " + peer)
+        else:
+            reason = Journal.SHUTDOWN_REASONS[detail] if detail < len(Journal.SHUTDOWN_REASONS) else str(detail)
+            description = "shutdown (" + reason + ")"
+        timeline.append((float(columns["time"][i]), ips[columns["node"][i]], description.strip()))
+    return timeline
+
+def failovers(ips, columns):
+    """
+    Return how long the network had no master that a majority of the servers agreed on.
+
+    A failover starts when the master of the majority is lost by the first server
+    (e.g. by the master itself when it shuts down) and ends when a majority
+    agrees on a master again.
+
+    Returns
+    -------
+    list of tuple
+        The start of the failover, the former master, the new master and the duration in seconds.
+    """
+    changes = np.flatnonzero(columns["kind"] == Journal.STATE_CHANGE)
+    changes = changes[np.argsort(columns["time"][changes], kind="stable")]
+    masters = [None] * len(ips)
+    majority = None
+    first_loss = None
+    start = None
+    result = []
+    for i in changes:
+        node, master, seconds = columns["node"][i], Journal.int_to_ip(int(columns["peer"][i])), float(columns["time"][i])
+        masters[node] = master if columns["detail"][i] == Journal.MASTER_ELECTED else None
+        if majority is not None and master == majority and first_loss is None and masters[node] is None:
+            first_loss = seconds
+        elif master == majority and None not in masters:
+            # every server has the master again
+            first_loss = None
+        candidates = [m for m in set(masters) if m is not None and masters.count(m) > len(ips) / 2]
+        current = candidates[0] if candidates else None
+        if majority is not None and current != majority:
+            start = seconds if first_loss is None else first_loss
+            former = majority
+        if current is not None and current != majority:
+            first_loss = None
+            if start is not None:
+                result.append((start, former, current, seconds - start))
+                start = None
+        majority = current
+    return result
+
+def intervals(ips, columns, kind, detail=None):
+    # returns the time between consecutive records of the kind for every server
+    result = {}
+    for node, ip in enumerate(ips):
+        selected = (columns["node"] == node) & (columns["kind"] == kind)
+        if detail is not None:
+            selected &= columns["detail"] == detail
+        times = np.sort(columns["time"][selected])
+        if len(times) > 1:
+            result[ip] = np.diff(times)
+    return result
+
+def jitter(ips, columns):
+    """
+    Return the distribution of the deviations of the pings from their intended interval.
+
+    The followers send a ping every SEND_PING_TIME seconds (-> Server.ping), the master
+    checks them every WAIT_PING_TIME seconds (-> Server.ping_check).
+
+    Returns
+    -------
+    dict
+        The count, the percentiles and the maximum of the deviations in seconds for every server.
+    """
+    result = {}
+    for name, deviations in [("ping sent", {ip : d - SEND_PING_TIME for ip, d in
+                                            intervals(ips, columns, Journal.MESSAGE_SENT, Journal.message_type("ping")).items()}),
+                             ("ping check", {ip : d - WAIT_PING_TIME for ip, d in
+                                             intervals(ips, columns, Journal.PING_TICK).items()})]:
+        for ip, d in deviations.items():
+            summary = {"count" : len(d), "max" : float(np.abs(d).max())}
+            for percentile in PERCENTILES:
+                summary["p" + str(percentile)] = float(np.percentile(np.abs(d), percentile))
+            result[(name, ip)] = summary
+    return result
+
+def main(paths):
+    ips, start, columns = load(paths)
+    offsets = align(ips, columns)
+    print("journals of " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start / 1e9)))
+    print("servers and clock corrections:")
+    for ip, offset in zip(ips, offsets):
+        print("  " + str(ip) + " ; " + str(round(offset * 1000, 3)) + " ms")
+    print("election timeline (seconds after the start of the first journal):")
+    for seconds, ip, description in election_timeline(ips, columns):
+        print("  " + str(round(seconds, 3)) + " ; " + str(ip) + " ; " + description)
+    print("failovers:")
+    for failover_start, former, new, duration in failovers(ips, columns):
+        print("  after " + str(round(failover_start, 3)) + " s ; " + str(former) + " -> " + str(new)
+              + " ; " + str(round(duration, 3)) + " s")
+    print("heartbeat jitter (deviation from the interval in ms):")
+    for (name, ip), summary in jitter(ips, columns).items():
+        line = "  " + name + " ; " + str(ip) + " ; count " + str(summary["count"])
+        for percentile in PERCENTILES:
+            line += " ; p" + str(percentile) + " " + str(round(summary["p" + str(percentile)] * 1000, 3))
+        print(line + " ; max " + str(round(summary["max"] * 1000, 3)))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python3 Analyzer.py <journal> [<journal> ...]")
+    else:
+        main(sys.argv[1:])
@@ -10,11 +10,17 @@ import os
 import threading
 import ipaddress
 import subprocess
+import logging
 import Server
+import Metrics
+import ServerLog
+import Profiler
+import Resources
 
 NO_IP_SPECIFIED = "no ip specified use help for manual"
 NON_VALID_IP = "non valid ip"
 WARNING_INVALID_NETWORK = "warning: this operation may cause an invalid network!"
+NO_MASTER = "the network has no master yet, only the server list of this server is changed"
 SERVER_HAS_NOT_STARTED = "server has not been started yet or command has not been found"
 WRONG_COMMAND = "wrong command usage, use help for manual"
 TERMINTATING_SERVER = "stopping server now"
@@ -23,6 +29,8 @@ NO_FLAG_SPECIFIED = "no flag specified use help for manual"
 server_started = False
 server_ip = ""
 server = None
+profiler = None
+tracker = None
 
 def manual():
     """
@@ -41,11 +49,23 @@ def manual():
             + " as soon as possible.\n"
             + "\n"
             + "use 'start -ip <server ip>' to start a server on the specified IP.\n"
+            + "use 'start -ip <server ip> -data <directory>' to start a server that persists its store"
+            + " in the directory and recovers it from there on a restart.\n"
             + "if the specified IP is invalid, or if the IP is not contained in the server list"
             + " within the server object the server will not start!\n"
             + "\n"
             + "use 'status' to see the current status of the server (online or offline)\n"
             + "\n"
+            + "use 'profile start' to sample the stacks of all threads of the application every "
+            + str(int(Profiler.SAMPLE_INTERVAL * 1000)) + " ms, e.g. when the master gets slow\n"
+            + "use 'profile start <ms>' to sample them in another interval\n"
+            + "use 'profile stop <file>' to stop sampling and write the stacks in the collapsed format for"
+            + " flame graphs, every stack starts with the role of its thread (e.g. 'ping' or 'handler')\n"
+            + "\n"
+            + "use 'resources' to print the open sockets, pipes and files and the threads by their role,"
+            + " compared to the first count of the last hour. The application counts them every "
+            + str(Resources.TRACK_INTERVAL) + " seconds and warns if a count keeps growing\n"
+            + "\n"
             + "All commands listed below will only work if a server was started beforehand\n"
             + "\n"
             + "use 'shutdown' to shutdown the server as soon as possible. The application is"
@@ -53,13 +73,14 @@ def manual():
             + "\n"
             + "use 'serverlist -list' to list all server IP's within the server's internal server list\n"
             + "use 'serverlist -append <server ip>' to add a server's IP address into the"
-            + " server's internal server list\n"
+            + " server list of all servers\n"
             + "use 'serverlist -remove <server ip>' to remove a server's IP address from the"
-            + " server's internal server list\n"
-            + "These will only work if the given IP is valid and different from the server's IP"
-            + " that is running on this application\n"
-            + "Note that removing or adding a server IP may result in a shutdown of all servers"
-            + " within the network to prevent split brain problems!\n"
+            + " server list of all servers\n"
+            + "The change is sent to the master, which changes the server lists of all servers"
+            + " at the same entry of the log. A removed server shuts down, an added server has to be"
+            + " started with the new server list. One change at a time is possible\n"
+            + "As long as the network has no master, only the server list of this server is changed."
+            + " This may result in a shutdown of all servers within the network to prevent split brain problems!\n"
             + "\n"
             + "use 'master' to print the master server of the network. This will be None"
             + " if there is no master server yet\n"
@@ -67,6 +88,47 @@ def manual():
             + "use 'network' to print the all IP's that this server is currently connected to."
             + " This maybe empty if the server has not finished its search\n"
             + "\n"
+            + "use 'batch -list' to print the batch window (in ms) and the batch size of the master\n"
+            + "use 'batch -window <ms>' to set the time the master waits for further writes"
+            + " before it replicates them together\n"
+            + "use 'batch -size <n>' to set the maximum number of writes that are replicated together\n"
+            + "A larger window or size increases the throughput of writes, but also their latency.\n"
+            + "\n"
+            + "use 'snapshot -list' to print the snapshot interval and the snapshot rate (in KB/s)\n"
+            + "use 'snapshot -interval <n>' to set the number of committed entries after which"
+            + " the store is compacted into a snapshot\n"
+            + "use 'snapshot -rate <KB/s>' to set the rate the master sends snapshots to lagging servers with\n"
+            + "\n"
+            + "use 'cache' to print the hits, misses and evictions of the request cache, which answers"
+            + " retried requests of clients\n"
+            + "\n"
+            + "use 'stats' to print the counters of the server (e.g. the handled messages by their type)"
+            + " and the percentiles of the measured durations (e.g. the round trip time of the pings) in ms\n"
+            + "\n"
+            + "use 'metrics -on' to serve the state and the counters of the server over HTTP for"
+            + " Prometheus on the port next to the server port (http://<server ip>:<port>/metrics)\n"
+            + "use 'metrics -on <port>' to serve them on another port\n"
+            + "use 'metrics -off' to stop serving them\n"
+            + "\n"
+            + "use 'log -list' to print the level, the sampling and the rate limit of every log category\n"
+            + "use 'log -level <category> <level>' to set the level of a category (e.g. 'log -level ping INFO')\n"
+            + "use 'log -sample <category> <n>' to log only every n-th message of a category\n"
+            + "use 'log -rate <category> <n>' to log at most n messages of a category per second"
+            + " ('log -rate <category> 0' removes the limit)\n"
+            + "The categories are: " + ", ".join(ServerLog.CATEGORIES) + "\n"
+            + "\n"
+            + "use 'trace -on' to trace the phases of the next elections (e.g. the search for the network)\n"
+            + "use 'trace -off' to stop tracing\n"
+            + "use 'trace -export <file>' to write the traced phases into a JSON file that can be opened"
+            + " in a timeline viewer (e.g. chrome://tracing)\n"
+            + "\n"
+            + "use 'journal -on <file>' to write the events of the protocol (e.g. the votes) into a binary"
+            + " journal, which can be analyzed with the journals of the other servers (-> Analyzer.py)\n"
+            + "use 'journal -off' to close the journal\n"
+            + "\n"
+            + "use 'events -on' to print the events of the network (e.g. a new master) as soon as they happen\n"
+            + "use 'events -off' to stop printing the events\n"
+            + "\n"
             + "use 'time' to print the time the server came online\n"
             + "\n"
             + "use 'ip' to print the IP of the running server\n"
@@ -109,6 +171,7 @@ def start(command):
 
     Checks the command line from the input on the required flag '-ip'
     If this is the case the IP is extracted from the input and checked.
+    The optional flag '-data' names the directory the server persists its store in.
     A valid IP address will cause a server object to be instantiated and
     a thread to be created where the server is going to run.
     If the command is not valid, the method will print an error message.
@@ -132,12 +195,13 @@ def start(command):
         ip = ""
         if len(command) == 1:
             print(NO_IP_SPECIFIED)
-        elif len(command) == 3 and command[1] == '-ip':
+        elif (len(command) == 3 or (len(command) == 5 and command[3] == '-data')) and command[1] == '-ip':
             ip = command[2]
+            data_dir = command[4] if len(command) == 5 else None
             if check_ip(ip):
                 server_ip = ip
                 server_started = True
-                server = Server.Server(ip)
+                server = Server.Server(ip, data_dir)
                 thread = threading.Thread(target=start_server, args=(ip,), name='Server_Main')
                 thread.start()
                 print("starting server")
@@ -210,18 +274,16 @@ def server_list(command):
         elif len(command) == 3 and command[1]=='-append':
             ip = command[2]
             if check_ip(ip):
-                print("adding server " + ip + " to list")
-                print(WARNING_INVALID_NETWORK)
-                server.add_server_to_list(ip)
+                print("adding server " + ip + " to the list of all servers")
+                change_membership({"append" : ip}, server.add_server_to_list)
             else:
                 print(NON_VALID_IP)
 
         elif len(command) == 3 and command[1]=='-remove':
             ip = command[2]
             if check_ip(ip):
-                print("removing server " + ip + " from list")
-                print(WARNING_INVALID_NETWORK)
-                server.remove_server_from_list(ip)
+                print("removing server " + ip + " from the list of all servers")
+                change_membership({"remove" : ip}, server.remove_server_from_list)
             else:
                 print(NON_VALID_IP)
 
@@ -230,6 +292,324 @@ def server_list(command):
     else:
         print(SERVER_HAS_NOT_STARTED)
 
+def change_membership(change, local_change):
+    """
+    Send a change of the servers to the master of the network.
+
+    The master changes the server list of all servers at once (-> Server.handle_membership).
+    As long as the network has no master, only the server list of this server is changed.
+
+    Parameters
+    ----------
+    change : dict
+        the IP of the server to 'append' or to 'remove'.
+    local_change : function
+        changes the server list of this server only.
+    """
+    global server
+
+    answer = server.request_membership(change)
+    if answer == Server.NOT_MASTER_MESSAGE + "None":
+        print(NO_MASTER)
+        print(WARNING_INVALID_NETWORK)
+        try:
+            local_change(change.get("append", change.get("remove")))
+        except ValueError:
+            print(NON_VALID_IP)
+    else:
+        print(answer)
+
+def batch(command):
+    """
+    Evaluate the batch command and perform the resulting actions.
+
+    The batch command tunes the group commit of the master
+    (-> Server.batch_writes). The window is given in milliseconds.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if len(command) == 2 and command[1] == '-list':
+        print("batch window: " + str(server.get_batch_window() * 1000) + " ms")
+        print("batch size: " + str(server.get_batch_size()))
+    elif len(command) == 3 and command[1] == '-window':
+        try:
+            window = float(command[2])
+        except ValueError:
+            window = -1
+        if window >= 0:
+            print("setting batch window to " + command[2] + " ms")
+            server.set_batch_window(window / 1000)
+        else:
+            print(WRONG_COMMAND)
+    elif len(command) == 3 and command[1] == '-size' and command[2].isdigit() and int(command[2]) > 0:
+        print("setting batch size to " + command[2])
+        server.set_batch_size(int(command[2]))
+    else:
+        print(WRONG_COMMAND)
+
+def snapshot(command):
+    """
+    Evaluate the snapshot command and perform the resulting actions.
+
+    The snapshot command tunes the compaction of the store (-> Store.compact)
+    and the transfer of snapshots to lagging servers (-> Server.send_snapshot).
+    The rate is given in kilobytes per second.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if len(command) == 2 and command[1] == '-list':
+        print("snapshot interval: " + str(server.get_snapshot_interval()) + " entries")
+        print("snapshot rate: " + str(server.get_snapshot_rate() / 1024) + " KB/s")
+    elif len(command) == 3 and command[1] == '-interval' and command[2].isdigit() and int(command[2]) > 0:
+        print("setting snapshot interval to " + command[2])
+        server.set_snapshot_interval(int(command[2]))
+    elif len(command) == 3 and command[1] == '-rate' and command[2].isdigit() and int(command[2]) > 0:
+        print("setting snapshot rate to " + command[2] + " KB/s")
+        server.set_snapshot_rate(int(command[2]) * 1024)
+    else:
+        print(WRONG_COMMAND)
+
+def stats():
+    """
+    Print the counters and the percentiles of the durations the server has recorded.
+
+    See also
+    --------
+    Metrics.summary : Return the count, the percentiles and the maximum of every histogram.
+    """
+    global server
+
+    metrics = server.get_metrics()
+    for name, counter in sorted(metrics.get_counters().items()):
+        for label, value in sorted(counter.items(), key=lambda item: str(item[0])):
+            print(name + ("" if label is None else " " + label) + " : " + str(value))
+    for name, summary in metrics.summary().items():
+        line = name + " : count " + str(summary["count"])
+        for percentile in Metrics.PERCENTILES:
+            line += " ; p" + str(percentile) + " " + str(round(summary["p" + str(percentile)] * 1000, 3)) + " ms"
+        print(line + " ; max " + str(round(summary["max"] * 1000, 3)) + " ms")
+
+def metrics(command):
+    """
+    Evaluate the metrics command and perform the resulting actions.
+
+    The metrics command starts or stops the exporter of the server (-> Server.start_exporter).
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if (len(command) == 2 or (len(command) == 3 and command[2].isdigit())) and command[1] == '-on':
+        port = int(command[2]) if len(command) == 3 else None
+        if server.start_exporter(port):
+            print("serving metrics on port " + str(server.get_exporter().port))
+        else:
+            print("the metrics port is not available")
+    elif len(command) == 2 and command[1] == '-off':
+        print("stop serving metrics")
+        server.stop_exporter()
+    else:
+        print(WRONG_COMMAND)
+
+def log(command):
+    """
+    Evaluate the log command and perform the resulting actions.
+
+    The log command configures the log of the server (-> Server.get_log)
+    separately for every category.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    server_log = server.get_log()
+    if len(command) == 2 and command[1] == '-list':
+        levels = server_log.get_levels()
+        for category in levels:
+            print(category + " : level " + logging.getLevelName(levels[category]) + " ; sampling "
+                  + str(server_log.get_sampling().get(category, 1)) + " ; rate limit "
+                  + str(server_log.get_rate_limits().get(category)))
+        print(server_log.get_counters())
+    elif len(command) != 4 or command[2] not in ServerLog.CATEGORIES:
+        print(WRONG_COMMAND)
+    elif command[1] == '-level' and isinstance(logging.getLevelName(command[3].upper()), int):
+        print("setting level of " + command[2] + " to " + command[3].upper())
+        server_log.set_level(command[2], logging.getLevelName(command[3].upper()))
+    elif command[1] == '-sample' and command[3].isdigit() and int(command[3]) > 0:
+        print("logging every " + command[3] + ". message of " + command[2])
+        server_log.set_sampling(command[2], int(command[3]))
+    elif command[1] == '-rate' and command[3].isdigit():
+        print("setting rate limit of " + command[2] + " to " + command[3] + " messages per second")
+        server_log.set_rate_limit(command[2], int(command[3]) if int(command[3]) > 0 else None)
+    else:
+        print(WRONG_COMMAND)
+
+def trace(command):
+    """
+    Evaluate the trace command and perform the resulting actions.
+
+    The trace command enables the tracer of the server (-> Server.get_tracer)
+    and exports the finished spans of the elections.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if len(command) == 2 and command[1] == '-on':
+        print("tracing elections")
+        server.get_tracer().enabled = True
+    elif len(command) == 2 and command[1] == '-off':
+        print("stop tracing elections")
+        server.get_tracer().enabled = False
+    elif len(command) == 3 and command[1] == '-export':
+        try:
+            print("exported " + str(server.get_tracer().export(command[2])) + " spans to " + command[2])
+        except OSError as err:
+            print("the trace could not be exported: " + str(err))
+    else:
+        print(WRONG_COMMAND)
+
+def journal(command):
+    """
+    Evaluate the journal command and perform the resulting actions.
+
+    The journal command starts or stops the journal of the server (-> Server.start_journal).
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if len(command) == 3 and command[1] == '-on':
+        if server.start_journal(command[2]):
+            print("writing journal to " + command[2])
+        else:
+            print("the journal could not be opened")
+    elif len(command) == 2 and command[1] == '-off':
+        print("closing journal")
+        server.stop_journal()
+    else:
+        print(WRONG_COMMAND)
+
+def profile(command):
+    """
+    Evaluate the profile command and perform the resulting actions.
+
+    The profile command starts the profiler of the application (-> Profiler.py)
+    and writes the sampled stacks when it is stopped. It works without a running
+    server as well, so the start of a server can be profiled.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global profiler
+
+    if (len(command) == 2 or (len(command) == 3 and command[2].isdigit() and int(command[2]) > 0)) \
+            and command[1] == 'start':
+        if profiler is not None and profiler.is_running():
+            print("the profiler is already running")
+        else:
+            interval = int(command[2]) / 1000 if len(command) == 3 else Profiler.SAMPLE_INTERVAL
+            profiler = Profiler.Profiler(interval)
+            profiler.start()
+            print("profiling all threads every " + str(interval * 1000) + " ms")
+    elif len(command) == 3 and command[1] == 'stop':
+        if profiler is None:
+            print("the profiler has not been started")
+        else:
+            profiler.stop()
+            try:
+                print("exported " + str(profiler.export(command[2])) + " stacks of " + str(profiler.get_samples())
+                      + " samples to " + command[2])
+                print(profiler.get_roles())
+            except OSError as err:
+                print("the stacks could not be exported: " + str(err))
+    else:
+        print(WRONG_COMMAND)
+
+def print_resource_warning(warning):
+    print("warning: " + warning)
+
+def resources(command):
+    """
+    Evaluate the resources command and perform the resulting actions.
+
+    The resources are counted for the whole application (-> Resources.py), so
+    the command works without a running server as well.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global tracker
+
+    if len(command) == 1:
+        current = Resources.snapshot()
+        history = tracker.get_history()
+        first = history[0] if history else current
+        print("resource ; now ; " + str(round(current["time"] - first["time"])) + " seconds ago")
+        for name, count in current["counts"].items():
+            print(name + " ; " + str(count) + " ; " + str(first["counts"].get(name, 0)))
+        for role in sorted(set(current["roles"]) | set(first["roles"])):
+            print("  " + role + " threads ; " + str(current["roles"].get(role, 0)) + " ; "
+                  + str(first["roles"].get(role, 0)))
+        for resource, increase in tracker.get_growing().items():
+            print("warning: the " + resource + " are growing, +" + str(increase) + " within the last "
+                  + str(Resources.GROWTH_WINDOW) + " counts")
+    else:
+        print(WRONG_COMMAND)
+
+def print_event(event):
+    print("event " + str(event["version"]) + " : " + str(event))
+
+def events(command):
+    """
+    Evaluate the events command and perform the resulting actions.
+
+    The events are printed by a callback of the event stream of the server
+    (-> Server.get_events), so they appear as soon as they are published.
+
+    Parameters
+    ----------
+    command : list of str
+        A list of the input command, that is split between the spaces.
+    """
+    global server
+
+    if len(command) == 2 and command[1] == '-on':
+        print("printing events")
+        server.get_events().unsubscribe(print_event)
+        server.get_events().subscribe(print_event)
+    elif len(command) == 2 and command[1] == '-off':
+        print("stop printing events")
+        server.get_events().unsubscribe(print_event)
+    else:
+        print(WRONG_COMMAND)
+
 def main():
     """
     Evaluate commands from the command line.
@@ -242,6 +622,8 @@ def main():
     shell commands work as well. On Keyboardinterrupt or 'quit'
     command the whole application terminates, killing all server
     threads, etc.
+    Before the loop, the tracker starts counting the resources of
+    the application (-> resources).
 
     See also
     --------
@@ -252,7 +634,10 @@ def main():
     global server_started
     global server_ip
     global server
+    global tracker
     cond = True
+    tracker = Resources.ResourceTracker(warn=print_resource_warning)
+    tracker.start()
 
     while cond:
         try:
@@ -267,6 +652,10 @@ def main():
                 manual()
             elif command[0] == 'debug':
                 print(threading.enumerate())
+            elif command[0] == 'profile':
+                profile(command)
+            elif command[0] == 'resources':
+                resources(command)
             elif server_started:
                 if command[0] == 'quit':
                     print(TERMINTATING_SERVER)
@@ -291,6 +680,26 @@ def main():
                     print("server is running on " + server_ip)
                 elif command[0] == 'serverlist':
                     server_list(command)
+                elif command[0] == 'batch':
+                    batch(command)
+                elif command[0] == 'snapshot':
+                    snapshot(command)
+                elif command[0] == 'stats':
+                    print("getting server statistics")
+                    stats()
+                elif command[0] == 'metrics':
+                    metrics(command)
+                elif command[0] == 'log':
+                    log(command)
+                elif command[0] == 'trace':
+                    trace(command)
+                elif command[0] == 'journal':
+                    journal(command)
+                elif command[0] == 'events':
+                    events(command)
+                elif command[0] == 'cache':
+                    print("getting request cache counters")
+                    print(server.get_request_cache().get_counters())
                 elif command[0] == 'start':
                     start(command)
                 else:
@@ -8,20 +8,78 @@ After that, the connection will be canceled and the client delete.
 """
 # -*- coding: utf-8 -*-
 import socket
+import Transport
 
 HEADER = 64
 FORMAT = 'utf-8'
 MAX_LENGTH = 2048
 
+def frame(msg):
+    """
+    Encode a message with its length in front of it.
+
+    The length is padded to HEADER bytes, which is the same format
+    the send method uses for the messages to the server.
+
+    Parameters
+    ----------
+    msg : str
+        the message to be framed
+
+    Returns
+    -------
+    bytes
+        The length header followed by the encoded message.
+    """
+    message = msg.encode(FORMAT)
+    send_length = str(len(message)).encode(FORMAT)
+    send_length += b' ' * (HEADER - len(send_length))
+    return send_length + message
+
+def receive_exactly(sock, length):
+    """
+    Receive exactly length bytes from the socket.
+
+    Returns
+    -------
+    bytes
+        The received bytes or 'None' if the connection was closed before.
+    """
+    chunks = []
+    while length > 0:
+        chunk = sock.recv(min(length, MAX_LENGTH * 32))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b''.join(chunks)
+
+def receive(sock):
+    """
+    Receive a framed message from the socket (-> frame).
+
+    Returns
+    -------
+    str
+        The decoded message or 'None' if the connection was closed.
+    """
+    msg_length = receive_exactly(sock, HEADER)
+    if not msg_length or not msg_length.strip():
+        return None
+    message = receive_exactly(sock, int(msg_length.decode(FORMAT)))
+    if message is None:
+        return None
+    return message.decode(FORMAT)
+
 class Client:
 
     client = None
     addr = None
     calling_server = None
 
-    def __init__(self, calling_server):
+    def __init__(self, calling_server, transport=None):
         self.calling_server = calling_server
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.client = (Transport.Transport() if transport is None else transport).socket()
 
     def connect(self, ip, port):
         """
@@ -58,6 +116,7 @@ class Client:
         the methods send the message length first (The length of
         this is capped by HEADER) and then proceed to send the message.
         It will receive an answer from the server that is returned.
+        The connection is closed afterwards, even if the server is not reachable anymore.
 
         Parameters
         ----------
@@ -73,12 +132,60 @@ class Client:
         msg_length = len(message)
         send_length = str(msg_length).encode(FORMAT)
         send_length += b' ' * (HEADER - len(send_length))
-        self.client.send(send_length)
-        self.client.send(message)
-        return_message = self.client.recv(MAX_LENGTH).decode(FORMAT)
-        self.client.close()
+        try:
+            self.client.send(send_length)
+            self.client.send(message)
+            return_message = self.client.recv(MAX_LENGTH).decode(FORMAT)
+        finally:
+            self.client.close()
         return return_message
 
+    def request(self, msg):
+        """
+        Send a message to the connected server and receive a framed answer.
+
+        Unlike send, the answer is expected to be prefixed with its length
+        (-> frame), so answers that exceed MAX_LENGTH are received completely.
+        This is used for the replication messages of the store.
+
+        Parameters
+        ----------
+        msg : str
+            the message to be send
+
+        Returns
+        -------
+        str
+            The answer of the server or 'None' if the connection was closed.
+        """
+        try:
+            self.client.sendall(frame(msg))
+            return_message = receive(self.client)
+        finally:
+            self.client.close()
+        return return_message
+
+    def exchange(self, msg):
+        """
+        Send a message to the connected server and receive a framed answer.
+
+        In contrast to request, the connection stays open, so the client
+        can be used for further messages. This is used by the master to
+        keep one connection to every server it replicates to.
+
+        Parameters
+        ----------
+        msg : str
+            the message to be send
+
+        Returns
+        -------
+        str
+            The answer of the server or 'None' if the connection was closed.
+        """
+        self.client.sendall(frame(msg))
+        return receive(self.client)
+
     def close(self):
         # for testing purposes only
         self.client.close()
\ No newline at end of file
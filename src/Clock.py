@@ -0,0 +1,139 @@
+"""
+The clock classes of the application.
+
+A server waits for the timeouts of the election and the heartbeat
+(-> Server.INITIAL_NETWORK_SEARCH_TIMEOUT, Server.MASTER_VOTE_TIMEOUT, Server.SEND_PING_TIME,
+Server.WAIT_PING_TIME) and measures its leases with a clock. The clock is the real
+time by default. The fake clock is a virtual time that jumps to the next timeout
+as soon as all threads wait, so the tests do not have to wait the real timeouts.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import select
+import time
+
+QUIET_TIME = 0.1
+# the real seconds without any use of the fake clock until it jumps to the next timeout
+
+class Clock:
+    """
+    Note:
+    Only the timeouts of the election, the heartbeat and the leases, the batch window
+    of the writes and the wait for a master use the clock.
+    The timeouts of the replication and the broadcasts limit how long the server waits
+    for real connections, so they stay in real time.
+    """
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, channel, timeout):
+        """
+        Wait until something can be read from the channel or the timeout expires.
+
+        Parameters
+        ----------
+        channel : int
+            the file descriptor to wait for (e.g. the pipe of a server).
+        timeout : float
+            the maximum time to wait in seconds.
+
+        Returns
+        -------
+        bool
+            True if the channel can be read, False if the timeout expired.
+        """
+        rfds = select.select([channel], [], [], timeout)
+        return channel in rfds[0]
+
+class FakeClock(Clock):
+    """
+    Note:
+    The fake clock cannot see threads that work without using it (e.g. waiting for
+    a connection), it jumps as soon as it has not been used for QUIET_TIME seconds
+    of real time. A thread that needs longer than that may miss a timeout.
+    The clock does not start threads of its own, so the tests can count the threads
+    of the server.
+    """
+
+    now = 0.0
+    deadlines = []
+    quiet = QUIET_TIME
+    last_use = 0.0
+    clock_cond = None
+
+    def __init__(self, start=None, quiet=QUIET_TIME):
+        self.now = time.time() if start is None else start
+        self.deadlines = []
+        self.quiet = quiet
+        self.last_use = time.monotonic()
+        self.clock_cond = threading.Condition()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.wait(None, seconds)
+
+    def wait(self, channel, timeout):
+        """
+        Wait until something can be read from the channel or the virtual timeout expires.
+
+        Parameters
+        ----------
+        channel : int
+            the file descriptor to wait for or 'None' to wait for the timeout only.
+        timeout : float
+            the maximum virtual time to wait in seconds.
+
+        Returns
+        -------
+        bool
+            True if the channel can be read, False if the timeout expired.
+
+        See also
+        --------
+        advance     : Jump to the next timeout if the clock has not been used for a while.
+        """
+        self.clock_cond.acquire()
+        deadline = self.now + max(0, timeout)
+        self.deadlines.append(deadline)
+        self.last_use = time.monotonic()
+        self.clock_cond.release()
+        try:
+            while True:
+                if channel is not None:
+                    rfds = select.select([channel], [], [], self.quiet)
+                    if channel in rfds[0]:
+                        return True
+                    self.clock_cond.acquire()
+                else:
+                    self.clock_cond.acquire()
+                    if self.now < deadline:
+                        self.clock_cond.wait(self.quiet)
+                if self.now >= deadline:
+                    self.clock_cond.release()
+                    return False
+                self.advance()
+                self.clock_cond.release()
+        finally:
+            self.clock_cond.acquire()
+            self.deadlines.remove(deadline)
+            self.last_use = time.monotonic()
+            self.clock_cond.release()
+
+    def advance(self):
+        # jumps to the next timeout if the clock has not been used for a while, the lock must be held
+        if self.deadlines and time.monotonic() - self.last_use >= self.quiet:
+            self.now = max(self.now, min(self.deadlines))
+            self.last_use = time.monotonic()
+            self.clock_cond.notify_all()
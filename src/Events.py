@@ -0,0 +1,120 @@
+"""
+The event stream class of the application.
+
+Every server publishes what happens in its network as events, so that
+a monitor does not have to ask the server again and again (-> Server.get_master).
+An event is a dictionary with its 'type', a 'version' that increases with
+every event of the server, the 'time' it happened and further information
+depending on the type (e.g. the 'master' or the 'ip' of a member).
+The events can be received by callbacks, by a thread-safe queue or by an
+asynchronous iterator.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import queue
+import asyncio
+import time
+
+MASTER_ELECTED = "master elected"
+MASTER_LOST = "master lost"
+MEMBER_JOINED = "member joined"
+MEMBER_LEFT = "member left"
+QUORUM_LOST = "quorum lost"
+MEMBERSHIP_CHANGED = "membership changed"
+SHUTDOWN = "shutdown"
+
+class EventStream:
+    """
+    Note:
+    The callbacks are called in the thread that publishes the event, which
+    is a thread of the server. Therefore a callback must not block. A queue
+    or the asynchronous iterator can be used to handle the events elsewhere.
+    A callback that fails is written to the log of the server (-> ServerLog.py).
+    """
+
+    version = 0
+    subscribers = []
+    stream_lock = None
+    log = None
+
+    def __init__(self, log=None):
+        self.version = 0
+        self.subscribers = []
+        self.stream_lock = threading.Lock()
+        self.log = log
+
+    def publish(self, event_type, **data):
+        """
+        Publish an event to all subscribers.
+
+        Parameters
+        ----------
+        event_type : str
+            the type of the event (e.g. MASTER_ELECTED).
+        data : keyword arguments
+            further information about the event.
+
+        Returns
+        -------
+        dict
+            The published event.
+        """
+        self.stream_lock.acquire()
+        self.version += 1
+        event = {"type" : event_type, "version" : self.version, "time" : time.time()}
+        event.update(data)
+        subscribers = list(self.subscribers)
+        self.stream_lock.release()
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as err:
+                if self.log is not None:
+                    self.log.debug("server", "event subscriber failed: %s", err)
+        return event
+
+    def subscribe(self, callback):
+        self.stream_lock.acquire()
+        self.subscribers.append(callback)
+        self.stream_lock.release()
+
+    def unsubscribe(self, callback):
+        self.stream_lock.acquire()
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+        self.stream_lock.release()
+
+    def queue(self):
+        """
+        Return a queue that receives all following events.
+
+        The queue has to be given back with unsubscribe_queue, when it is not used anymore.
+        """
+        events = queue.Queue()
+        self.subscribe(events.put)
+        return events
+
+    def unsubscribe_queue(self, events):
+        self.unsubscribe(events.put)
+
+    async def stream(self):
+        """
+        Iterate asynchronously over all following events.
+
+        Examples
+        --------
+        >>> async for event in server.get_events().stream():
+        ...     print(event["type"])
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        callback = lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+        self.subscribe(callback)
+        try:
+            while True:
+                yield await events.get()
+        finally:
+            self.unsubscribe(callback)
+
+    def get_version(self):
+        return self.version
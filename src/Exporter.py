@@ -0,0 +1,151 @@
+"""
+The exporter class of the application.
+
+The exporter is an optional HTTP listener of a server that serves the state
+of the server and its metrics (-> Metrics.py) in the text format of Prometheus,
+so that a monitoring system can scrape every server of the network.
+It listens on its own port next to the port of the server (-> Server.METRICS_PORT_OFFSET)
+and answers in its own threads, so a scrape never blocks the accept loop
+of the server. The state of the server is only read, no lock of the server
+is acquired (e.g. the ping_lock), so the values of a scrape may be a moment old.
+"""
+# -*- coding: utf-8 -*-
+import http.server
+import threading
+import datetime
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "server_"
+ROLES = ["master", "follower", "searching", "offline"]
+QUANTILES = [50, 90, 99]
+
+class ExporterHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Note:
+    The handler is created by the HTTP server for every scrape,
+    the exporter is reached over the HTTP server (-> Exporter.start).
+    """
+
+    def do_GET(self):
+        if self.path != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.exporter.server.get_log().debug("server", "exporter: " + format, *args)
+
+class Exporter:
+    """
+    Note:
+    The exporter is started and stopped by the server (-> Server.start_exporter).
+    """
+
+    server = None
+    port = 0
+    http_server = None
+    thread = None
+
+    def __init__(self, server, port):
+        self.server = server
+        self.port = port
+        self.http_server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start listening for scrapes in another thread.
+
+        Raises
+        ------
+        OSError
+            If the port is not available.
+        """
+        self.http_server = http.server.ThreadingHTTPServer((self.server.ip, self.port), ExporterHandler)
+        self.http_server.daemon_threads = True
+        self.http_server.exporter = self
+        self.thread = threading.Thread(target=self.http_server.serve_forever, name='Exporter', daemon=True)
+        self.thread.start()
+        self.server.get_log().debug("server", "Exporter is listening on %s:%s", self.server.ip, self.port)
+
+    def stop(self):
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.thread.join()
+            self.http_server = None
+
+    def role(self):
+        if not self.server.server_online:
+            return "offline"
+        if self.server.master_server is None:
+            return "searching"
+        if self.server.master_server == self.server.ip:
+            return "master"
+        return "follower"
+
+    def quorum_margin(self):
+        """
+        Return how many servers more than the quorum are online.
+
+        The master counts itself and the servers that pinged in the current check (-> Server.ping_check),
+        every other server counts the servers of its network. A negative margin means
+        that the network has lost its quorum.
+        """
+        if self.role() == "master":
+            online = list(self.server.ping_targets.values()).count(1)
+        elif self.role() == "follower":
+            online = len(self.server.network)
+        else:
+            online = 0
+        return online - self.server.quorum()
+
+    def render(self):
+        """
+        Return the state and the metrics of the server in the text format of Prometheus.
+
+        Every counter of the metrics becomes a counter '<name>_total' with the label as 'type',
+        every histogram becomes a summary '<name>_seconds' with its quantiles.
+
+        Returns
+        -------
+        str
+            The exposition of all metrics.
+        """
+        lines = []
+        role = self.role()
+        self.add(lines, "role", "gauge", "the role of the server in the network",
+                 [('{role="' + r + '"}', int(r == role)) for r in ROLES])
+        self.add(lines, "master_info", "gauge", "the master the server knows",
+                 [('{master="' + str(self.server.master_server) + '"}', 1)])
+        self.add(lines, "network_size", "gauge", "the number of servers in the network of the server",
+                 [("", len(self.server.network))])
+        self.add(lines, "quorum_margin", "gauge", "the number of online servers above the quorum",
+                 [("", self.quorum_margin())])
+        self.add(lines, "uptime_seconds", "gauge", "the time since the server came online",
+                 [("", (datetime.datetime.now() - self.server.server_start_time).total_seconds())])
+        metrics = self.server.get_metrics()
+        for name, counter in sorted(metrics.get_counters().items()):
+            self.add(lines, name + "_total", "counter", "the number of " + name.replace("_", " "),
+                     [("" if label is None else '{type="' + str(label) + '"}', value)
+                      for label, value in sorted(counter.items(), key=lambda item: str(item[0]))])
+        for name in metrics.get_histogram_names():
+            histogram = metrics.get_histogram(name)
+            samples = [('{quantile="' + str(q / 100) + '"}', metrics.percentile(name, q)) for q in QUANTILES]
+            self.add(lines, name + "_seconds", "summary", "the duration of " + name.replace("_", " "), samples)
+            lines.append(METRIC_PREFIX + name + "_seconds_sum " + str(histogram["sum"]))
+            lines.append(METRIC_PREFIX + name + "_seconds_count " + str(histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+    def add(self, lines, name, metric_type, description, samples):
+        # appends a metric with its help, its type and its samples (pairs of the labels and the value)
+        lines.append("# HELP " + METRIC_PREFIX + name + " " + description)
+        lines.append("# TYPE " + METRIC_PREFIX + name + " " + metric_type)
+        for labels, value in samples:
+            lines.append(METRIC_PREFIX + name + labels + " " + str(value))
@@ -0,0 +1,253 @@
+"""
+The group classes of the application.
+
+A network has exactly one master, so all writes pass one server. Several
+groups can run on the same servers instead: every group is a network of its
+own with its own port (-> group_port) and elects its own master with the same
+quorum. The groups prefer different masters (-> Server.candidate), so the
+writes of all groups are spread over the servers. The servers of all groups of
+one machine run in one process and are accepted by one host (-> GroupNode).
+A key belongs to one group, the keys are mapped to the groups by consistent
+hashing (-> Ring), so only a few keys move to another group if a group is added.
+A client sends every request to the master of the group of its key and caches
+the masters, they are refreshed on every redirect and when a master is not
+available anymore (-> GroupSession).
+"""
+# -*- coding: utf-8 -*-
+import hashlib
+import bisect
+import threading
+import os
+import Server
+import Session
+import Host
+
+GROUP_PORT_STEP = 2
+# every group uses the port of its servers and the next one for the exporter (-> Server.METRICS_PORT_OFFSET)
+MAXIMUM_GROUPS = 25
+# the groups share the block of 50 ports of a user (-> Server.default_port)
+VIRTUAL_NODES = 64
+MAXIMUM_REFRESHES = 3
+
+"""
+Note:
+A write is only ordered within its group, the groups do not know each other.
+The group of a key has to be the same for all clients, so all of them have to use
+the same number of groups. A request that has been answered with a connection
+error is sent to the next server of the list, which redirects it to the master of
+the group. A server that does not know the master yet answers 'not master = None'
+and the answer is returned as it is, like by the session.
+"""
+
+def group_port(port, group):
+    """
+    Return the port of the servers of a group.
+
+    Parameters
+    ----------
+    port : int
+        the first port of the block (-> Server.default_port).
+    group : int
+        the number of the group.
+
+    Returns
+    -------
+    int
+        The port of the group, the groups use every second port of the block.
+    """
+    if group < 0 or group >= MAXIMUM_GROUPS:
+        raise ValueError("group " + str(group) + " does not exist, at most " + str(MAXIMUM_GROUPS) + " groups")
+    return port + group * GROUP_PORT_STEP
+
+def key_hash(key):
+    return int(hashlib.md5(str(key).encode(Server.FORMAT)).hexdigest()[:16], 16)
+
+class Ring:
+    """
+    Note:
+    Every group is put on the ring at VIRTUAL_NODES points, a key belongs to the
+    group of the next point after its hash. More points spread the keys more
+    evenly over the groups.
+    """
+
+    groups = 0
+    points = []
+    owners = []
+
+    def __init__(self, groups, virtual_nodes=VIRTUAL_NODES):
+        self.groups = groups
+        ring = sorted((key_hash(str(group) + "#" + str(i)), group) for group in range(groups)
+                      for i in range(virtual_nodes))
+        self.points = [point for point, group in ring]
+        self.owners = [group for point, group in ring]
+
+    def group(self, key):
+        position = bisect.bisect(self.points, key_hash(key)) % len(self.points)
+        return self.owners[position]
+
+    def get_groups(self):
+        return self.groups
+
+class GroupNode:
+    """
+    Note:
+    A node runs the server of every group on one IP address. The servers are
+    independent, a group that has lost its master does not disturb the others.
+    """
+
+    ip = ""
+    port = 0
+    host = None
+    servers = []
+
+    def __init__(self, ip, groups, port=None, server_list=None, data_dir=None, **kwargs):
+        """
+        Build the servers of all groups.
+
+        Parameters
+        ----------
+        ip : str
+            the IP address of the node.
+        groups : int
+            the number of groups.
+        port : int
+            the first port of the block (default -> Server.default_port).
+        server_list : list
+            the IP addresses of all nodes (default -> Server.DEFAULT_SERVER_LIST).
+        data_dir : str
+            the directory of the stores, every group gets a directory of its own.
+        kwargs : dict
+            further arguments of the servers (e.g. clock, transport).
+        """
+        self.ip = ip
+        self.port = Server.default_port() if port is None else port
+        self.host = Host.Host()
+        self.servers = []
+        for group in range(groups):
+            group_dir = None if data_dir is None else os.path.join(data_dir, "group_" + str(group))
+            s = Server.Server(ip, data_dir=group_dir, port=group_port(self.port, group),
+                              server_list=server_list, group=group, **kwargs)
+            self.servers.append(self.host.add(s))
+
+    def start(self):
+        self.host.start()
+        for s in self.servers:
+            s.start()
+
+    def stop(self):
+        # shuts down the servers of all groups
+        self.host.stop()
+
+    def close(self):
+        # for testing purposes only
+        for s in self.servers:
+            s.close()
+
+    def get_server(self, group):
+        return self.servers[group]
+
+    def get_servers(self):
+        return list(self.servers)
+
+    def get_masters(self):
+        return [s.get_master() for s in self.servers]
+
+class GroupSession:
+    """
+    Note:
+    Every group has its own session (-> Session.py), which keeps the connection
+    to the master of the group. At first the session is sent to the master the
+    group prefers (-> Server.candidate), afterwards it follows the redirects.
+    """
+
+    server_list = []
+    port = 0
+    ring = None
+    sessions = []
+    refreshes = {}
+    group_lock = None
+
+    def __init__(self, groups, port=None, server_list=None):
+        self.server_list = list(Server.DEFAULT_SERVER_LIST if server_list is None else server_list)
+        self.port = Server.default_port() if port is None else port
+        self.ring = Ring(groups)
+        self.sessions = [Session.Session(Server.candidate(self.server_list, self.server_list, group),
+                                         group_port(self.port, group)) for group in range(groups)]
+        self.refreshes = {}
+        self.group_lock = threading.Lock()
+
+    def submit(self, key, message):
+        """
+        Send a request to the master of the group of the key without waiting for its answer.
+
+        Parameters
+        ----------
+        key : str
+            the key of the request, it determines the group (-> Ring).
+        message : str
+            a write or a read message of the key (-> Session.write_message, Session.read_message).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The future of the answer of the master.
+        """
+        return self.sessions[self.ring.group(key)].submit(message)
+
+    def request(self, key, message, timeout=None):
+        # sends the request again to another server if the master is not available anymore
+        group = self.ring.group(key)
+        refreshes = 0
+        while True:
+            try:
+                return self.sessions[group].submit(message).result(timeout)
+            except ConnectionError:
+                if refreshes == MAXIMUM_REFRESHES * len(self.server_list):
+                    raise
+            self.refresh(group)
+            refreshes += 1
+
+    def write(self, key, value, timeout=None):
+        return self.request(key, Session.write_message(key, value), timeout)
+
+    def read(self, key, consistency=Session.LINEARIZABLE_READ, max_staleness=None, timeout=None):
+        return self.request(key, Session.read_message(key, consistency, max_staleness), timeout)
+
+    def refresh(self, group):
+        """
+        Forget the master of a group that is not available anymore.
+
+        The next request is sent to the next server of the list, which redirects
+        it to the current master of the group.
+
+        Returns
+        -------
+        str
+            The IP address the next request of the group is sent to.
+        """
+        session = self.sessions[group]
+        former = session.get_server()
+        position = self.server_list.index(former) if former in self.server_list else -1
+        server = self.server_list[(position + 1) % len(self.server_list)]
+        session.set_server(server)
+        self.group_lock.acquire()
+        self.refreshes[group] = self.refreshes.get(group, 0) + 1
+        self.group_lock.release()
+        return server
+
+    def group(self, key):
+        return self.ring.group(key)
+
+    def get_routes(self):
+        # the cached master of every group
+        return [session.get_server() for session in self.sessions]
+
+    def get_refreshes(self):
+        self.group_lock.acquire()
+        refreshes = dict(self.refreshes)
+        self.group_lock.release()
+        return refreshes
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
@@ -0,0 +1,229 @@
+"""
+The host class of the application.
+
+A host runs many servers in one process. Every server started by itself waits
+for its connections in a loop of its own (-> Server.start), so a node costs an
+interpreter and a thread that does nothing but wait. The servers added to a host
+register their listening socket and their pipe at the host instead, and one
+thread of the host waits for the connections of all of them (-> Host.loop).
+The servers keep their state apart, so servers of different networks can be
+hosted next to each other if they have their own port or their own addresses
+(-> Server.__init__).
+"""
+# -*- coding: utf-8 -*-
+import selectors
+import threading
+import os
+
+LISTENER = "listener"
+CHANNEL = "channel"
+STOP_TIMEOUT = 30
+
+"""
+Note:
+The selector is only changed by the thread of the host, the other threads put
+their registrations into a list and wake the thread up with the pipe of the host.
+A server that has been shut down stops listening once the host has seen its pipe,
+so it has to be waited for before it is restarted (-> Host.join), like the thread
+of a server that runs by itself. It stays registered until its listener has been
+closed and its log writer has stopped, so a restart does not race the host. The connections are still handled by a thread
+each (-> Server.handle_client).
+"""
+
+class Host:
+
+    selector = None
+    servers = []
+    registered = {}
+    pending = []
+    host_lock = None
+    host_cond = None
+    r_channel = None
+    w_channel = None
+    loop_thread = None
+    online = False
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.servers = []
+        self.registered = {}
+        self.pending = []
+        self.host_lock = threading.Lock()
+        self.host_cond = threading.Condition(self.host_lock)
+
+    def add(self, server):
+        """
+        Add a server to the host.
+
+        Parameters
+        ----------
+        server : Server object
+            the server, it is started as usual (-> Server.start) and registers itself.
+
+        Returns
+        -------
+        Server object
+            The same server.
+        """
+        server.host = self
+        self.host_lock.acquire()
+        self.servers.append(server)
+        self.host_lock.release()
+        return server
+
+    def remove(self, server):
+        # the server has to be shut down before, afterwards it runs by itself again
+        self.join(server)
+        self.host_lock.acquire()
+        if server in self.servers:
+            self.servers.remove(server)
+        self.host_lock.release()
+        server.host = None
+
+    def get_servers(self):
+        self.host_lock.acquire()
+        servers = list(self.servers)
+        self.host_lock.release()
+        return servers
+
+    def start(self):
+        # starts the thread that accepts the connections of all servers
+        self.r_channel, self.w_channel = os.pipe()
+        self.selector.register(self.r_channel, selectors.EVENT_READ, None)
+        self.online = True
+        self.loop_thread = threading.Thread(target=self.loop, name="Host")
+        self.loop_thread.start()
+
+    def stop(self):
+        """
+        Shut down all hosted servers and stop the thread of the host.
+
+        The servers that are still listening are shut down and the host waits until
+        they have stopped listening (at most STOP_TIMEOUT seconds each).
+        """
+        if not self.online:
+            return
+        for server in self.get_servers():
+            if self.is_registered(server):
+                if server.server_online:
+                    server.shutdown("host stopped")
+                self.join(server, STOP_TIMEOUT)
+        self.host_lock.acquire()
+        self.online = False
+        self.host_lock.release()
+        os.write(self.w_channel, b'stop')
+        self.loop_thread.join()
+        self.selector.close()
+        os.close(self.r_channel)
+        os.close(self.w_channel)
+
+    def register(self, server):
+        # called by the server when it starts listening (-> Server.start)
+        self.host_lock.acquire()
+        self.pending.append(server)
+        self.host_lock.release()
+        if self.online:
+            os.write(self.w_channel, b'!')
+
+    def is_registered(self, server):
+        self.host_lock.acquire()
+        registered = server in self.registered or server in self.pending
+        self.host_lock.release()
+        return registered
+
+    def join(self, server, timeout=None):
+        """
+        Wait until a hosted server has stopped listening.
+
+        Parameters
+        ----------
+        server : Server object
+            the server that has been shut down.
+        timeout : float
+            the maximum time to wait in seconds ('None' to wait forever).
+
+        Returns
+        -------
+        bool
+            True if the server has stopped listening, False if the timeout expired.
+
+        See also
+        --------
+        Server.stop_listening
+        """
+        self.host_cond.acquire()
+        stopped = self.host_cond.wait_for(lambda: server not in self.registered and server not in self.pending,
+                                          timeout)
+        self.host_cond.release()
+        return stopped
+
+    ####################################### Loop #######################################################################
+
+    def loop(self):
+        """
+        Accept the connections of all hosted servers.
+
+        The selector waits for the listening sockets and the pipes of the servers
+        and the pipe of the host. A connection is passed to a thread of its server
+        (-> Server.handle_client), a shutdown command in the pipe of a server stops
+        its listening (-> Server.stop_listening).
+        """
+        self.apply_pending()
+        while True:
+            for key, mask in self.selector.select():
+                if key.data is None:
+                    os.read(self.r_channel, 512)
+                    if not self.online:
+                        return
+                    self.apply_pending()
+                    continue
+                server, kind = key.data
+                if self.registered.get(server) is None or self.registered[server][kind] != key.fileobj:
+                    # the server has been unregistered by an earlier event of this round
+                    continue
+                if kind == CHANNEL:
+                    # the server stops listening before it is unregistered, so a join returns only afterwards
+                    self.forget(self.registered[server])
+                    server.stop_listening()
+                    self.unregister(server)
+                    continue
+                try:
+                    conn, addr = server.server.accept()
+                except OSError:
+                    continue
+                thread = threading.Thread(target=server.handle_client, args=(conn, addr))
+                thread.start()
+
+    def apply_pending(self):
+        self.host_lock.acquire()
+        pending = self.pending
+        self.pending = []
+        self.host_lock.release()
+        for server in pending:
+            self.unregister(server)
+            entry = {LISTENER : server.server, CHANNEL : server.r_channel}
+            try:
+                self.selector.register(server.server, selectors.EVENT_READ, (server, LISTENER))
+                self.selector.register(server.r_channel, selectors.EVENT_READ, (server, CHANNEL))
+            except (ValueError, KeyError, OSError):
+                # the server has been closed in the meantime
+                self.forget(entry)
+                continue
+            self.host_cond.acquire()
+            self.registered[server] = entry
+            self.host_cond.release()
+
+    def unregister(self, server):
+        self.host_cond.acquire()
+        entry = self.registered.pop(server, None)
+        self.host_cond.notify_all()
+        self.host_cond.release()
+        if entry is not None:
+            self.forget(entry)
+
+    def forget(self, entry):
+        for fileobj in entry.values():
+            try:
+                self.selector.unregister(fileobj)
+            except (ValueError, KeyError):
+                pass
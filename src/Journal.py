@@ -0,0 +1,147 @@
+"""
+The journal class of the application.
+
+A server can write what happens in the protocol into a binary journal,
+so that the behavior of a network can be analyzed afterwards (-> Analyzer.py).
+Every entry is a record of a fixed size with the monotonic time in nanoseconds,
+the kind of the event (e.g. a received message or a vote), a detail (e.g. the
+type of the message), the IP of the other server and a value (e.g. the number
+of online servers of a ping check). The journal starts with a header that holds
+the IP of the server and its wall clock and monotonic clock at the same moment,
+so the journals of several servers can be put on the same time line.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import ipaddress
+import struct
+import time
+
+MAGIC = b"SJNL"
+VERSION = 1
+HEADER = struct.Struct("<4sHIqq")
+# magic, version, IP of the server, wall clock and monotonic clock in nanoseconds
+RECORD = struct.Struct("<qBBIq")
+# monotonic time in nanoseconds, kind, detail, IP of the other server, value
+
+# the kinds of the events
+MESSAGE_SENT = 1
+MESSAGE_RECEIVED = 2
+STATE_CHANGE = 3
+VOTE = 4
+PING_TICK = 5
+SHUTDOWN = 6
+KINDS = {MESSAGE_SENT : "message sent", MESSAGE_RECEIVED : "message received", STATE_CHANGE : "state change",
+         VOTE : "vote", PING_TICK : "ping tick", SHUTDOWN : "shutdown"}
+
+# the details of the messages (like the labels of Server.handle_client)
+MESSAGE_TYPES = ["unknown", "disconnect", "ask master", "write", "read", "replicate", "request", "broadcast",
+                 "snapshot", "log", "ping", "vote", "ping answer", "membership"]
+# the details of the state changes
+MASTER_ELECTED = 1
+MASTER_LOST = 2
+STATES = {MASTER_ELECTED : "master elected", MASTER_LOST : "master lost"}
+# the details of the votes
+VOTE_RECEIVED = 1
+VOTE_CONFIRMED = 2
+VOTE_DECLINED = 3
+VOTES = {VOTE_RECEIVED : "received", VOTE_CONFIRMED : "confirmed", VOTE_DECLINED : "declined"}
+# the details of the shutdowns (like the reasons of Server.shutdown)
+SHUTDOWN_REASONS = ["manual", "interrupted", "master declined", "no votes", "invalid network", "network attempts",
+                    "removed"]
+
+def ip_to_int(ip):
+    # an IP that is not valid (e.g. of a broken message) is written as 'None'
+    try:
+        return int(ipaddress.IPv4Address(ip))
+    except ValueError:
+        return 0
+
+def int_to_ip(number):
+    if number == 0:
+        return None
+    return str(ipaddress.ip_address(number))
+
+def message_type(label):
+    return MESSAGE_TYPES.index(label) if label in MESSAGE_TYPES else 0
+
+def shutdown_reason(reason):
+    return SHUTDOWN_REASONS.index(reason) if reason in SHUTDOWN_REASONS else 0
+
+def read_header(f):
+    """
+    Read the header of a journal.
+
+    Parameters
+    ----------
+    f : file object
+        the journal opened for binary reading.
+
+    Returns
+    -------
+    tuple
+        The IP of the server, its wall clock and its monotonic clock in nanoseconds.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a journal.
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("the file is not a journal")
+    magic, version, ip, wall_clock, monotonic_clock = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("the file is not a journal of version " + str(VERSION))
+    return int_to_ip(ip), wall_clock, monotonic_clock
+
+class Journal:
+    """
+    Note:
+    The records are written into a buffer and reach the file when the buffer
+    is full or the journal is flushed or closed. The records of a journal
+    that has not been closed properly are only complete up to the last flush.
+    """
+
+    path = None
+    journal_file = None
+    journal_lock = None
+
+    def __init__(self, path, ip):
+        self.path = path
+        self.journal_lock = threading.Lock()
+        self.journal_file = open(path, "wb")
+        self.journal_file.write(HEADER.pack(MAGIC, VERSION, ip_to_int(ip), time.time_ns(), time.monotonic_ns()))
+
+    def record(self, kind, detail=0, peer=None, value=0):
+        """
+        Write a record into the journal.
+
+        Parameters
+        ----------
+        kind : int
+            the kind of the event (e.g. MESSAGE_RECEIVED).
+        detail : int
+            the detail of the event (e.g. the type of the message).
+        peer : str
+            the IP of the other server or 'None'.
+        value : int
+            further information depending on the kind.
+        """
+        entry = RECORD.pack(time.monotonic_ns(), kind, detail, ip_to_int(peer), value)
+        self.journal_lock.acquire()
+        if self.journal_file is not None:
+            self.journal_file.write(entry)
+        self.journal_lock.release()
+
+    def flush(self):
+        self.journal_lock.acquire()
+        if self.journal_file is not None:
+            self.journal_file.flush()
+        self.journal_lock.release()
+
+    def close(self):
+        self.journal_lock.acquire()
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+        self.journal_lock.release()
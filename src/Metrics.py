@@ -0,0 +1,158 @@
+"""
+The metrics class of the application.
+
+The server counts what it does (e.g. the handled messages by their type)
+and measures how long it takes (e.g. the round trip of a ping) in a metrics
+registry, so that a running server can be observed without reading its log.
+A counter has a name and optionally a label (e.g. 'messages' and 'write').
+A duration is sorted into a histogram with fixed buckets that grow by a factor
+of 2^(1/4) from one microsecond on, so a percentile is known up to about 19%.
+Recording only increases a number under a lock, so it can be used in the
+methods that handle every message.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import bisect
+import math
+
+BUCKET_START = 0.000001
+BUCKETS_PER_DOUBLING = 4
+BUCKET_COUNT = 4 * 30
+BUCKETS = [BUCKET_START * 2 ** (i / BUCKETS_PER_DOUBLING) for i in range(BUCKET_COUNT)]
+# the last bucket is about 1000 seconds, longer durations are counted in an additional bucket
+PERCENTILES = [50, 90, 99]
+
+class Metrics:
+    """
+    Note:
+    A histogram is a dictionary with the 'counts' per bucket (one more than
+    BUCKETS for the durations above the last bucket), the 'count', the 'sum'
+    and the 'max' of all recorded durations.
+    """
+
+    counters = {}
+    histograms = {}
+    metrics_lock = None
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.metrics_lock = threading.Lock()
+
+    def count(self, name, label=None, amount=1):
+        """
+        Increase a counter.
+
+        Parameters
+        ----------
+        name : str
+            the name of the counter (e.g. 'messages').
+        label : str
+            distinguishes the counters of the same name (e.g. the type of the message).
+        amount : int
+            the amount the counter is increased by.
+        """
+        self.metrics_lock.acquire()
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = {}
+        counter[label] = counter.get(label, 0) + amount
+        self.metrics_lock.release()
+
+    def observe(self, name, duration):
+        """
+        Record a duration in the histogram of the given name.
+
+        Parameters
+        ----------
+        name : str
+            the name of the histogram (e.g. 'ping_rtt').
+        duration : float
+            the duration in seconds.
+        """
+        bucket = bisect.bisect_left(BUCKETS, duration)
+        self.metrics_lock.acquire()
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = {"counts" : [0] * (BUCKET_COUNT + 1), "count" : 0, "sum" : 0.0, "max" : 0.0}
+        histogram["counts"][bucket] += 1
+        histogram["count"] += 1
+        histogram["sum"] += duration
+        if duration > histogram["max"]:
+            histogram["max"] = duration
+        self.metrics_lock.release()
+
+    def percentile(self, name, percentile):
+        """
+        Return the duration that the given percentage of the recorded durations does not exceed.
+
+        The duration is the upper bound of the bucket the percentile falls into,
+        but never more than the longest recorded duration.
+
+        Parameters
+        ----------
+        name : str
+            the name of the histogram.
+        percentile : float
+            the percentage between 0 and 100.
+
+        Returns
+        -------
+        float
+            The duration in seconds or 'None' if no duration has been recorded.
+        """
+        histogram = self.get_histogram(name)
+        if histogram is None or histogram["count"] == 0:
+            return None
+        rank = max(1, math.ceil(histogram["count"] * percentile / 100))
+        seen = 0
+        for bucket, count in enumerate(histogram["counts"]):
+            seen += count
+            if seen >= rank:
+                break
+        if bucket == BUCKET_COUNT:
+            return histogram["max"]
+        return min(BUCKETS[bucket], histogram["max"])
+
+    def summary(self):
+        """
+        Return the count, the percentiles and the maximum of every histogram.
+
+        Returns
+        -------
+        dict
+            The summary of every histogram by its name, the durations are in seconds.
+        """
+        summary = {}
+        for name in self.get_histogram_names():
+            histogram = self.get_histogram(name)
+            summary[name] = {"count" : histogram["count"], "max" : histogram["max"]}
+            for percentile in PERCENTILES:
+                summary[name]["p" + str(percentile)] = self.percentile(name, percentile)
+        return summary
+
+    def get_counters(self):
+        self.metrics_lock.acquire()
+        counters = {name : dict(counter) for name, counter in self.counters.items()}
+        self.metrics_lock.release()
+        return counters
+
+    def get_counter(self, name, label=None):
+        self.metrics_lock.acquire()
+        value = self.counters.get(name, {}).get(label, 0)
+        self.metrics_lock.release()
+        return value
+
+    def get_histogram(self, name):
+        self.metrics_lock.acquire()
+        histogram = self.histograms.get(name)
+        if histogram is not None:
+            histogram = dict(histogram, counts=list(histogram["counts"]))
+        self.metrics_lock.release()
+        return histogram
+
+    def get_histogram_names(self):
+        self.metrics_lock.acquire()
+        names = sorted(self.histograms.keys())
+        self.metrics_lock.release()
+        return names
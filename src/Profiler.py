@@ -0,0 +1,176 @@
+"""
+The profiler class of the application.
+
+The profiler can be started in a running server (-> Bash.py) without restarting it.
+It samples the stacks of all threads of the process in a fixed interval
+and counts how often every stack has been seen. The samples are taken of the
+waiting threads as well (e.g. a ping check that waits in select), so the
+result shows where the time of the threads goes, not only where the CPU is used.
+Every stack is tagged with the role of its thread in the server (e.g. 'ping' or
+'handler'), which is determined by the innermost method of the server on
+the stack (-> ROLES). The counted stacks are written in the collapsed format,
+one stack per line with its frames separated by ';' and the number of samples
+at the end, which can be turned into a flame graph (e.g. with flamegraph.pl
+or speedscope.app).
+"""
+# -*- coding: utf-8 -*-
+import threading
+import os
+import sys
+
+SAMPLE_INTERVAL = 0.005
+ROLE_FILE = "Server.py"
+# the methods of the server that determine the role of a thread, the innermost one on the stack counts
+ROLES = {"start" : "accept loop", "handle_client" : "handler", "ping" : "ping", "ping_check" : "ping check",
+         "find_network" : "discovery", "client_thread" : "discovery"}
+OTHER_ROLE = "other"
+
+def role(frames):
+    """
+    Determine the role of a thread in the server by its stack.
+
+    Parameters
+    ----------
+    frames : list of tuple of str
+        the file and the function of every frame of the stack, the innermost frame first.
+
+    Returns
+    -------
+    str
+        The role of the thread (-> ROLES) or OTHER_ROLE if no method of the server is on the stack.
+    """
+    for filename, function in frames:
+        if function in ROLES and os.path.basename(filename) == ROLE_FILE:
+            return ROLES[function]
+    return OTHER_ROLE
+
+class Profiler:
+    """
+    Note:
+    The samples are taken by a thread of the profiler, so the threads of the server are only
+    slowed down by the global interpreter lock the sampling thread needs for every sample.
+    A sample only counts the code objects of the stacks, they are turned into text and
+    tagged with the role of the thread when the stacks are exported (-> get_stacks).
+    A longer interval lowers the overhead, but needs a longer profile for the same accuracy.
+    A busy thread keeps the global interpreter lock up to sys.getswitchinterval() (5 ms),
+    so a shorter interval than that results in less samples than expected.
+    """
+
+    interval = SAMPLE_INTERVAL
+    stacks = {}
+    samples = 0
+    sampler = None
+    stopped = None
+    profiler_lock = None
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.sampler = None
+        self.stopped = threading.Event()
+        self.profiler_lock = threading.Lock()
+
+    def sample(self):
+        # counts the current stack of every thread except the sampling thread
+        own = threading.get_ident()
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            stacks.append(tuple(codes))
+        self.profiler_lock.acquire()
+        for codes in stacks:
+            self.stacks[codes] = self.stacks.get(codes, 0) + 1
+        self.samples += 1
+        self.profiler_lock.release()
+
+    def run(self):
+        # samples until the profiler is stopped
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        """
+        Start sampling the threads of the process.
+
+        See also
+        --------
+        run     : Sample until the profiler is stopped.
+        """
+        if self.sampler is None:
+            self.stopped.clear()
+            sampler = threading.Thread(target=self.run, name='Profiler', daemon=True)
+            sampler.start()
+            self.sampler = sampler
+
+    def stop(self):
+        if self.sampler is not None:
+            sampler = self.sampler
+            self.sampler = None
+            self.stopped.set()
+            sampler.join()
+
+    def is_running(self):
+        return self.sampler is not None
+
+    def get_samples(self):
+        return self.samples
+
+    def get_stacks(self):
+        """
+        Return the counted stacks in the collapsed format.
+
+        Returns
+        -------
+        dict
+            The number of samples of every stack, which starts with the role of the thread
+            followed by the frames from the outermost to the innermost one.
+        """
+        self.profiler_lock.acquire()
+        counted = dict(self.stacks)
+        self.profiler_lock.release()
+        stacks = {}
+        for codes, count in counted.items():
+            stack = [role([(code.co_filename, code.co_name) for code in codes])]
+            stack.extend(os.path.basename(code.co_filename) + ":" + code.co_name for code in reversed(codes))
+            stack = ";".join(stack)
+            stacks[stack] = stacks.get(stack, 0) + count
+        return stacks
+
+    def get_roles(self):
+        # returns the number of samples of every role
+        roles = {}
+        for stack, count in self.get_stacks().items():
+            name = stack.split(";", 1)[0]
+            roles[name] = roles.get(name, 0) + count
+        return roles
+
+    def export(self, path):
+        """
+        Write the counted stacks in the collapsed format.
+
+        Every line starts with the role of the thread, followed by the frames from the
+        outermost to the innermost one (e.g. 'ping;threading.py:_bootstrap;...;Server.py:ping 42').
+        The stacks of the threads of the same role are not separated by their names,
+        because every connection has its own thread (-> Server.start).
+
+        Parameters
+        ----------
+        path : str
+            the file the stacks are written to.
+
+        Returns
+        -------
+        int
+            The number of exported stacks.
+        """
+        stacks = self.get_stacks()
+        with open(path, "w") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(stack + " " + str(count) + "\n")
+        return len(stacks)
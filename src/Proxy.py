@@ -0,0 +1,499 @@
+"""
+The proxy class of the application.
+
+The proxy sits between servers on the loopback interface and injects the
+faults of a real network: a delay drawn from a distribution, packet loss,
+a bandwidth cap and one-way partitions. A server uses the proxy if it is built
+with its transport (-> Proxy.transport), every connection of the server is then
+opened through the proxy, which connects to the destination and relays the
+bytes of both directions. The rules are kept per link (source -> destination)
+and can be changed while the servers are running, also from a scenario that is
+replayed step by step (-> Proxy.replay). The proxy measures how late it delivers
+compared to its rules, which is its own overhead (-> Proxy.get_metrics).
+"""
+# -*- coding: utf-8 -*-
+import threading
+import socket
+import select
+import random
+import queue
+import json
+import time
+import os
+import Client
+import Transport
+import Metrics
+
+PROXY_IP = "127.0.0.1"
+PROXY_MESSAGE = "proxy = "
+CONNECTED = b"1"
+REFUSED = b"0"
+ANY = "*"
+CHUNK_SIZE = 4096
+DISTRIBUTIONS = ["constant", "uniform", "normal", "exponential"]
+DEFAULT_RULE = {"delay" : 0, "jitter" : 0, "distribution" : "constant", "loss" : 0,
+                "bandwidth" : None, "partitioned" : False}
+# delay and jitter in seconds, loss as probability, bandwidth in bytes per second
+RETRANSMISSION_TIMEOUT = 0.2
+# the minimum retransmission timeout of Linux, it doubles with every loss of the same chunk
+MAXIMUM_RETRANSMISSIONS = 15
+# like net.ipv4.tcp_retries2, the connection is reset after that many losses of a chunk
+PARTITION_POLL_TIME = 0.1
+
+"""
+Note:
+The proxy relays TCP streams, so it cannot drop bytes. A lost chunk is delivered
+after the retransmission timeouts instead, like TCP would do it, and the connection
+is reset if a chunk is lost too often. A partition holds the bytes of its direction
+until it is healed. A new connection needs both directions for its handshake, so it
+is refused at once if one of them is partitioned (a real network would let the
+connect time out). The proxy connects to the destination from its own address, so
+the destination sees the same peer address as without the proxy (-> Server.handle_client).
+"""
+
+class ProxySocket(socket.socket):
+    """
+    Note:
+    A socket of the proxy transport connects to the proxy and tells it the source
+    and the destination. Everything else is a normal socket.
+    """
+
+    def __init__(self, proxy_address, source):
+        super().__init__(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.proxy_address = proxy_address
+        self.source = source
+
+    def connect(self, address):
+        super().connect(self.proxy_address)
+        self.sendall(Client.frame(PROXY_MESSAGE + self.source + " " + address[0] + " " + str(address[1])))
+        if self.recv(1) != CONNECTED:
+            raise ConnectionRefusedError("connection refused by the proxy")
+
+class ProxyTransport(Transport.Transport):
+
+    proxy_address = None
+    source = ""
+
+    def __init__(self, proxy_address, source):
+        self.proxy_address = proxy_address
+        self.source = source
+
+    def socket(self):
+        return ProxySocket(self.proxy_address, self.source)
+
+    def listen(self, ip, port):
+        # the server listens directly, only its outgoing connections pass the proxy
+        return Transport.Transport().listen(ip, port)
+
+class Proxy:
+    """
+    Note:
+    Every connection is relayed by one thread per direction that reads and one that
+    writes, the writer holds a chunk until it is due. The chunks of a direction stay in
+    order, a chunk is never delivered before the one read before it.
+    """
+
+    ip = ""
+    port = 0
+    listener = None
+    online = False
+    rules = {}
+    rule_cond = None
+    busy_until = {}
+    connections = []
+    connection_lock = None
+    metrics = None
+    random = None
+    r_channel = None
+    w_channel = None
+    accept_thread = None
+
+    def __init__(self, ip=PROXY_IP, port=0, seed=None):
+        self.ip = ip
+        self.port = port
+        self.rules = {}
+        self.rule_cond = threading.Condition()
+        self.busy_until = {}
+        self.connections = []
+        self.connection_lock = threading.Lock()
+        self.metrics = Metrics.Metrics()
+        self.random = random.Random(seed)
+
+    def start(self):
+        """
+        Start listening for the connections of the servers.
+
+        Returns
+        -------
+        tuple
+            The address of the proxy (-> ProxyTransport).
+        """
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.ip, self.port))
+        self.port = self.listener.getsockname()[1]
+        self.listener.listen(socket.SOMAXCONN)
+        self.r_channel, self.w_channel = os.pipe()
+        self.online = True
+        self.accept_thread = threading.Thread(target=self.accept, name="Proxy")
+        self.accept_thread.start()
+        return (self.ip, self.port)
+
+    def stop(self):
+        # stops listening and resets all relayed connections
+        if not self.online:
+            return
+        self.rule_cond.acquire()
+        self.online = False
+        self.rule_cond.notify_all()
+        self.rule_cond.release()
+        os.write(self.w_channel, b'stop')
+        self.accept_thread.join()
+        self.listener.close()
+        os.close(self.r_channel)
+        os.close(self.w_channel)
+        self.connection_lock.acquire()
+        connections = list(self.connections)
+        self.connection_lock.release()
+        for connection in connections:
+            self.close_connection(connection)
+
+    def transport(self, source):
+        # the transport of the server with the given IP address
+        return ProxyTransport((self.ip, self.port), source)
+
+    def accept(self):
+        while True:
+            rfds = select.select([self.listener, self.r_channel], [], [])
+            if self.r_channel in rfds[0]:
+                break
+            try:
+                conn, addr = self.listener.accept()
+            except OSError:
+                continue
+            threading.Thread(target=self.handle, args=(conn,), name="Proxy_Handshake").start()
+
+    ####################################### Rules ######################################################################
+
+    def set_rule(self, source=ANY, destination=ANY, **rule):
+        """
+        Set the rule of a link.
+
+        Parameters
+        ----------
+        source : str
+            the IP address that sends or ANY for all.
+        destination : str
+            the IP address that receives or ANY for all.
+        rule : dict
+            the values that differ from DEFAULT_RULE (e.g. delay=0.01, loss=0.05).
+
+        Note:
+        The most specific rule applies: source and destination, then the source, then the
+        destination, then the rule of all links. A rule applies to the chunks that are
+        read after it has been set, a healed partition releases the chunks it held.
+        """
+        for key in rule:
+            if key not in DEFAULT_RULE:
+                raise ValueError("unknown rule: " + key)
+        if rule.get("distribution", "constant") not in DISTRIBUTIONS:
+            raise ValueError("unknown distribution: " + str(rule["distribution"]))
+        if not 0 <= rule.get("loss", 0) <= 1:
+            raise ValueError("the loss is a probability")
+        new_rule = dict(DEFAULT_RULE)
+        new_rule.update(rule)
+        self.rule_cond.acquire()
+        self.rules[(source, destination)] = new_rule
+        self.rule_cond.notify_all()
+        self.rule_cond.release()
+
+    def partition(self, source, destination, both=False):
+        # cuts the link from the source to the destination, both directions if requested
+        self.set_rule(source, destination, **dict(self.get_rule(source, destination), partitioned=True))
+        if both:
+            self.set_rule(destination, source, **dict(self.get_rule(destination, source), partitioned=True))
+
+    def clear(self):
+        # removes all rules and heals all partitions
+        self.rule_cond.acquire()
+        self.rules = {}
+        self.rule_cond.notify_all()
+        self.rule_cond.release()
+
+    def get_rule(self, source, destination):
+        self.rule_cond.acquire()
+        for link in [(source, destination), (source, ANY), (ANY, destination), (ANY, ANY)]:
+            if link in self.rules:
+                rule = self.rules[link]
+                break
+        else:
+            rule = DEFAULT_RULE
+        self.rule_cond.release()
+        return dict(rule)
+
+    def get_rules(self):
+        self.rule_cond.acquire()
+        rules = {source + " -> " + destination : dict(rule) for (source, destination), rule in self.rules.items()}
+        self.rule_cond.release()
+        return rules
+
+    def replay(self, steps):
+        """
+        Apply the steps of a scenario at their times.
+
+        Parameters
+        ----------
+        steps : list
+            the steps sorted by 'at' (seconds after the start). A step either sets a rule
+            ('source', 'destination' and 'rule'), cuts a link ('partition' : [source, destination])
+            or removes all rules ('clear' : true).
+
+        Returns
+        -------
+        threading.Thread
+            The thread that applies the steps, it ends after the last step or when the proxy stops.
+
+        See also
+        --------
+        load_scenario   : Read the steps of a scenario from a JSON file.
+        """
+        thread = threading.Thread(target=self.apply_steps, args=(list(steps), time.monotonic()), name="Proxy_Replay")
+        thread.start()
+        return thread
+
+    def apply_steps(self, steps, start_time):
+        for step in steps:
+            self.rule_cond.acquire()
+            while self.online and time.monotonic() < start_time + step["at"]:
+                self.rule_cond.wait(start_time + step["at"] - time.monotonic())
+            online = self.online
+            self.rule_cond.release()
+            if not online:
+                break
+            if step.get("clear"):
+                self.clear()
+            elif "partition" in step:
+                self.partition(*step["partition"], both=step.get("both", False))
+            else:
+                self.set_rule(step.get("source", ANY), step.get("destination", ANY), **step.get("rule", {}))
+            self.metrics.count("proxy_steps")
+
+    ####################################### Relaying ###################################################################
+
+    def handle(self, conn):
+        """
+        Connect a server with its destination and relay the connection.
+
+        The first message of the connection names the source, the destination and
+        its port (-> ProxySocket.connect). The handshake takes one delay of both
+        directions. A handshake that cannot be read is refused.
+
+        Parameters
+        ----------
+        conn : socket object
+            the connection of the server to the proxy.
+        """
+        msg = Client.receive(conn)
+        if msg is None or not msg.startswith(PROXY_MESSAGE):
+            conn.close()
+            return
+        try:
+            source, destination, port = msg[len(PROXY_MESSAGE):].split(" ")
+            port = int(port)
+            if not 0 < port < 65536:
+                raise ValueError("invalid port " + str(port))
+        except ValueError:
+            self.refuse(conn, "invalid")
+            return
+        forward = self.get_rule(source, destination)
+        backward = self.get_rule(destination, source)
+        if forward["partitioned"] or backward["partitioned"]:
+            self.refuse(conn, "partitioned")
+            return
+        time.sleep(self.sample(forward) + self.sample(backward))
+        upstream = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        try:
+            upstream.connect((destination, port))
+        except OSError:
+            upstream.close()
+            self.refuse(conn, "unavailable")
+            return
+        try:
+            conn.sendall(CONNECTED)
+        except OSError:
+            upstream.close()
+            conn.close()
+            return
+        connection = {"sockets" : (conn, upstream), "finished" : 0, "closed" : False, "lock" : threading.Lock()}
+        self.connection_lock.acquire()
+        online = self.online
+        if online:
+            self.connections.append(connection)
+        self.connection_lock.release()
+        if not online:
+            self.close_connection(connection)
+            return
+        self.metrics.count("proxy_connections", "relayed")
+        for link, sockets in [((source, destination), (conn, upstream)), ((destination, source), (upstream, conn))]:
+            chunks = queue.Queue()
+            threading.Thread(target=self.read, args=(link, sockets[0], chunks, connection), name="Proxy_Read").start()
+            threading.Thread(target=self.write, args=(link, sockets[1], chunks, connection), name="Proxy_Write").start()
+
+    def refuse(self, conn, reason):
+        self.metrics.count("proxy_connections", reason)
+        try:
+            conn.sendall(REFUSED)
+        except OSError:
+            pass
+        conn.close()
+
+    def read(self, link, sock, chunks, connection):
+        # reads the chunks of one direction and schedules them, an empty chunk is the end
+        due = 0
+        while True:
+            try:
+                data = sock.recv(CHUNK_SIZE)
+            except OSError:
+                data = b""
+            due = self.schedule(link, len(data), due)
+            chunks.put((due, data))
+            if not data or due is None:
+                break
+
+    def schedule(self, link, size, last_due):
+        """
+        Return when a chunk that has just been read has to be delivered.
+
+        Parameters
+        ----------
+        link : tuple
+            the source and the destination of the chunk.
+        size : int
+            the number of bytes of the chunk.
+        last_due : float
+            when the chunk before has to be delivered.
+
+        Returns
+        -------
+        float
+            The monotonic time of the delivery, 'None' if the chunk has been lost too often.
+        """
+        rule = self.get_rule(*link)
+        now = time.monotonic()
+        sent = now
+        if rule["bandwidth"]:
+            # the chunk waits for the chunks before it on the same link
+            self.rule_cond.acquire()
+            sent = max(now, self.busy_until.get(link, 0)) + size / rule["bandwidth"]
+            self.busy_until[link] = sent
+            self.rule_cond.release()
+        delay = self.sample(rule)
+        timeout = RETRANSMISSION_TIMEOUT
+        losses = 0
+        while rule["loss"] and self.random.random() < rule["loss"]:
+            losses += 1
+            if losses > MAXIMUM_RETRANSMISSIONS:
+                self.metrics.count("proxy_connections", "reset")
+                return None
+            delay += timeout
+            timeout *= 2
+        if losses:
+            self.metrics.count("proxy_retransmissions", amount=losses)
+        return max(sent + delay, last_due)
+
+    def sample(self, rule):
+        # draws a delay from the distribution of the rule
+        delay = rule["delay"]
+        jitter = rule["jitter"]
+        if rule["distribution"] == "uniform":
+            delay += self.random.uniform(-jitter, jitter)
+        elif rule["distribution"] == "normal":
+            delay = self.random.gauss(delay, jitter)
+        elif rule["distribution"] == "exponential" and jitter > 0:
+            delay += self.random.expovariate(1 / jitter)
+        return max(0, delay)
+
+    def write(self, link, sock, chunks, connection):
+        # delivers the chunks of one direction when they are due and the link is not partitioned
+        while True:
+            due, data = chunks.get()
+            if due is None:
+                self.close_connection(connection)
+                break
+            self.rule_cond.acquire()
+            while self.online and not connection["closed"] and (self.get_rule(*link)["partitioned"]
+                                                                or time.monotonic() < due):
+                if self.get_rule(*link)["partitioned"]:
+                    self.rule_cond.wait(PARTITION_POLL_TIME)
+                else:
+                    self.rule_cond.wait(due - time.monotonic())
+            online = self.online and not connection["closed"]
+            self.rule_cond.release()
+            if not online:
+                break
+            if data:
+                self.metrics.observe("proxy_lateness", time.monotonic() - due)
+                self.metrics.count("proxy_bytes", link[0] + " -> " + link[1], len(data))
+            try:
+                if not data:
+                    sock.shutdown(socket.SHUT_WR)
+                    self.finish(connection)
+                    break
+                sock.sendall(data)
+            except OSError:
+                self.close_connection(connection)
+                break
+
+    def finish(self, connection):
+        # one direction has ended, the connection is closed after both
+        connection["lock"].acquire()
+        connection["finished"] += 1
+        finished = connection["finished"] == 2
+        connection["lock"].release()
+        if finished:
+            self.close_connection(connection)
+
+    def close_connection(self, connection):
+        connection["lock"].acquire()
+        closed = connection["closed"]
+        connection["closed"] = True
+        connection["lock"].release()
+        if closed:
+            return
+        for sock in connection["sockets"]:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.connection_lock.acquire()
+        if connection in self.connections:
+            self.connections.remove(connection)
+        self.connection_lock.release()
+
+    def get_connections(self):
+        self.connection_lock.acquire()
+        count = len(self.connections)
+        self.connection_lock.release()
+        return count
+
+    def get_metrics(self):
+        return self.metrics
+
+def load_scenario(path):
+    """
+    Read the steps of a scenario.
+
+    Parameters
+    ----------
+    path : str
+        the JSON file with the list of steps (-> Proxy.replay).
+
+    Returns
+    -------
+    list
+        The steps sorted by their time.
+    """
+    with open(path) as f:
+        steps = json.load(f)
+    return sorted(steps, key=lambda step: step["at"])
@@ -0,0 +1,170 @@
+"""
+The request cache class of the application.
+
+A client or a session that does not receive an answer in time sends
+its request again. Without the cache the server cannot tell that the
+request is a duplicate and a write would be appended to the log twice.
+Therefore every request of a client carries the id of the client and a
+sequence number. The server keeps the answers of the most recent requests
+and answers a retried request from the cache, without handling it again
+(-> Server.cached).
+"""
+# -*- coding: utf-8 -*-
+import threading
+import time
+import collections
+
+# estimated memory of a cached answer besides its text
+ENTRY_OVERHEAD = 256
+
+class RequestCache:
+    """
+    Note:
+    The answers are kept in the order they were used last. If the cache
+    exceeds its memory budget, the least recently used answers are evicted.
+    Answers that have not been used for longer than the time to live are evicted as well.
+    A request that is retried while it is still handled waits for the answer
+    of the first one instead of being handled twice.
+    The cache only knows the requests its own server has handled, so a retry
+    that reaches a new master after an election is handled again.
+    """
+
+    budget = 0
+    ttl = 0
+    entries = None
+    size = 0
+    hits = 0
+    misses = 0
+    evictions = 0
+    cache_cond = None
+
+    def __init__(self, budget, ttl):
+        self.budget = budget
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cache_cond = threading.Condition()
+
+    def begin(self, client, sequence, timeout=None):
+        """
+        Return the cached answer of a request or reserve the request for this call.
+
+        If the request is handled by another thread at the moment, the call
+        waits for its answer (at most timeout seconds).
+
+        Parameters
+        ----------
+        client : str
+            the id of the client that sent the request.
+        sequence : int
+            the sequence number of the request within the client.
+        timeout : float
+            the time to wait for a request that is handled at the moment.
+
+        Returns
+        -------
+        tuple of bool and str
+            True and the cached answer if the request is known ('None' if it is still
+            handled after the timeout), False and 'None' if the caller has to handle
+            the request and call finish (or abort) afterwards.
+        """
+        key = (client, sequence)
+        self.cache_cond.acquire()
+        try:
+            self.expire()
+            entry = self.entries.get(key)
+            if entry is not None and entry["answer"] is None:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while key in self.entries and self.entries[key]["answer"] is None:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        break
+                    self.cache_cond.wait(None if deadline is None else deadline - time.monotonic())
+                entry = self.entries.get(key)
+                if entry is not None and entry["answer"] is None:
+                    # the first request is still handled, the retry is not handled twice
+                    self.hits += 1
+                    return True, None
+            if entry is not None:
+                self.hits += 1
+                entry["time"] = time.monotonic()
+                self.entries.move_to_end(key)
+                return True, entry["answer"]
+            self.misses += 1
+            self.entries[key] = {"answer" : None, "size" : 0, "time" : time.monotonic()}
+            return False, None
+        finally:
+            self.cache_cond.release()
+
+    def finish(self, client, sequence, answer):
+        """
+        Cache the answer of a request that has been reserved by begin.
+
+        Parameters
+        ----------
+        client : str
+            the id of the client that sent the request.
+        sequence : int
+            the sequence number of the request within the client.
+        answer : str
+            the answer that has been sent to the client.
+        """
+        key = (client, sequence)
+        self.cache_cond.acquire()
+        entry = {"answer" : answer, "size" : len(answer) + len(str(client)) + ENTRY_OVERHEAD, "time" : time.monotonic()}
+        self.size += entry["size"] - self.entries.get(key, {"size" : 0})["size"]
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.evict()
+        self.cache_cond.notify_all()
+        self.cache_cond.release()
+
+    def abort(self, client, sequence):
+        """
+        Release a request that has been reserved by begin without caching an answer.
+        """
+        self.cache_cond.acquire()
+        entry = self.entries.pop((client, sequence), None)
+        if entry is not None:
+            self.size -= entry["size"]
+        self.cache_cond.notify_all()
+        self.cache_cond.release()
+
+    def evict(self):
+        # the cache lock has to be held by the caller
+        self.expire()
+        while self.size > self.budget:
+            # requests that are still handled are not evicted
+            key = next((key for key in self.entries if self.entries[key]["answer"] is not None), None)
+            if key is None:
+                break
+            self.size -= self.entries.pop(key)["size"]
+            self.evictions += 1
+
+    def expire(self):
+        # the cache lock has to be held by the caller
+        # the entries are ordered by their last use, so the oldest are in front
+        now = time.monotonic()
+        expired = []
+        for key, entry in self.entries.items():
+            if entry["answer"] is None:
+                # a request that is still handled does not expire, the entries behind it may
+                continue
+            if now - entry["time"] <= self.ttl:
+                break
+            expired.append(key)
+        for key in expired:
+            self.size -= self.entries.pop(key)["size"]
+            self.evictions += 1
+
+    def get_counters(self):
+        """
+        Return the hits, misses and evictions of the cache and its current size.
+        """
+        self.cache_cond.acquire()
+        counters = {"hits" : self.hits, "misses" : self.misses, "evictions" : self.evictions,
+                    "entries" : len(self.entries), "size" : self.size}
+        self.cache_cond.release()
+        return counters
@@ -0,0 +1,209 @@
+"""
+The resource tracker class of the application.
+
+A server that runs for a long time goes through many elections, every one
+of them opens sockets and starts threads. If some of them are not closed or
+do not end, the server slowly uses up its file descriptors and threads.
+The tracker counts the open sockets, pipes and other files of the process and
+its threads by their role in the server (like the profiler, -> Profiler.role)
+in a fixed interval and keeps the latest counts. If a count has grown steadily
+over the last counts, the tracker warns about a possible leak (-> growth).
+"""
+# -*- coding: utf-8 -*-
+import threading
+import collections
+import stat
+import sys
+import os
+import time
+import Profiler
+
+TRACK_INTERVAL = 10
+HISTORY_SIZE = 360
+# one hour with the default interval
+GROWTH_WINDOW = 30
+# a count is growing if it has not decreased during the last GROWTH_WINDOW counts...
+GROWTH_MINIMUM = 10
+# ...and has increased by at least GROWTH_MINIMUM
+DESCRIPTOR_DIRECTORY = "/proc/self/fd"
+MAXIMUM_DESCRIPTORS = 4096
+# the descriptors that are checked if the descriptor directory is not available (e.g. on macOS)
+
+def descriptors():
+    """
+    Count the open file descriptors of the process by their type.
+
+    Returns
+    -------
+    dict
+        The number of open sockets, pipes and other files.
+    """
+    if os.path.isdir(DESCRIPTOR_DIRECTORY):
+        fds = [int(fd) for fd in os.listdir(DESCRIPTOR_DIRECTORY)]
+    else:
+        fds = range(MAXIMUM_DESCRIPTORS)
+    counts = {"sockets" : 0, "pipes" : 0, "files" : 0}
+    for fd in fds:
+        try:
+            mode = os.fstat(fd).st_mode
+        except OSError:
+            # closed in the meantime (e.g. the descriptor of the directory listing)
+            continue
+        if stat.S_ISSOCK(mode):
+            counts["sockets"] += 1
+        elif stat.S_ISFIFO(mode):
+            counts["pipes"] += 1
+        else:
+            counts["files"] += 1
+    return counts
+
+def threads():
+    """
+    Count the live threads of the process by their role in the server.
+
+    Returns
+    -------
+    dict
+        The number of threads of every role (-> Profiler.ROLES).
+    """
+    counts = {}
+    for frame in sys._current_frames().values():
+        frames = []
+        while frame is not None:
+            frames.append((frame.f_code.co_filename, frame.f_code.co_name))
+            frame = frame.f_back
+        role = Profiler.role(frames)
+        counts[role] = counts.get(role, 0) + 1
+    return counts
+
+def snapshot():
+    # counts the resources of the process at the moment
+    counts = descriptors()
+    roles = threads()
+    counts["threads"] = sum(roles.values())
+    return {"time" : time.time(), "counts" : counts, "roles" : roles}
+
+def growth(history, window=GROWTH_WINDOW, minimum=GROWTH_MINIMUM):
+    """
+    Find the counts that have grown steadily.
+
+    Parameters
+    ----------
+    history : list of dict
+        the snapshots of the resources, the oldest one first (-> snapshot).
+    window : int
+        the number of the latest snapshots that are compared.
+    minimum : int
+        the minimal increase of a count over the window.
+
+    Returns
+    -------
+    dict
+        The increase of every count that has not decreased within the window and
+        has increased by at least the minimum.
+    """
+    if len(history) < window:
+        return {}
+    latest = list(history)[-window:]
+    grown = {}
+    for name in latest[-1]["counts"]:
+        values = [s["counts"].get(name, 0) for s in latest]
+        if all(a <= b for a, b in zip(values, values[1:])) and values[-1] - values[0] >= minimum:
+            grown[name] = values[-1] - values[0]
+    return grown
+
+class ResourceTracker:
+    """
+    Note:
+    The resources are counted for the whole process, so if several servers run
+    in the same process (e.g. in the tests), their resources are counted together.
+    A warning is given once for a growing count, and again after the count has
+    stopped growing and starts growing again.
+    """
+
+    interval = TRACK_INTERVAL
+    history = None
+    warnings = []
+    growing = {}
+    warn = None
+    tracker = None
+    stopped = None
+    tracker_lock = None
+
+    def __init__(self, interval=TRACK_INTERVAL, warn=None):
+        self.interval = interval
+        self.history = collections.deque(maxlen=HISTORY_SIZE)
+        self.warnings = []
+        self.growing = {}
+        self.warn = warn
+        self.tracker = None
+        self.stopped = threading.Event()
+        self.tracker_lock = threading.Lock()
+
+    def track(self):
+        """
+        Count the resources once and warn about the counts that have grown steadily.
+
+        Returns
+        -------
+        dict
+            The counted resources (-> snapshot).
+        """
+        current = snapshot()
+        self.tracker_lock.acquire()
+        self.history.append(current)
+        grown = growth(self.history)
+        new = [name for name in grown if name not in self.growing]
+        self.growing = grown
+        for name in new:
+            self.warnings.append((current["time"], name, grown[name]))
+        self.tracker_lock.release()
+        for name in new:
+            if self.warn is not None:
+                self.warn("the " + name + " have grown by " + str(grown[name]) + " within the last "
+                          + str(GROWTH_WINDOW) + " counts, they may leak")
+        return current
+
+    def run(self):
+        # counts the resources until the tracker is stopped
+        while not self.stopped.wait(self.interval):
+            self.track()
+
+    def start(self):
+        """
+        Count the resources in the interval from now on.
+
+        See also
+        --------
+        run     : Count the resources until the tracker is stopped.
+        """
+        if self.tracker is None:
+            self.stopped.clear()
+            tracker = threading.Thread(target=self.run, name='Resource_Tracker', daemon=True)
+            tracker.start()
+            self.tracker = tracker
+
+    def stop(self):
+        if self.tracker is not None:
+            tracker = self.tracker
+            self.tracker = None
+            self.stopped.set()
+            tracker.join()
+
+    def get_history(self):
+        self.tracker_lock.acquire()
+        history = list(self.history)
+        self.tracker_lock.release()
+        return history
+
+    def get_warnings(self):
+        self.tracker_lock.acquire()
+        warnings = list(self.warnings)
+        self.tracker_lock.release()
+        return warnings
+
+    def get_growing(self):
+        self.tracker_lock.acquire()
+        growing = dict(self.growing)
+        self.tracker_lock.release()
+        return growing
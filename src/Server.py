@@ -12,12 +12,24 @@ import socket
 import subprocess
 import threading
 import time
-import logging
 import select
 import os
 import datetime
 import operator
+import json
+import queue
 import Client
+import Store
+import WriteAheadLog
+import RequestCache
+import Events
+import Metrics
+import Exporter
+import Tracing
+import ServerLog
+import Journal
+import Clock
+import Transport
 
 HEADER = 64
 DEFAULT_SERVER_LIST = ["127.0.0.7", "127.0.0.8", "127.0.0.9"]
@@ -30,19 +42,118 @@ VOTE_MASTER_MESSAGE = "vote = "
 MASTER_CONFIRMED_MESSAGE = "The master has been confirmed"
 MASTER_DECLINED_MESSAGE = "The master has been declined"
 PING_MESSAGE = "ip = "
+PING_RECEIVED_MESSAGE = "Ping received = "
 SERVER_SHUTDOWN_EXCEPTION = "Server Shutdown"
+WRITE_MESSAGE = "write = "
+READ_MESSAGE = "read = "
+REQUEST_MESSAGE = "request = "
+BROADCAST_MESSAGE = "broadcast = "
+REPLICATE_MESSAGE = "replicate = "
+LOG_MESSAGE = "log = "
+SNAPSHOT_MESSAGE = "snapshot = "
+NOT_MASTER_MESSAGE = "not master = "
+WRITE_COMMITTED_MESSAGE = "The write has been committed"
+WRITE_DECLINED_MESSAGE = "The write has been declined"
+READ_DECLINED_MESSAGE = "The read has been declined"
+MEMBERSHIP_MESSAGE = "members = "
+MEMBERSHIP_COMMITTED_MESSAGE = "The membership change has been committed"
+MEMBERSHIP_DECLINED_MESSAGE = "The membership change has been declined"
+CONFIGURATION_KEY = "!configuration"
+# the key of the store that holds the committed configuration of the servers (-> change_membership)
+REQUEST_PENDING_MESSAGE = "The request is still handled"
+REQUEST_DECLINED_MESSAGE = "The request has been declined"
+LINEARIZABLE_READ = "linearizable"
+STALE_READ = "stale"
 
 MAXIMUM_NETWORK_ATTEMPTS = 3
 MASTER_VOTE_TIMEOUT = 20
 INITIAL_NETWORK_SEARCH_TIMEOUT = 10
 SEND_PING_TIME = 6
 WAIT_PING_TIME = 15
+MAXIMUM_REPLICATION_ATTEMPTS = 3
+REPLICATION_TIMEOUT = 6
+BATCH_WINDOW = 0.002
+BATCH_SIZE = 64
+SNAPSHOT_INTERVAL = 10000
+SNAPSHOT_CHUNK_SIZE = 64 * 1024
+SNAPSHOT_RATE = 16 * 1024 * 1024
+# shorter than the time a server waits before it searches a new master (-> find_network)
+MASTER_LEASE_TIME = INITIAL_NETWORK_SEARCH_TIMEOUT - 1
+REQUEST_CACHE_SIZE = 4 * 1024 * 1024
+REQUEST_CACHE_TTL = 300
+BROADCAST_TIMEOUT = 5
+BROADCAST_FANOUT = 16
+METRICS_PORT_OFFSET = 1
+
+def default_port():
+    # every user gets a block of ports, the server uses the first and the exporter the next one
+    uid = subprocess.check_output(['id','-u']).decode(FORMAT).strip()
+    return 20000 + (int(uid) - 1000) * 50
+
+def candidate(network, server_list, group=0):
+    """
+    Return the server of the network that is voted as master.
+
+    Parameters
+    ----------
+    network : list
+        the IP addresses of the available servers.
+    server_list : list
+        the IP addresses of all servers.
+    group : int
+        the number of the group (-> Groups.py).
+
+    Returns
+    -------
+    str
+        The maximum of the IP addresses for group 0. The order of the addresses is rotated
+        by the number of the group, so every group prefers another master.
+    """
+    ranking = sorted(set(server_list) | set(network))
+    return max(network, key=lambda ip: (ranking.index(ip) - group) % len(ranking))
+
+def is_majority(ips, server_lists):
+    """
+    Check if the given servers are more than half of every server list.
+
+    Parameters
+    ----------
+    ips : list of str
+        the IP addresses of the servers, e.g. the votes or the available servers.
+    server_lists : list of list
+        the server list and during a change of the servers also the old one (-> Server.has_majority).
+
+    Returns
+    -------
+    bool
+        True if the servers are a majority of every server list, servers that are not listed do not count.
+    """
+    ips = set(ips)
+    return all(len(ips & set(server_list)) >= int(len(server_list) / 2) + 1 for server_list in server_lists)
 
-logging.basicConfig(
-    #filename='../Example/server.log', filemode='w',
-    format='%(threadName)s:%(message)s',
-    level=logging.DEBUG,
-)
+def network_master(network_masters):
+    """
+    Return the master that more than half of the network follows.
+
+    Parameters
+    ----------
+    network_masters : dict of str and str
+        the master of every server of the network, 'None' if it has none.
+
+    Returns
+    -------
+    str
+        The IP address of the active master or 'None' if there is none (-> Server.check_network_masters).
+    """
+    master_of_network = None
+    masters = network_masters.values()
+    network_size = len(network_masters)
+    if operator.countOf(masters, "None") <= int(network_size / 2) :
+        for master in masters:
+            if master != "None":
+                if operator.countOf(masters, master) > int(network_size / 2):
+                    master_of_network = master
+    return master_of_network
 
 class Server:
     """
@@ -52,10 +163,17 @@ class Server:
     This will cause inconsistencies all over the place and should be avoided.
     The entirety of servers is stated in the server list that can be manipulated in the console
     (-> Bash.py).
+    The timeouts of the election and the heartbeat are measured by a clock (-> Clock.py) and the
+    sockets are created by a transport (-> Transport.py). Both can be passed to the server, by
+    default it uses the real time and TCP. The port and the server list can be passed as well,
+    so several networks can run next to each other (e.g. the tests -> Test/Fixtures.py).
+    Several groups of the same servers elect their own masters, if every group has its own
+    port and number (-> Groups.py).
     """
 
     ip = ""
     port = 0
+    data_dir = None
     server = None
     master_server = None
     ping_lock = None
@@ -68,18 +186,111 @@ class Server:
     network_masters = {}
     ping_targets = {}
     server_list = []
-
-    def __init__(self, ip):
+    store = None
+    term = None
+    next_index = {}
+    match_index = {}
+    replication_locks = {}
+    replication_clients = {}
+    batch_window = BATCH_WINDOW
+    batch_size = BATCH_SIZE
+    batch_cond = None
+    pending_writes = []
+    group_commit_thread = None
+    snapshot_interval = SNAPSHOT_INTERVAL
+    snapshot_rate = SNAPSHOT_RATE
+    snapshot_transfers = []
+    snapshot_lock = None
+    snapshot_buffer = None
+    lease_pings = {}
+    term_index = 0
+    synced_time = None
+    request_cache = None
+    broadcast_clients = {}
+    broadcast_lock = None
+    broadcast_listeners = []
+    events = None
+    members = []
+    metrics = None
+    exporter = None
+    tracer = None
+    election_span = None
+    vote_check_span = None
+    log = None
+    journal = None
+    idle_connections = []
+    connection_lock = None
+    clock = None
+    transport = None
+    initial_server_list = []
+    vote_lock = None
+    vote_check_thread = None
+    host = None
+    group = 0
+    joint_list = None
+    configuration = None
+    configuration_changes = []
+    configuration_lock = None
+    membership_lock = None
+
+    def __init__(self, ip, data_dir=None, log=None, clock=None, transport=None, port=None, server_list=None, group=0):
         self.server_start_time = datetime.datetime.now()
         self.server_online = True
-        uid = subprocess.check_output(['id','-u']).decode(FORMAT).strip()
-        self.port = 20000 + (int(uid) - 1000) * 50
+        if port is None:
+            port = default_port()
+        self.port = port
+        self.group = group
         self.ip = ip
+        self.data_dir = data_dir
+        self.log = ServerLog.ServerLog(ip) if log is None else log
+        self.clock = Clock.Clock() if clock is None else clock
+        self.transport = Transport.Transport() if transport is None else transport
         self.r_channel, self.w_channel = os.pipe()
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
         self.ping_lock = threading.Lock()
-        self.server_list = list(DEFAULT_SERVER_LIST)
-        self.server.bind((self.ip, self.port))
+        self.initial_server_list = list(DEFAULT_SERVER_LIST if server_list is None else server_list)
+        self.server_list = list(self.initial_server_list)
+        # the lists and dicts of the class would be shared by all servers of a process (-> Host.py)
+        self.network_attempts = 0
+        self.votes = []
+        self.network = []
+        self.requests = []
+        self.network_masters = {}
+        self.ping_targets = {}
+        self.next_index = {}
+        self.match_index = {}
+        self.replication_locks = {}
+        self.replication_clients = {}
+        self.vote_lock = threading.Lock()
+        self.vote_check_thread = None
+        self.host = None
+        self.joint_list = None
+        self.configuration = None
+        self.configuration_changes = []
+        self.configuration_lock = threading.Lock()
+        self.membership_lock = threading.Lock()
+        self.store = self.open_store()
+        self.batch_cond = threading.Condition()
+        self.pending_writes = []
+        self.snapshot_transfers = []
+        self.snapshot_lock = threading.Lock()
+        self.lease_pings = {}
+        self.request_cache = RequestCache.RequestCache(REQUEST_CACHE_SIZE, REQUEST_CACHE_TTL)
+        self.broadcast_clients = {}
+        self.broadcast_lock = threading.Lock()
+        self.broadcast_listeners = []
+        self.events = Events.EventStream(self.log)
+        self.members = []
+        self.metrics = Metrics.Metrics()
+        self.exporter = None
+        self.tracer = Tracing.Tracer(self.ip)
+        self.election_span = None
+        self.vote_check_span = None
+        self.journal = None
+        self.idle_connections = []
+        self.connection_lock = threading.Lock()
+        # a recovered store may contain a configuration that differs from the server list
+        self.update_configuration()
+        self.server = self.transport.listen(self.ip, self.port)
 
     ####################################### Handle incoming connections ################################################
 
@@ -92,18 +303,27 @@ class Server:
         The method also checks the application's pipe for shutdown commands to decide
         when to shut down the listening.
         In the beginning, another thread is created that determines all available
-        servers in the network.
+        servers in the network. While the server is listening, its log is written
+        by another thread (-> ServerLog.start).
+        If the server has been added to a host (-> Host.add), the host accepts the
+        connections of all its servers in one thread. Then the method returns as soon
+        as the server has been registered at the host.
 
         See also
         --------
         handle_client   : Handle the connection to send and receive messages from a client connection.
         find_network    : Find a network of available servers in the given environment.
+        stop_listening  : Close the listening socket of the server and stop its log.
         """
+        self.log.start()
         self.server.listen(socket.SOMAXCONN)
         self.server.setblocking(0)
-        logging.debug("Server is listening on %s", self.ip)
+        self.log.debug("server", "Server is listening on %s", self.ip)
         find_network_thread = threading.Thread(target=self.find_network, name='Find_Network')
         find_network_thread.start()
+        if self.host is not None:
+            self.host.register(self)
+            return
 
         while True:
             try:
@@ -113,20 +333,25 @@ class Server:
                     raise Exception(SERVER_SHUTDOWN_EXCEPTION)
                 conn, addr = self.server.accept()
             except KeyboardInterrupt:
-                logging.debug("\n server accept has been interrupted by KeyBoardInterrupt")
+                self.log.debug("server", "\n server accept has been interrupted by KeyBoardInterrupt")
                 # use pipe to terminate all other running threads
-                self.shutdown()
+                self.shutdown("interrupted")
                 break
             except Exception as err:
-                logging.debug(err)
-                logging.debug("server accept has been interrupted")
+                self.log.debug("server", "%s", err)
+                self.log.debug("server", "server accept has been interrupted")
                 break
             thread = threading.Thread(target=self.handle_client, args=(conn, addr))
             thread.start()
 
+        self.stop_listening()
+
+    def stop_listening(self):
+        # called by the host if the server is hosted (-> Host.py)
         self.server.close()
-        logging.debug("Server is shutting down")
+        self.log.debug("server", "Server is shutting down")
         #logging.debug(threading.enumerate())
+        self.log.stop()
 
     def handle_client(self, conn, addr):
         """
@@ -137,6 +362,12 @@ class Server:
         with a length of 'HEADER', as mentioned in the Client class. For every received
         message the associated action is performed. As the current connections are only
         from other servers, the connection is canceled after receiving the message.
+        Only the master keeps its connection open to replicate the store (-> replicate_to).
+        Every message is counted by its type (-> count_message).
+        A connection that is kept open is not answered anymore once the server has been
+        shut down, so that the master notices it. While the connection waits for the next
+        message, it is idle and is closed by a shutdown, so the thread does not wait forever
+        (-> close_idle_connections).
         In the future, this method may be extended for connections from non-server-client
         instances.
 
@@ -152,34 +383,99 @@ class Server:
         Client.send     : Send a message to the connected server.
         handle_ping     : Handle a ping message if the server is the master of the network.
         handle_votes    : Handle a master vote of another server.
+        handle_write    : Handle a write to the store if the server is the master of the network.
+        handle_replicate: Handle the replicated entries of the master.
+        handle_request  : Handle a request of a session that is answered with its id.
+        handle_broadcast: Handle a broadcast and relay it to the servers that are named in it.
+        handle_membership: Handle a change of the servers if the server is the master of the network.
         """
+        listener = self.server
+        send_lock = threading.Lock()
         connected = True
         while connected:
-            msg_length = conn.recv(HEADER).decode(FORMAT)
-            if msg_length:
+            msg_length = self.receive_idle(conn)
+            if msg_length and (not self.server_online or self.server is not listener):
+                # the server has been shut down or restarted since the connection was accepted
+                connected = False
+            elif msg_length:
                 msg_length = int(msg_length)
-                msg = conn.recv(msg_length).decode(FORMAT)
+                msg = Client.receive_exactly(conn, msg_length).decode(FORMAT)
                 if msg == DISCONNECT_MESSAGE:
+                    self.count_message("disconnect", addr[0])
                     connected = False
                     conn.send("Disconnect received".encode(FORMAT))
                 elif msg == ASK_MASTER_MESSAGE:
                     # the requestant is part of the network
+                    self.count_message("ask master", addr[0])
                     self.requests.append(addr[0])
                     conn.send(str(self.master_server).encode(FORMAT))
                     connected = False
+                elif msg.startswith(WRITE_MESSAGE):
+                    self.count_message("write", addr[0])
+                    self.handle_write(msg[len(WRITE_MESSAGE):], conn)
+                    connected = False
+                elif msg.startswith(READ_MESSAGE):
+                    self.count_message("read", addr[0])
+                    self.handle_read(msg[len(READ_MESSAGE):], conn)
+                    connected = False
+                elif msg.startswith(REPLICATE_MESSAGE):
+                    # the master keeps the connection for the next replication
+                    self.count_message("replicate", addr[0])
+                    connected = self.handle_replicate(msg[len(REPLICATE_MESSAGE):], conn)
+                elif msg.startswith(REQUEST_MESSAGE):
+                    # the requestant keeps the connection and sends further requests without waiting
+                    self.count_message("request", addr[0])
+                    threading.Thread(target=self.handle_request, args=(msg[len(REQUEST_MESSAGE):], conn, send_lock),
+                                     name='Request').start()
+                elif msg.startswith(BROADCAST_MESSAGE):
+                    # the sender keeps the connection for the next broadcast
+                    self.count_message("broadcast", addr[0])
+                    connected = self.handle_broadcast(msg[len(BROADCAST_MESSAGE):], conn)
+                elif msg.startswith(SNAPSHOT_MESSAGE):
+                    # the master keeps the connection for the next chunk
+                    self.count_message("snapshot", addr[0])
+                    self.handle_snapshot(msg[len(SNAPSHOT_MESSAGE):], conn)
+                elif msg.startswith(LOG_MESSAGE):
+                    self.count_message("log", addr[0])
+                    self.handle_log(msg[len(LOG_MESSAGE):], conn)
+                    connected = False
+                elif msg.startswith(MEMBERSHIP_MESSAGE):
+                    self.count_message("membership", addr[0])
+                    self.handle_membership(msg[len(MEMBERSHIP_MESSAGE):], conn)
+                    connected = False
                 elif PING_MESSAGE in str(msg):
+                    self.count_message("ping", str(msg[5:]))
                     self.handle_ping(str(msg[5:]), conn)
                     # msg[5:] is the ip address of the requesting server
                     connected = False
                 elif VOTE_MASTER_MESSAGE in str(msg):
+                    self.count_message("vote", Tracing.extract(str(msg[7:]))[0])
                     self.handle_votes(str(msg[7:]), conn)
                     # msg[7:] is the ip address of the requesting server
                     connected = False
                 else:
+                    self.count_message("unknown", addr[0])
                     conn.send("recieved something".encode(FORMAT))
                     connected = False
+            else:
+                # the connection has been closed on the other end
+                connected = False
         conn.close()
 
+    def receive_idle(self, conn):
+        # receives the length of the next message, the connection can be closed by a shutdown meanwhile
+        self.connection_lock.acquire()
+        self.idle_connections.append(conn)
+        self.connection_lock.release()
+        try:
+            return conn.recv(HEADER).decode(FORMAT)
+        except OSError:
+            return ""
+        finally:
+            self.connection_lock.acquire()
+            self.idle_connections.remove(conn)
+            self.connection_lock.release()
+
     def handle_ping(self, ip, conn):
         """
         Handle a ping message if the server is the master of the network.
@@ -187,6 +483,12 @@ class Server:
         If a server pings to the master, the IP address of the requesting server
         in the ping_target dictionary is set to 1. Because there may be two or more
         threads writing in the dictionary, a lock is required.
+        The time of the ping renews the lease of the master (-> has_lease). The answer
+        contains the commit index of the master, so that the requesting server knows
+        how up to date its store is (-> ping).
+        If the requesting server misses entries of the store (e.g. because it joined
+        the network or restarted), the master catches it up in another thread,
+        so that the ping is answered immediately.
 
         Parameters
         ----------
@@ -197,9 +499,462 @@ class Server:
         """
         self.ping_lock.acquire()
         self.ping_targets[ip] = 1
+        self.lease_pings[ip] = self.clock.monotonic()
         #logging.debug(self.ping_targets)
         self.ping_lock.release()
-        conn.send("Ping received".encode(FORMAT))
+        conn.send((PING_RECEIVED_MESSAGE + str(self.store.get_commit_index())).encode(FORMAT))
+        self.journal_record(Journal.MESSAGE_SENT, Journal.message_type("ping answer"), ip)
+        if self.term is not None and self.match_index.get(ip, 0) < self.store.last()[0]:
+            lock = self.replication_locks.get(ip)
+            if lock is None or not lock.locked():
+                threading.Thread(target=self.replicate_to, args=(ip,), name='Replicate').start()
+
+    def handle_write(self, payload, conn):
+        """
+        Handle a write to the store if the server is the master of the network.
+
+        The write is appended to the log of the store and replicated to
+        the network together with other writes (-> group_commit). As soon as a
+        majority of the server list (not the network!) holds the write, it is
+        committed and the requestant is informed. If the server is not the master, the
+        requestant is told which server is.
+
+        A write that carries the id of the client and a sequence number is
+        only handled once, a retry is answered from the request cache (-> cached).
+        A write that is not a valid JSON object with a key and a value is declined.
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the 'key' and the 'value' to be written and
+            optionally the 'client' id and the 'sequence' number of the write.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        See also
+        --------
+        group_commit    : Wait until the write with the given index has been committed.
+        """
+        try:
+            write = json.loads(payload)
+            client, sequence = write.get("client"), write.get("sequence")
+        except (ValueError, AttributeError):
+            self.log.debug("client", "declined malformed write %s", payload)
+            conn.sendall(Client.frame(WRITE_DECLINED_MESSAGE))
+            return
+        conn.sendall(Client.frame(self.cached(client, sequence, self.write, payload)))
+
+    def write(self, payload):
+        # see handle_write, returns the answer to the requestant
+        if self.master_server != self.ip or self.term is None:
+            return NOT_MASTER_MESSAGE + str(self.master_server)
+        try:
+            write = json.loads(payload)
+            key, value = str(write["key"]), write["value"]
+        except (ValueError, KeyError, TypeError):
+            self.log.debug("client", "declined malformed write %s", payload)
+            return WRITE_DECLINED_MESSAGE
+        if key == CONFIGURATION_KEY:
+            # only changed by the master (-> change_membership)
+            return WRITE_DECLINED_MESSAGE
+        entry = self.store.append(self.term, key, value)
+        if self.group_commit(entry["index"]):
+            return WRITE_COMMITTED_MESSAGE
+        self.log.debug("client", "write %s did not reach a majority", entry["index"])
+        return WRITE_DECLINED_MESSAGE
+
+    def handle_read(self, payload, conn):
+        """
+        Handle a read of the store.
+
+        The requestant chooses the consistency of every read. A linearizable read
+        is only answered by the master and only while it holds the lease (-> has_lease),
+        so the master does not have to ask the network whether it is still the master.
+        A new master commits the log it adopted during the election first (-> sync_store).
+        A stale read is answered by every server from its own store, as long as the store
+        has been up to date with the master within the last 'max_staleness' seconds
+        (-> ping). Without 'max_staleness' any committed value is accepted.
+        The answer contains the committed value of the key as JSON ('null' if the key
+        is unknown). If the server cannot answer the read, the requestant is told which
+        server is the master. A read that is not a valid JSON object with a key is declined.
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the 'key' to be read, the 'consistency' (LINEARIZABLE_READ
+            or STALE_READ) and optionally the 'max_staleness' in seconds.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        See also
+        --------
+        has_lease       : Check if the master may answer linearizable reads on its own.
+        """
+        conn.sendall(Client.frame(self.read(payload)))
+
+    def read(self, payload):
+        # see handle_read, returns the answer to the requestant
+        try:
+            read = json.loads(payload)
+            key, consistency = str(read["key"]), read.get("consistency", LINEARIZABLE_READ)
+            max_staleness = read.get("max_staleness")
+            if max_staleness is not None:
+                max_staleness = float(max_staleness)
+        except (ValueError, KeyError, TypeError):
+            self.log.debug("client", "declined malformed read %s", payload)
+            return READ_DECLINED_MESSAGE
+        is_master = self.master_server == self.ip and self.term is not None
+        if consistency == STALE_READ:
+            if not is_master and max_staleness is not None and (self.synced_time is None
+                    or self.clock.monotonic() - self.synced_time > max_staleness):
+                return NOT_MASTER_MESSAGE + str(self.master_server)
+        elif not is_master:
+            return NOT_MASTER_MESSAGE + str(self.master_server)
+        elif self.store.get_commit_index() < self.term_index and not self.replicate(self.term_index):
+            return READ_DECLINED_MESSAGE
+        elif not self.has_lease():
+            self.log.debug("client", "read of %s declined, the lease has expired", key)
+            return READ_DECLINED_MESSAGE
+        return json.dumps(self.store.get(key))
+
+    def cached(self, client, sequence, handler, payload):
+        """
+        Handle a request only once per client and sequence number.
+
+        The answer of a request is kept in the request cache. A retry of the request
+        is answered from the cache without calling the handler again. If the request
+        is still handled, the retry waits for its answer. Answers that name the master
+        are not kept, because the retry is supposed to be handled by the master.
+        Requests without a client id are always handled.
+
+        Parameters
+        ----------
+        client : str
+            the id of the client that sent the request or 'None'.
+        sequence : int
+            the sequence number of the request within the client.
+        handler : method
+            the method that handles the payload and returns the answer (-> write, read).
+        payload : str
+            the payload of the request.
+
+        Returns
+        -------
+        str
+            The answer of the request.
+        """
+        if client is None:
+            return handler(payload)
+        known, answer = self.request_cache.begin(client, sequence, 2 * REPLICATION_TIMEOUT)
+        if known:
+            return REQUEST_PENDING_MESSAGE if answer is None else answer
+        try:
+            answer = handler(payload)
+        except Exception:
+            self.request_cache.abort(client, sequence)
+            raise
+        if answer.startswith(NOT_MASTER_MESSAGE):
+            self.request_cache.abort(client, sequence)
+        else:
+            self.request_cache.finish(client, sequence, answer)
+        return answer
+
+    def handle_request(self, payload, conn, send_lock):
+        """
+        Handle a request of a session that is answered with its id.
+
+        A session (-> Session.py) keeps its connection open and sends further
+        requests before the former ones are answered. Every request is handled
+        in its own thread, so that the writes of one session are committed together
+        (-> group_commit). The answers are sent as soon as they are ready and are
+        matched to the requests by their id. The send lock prevents that two answers
+        are mixed up on the connection.
+        The id of a request is its sequence number within the session, so a request
+        that the session sends again is answered from the request cache (-> cached).
+        A request without a valid message is declined. If not even its id can be read,
+        the connection is closed, so the session sends its requests again.
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the 'id' of the request, the 'client' id of the session
+            and the 'message', which is a write or a read message.
+        conn : socket object
+            usable to send and receive data on the connection.
+        send_lock : lock object
+            held while an answer is sent on the connection.
+        """
+        try:
+            request = json.loads(payload)
+            request_id, message = request["id"], request.get("message")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # the answer could not be matched, the session sends its requests again on a new connection
+            self.log.debug("client", "malformed request %s, closing the connection", payload)
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+        if not isinstance(message, str):
+            self.log.debug("client", "declined malformed request %s", payload)
+            answer = REQUEST_DECLINED_MESSAGE
+        elif message.startswith(WRITE_MESSAGE):
+            answer = self.cached(request.get("client"), request_id, self.write, message[len(WRITE_MESSAGE):])
+        elif message.startswith(READ_MESSAGE):
+            answer = self.cached(request.get("client"), request_id, self.read, message[len(READ_MESSAGE):])
+        else:
+            answer = "recieved something"
+        send_lock.acquire()
+        try:
+            conn.sendall(Client.frame(json.dumps({"id" : request_id, "answer" : answer})))
+        except OSError as err:
+            # the session has been closed in the meantime
+            self.log.debug("client", "answer to request %s failed: %s", request_id, err)
+        finally:
+            send_lock.release()
+
+    def handle_replicate(self, payload, conn):
+        """
+        Handle the replicated entries of the master.
+
+        The entries are appended to the log of the store (-> Store.append_entries).
+        A replication of a master with an older term than the known one is
+        declined, because this master has already been replaced.
+
+        A malformed replication is declined and the connection is closed, the
+        master opens a new one for the next replication (-> send_replication).
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the term of the master, the entry before
+            the sent entries, the entries and the commit index of the master.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        Returns
+        -------
+        bool
+            True if the connection is kept for the next replication, False otherwise.
+        """
+        try:
+            replication = json.loads(payload)
+            term, master, commit_index = replication["term"], replication["master"], replication["commit_index"]
+            prev_index, prev_term, entries = replication["prev_index"], replication["prev_term"], replication["entries"]
+        except (ValueError, KeyError, TypeError):
+            self.log.debug("replication", "declined malformed replication, closing the connection")
+            conn.sendall(Client.frame(json.dumps({"success" : False, "index" : self.store.last()[0]})))
+            return False
+        if term < self.store.term:
+            success, index = False, self.store.last()[0]
+        else:
+            if term > self.store.term:
+                self.store.set_term(term, master)
+            success, index = self.store.append_entries(prev_index, prev_term, entries, commit_index)
+            self.update_configuration()
+            if self.store.get_commit_index() >= commit_index:
+                self.synced_time = self.clock.monotonic()
+        conn.sendall(Client.frame(json.dumps({"success" : success, "index" : index})))
+        self.store.compact(self.snapshot_interval)
+        return True
+
+    def handle_snapshot(self, payload, conn):
+        """
+        Handle a chunk of the snapshot of the master.
+
+        The snapshot is sent in chunks (-> send_snapshot). The first line
+        of the payload describes the chunk, the rest is the chunk itself.
+        The chunks are collected until the last one arrives, then the
+        snapshot is installed in the store (-> Store.install_snapshot).
+        If a chunk does not continue the collected ones, the master is
+        told where to continue. A malformed chunk is declined like a chunk
+        of an old term.
+
+        Parameters
+        ----------
+        payload : str
+            the description of the chunk as JSON object, a new line and the chunk.
+        conn : socket object
+            usable to send and receive data on the connection.
+        """
+        try:
+            header, chunk = payload.split("\n", 1)
+            header = json.loads(header)
+            term, master, index, last_term = header["term"], header["master"], header["index"], header["last_term"]
+            offset, done = header["offset"], header["done"]
+            stale = term < self.store.term
+        except (ValueError, KeyError, TypeError):
+            self.log.debug("replication", "declined malformed snapshot chunk")
+            conn.sendall(Client.frame(json.dumps({"success" : False, "offset" : 0})))
+            return
+        if stale:
+            conn.sendall(Client.frame(json.dumps({"success" : False, "offset" : 0})))
+            return
+        if offset == 0:
+            self.snapshot_buffer = {"index" : index, "chunks" : [], "length" : 0}
+        buffer = self.snapshot_buffer
+        if buffer is None or buffer["index"] != index or buffer["length"] != offset:
+            offset = buffer["length"] if buffer is not None and buffer["index"] == index else 0
+            conn.sendall(Client.frame(json.dumps({"success" : False, "offset" : offset})))
+            return
+        buffer["chunks"].append(chunk)
+        buffer["length"] += len(chunk)
+        if done:
+            self.snapshot_buffer = None
+            if term > self.store.term:
+                self.store.set_term(term, master)
+            self.store.install_snapshot(index, last_term, "".join(buffer["chunks"]))
+            self.update_configuration()
+            self.log.debug("replication", "installed snapshot up to index %s", index)
+        conn.sendall(Client.frame(json.dumps({"success" : True, "offset" : buffer["length"]})))
+
+    def handle_broadcast(self, payload, conn):
+        """
+        Handle a broadcast and relay it to the servers that are named in it.
+
+        The message is handed to the broadcast listeners (-> add_broadcast_listener),
+        which should not block. Afterwards it is relayed to the servers this server
+        is responsible for (-> fan_out). The answer contains the acknowledgement of this
+        server and of all servers it relayed to. The relaying ends a bit earlier than
+        the remaining time of the sender, so that the answer reaches it in time.
+        A malformed broadcast is answered without acknowledgements and the connection
+        is closed.
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the 'message', the servers to 'relay' to,
+            the 'fanout' and the remaining time until the 'deadline' in seconds.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        Returns
+        -------
+        bool
+            True if the connection is kept for the next broadcast, False otherwise.
+
+        See also
+        --------
+        broadcast       : Send a message to every server of the network.
+        """
+        try:
+            broadcast = json.loads(payload)
+            message, relay = broadcast["message"], broadcast["relay"]
+            remaining, fanout = float(broadcast["deadline"]), int(broadcast["fanout"])
+            if not isinstance(relay, list) or fanout < 1:
+                raise ValueError("invalid relay")
+        except (ValueError, KeyError, TypeError):
+            self.log.debug("broadcast", "declined malformed broadcast, closing the connection")
+            conn.sendall(Client.frame(json.dumps({"acks" : {}})))
+            return False
+        for listener in list(self.broadcast_listeners):
+            listener(message)
+        deadline = time.time() + remaining * 0.9
+        acks = self.fan_out(message, relay, deadline, fanout)
+        acks[self.ip] = True
+        conn.sendall(Client.frame(json.dumps({"acks" : acks})))
+        return True
+
+    def handle_log(self, index, conn):
+        """
+        Handle the request of a new master for the log of the store.
+
+        Parameters
+        ----------
+        index : str
+            the commit index of the new master. Only the entries after it are sent.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        See also
+        --------
+        sync_store      : Adopt the most recent log of the network.
+        """
+        try:
+            index = int(index)
+        except ValueError:
+            # the connection is closed without an answer, the new master skips this server
+            self.log.debug("replication", "declined malformed log request %s", index)
+            return
+        answer = {}
+        answer["index"], answer["term"] = self.store.last()
+        log = self.store.entries_from(index + 1)
+        if log is None:
+            # the new master misses entries that are only contained in the snapshot
+            snapshot_index, snapshot_term, snapshot_data = self.store.get_snapshot()
+            answer["snapshot"] = {"index" : snapshot_index, "term" : snapshot_term, "data" : snapshot_data}
+            log = self.store.entries_from(snapshot_index + 1) or (0, 0, [])
+        answer["entries"] = log[2]
+        conn.sendall(Client.frame(json.dumps(answer)))
+
+    def handle_membership(self, payload, conn):
+        """
+        Handle a change of the servers if the server is the master of the network.
+
+        A server is added to or removed from the server list of all servers. The
+        change is written into the log of the store like a write, so every server
+        switches to the new server list at the same entry of the log. It is done in
+        two steps: first the old and the new server list together (joint configuration),
+        which is committed by a majority of both lists, then the new server list alone,
+        which is committed by a majority of it. In between, every decision of the
+        network (commits, votes, the ping check) needs a majority of both lists, so the
+        old and the new servers cannot decide on their own. A removed server shuts down
+        as soon as it knows the new list (-> update_configuration). If the server is not
+        the master, the requestant is told which server is. A malformed change is declined.
+
+        Parameters
+        ----------
+        payload : str
+            a JSON object with the IP of the server to 'append' or to 'remove'.
+        conn : socket object
+            usable to send and receive data on the connection.
+
+        See also
+        --------
+        change_membership   : Commit the change of the servers.
+        request_membership  : Send a change of the servers to the master.
+        """
+        conn.sendall(Client.frame(self.change_membership(payload)))
+
+    def change_membership(self, payload):
+        # see handle_membership, returns the answer to the requestant
+        if self.master_server != self.ip or self.term is None:
+            return NOT_MASTER_MESSAGE + str(self.master_server)
+        try:
+            change = json.loads(payload)
+            append, remove = change.get("append"), change.get("remove")
+            if any(ip is not None and not isinstance(ip, str) for ip in (append, remove)):
+                raise ValueError("the IP of the server is not a string")
+        except (ValueError, AttributeError):
+            self.log.debug("election", "declined malformed membership change %s", payload)
+            return MEMBERSHIP_DECLINED_MESSAGE
+        if not self.membership_lock.acquire(blocking=False):
+            self.log.debug("election", "membership change %s declined, another change is in progress", change)
+            return MEMBERSHIP_DECLINED_MESSAGE
+        try:
+            if self.joint_list is not None:
+                # a former change has been committed later than its requestant waited, it is completed first
+                if not self.commit_configuration({"servers" : list(self.server_list), "joint" : None}):
+                    return MEMBERSHIP_DECLINED_MESSAGE
+            old = list(self.server_list)
+            new = list(old)
+            if append is not None and append not in new:
+                new.append(append)
+            elif remove is not None and remove in new and len(new) > 1:
+                new.remove(remove)
+            else:
+                return MEMBERSHIP_DECLINED_MESSAGE
+            self.log.debug("election", "changing the server list from %s to %s", old, new)
+            for configuration in [{"servers" : new, "joint" : old}, {"servers" : new, "joint" : None}]:
+                if not self.commit_configuration(configuration):
+                    self.log.debug("election", "configuration %s did not reach a majority", configuration)
+                    return MEMBERSHIP_DECLINED_MESSAGE
+            if self.ip not in self.server_list:
+                # the others know the new server list, they elect a new master
+                threading.Thread(target=self.shutdown, args=("removed",), name='Removed').start()
+            return MEMBERSHIP_COMMITTED_MESSAGE
+        finally:
+            self.membership_lock.release()
 
     def handle_votes(self, ip, conn):
         """
@@ -215,6 +970,8 @@ class Server:
         After a positive outcome of the quorum (a valid master has been elected)
         a new thread is started that will check if the other server in the network
         are online (-> ping_check).
+        The vote may carry the id of the span of the voter, the span that checks
+        the votes is linked to it (-> Tracing.extract).
 
         Parameters
         ----------
@@ -227,36 +984,54 @@ class Server:
         --------
         ping_check      : Check consistently if enough servers in the network are online.
         """
+        ip, voter_span = Tracing.extract(ip)
+        span = self.tracer.start("handle_votes", self.election_span, voter=ip)
+        self.tracer.link(span, voter_span)
+        self.tracer.link(self.vote_check_span, voter_span)
         self.votes.append(ip)
-        vote_check_thread = None
-        threads = threading.enumerate()
-        for t in threads:
-            if t.name == 'Vote_Check' and t.is_alive():
-                vote_check_thread = t
+        self.metrics.count("votes", "received")
+        self.journal_record(Journal.VOTE, Journal.VOTE_RECEIVED, ip)
+        # the vote check thread belongs to this server, other servers of the process have their own
+        self.vote_lock.acquire()
+        vote_check_thread = self.vote_check_thread
+        if vote_check_thread is None or not vote_check_thread.is_alive():
+            vote_check_thread = None
+            self.vote_check_thread = threading.current_thread()
+        self.vote_lock.release()
         if vote_check_thread:
             # if a vote check thread is present, wait until it is finished.
             vote_check_thread.join()
         else:
             #logging.debug("no checker thread active so i will be new one")
             threading.current_thread().name = 'Vote_Check'
-            start_time = time.time()
+            self.vote_check_span = self.tracer.start("vote_check", self.election_span)
+            self.tracer.link(self.vote_check_span, voter_span)
+            start_time = self.clock.time()
             while int(len(self.votes)) < int(len(self.network)):
-                time.sleep(1)
+                self.clock.sleep(1)
                 # wait till everyone has voted or timeout
-                if time.time() >=  start_time + MASTER_VOTE_TIMEOUT:
+                if self.clock.time() >=  start_time + MASTER_VOTE_TIMEOUT:
                     break
                 # eliminate dublicates in vote list
                 self.votes = list(self.eliminate_dublicates(self.votes))
 
             self.votes = list(self.eliminate_dublicates(self.votes))
+            self.metrics.observe("election_vote_check", self.clock.time() - start_time)
+            self.tracer.end(self.vote_check_span, votes=list(self.votes))
+            self.vote_check_span = None
             #logging.debug(self.votes)
 
-        if int(len(self.votes)) >= (int(len(self.server_list) / 2) + 1):
+        if self.has_majority(self.votes):
             # this check prevents split brain problems
-            logging.debug("Master eval successful. Sending info to server now")
+            self.log.debug("election", "Master eval successful. Sending info to server now")
             conn.send(MASTER_CONFIRMED_MESSAGE.encode(FORMAT))
-            self.master_server = self.ip
-            if threading.current_thread().name == 'Vote_Check':
+            self.metrics.count("votes", "confirmed")
+            self.journal_record(Journal.VOTE, Journal.VOTE_CONFIRMED, ip)
+            self.set_master(self.ip)
+            self.tracer.end(span, confirmed=True)
+            if threading.current_thread() is self.vote_check_thread:
+                self.tracer.end(self.election_span, master=self.ip)
+                self.election_span = None
             # Vote_Check thread will be the new Ping_Check thread
                 for server in self.network:
                     self.ping_targets[server] = 1
@@ -264,8 +1039,12 @@ class Server:
                 thread.start()
         else:
             conn.send(MASTER_DECLINED_MESSAGE.encode(FORMAT))
-            logging.debug("Master eval failed. Shutting down server")
-            self.shutdown()
+            self.metrics.count("votes", "declined")
+            self.journal_record(Journal.VOTE, Journal.VOTE_DECLINED, ip)
+            self.tracer.end(span, confirmed=False)
+            self.log.debug("election", "Master eval failed. Shutting down server")
+            self.events.publish(Events.QUORUM_LOST, votes=len(self.votes))
+            self.shutdown("master declined")
 
     def ping_check(self):
         """
@@ -282,24 +1061,33 @@ class Server:
         This is the case if more than half of the listed servers are online.
         Otherwise, the server will shut down itself. And this will cause the remaining
         servers to shut down aswell; the network has to be restarted.
+        Before the first check, the master adopts the most recent log of the network,
+        so that it can accept writes (-> sync_store).
+        Every check publishes which servers joined or left the network (-> update_members).
 
         See also
         --------
         handle_ping     : Handle a ping message if the server is the master of the network.
+        sync_store      : Adopt the most recent log of the network.
         """
+        self.sync_store()
+        self.members = []
+        self.update_members([sip for sip in self.network if sip != self.ip])
         while self.server_online:
-            rfds = select.select([self.r_channel], [], [], WAIT_PING_TIME)
             # blocks until the wait ping time expired or a shutdown command is written into the pipe
-            if self.r_channel in rfds[0]:
-                logging.debug("canceling ping check due to shutdown")
+            if self.clock.wait(self.r_channel, WAIT_PING_TIME):
+                self.log.debug("election", "canceling ping check due to shutdown")
                 self.server_online = False
                 break
             self.ping_lock.acquire()
+            self.journal_record(Journal.PING_TICK, value=list(self.ping_targets.values()).count(1))
 
-            if list(self.ping_targets.values()).count(1) < (int(len(self.server_list) / 2) + 1):
-                logging.debug("invalid network, shutting down")
-                self.shutdown()
+            if not self.has_majority([sip for sip in self.ping_targets if self.ping_targets[sip] == 1]):
+                self.log.debug("election", "invalid network, shutting down")
+                self.events.publish(Events.QUORUM_LOST, online=list(self.ping_targets.values()).count(1))
+                self.shutdown("invalid network")
             else:
+                self.update_members([sip for sip in self.ping_targets if self.ping_targets[sip] == 1 and sip != self.ip])
                 for ping_target in self.ping_targets.keys():
                     if ping_target not in self.network:
                         self.network.append(ping_target)
@@ -310,6 +1098,550 @@ class Server:
 
     ####################################### Handle outgoing connections ################################################
 
+    def sync_store(self):
+        """
+        Adopt the most recent log of the network.
+
+        The master is elected by its IP address and not by its log, so it may
+        miss entries that have been committed by the former master. But these
+        entries are held by a majority of the server list and therefore by at
+        least one server of the network that voted for this master. The master
+        asks every server of the network for the entries after its commit index
+        and adopts the log with the latest term (and then the longest). If the master
+        is so far behind that these entries are only contained in a snapshot,
+        it installs the snapshot first.
+        Afterwards a new term is started, which is the time of the election
+        in milliseconds. Elections are far enough apart to order the terms.
+        The adopted log may contain entries the former master has already committed,
+        therefore the master commits its log before it answers linearizable reads (-> handle_read).
+
+        See also
+        --------
+        handle_log      : Handle the request of a new master for the log of the store.
+        Store.adopt     : Replace the uncommitted part of the log with the given entries.
+        """
+        commit_index = self.store.get_commit_index()
+        last_index, last_term = self.store.last()
+        most_recent = (last_term, last_index)
+        most_recent_entries = None
+        most_recent_snapshot = None
+        for sip in list(self.network):
+            if sip != self.ip:
+                c = Client.Client(self.ip, self.transport)
+                if not c.connect(sip, self.port):
+                    continue
+                try:
+                    answer = json.loads(c.request(LOG_MESSAGE + str(commit_index)))
+                except (OSError, TypeError, ValueError):
+                    continue
+                if answer["index"] >= commit_index and (answer["term"], answer["index"]) > most_recent:
+                    most_recent = (answer["term"], answer["index"])
+                    most_recent_entries = answer["entries"]
+                    most_recent_snapshot = answer.get("snapshot")
+        if most_recent_snapshot is not None:
+            self.store.install_snapshot(most_recent_snapshot["index"], most_recent_snapshot["term"],
+                                        most_recent_snapshot["data"])
+        if most_recent_entries is not None:
+            self.store.adopt(most_recent_entries)
+        self.next_index = {}
+        self.match_index = {}
+        self.replication_locks = {}
+        self.snapshot_transfers = []
+        self.lease_pings = {}
+        self.term_index = self.store.last()[0]
+        self.close_replication_clients()
+        self.term = max(int(self.clock.time() * 1000), self.store.term + 1)
+        self.store.set_term(self.term, self.ip)
+        self.log.debug("replication", "store synchronized up to index %s, starting term %s", self.store.last()[0], self.term)
+
+    def group_commit(self, index):
+        """
+        Wait until the write with the given index has been committed.
+
+        The writes are not replicated one by one. Every write is handed
+        to the group commit thread (-> batch_writes) that replicates
+        all waiting writes together and starts it if necessary.
+
+        Parameters
+        ----------
+        index : int
+            the index of the write in the log of the store.
+
+        Returns
+        -------
+        bool
+            True if the write has been committed, False otherwise.
+
+        See also
+        --------
+        batch_writes    : Collect the waiting writes and replicate them together.
+        """
+        waiter = {"index" : index, "committed" : False, "done" : threading.Event()}
+        self.batch_cond.acquire()
+        if self.group_commit_thread is None:
+            self.group_commit_thread = threading.Thread(target=self.batch_writes, args = (), name='Group_Commit')
+            self.group_commit_thread.start()
+        self.pending_writes.append(waiter)
+        self.batch_cond.notify()
+        self.batch_cond.release()
+        waiter["done"].wait(2 * REPLICATION_TIMEOUT)
+        return waiter["committed"]
+
+    def batch_writes(self):
+        """
+        Collect the waiting writes and replicate them together.
+
+        After the first write arrives, the thread waits for the batch
+        window to expire or for the batch size to be reached. Then the
+        log is replicated once up to the last write of the batch (-> replicate),
+        which sends one message to every server of the network. All writes
+        of the batch are acknowledged with the outcome of this single majority check.
+        Writes that arrive during the replication form the next batch.
+        The thread terminates as soon as the server is not the master anymore
+        or if no write arrives for a second. A shutdown wakes the thread up and
+        waits for it to end (-> stop_group_commit).
+
+        See also
+        --------
+        replicate       : Replicate the log of the store to the network.
+        set_batch_window: Set the time the master waits for further writes.
+        set_batch_size  : Set the maximum number of writes in a batch.
+        """
+        # a restart replaces the condition and the waiting writes, the thread only handles the former ones
+        cond = self.batch_cond
+        cond.acquire()
+        pending = self.pending_writes
+        while True:
+            if not pending:
+                cond.wait(1)
+            deadline = self.clock.monotonic() + self.batch_window
+            while pending and len(pending) < self.batch_size and self.clock.monotonic() < deadline and self.server_online:
+                cond.wait(deadline - self.clock.monotonic())
+            if not pending or not self.server_online or self.term is None or cond is not self.batch_cond:
+                break
+            batch = pending[:self.batch_size]
+            del pending[:self.batch_size]
+            cond.release()
+            # the master holds the writes itself as soon as they are on disk
+            self.store.sync()
+            committed = self.replicate(max([waiter["index"] for waiter in batch]))
+            for waiter in batch:
+                waiter["committed"] = committed
+                waiter["done"].set()
+            self.store.compact(self.snapshot_interval)
+            cond.acquire()
+        # the remaining writes are declined
+        for waiter in pending:
+            waiter["done"].set()
+        del pending[:]
+        if self.group_commit_thread is threading.current_thread():
+            self.group_commit_thread = None
+        cond.release()
+
+    def replicate(self, index):
+        """
+        Replicate the log of the store to the network.
+
+        Every server of the network is updated in its own thread (-> replicate_to).
+        The entry with the given index is committed as soon as a majority of the
+        server list holds the entry (-> has_majority). The master itself always holds it.
+        Therefore the master does not wait for slow servers, if the others are enough.
+
+        Parameters
+        ----------
+        index : int
+            the index of the entry that has to be committed.
+
+        Returns
+        -------
+        bool
+            True if the entry has been committed, False otherwise.
+
+        See also
+        --------
+        replicate_to    : Send the missing entries of the log to a server of the network.
+        """
+        # during a change of the servers the new ones are not part of the network yet
+        servers = self.eliminate_dublicates(list(self.network) + self.listed_servers())
+        followers = [sip for sip in servers if sip != self.ip]
+        finished = []
+        cond = threading.Condition()
+        cond.acquire()
+        for sip in followers:
+            t = threading.Thread(target=self.replicate_to, args=(sip, cond, finished), name='Replicate')
+            t.start()
+        deadline = time.time() + REPLICATION_TIMEOUT
+        acks = [self.ip] + [sip for sip in followers if self.match_index.get(sip, 0) >= index]
+        while not self.has_majority(acks, index) and len(finished) < len(followers) and time.time() < deadline:
+            cond.wait(deadline - time.time())
+            acks = [self.ip] + [sip for sip in followers if self.match_index.get(sip, 0) >= index]
+        cond.release()
+        if self.has_majority(acks, index):
+            self.store.commit(index)
+            self.update_configuration()
+            return True
+        return False
+
+    def replicate_to(self, sip, cond=None, finished=None, commit=False):
+        """
+        Send the missing entries of the log to a server of the network.
+
+        The master remembers the next entry every server needs. If the server
+        declines the entries because it misses older ones, the master continues
+        with the index the server answered, up to MAXIMUM_REPLICATION_ATTEMPTS times.
+        Only one thread at a time replicates to the same server. Because every message
+        contains all missing entries, concurrent writes are sent together.
+        The connection to the server is kept open (-> send_replication).
+        If the server needs entries that are only contained in the snapshot,
+        the snapshot is sent in another thread (-> send_snapshot).
+
+        Parameters
+        ----------
+        sip : str
+            the IP of the server that is updated.
+        cond : condition object
+            notified when the server has been updated (-> replicate).
+        finished : list of str
+            the IPs of the servers that have been updated, the IP is added.
+        commit : bool
+            True to send the commit index even if the server holds all entries.
+
+        See also
+        --------
+        handle_replicate    : Handle the replicated entries of the master.
+        send_snapshot       : Send the snapshot of the store to a server in chunks.
+        """
+        lock = self.replication_locks.setdefault(sip, threading.Lock())
+        lock.acquire()
+        try:
+            attempts = 0
+            while attempts < MAXIMUM_REPLICATION_ATTEMPTS and self.term is not None:
+                next_index = self.next_index.get(sip, self.store.last()[0])
+                log = self.store.entries_from(next_index)
+                if log is None:
+                    # the replication locks are replaced by a new term (-> sync_store), the transfers are not
+                    self.snapshot_lock.acquire()
+                    transfer = sip not in self.snapshot_transfers
+                    if transfer:
+                        self.snapshot_transfers.append(sip)
+                    self.snapshot_lock.release()
+                    if transfer:
+                        threading.Thread(target=self.send_snapshot, args=(sip,), name='Snapshot_Transfer').start()
+                    break
+                prev_index, prev_term, entries = log
+                if not entries and not commit and self.match_index.get(sip, 0) >= prev_index:
+                    break
+                message = REPLICATE_MESSAGE + json.dumps({"term" : self.term, "master" : self.ip, "prev_index" : prev_index,
+                    "prev_term" : prev_term, "entries" : entries, "commit_index" : self.store.get_commit_index()})
+                answer = self.send_replication(sip, message)
+                if answer is None:
+                    break
+                answer = json.loads(answer)
+                self.next_index[sip] = answer["index"] + 1
+                if answer["success"]:
+                    self.match_index[sip] = answer["index"]
+                    break
+                attempts += 1
+        except (OSError, TypeError, ValueError) as err:
+            self.log.debug("replication", "replication to %s failed: %s", sip, err)
+        finally:
+            lock.release()
+            if cond is not None:
+                cond.acquire()
+                finished.append(sip)
+                cond.notify()
+                cond.release()
+
+    def commit_configuration(self, configuration):
+        """
+        Write a configuration of the servers into the log and wait until it has been committed.
+
+        From its entry on, the master commits the entries by the majorities of the
+        configuration (-> has_majority), the entry itself as well. Afterwards all
+        servers of the old and the new server list are sent the commit index at once,
+        so they switch to the configuration soon (-> update_configuration).
+
+        Parameters
+        ----------
+        configuration : dict
+            the new server list ('servers') and the old one during the joint configuration ('joint').
+
+        Returns
+        -------
+        bool
+            True if the configuration has been committed, False otherwise.
+        """
+        targets = self.eliminate_dublicates(self.listed_servers() + configuration["servers"]
+                                            + (configuration["joint"] or []))
+        entry = self.store.append(self.term, CONFIGURATION_KEY, configuration)
+        self.configuration_lock.acquire()
+        self.configuration_changes.append((entry["index"], configuration))
+        self.configuration_lock.release()
+        if not self.group_commit(entry["index"]):
+            return False
+        threads = []
+        for sip in targets:
+            if sip != self.ip:
+                t = threading.Thread(target=self.replicate_to, args=(sip, None, None, True), name='Replicate')
+                t.start()
+                threads.append(t)
+        for t in threads:
+            t.join(REPLICATION_TIMEOUT)
+        return True
+
+    def send_snapshot(self, sip):
+        """
+        Send the snapshot of the store to a server in chunks.
+
+        A server that needs entries which have already been removed from
+        the log receives the newest snapshot and only the entries after it.
+        The chunks (SNAPSHOT_CHUNK_SIZE) are sent over a separate connection
+        and the transfer is throttled to the snapshot rate, so that a large
+        snapshot neither delays the pings nor the replication to the other servers.
+        When the server has installed the snapshot, the remaining entries
+        are replicated (-> replicate_to).
+
+        Parameters
+        ----------
+        sip : str
+            the IP of the server that is updated.
+
+        See also
+        --------
+        handle_snapshot     : Handle a chunk of the snapshot of the master.
+        Store.compact       : Save a snapshot of the data.
+        """
+        index, term, snapshot_data = self.store.get_snapshot()
+        self.log.debug("replication", "sending snapshot up to index %s to %s", index, sip)
+        c = Client.Client(self.ip, self.transport)
+        installed = False
+        try:
+            if c.connect(sip, self.port):
+                offset = 0
+                start_time = time.time()
+                while self.term is not None:
+                    chunk = snapshot_data[offset:offset + SNAPSHOT_CHUNK_SIZE]
+                    done = offset + len(chunk) >= len(snapshot_data)
+                    header = json.dumps({"term" : self.term, "master" : self.ip, "index" : index,
+                        "last_term" : term, "offset" : offset, "done" : done})
+                    answer = c.exchange(SNAPSHOT_MESSAGE + header + "\n" + chunk)
+                    if answer is None:
+                        break
+                    answer = json.loads(answer)
+                    if not answer["success"] and answer["offset"] == offset:
+                        break
+                    offset = answer["offset"]
+                    if answer["success"] and done:
+                        installed = True
+                        break
+                    # throttle the transfer to the snapshot rate
+                    delay = start_time + offset / self.snapshot_rate - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+        except (OSError, ValueError) as err:
+            self.log.debug("replication", "snapshot transfer to %s failed: %s", sip, err)
+        finally:
+            c.close()
+            self.snapshot_lock.acquire()
+            if sip in self.snapshot_transfers:
+                self.snapshot_transfers.remove(sip)
+            self.snapshot_lock.release()
+        if installed:
+            self.next_index[sip] = index + 1
+            self.match_index[sip] = max(self.match_index.get(sip, 0), index)
+            self.replicate_to(sip)
+
+    def send_replication(self, sip, message):
+        """
+        Send a replication message over the open connection to a server.
+
+        If there is no open connection or the connection has been closed
+        in the meantime (e.g. because the server restarted), a new one is established.
+
+        Parameters
+        ----------
+        sip : str
+            the IP of the server that is updated.
+        message : str
+            the replication message.
+
+        Returns
+        -------
+        str
+            The answer of the server or 'None' if it is not accessible.
+        """
+        c = self.replication_clients.pop(sip, None)
+        if c is not None:
+            try:
+                answer = c.exchange(message)
+            except OSError:
+                answer = None
+            if answer is not None:
+                self.replication_clients[sip] = c
+                return answer
+            c.close()
+        c = Client.Client(self.ip, self.transport)
+        if not c.connect(sip, self.port):
+            return None
+        try:
+            answer = c.exchange(message)
+        except OSError:
+            answer = None
+        if answer is None:
+            c.close()
+        else:
+            self.replication_clients[sip] = c
+        return answer
+
+    def broadcast(self, message, timeout=BROADCAST_TIMEOUT, fanout=BROADCAST_FANOUT):
+        """
+        Send a message to every server of the network.
+
+        The servers are reached in parallel over pooled connections (-> send_broadcast).
+        If the network has more servers than the fanout, the master only sends the
+        message to 'fanout' servers, which relay it to the others (-> broadcast_tree).
+        So the master does not need a connection to every server of a large network.
+        The broadcast ends after the timeout, even if not all servers have answered.
+
+        Parameters
+        ----------
+        message : str
+            the message that is handed to the broadcast listeners of every server.
+        timeout : float
+            the time in seconds after which the broadcast ends.
+        fanout : int
+            the number of servers a server sends the message to itself.
+
+        Returns
+        -------
+        dict of str and bool
+            True for every server that acknowledged the message in time, False otherwise.
+            An empty dict if the server is not the master.
+
+        See also
+        --------
+        handle_broadcast    : Handle a broadcast and relay it to the servers that are named in it.
+        """
+        if self.master_server != self.ip or self.term is None:
+            self.log.debug("broadcast", "broadcast declined, the master is %s", self.master_server)
+            return {}
+        targets = [sip for sip in list(self.network) if sip != self.ip]
+        return self.fan_out(message, targets, time.time() + timeout, fanout)
+
+    def fan_out(self, message, targets, deadline, fanout):
+        """
+        Send a message to the given servers in parallel and collect their acknowledgements.
+
+        Every thread sends the message to one server, together with the servers that
+        this one relays it to (-> broadcast_tree). The acknowledgements that have not
+        arrived until the deadline are False.
+
+        Returns
+        -------
+        dict of str and bool
+            The acknowledgement of every target.
+        """
+        acks = {}
+        for sip in targets:
+            acks[sip] = False
+        threads = []
+        for relay, subtree in self.broadcast_tree(targets, fanout):
+            t = threading.Thread(target=self.send_broadcast, args=(relay, subtree, message, deadline, fanout, acks),
+                                 name='Broadcast')
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join(max(0, deadline - time.time()))
+        return dict(acks)
+
+    def broadcast_tree(self, targets, fanout):
+        """
+        Split the targets of a broadcast into the servers that relay the message.
+
+        If there are not more targets than the fanout, every target receives
+        the message directly. Otherwise, the targets are split into 'fanout' groups
+        of the same size. The first server of every group relays the message to
+        the rest of its group, which it splits the same way. Therefore a broadcast
+        to n servers passes about log(n) / log(fanout) servers.
+
+        Returns
+        -------
+        list of tuple of str and list of str
+            Every server the message is sent to and the servers it relays it to.
+        """
+        if len(targets) <= fanout:
+            return [(sip, []) for sip in targets]
+        size = -(-len(targets) // fanout)
+        groups = [targets[i:i + size] for i in range(0, len(targets), size)]
+        return [(group[0], group[1:]) for group in groups]
+
+    def send_broadcast(self, sip, subtree, message, deadline, fanout, acks):
+        """
+        Send a broadcast over a pooled connection to a server.
+
+        The socket waits until the deadline at most. A connection that has been used
+        successfully is put back into the pool (-> broadcast_clients) for the next broadcast.
+        A pooled connection that the server has closed in the meantime is replaced once
+        by a new one, like the connections of the replication (-> send_replication).
+
+        Parameters
+        ----------
+        sip : str
+            the IP of the server the broadcast is sent to.
+        subtree : list of str
+            the servers the broadcast is relayed to by this server.
+        acks : dict of str and bool
+            the acknowledgements of the broadcast, the answer is added.
+        """
+        broadcast = json.dumps({"message" : message, "relay" : subtree, "fanout" : fanout,
+                                "deadline" : deadline - time.time()})
+        c = self.broadcast_client(sip)
+        answer = None
+        if c is not None:
+            answer = self.exchange_broadcast(sip, c, broadcast, deadline)
+            if answer is None:
+                # the server has closed the pooled connection in the meantime (e.g. because it restarted)
+                c.close()
+        if answer is None:
+            c = Client.Client(self.ip, self.transport)
+            if not c.connect(sip, self.port):
+                return
+            answer = self.exchange_broadcast(sip, c, broadcast, deadline)
+            if answer is None:
+                c.close()
+                return
+        try:
+            answers = list(json.loads(answer)["acks"].items())
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.log.debug("broadcast", "broadcast to %s got an invalid answer: %s", sip, answer)
+            c.close()
+            return
+        self.broadcast_lock.acquire()
+        self.broadcast_clients.setdefault(sip, []).append(c)
+        self.broadcast_lock.release()
+        for ip, ack in answers:
+            if ip in acks:
+                acks[ip] = ack
+
+    def exchange_broadcast(self, sip, c, broadcast, deadline):
+        # returns the answer of the server or 'None' if the connection failed
+        try:
+            c.client.settimeout(max(0.001, deadline - time.time()))
+            answer = c.exchange(BROADCAST_MESSAGE + broadcast)
+            c.client.settimeout(None)
+        except OSError as err:
+            self.log.debug("broadcast", "broadcast to %s failed: %s", sip, err)
+            answer = None
+        return answer
+
+    def broadcast_client(self, sip):
+        # returns an idle connection of the pool, 'None' if there is none
+        self.broadcast_lock.acquire()
+        idle = self.broadcast_clients.get(sip)
+        c = idle.pop() if idle else None
+        self.broadcast_lock.release()
+        return c
+
     def find_network(self):
         """
         Find a network of available servers in the given environment.
@@ -337,19 +1669,25 @@ class Server:
 
         Notes
         -----
+        The duration of the search for the available servers is recorded (-> Metrics.observe).
+        Every phase of the election is traced as a span of the same trace (-> Tracing.py).
         The delay to start the client_thread method is important to prevent race conditions.
         Unfortunately the threading.Condition() does not eradicate these. If you catch the
         find_network method and its client_threads being stuck, increasing the delay may
         solve the error.
         """
-        time.sleep(INITIAL_NETWORK_SEARCH_TIMEOUT)
-        self.network = list(self.server_list)
+        self.clock.sleep(INITIAL_NETWORK_SEARCH_TIMEOUT)
+        start_time = self.clock.time()
+        self.network = self.listed_servers()
         self.network_masters = {}
         cond = threading.Condition()
         cond.acquire()
         thread_count = 0
         network_list = self.network
         if self.server_online:
+            if self.election_span is None:
+                self.election_span = self.tracer.start("election")
+            span = self.tracer.start("find_network", self.election_span, attempt=self.network_attempts)
             # check which servers are accessible
             for sip in network_list:
                 if sip != self.ip:
@@ -363,44 +1701,48 @@ class Server:
                 cond.wait()
                 thread_count -= 1
             cond.release()
+            self.metrics.observe("election_discovery", self.clock.time() - start_time)
+            self.tracer.end(span, network=list(self.network))
             #logging.debug(self.network)
 
-            if len(self.network) < (int(len(self.server_list)/2) + 1):
+            if not self.has_majority(self.network):
                 # not enough servers in the network, try find_network again
-                logging.debug("insufficient server in network, restarting find_network")
+                self.log.debug("election", "insufficient server in network, restarting find_network")
                 self.retry_find_network()
             else:
                 #logging.debug(self.network_masters)
-                logging.debug("checking if there is an active master in the network")
+                self.log.debug("election", "checking if there is an active master in the network")
                 active_master = self.check_network_masters()
 
                 if active_master:
                     # if there is a valid active master in the network the server will join the network
                     if active_master in self.network:
-                        self.master_server = active_master
+                        self.set_master(active_master)
                         self.ping()
                     else:
-                        logging.debug("Could not connect to the active master of the network, restarting find_network")
+                        self.log.debug("election", "Could not connect to the active master of the network, restarting find_network")
                         self.retry_find_network()
                 else:
                     # if there is no valid master in the network, the server assumes that the other servers are
                     # also looking for a network and waits until everyone has found another to ensure stability.
-                    start_time = time.time()
+                    start_time = self.clock.time()
                     network_invalid = False
-                    logging.debug("waiting for all servers to finish network config")
+                    self.log.debug("election", "waiting for all servers to finish network config")
+                    span = self.tracer.start("wait_requests", self.election_span)
 
                     while int(len(self.requests)) < int((len(self.network) - 1)):
                         #logging.debug(self.requests)
-                        if time.time() >=  start_time + MASTER_VOTE_TIMEOUT:
+                        if self.clock.time() >=  start_time + MASTER_VOTE_TIMEOUT:
                             network_invalid = True
                             break
-                        time.sleep(5)
+                        self.clock.sleep(5)
+                    self.tracer.end(span, requests=list(self.requests), timed_out=network_invalid)
 
                     if not network_invalid:
-                        logging.debug("no valid masters found in network, new master will be calculated now")
+                        self.log.debug("election", "no valid masters found in network, new master will be calculated now")
                         self.calc_master()
                     else:
-                        logging.debug("the given network is not valid, because some servers did not respond in time, restarting find_network")
+                        self.log.debug("election", "the given network is not valid, because some servers did not respond in time, restarting find_network")
                         self.retry_find_network()
 
     def client_thread(self, cond, sip, delay):
@@ -430,19 +1772,33 @@ class Server:
         --------
         Client          : The client class of the application.
         """
-        time.sleep(delay)
-        c = Client.Client(self.ip)
+        self.clock.sleep(delay)
+        span = self.tracer.start("client_thread", self.election_span, ip=sip)
+        c = Client.Client(self.ip, self.transport)
         if not c.connect(sip, self.port):
+            self.tracer.end(span, available=False)
             cond.acquire()
             self.network.remove(sip)
-            logging.debug("%s server not found.", sip)
+            self.log.debug("election", "%s server not found.", sip)
             cond.notify()
             cond.release()
         else:
-            master_of_sip = str(c.send(ASK_MASTER_MESSAGE))
+            self.journal_record(Journal.MESSAGE_SENT, Journal.message_type("ask master"), sip)
+            try:
+                master_of_sip = str(c.send(ASK_MASTER_MESSAGE))
+            except OSError as err:
+                # the server has gone in the meantime, it must not keep find_network waiting
+                self.tracer.end(span, available=False)
+                cond.acquire()
+                self.network.remove(sip)
+                self.log.debug("election", "%s server is not available anymore: %s", sip, err)
+                cond.notify()
+                cond.release()
+                return
+            self.tracer.end(span, available=True, master=master_of_sip)
             cond.acquire()
             self.network_masters[sip] = master_of_sip
-            logging.debug("%s server is available.", sip)
+            self.log.debug("election", "%s server is available.", sip)
             cond.notify()
             cond.release()
 
@@ -466,16 +1822,11 @@ class Server:
         --------
         find_network    : Find a network of available servers in the given environment.
         """
-        master_of_network = None
-        masters = self.network_masters.values()
-        network_size = len(self.network_masters)
-        if operator.countOf(masters, "None") <= int(network_size / 2) :
-            for master in masters:
-                if master != "None":
-                    if operator.countOf(masters, master) > int(network_size / 2):
-                        master_of_network = master
+        span = self.tracer.start("check_network_masters", self.election_span)
+        master_of_network = network_master(self.network_masters)
         if master_of_network is not None:
-            logging.debug('%s is valid master of network', master_of_network)
+            self.log.debug("election", '%s is valid master of network', master_of_network)
+        self.tracer.end(span, master=master_of_network)
         return master_of_network
 
     def calc_master(self):
@@ -483,7 +1834,7 @@ class Server:
         Determine the master in the current network.
 
         The method takes the maximum of the network's IP addresses
-        and votes this server as master. Therefore the master will
+        (in another order for every group -> candidate) and votes this server as master. Therefore the master will
         be elected unanimously in most use cases.
         To confirm the master, the method will create a client object
         to connect with the master and send a vote message. Only if
@@ -494,6 +1845,9 @@ class Server:
         In some cases, the server might not get any votes, except for his own.
         This will lead to a server shutdown. If the server is not reachable
         the find_network method will be restarted.
+        The time until the vote has been decided is recorded (-> Metrics.observe), also if
+        the vote has been declined or failed.
+        The vote carries the id of the span of this method, so the master can link to it.
 
         See also
         --------
@@ -501,37 +1855,55 @@ class Server:
         find_network    : Find a network of available servers in the given environment.
         Client          : The client class of the application.
         """
-        master_candidate = max(self.network)
+        master_candidate = candidate(self.network, self.server_list, self.group)
+        start_time = self.clock.time()
+        span = self.tracer.start("calc_master", self.election_span, candidate=master_candidate)
+        shutdown = False
+        available = True
+        answer = None
+        try:
+            if master_candidate == self.ip:
+                self.votes.append(self.ip)
+                self.metrics.count("votes", "own")
+                shutdown = self.clock.wait(self.r_channel, MASTER_VOTE_TIMEOUT)
+                # blocks until the master vote time expires or a shutdown command is written into the pipe
+                self.tracer.end(span, votes=len(self.votes))
+            else:
+                c = Client.Client(self.ip, self.transport)
+                available = c.connect(master_candidate, self.port)
+                if not available:
+                    self.tracer.end(span, available=False)
+                else:
+                    message = Tracing.inject(VOTE_MASTER_MESSAGE + self.ip, span)
+                    self.metrics.count("votes", "sent")
+                    self.journal_record(Journal.MESSAGE_SENT, Journal.message_type("vote"), master_candidate)
+                    answer = str(c.send(message))
+                    self.tracer.end(span, answer=answer)
+        finally:
+            # the vote has been decided, also if it has been declined or failed
+            self.metrics.observe("election_vote", self.clock.time() - start_time)
         if master_candidate == self.ip:
-            self.votes.append(self.ip)
-            rfds = select.select([self.r_channel], [], [], MASTER_VOTE_TIMEOUT)
-            # blocks until the master vote time expires or a shutdown command is written into the pipe
-            if self.r_channel in rfds[0]:
-                logging.debug("server shutdown")
+            if shutdown:
+                self.log.debug("election", "server shutdown")
             elif len(self.votes) < 2:
                 # if there are more than one vote, a vote check thread will continue the sequence
-                self.shutdown()
+                self.shutdown("no votes")
+        elif not available:
+            self.log.debug("election", "master candidate is not available anymore, removing network and retry")
+            self.requests = []
+            self.find_network()
+        elif answer == MASTER_CONFIRMED_MESSAGE:
+            self.set_master(master_candidate)
+            self.log.debug("election", "the new master of the network is: %s keeping ping connection", self.master_server)
+            self.ping()
+        elif answer == MASTER_DECLINED_MESSAGE:
+            self.log.debug("election", "master candidate vote failed. finding new network now")
+            self.requests = []
+            self.find_network()
         else:
-            c = Client.Client(self.ip)
-            if not c.connect(master_candidate, self.port):
-                logging.debug("master candidate is not available anymore, removing network and retry")
-                self.requests = []
-                self.find_network()
-            else:
-                message = VOTE_MASTER_MESSAGE + self.ip
-                answer = str(c.send(message))
-                if answer == MASTER_CONFIRMED_MESSAGE:
-                    self.master_server = master_candidate
-                    logging.debug("the new master of the network is: %s keeping ping connection", self.master_server)
-                    self.ping()
-                elif answer == MASTER_DECLINED_MESSAGE:
-                    logging.debug("master candidate vote failed. finding new network now")
-                    self.requests = []
-                    self.find_network()
-                else:
-                    # should not occur
-                    logging.debug(answer)
-                    raise Exception("unknown answer")
+            # should not occur
+            self.log.debug("election", "%s", answer)
+            raise Exception("unknown answer")
 
     def ping(self):
         """
@@ -543,6 +1915,10 @@ class Server:
         It uses a client to periodically connect to the server and confirm the
         reachability of this server to the master and the other way around by
         sending a message containing its IP address.
+        The master answers with its commit index. If the store holds all entries up to it,
+        the time is remembered to bound the staleness of reads from this server (-> handle_read).
+        The round trip time of every ping is recorded (-> Metrics.observe).
+        The first ping completes the trace of the election (-> Tracing.py).
 
         See also
         --------
@@ -553,31 +1929,44 @@ class Server:
         shutdown = False
         while True:
             try:
-                rfds = select.select([self.r_channel], [], [], SEND_PING_TIME)
                 # blocks until the send ping time expires or a shutdown command is written into the pipe
-                if self.r_channel in rfds[0]:
+                if self.clock.wait(self.r_channel, SEND_PING_TIME):
                     shutdown = True
                     raise Exception(SERVER_SHUTDOWN_EXCEPTION)
-                c = Client.Client(self.ip)
+                start_time = time.perf_counter()
+                span = self.tracer.start("first_ping", self.election_span) if self.election_span is not None else None
+                c = Client.Client(self.ip, self.transport)
                 if not c.connect(self.master_server, self.port):
+                    self.metrics.count("pings", "failed")
+                    self.tracer.end(span, available=False)
                     raise Exception("Lost connection to master server")
                 message = PING_MESSAGE + self.ip
-                answer = c.send(message)
-                logging.debug(answer)#TODO
+                self.journal_record(Journal.MESSAGE_SENT, Journal.message_type("ping"), self.master_server)
+                answer = str(c.send(message))
+                self.journal_record(Journal.MESSAGE_RECEIVED, Journal.message_type("ping answer"), self.master_server)
+                self.metrics.observe("ping_rtt", time.perf_counter() - start_time)
+                if span is not None:
+                    self.tracer.end(span, answer=answer)
+                    self.tracer.end(self.election_span, master=self.master_server)
+                    self.election_span = None
+                self.log.debug("ping", "%s", answer)
+                if answer.startswith(PING_RECEIVED_MESSAGE) and \
+                        self.store.get_commit_index() >= int(answer[len(PING_RECEIVED_MESSAGE):]):
+                    self.synced_time = self.clock.monotonic()
 
             except Exception as err:
-                logging.debug(err)
+                self.log.debug("election", "%s", err)
                 break
 
         if not shutdown:
             # master server is not accessible
-            logging.debug("starting find network again")
+            self.log.debug("election", "starting find network again")
             self.network_attempts = 0
-            self.master_server = None
+            self.set_master(None)
             self.requests = []
             self.find_network()
         else:
-            logging.debug("stopped ping connection due to server shutdown")
+            self.log.debug("election", "stopped ping connection due to server shutdown")
 
     ####################################### Getter, setter and miscellaneous ################################################
 
@@ -588,36 +1977,396 @@ class Server:
                 eliminated_dublicates.append(element)
         return eliminated_dublicates
     
+    def open_store(self):
+        """
+        Create the store of the server.
+
+        If the server has a data directory, the store persists its changes
+        in a write-ahead log in a subdirectory named after the IP of the server
+        and is recovered from it. Otherwise, the store is kept in memory only.
+
+        Returns
+        -------
+        Store object
+            The store of the server.
+        """
+        if self.data_dir is None:
+            return Store.Store()
+        wal = WriteAheadLog.WriteAheadLog(os.path.join(self.data_dir, self.ip))
+        store = Store.Store(wal)
+        self.log.debug("server", "recovered store up to index %s", store.last()[0])
+        return store
+
+    def close_replication_clients(self):
+        for c in list(self.replication_clients.values()):
+            c.close()
+        self.replication_clients = {}
+
+    def close_idle_connections(self):
+        # wakes up the threads that wait for the next message on a kept connection (-> receive_idle)
+        self.connection_lock.acquire()
+        for conn in self.idle_connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.connection_lock.release()
+
+    def stop_group_commit(self):
+        # wakes up the group commit thread, which declines the waiting writes, and waits for it (-> batch_writes)
+        self.batch_cond.acquire()
+        thread = self.group_commit_thread
+        self.batch_cond.notify()
+        self.batch_cond.release()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(REPLICATION_TIMEOUT)
+
+    def close_broadcast_clients(self):
+        self.broadcast_lock.acquire()
+        for idle in self.broadcast_clients.values():
+            for c in idle:
+                c.close()
+        self.broadcast_clients = {}
+        self.broadcast_lock.release()
+
+    def quorum(self):
+        # more than half of the servers altogether
+        return int(len(self.server_list) / 2) + 1
+
+    def listed_servers(self):
+        # the servers of the server list and during a change of the servers also the old ones
+        return self.eliminate_dublicates(list(self.server_list) + list(self.joint_list or []))
+
+    def has_majority(self, ips, index=None):
+        """
+        Check if the given servers are more than half of the server list.
+
+        During a change of the servers (-> handle_membership) they have to be more
+        than half of the old and of the new server list. The master commits an entry
+        by the configuration that has been written last before it, even if that
+        configuration has not been committed yet (-> commit_configuration).
+
+        Parameters
+        ----------
+        ips : list of str
+            the IPs of the servers, e.g. the votes or the servers that hold an entry.
+        index : int
+            the index of the entry that is committed or 'None' for the committed configuration.
+
+        Returns
+        -------
+        bool
+            True if the servers are a majority of every server list, False otherwise.
+        """
+        server_lists = [self.server_list] if self.joint_list is None else [self.server_list, self.joint_list]
+        if index is not None:
+            self.configuration_lock.acquire()
+            for change_index, configuration in self.configuration_changes:
+                if change_index <= index:
+                    server_lists = [configuration["servers"]]
+                    if configuration["joint"] is not None:
+                        server_lists.append(configuration["joint"])
+            self.configuration_lock.release()
+        return is_majority(ips, server_lists)
+
+    def update_configuration(self):
+        """
+        Switch to the configuration of the servers that has been committed last.
+
+        The configuration is an entry of the log (-> handle_membership), so all servers
+        switch at the same entry, as soon as they know that it has been committed.
+        A server that is not part of the new server list anymore shuts down, the master
+        only after it has sent the commit to the others (-> change_membership).
+        """
+        configuration = self.store.get(CONFIGURATION_KEY)
+        self.configuration_lock.acquire()
+        if configuration is None or configuration == self.configuration:
+            self.configuration_lock.release()
+            return
+        self.configuration = configuration
+        self.server_list = list(configuration["servers"])
+        self.joint_list = None if configuration["joint"] is None else list(configuration["joint"])
+        commit_index = self.store.get_commit_index()
+        self.configuration_changes = [change for change in self.configuration_changes if change[0] > commit_index]
+        self.configuration_lock.release()
+        self.log.debug("election", "switched to the server list %s (joint with %s)", list(self.server_list),
+                       self.joint_list)
+        self.metrics.count("configurations", "new" if self.joint_list is None else "joint")
+        self.events.publish(Events.MEMBERSHIP_CHANGED, servers=list(self.server_list), joint=self.joint_list is not None)
+        if self.joint_list is None and self.ip not in self.server_list and self.master_server != self.ip \
+                and self.server_online:
+            threading.Thread(target=self.shutdown, args=("removed",), name='Removed').start()
+
+    def request_membership(self, change):
+        """
+        Send a change of the servers to the master of the network (-> handle_membership).
+
+        Parameters
+        ----------
+        change : dict
+            the IP of the server to 'append' or to 'remove'.
+
+        Returns
+        -------
+        str
+            The answer of the master, NOT_MASTER_MESSAGE if the network has no master.
+
+        Note:
+        If the master of this server is outdated, the answer names the current master.
+        The change is sent to it once, like a session follows a redirect (-> Session.redirect).
+        """
+        payload = json.dumps(change)
+        master = self.master_server
+        if master == self.ip:
+            return self.change_membership(payload)
+        if master is None:
+            return NOT_MASTER_MESSAGE + str(master)
+        answer = self.send_membership(master, payload)
+        if answer.startswith(NOT_MASTER_MESSAGE):
+            master = answer[len(NOT_MASTER_MESSAGE):]
+            if master == self.ip:
+                return self.change_membership(payload)
+            if master != "None":
+                answer = self.send_membership(master, payload)
+        return answer
+
+    def send_membership(self, master, payload):
+        # returns the answer of the master, MEMBERSHIP_DECLINED_MESSAGE if it is not accessible
+        c = Client.Client(self.ip, self.transport)
+        if not c.connect(master, self.port):
+            return MEMBERSHIP_DECLINED_MESSAGE
+        try:
+            answer = c.request(MEMBERSHIP_MESSAGE + payload)
+        except OSError:
+            answer = None
+        return MEMBERSHIP_DECLINED_MESSAGE if answer is None else answer
+
+    def has_lease(self):
+        """
+        Check if the master may answer linearizable reads on its own.
+
+        Every ping of a server renews the lease of the master. A server that pinged
+        does not search a new master for at least INITIAL_NETWORK_SEARCH_TIMEOUT
+        (-> find_network), so no other master can be elected by a majority that
+        pinged within the last MASTER_LEASE_TIME seconds. The master itself always
+        counts towards this majority.
+
+        Returns
+        -------
+        bool
+            True if a majority of the server list pinged in time, False otherwise.
+        """
+        if self.master_server != self.ip or self.term is None:
+            return False
+        now = self.clock.monotonic()
+        self.ping_lock.acquire()
+        pinged = [sip for sip in self.lease_pings if sip != self.ip and now < self.lease_pings[sip] + MASTER_LEASE_TIME]
+        self.ping_lock.release()
+        return self.has_majority([self.ip] + pinged)
+
+    def set_master(self, master):
+        """
+        Remember the master of the network and publish the change as an event.
+
+        Parameters
+        ----------
+        master : str
+            the IP of the master or 'None' if the master has been lost.
+        """
+        former = self.master_server
+        self.master_server = master
+        if master == former:
+            return
+        if former is not None:
+            self.events.publish(Events.MASTER_LOST, master=former)
+            self.journal_record(Journal.STATE_CHANGE, Journal.MASTER_LOST, former)
+        if master is not None:
+            self.events.publish(Events.MASTER_ELECTED, master=master)
+            self.journal_record(Journal.STATE_CHANGE, Journal.MASTER_ELECTED, master)
+
+    def update_members(self, online):
+        """
+        Publish the servers that joined or left the network since the last update.
+
+        Parameters
+        ----------
+        online : list of str
+            the IPs of the servers that are online at the moment.
+        """
+        for sip in online:
+            if sip not in self.members:
+                self.members.append(sip)
+                self.events.publish(Events.MEMBER_JOINED, ip=sip)
+        for sip in list(self.members):
+            if sip not in online:
+                self.members.remove(sip)
+                self.events.publish(Events.MEMBER_LEFT, ip=sip)
+
+    def wait_for_master(self, timeout=None):
+        """
+        Wait until the network has a master.
+
+        Parameters
+        ----------
+        timeout : float
+            the maximum time to wait in seconds or 'None' to wait without limit.
+
+        Returns
+        -------
+        str
+            The IP address of the master or 'None' if the timeout expired.
+        """
+        events = self.events.queue()
+        try:
+            deadline = None if timeout is None else self.clock.monotonic() + timeout
+            while self.master_server is None:
+                try:
+                    events.get(timeout=None if deadline is None else max(0, deadline - self.clock.monotonic()))
+                except queue.Empty:
+                    break
+            return self.master_server
+        finally:
+            self.events.unsubscribe_queue(events)
+
+    def start_exporter(self, port=None):
+        """
+        Serve the state and the metrics of the server for a monitoring system.
+
+        The exporter answers scrapes over HTTP in its own threads (-> Exporter.py),
+        so it does not interfere with the connections of the server.
+
+        Parameters
+        ----------
+        port : int
+            the port of the exporter, by default the port next to the port of the server.
+
+        Returns
+        -------
+        bool
+            True if the exporter is listening, False if the port is not available.
+        """
+        self.stop_exporter()
+        exporter = Exporter.Exporter(self, self.port + METRICS_PORT_OFFSET if port is None else port)
+        try:
+            exporter.start()
+        except OSError as err:
+            self.log.debug("server", "exporter could not be started: %s", err)
+            return False
+        self.exporter = exporter
+        return True
+
+    def stop_exporter(self):
+        if self.exporter is not None:
+            self.exporter.stop()
+            self.exporter = None
+
+    def start_journal(self, path):
+        """
+        Write the events of the protocol into a binary journal (-> Journal.py).
+
+        The journals of all servers can be analyzed together afterwards (-> Analyzer.py).
+
+        Parameters
+        ----------
+        path : str
+            the file of the journal, an existing file is overwritten.
+
+        Returns
+        -------
+        bool
+            True if the journal has been opened, False if the file could not be written.
+        """
+        self.stop_journal()
+        try:
+            self.journal = Journal.Journal(path, self.ip)
+        except OSError as err:
+            self.log.debug("server", "journal could not be opened: %s", err)
+            return False
+        return True
+
+    def stop_journal(self):
+        if self.journal is not None:
+            journal = self.journal
+            self.journal = None
+            journal.close()
+
+    def journal_record(self, kind, detail=0, peer=None, value=0):
+        # writes a record if the journal has been started
+        journal = self.journal
+        if journal is not None:
+            journal.record(kind, detail, peer, value)
+
+    def count_message(self, label, peer):
+        # counts a received message by its type and writes it into the journal
+        self.metrics.count("messages", label)
+        self.journal_record(Journal.MESSAGE_RECEIVED, Journal.message_type(label), peer)
+
     def retry_find_network(self):
         self.network_attempts += 1
+        self.metrics.count("discovery_retries")
         if self.network_attempts == MAXIMUM_NETWORK_ATTEMPTS:
-            logging.debug("Maximum number of find_network attempts exceeded, shutting down")
-            self.shutdown()
+            self.log.debug("election", "Maximum number of find_network attempts exceeded, shutting down")
+            self.events.publish(Events.QUORUM_LOST, online=len(self.network))
+            self.shutdown("network attempts")
         else:
             self.requests = []
             self.find_network()
 
-    def shutdown(self):
+    def shutdown(self, reason="manual"):
         os.write(self.w_channel, str.encode('!'))
         self.server_online = False
-        self.master_server = None
-        logging.debug(datetime.datetime.now())
+        self.metrics.count("shutdowns", reason)
+        self.journal_record(Journal.SHUTDOWN, Journal.shutdown_reason(reason))
+        journal = self.journal
+        if journal is not None:
+            journal.flush()
+        self.tracer.end(self.election_span, shutdown=reason)
+        self.election_span = None
+        self.set_master(None)
+        self.events.publish(Events.SHUTDOWN, reason=reason)
+        self.term = None
+        self.synced_time = None
+        self.close_replication_clients()
+        self.close_broadcast_clients()
+        self.close_idle_connections()
+        self.stop_group_commit()
+        self.log.debug("server", "%s", datetime.datetime.now())
 
     def restart(self):
         self.server_start_time = datetime.datetime.now()
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
         self.server_online = True
         self.ping_lock = threading.Lock()
+        former_channels = (self.r_channel, self.w_channel)
         self.r_channel, self.w_channel = os.pipe()
-        self.server_list = list(DEFAULT_SERVER_LIST)
-        master_server = None
-        network_attempts = 0
-        votes = []
-        network = []
-        requests = []
-        network_masters = {}
-        ping_targets = {}
+        # the former pipe is closed after the new one has been opened, so their descriptors differ
+        self.close_channels(former_channels)
+        self.server_list = list(self.initial_server_list)
+        self.joint_list = None
+        self.configuration = None
+        self.configuration_changes = []
+        self.store.close()
+        self.store = self.open_store()
+        self.update_configuration()
+        self.term = None
+        self.batch_cond = threading.Condition()
+        self.pending_writes = []
+        self.group_commit_thread = None
+        self.snapshot_transfers = []
+        self.snapshot_buffer = None
+        self.lease_pings = {}
+        self.term_index = 0
+        self.synced_time = None
+        self.master_server = None
+        self.members = []
+        self.network_attempts = 0
+        self.votes = []
+        self.network = []
+        self.requests = []
+        self.network_masters = {}
+        self.ping_targets = {}
+        self.vote_check_thread = None
         try:
+            self.server = self.transport.listen(self.ip, self.port)
             self.start()
         except socket.error:
             self.server_online = False
@@ -625,12 +2374,66 @@ class Server:
     def get_server_list(self):
         return self.server_list
 
+    def get_joint_list(self):
+        return self.joint_list
+
     def get_network(self):
         return self.network
 
     def get_master(self):
         return self.master_server
 
+    def get_store(self):
+        return self.store
+
+    def add_broadcast_listener(self, listener):
+        self.broadcast_listeners.append(listener)
+
+    def get_metrics(self):
+        return self.metrics
+
+    def get_exporter(self):
+        return self.exporter
+
+    def get_tracer(self):
+        return self.tracer
+
+    def get_log(self):
+        return self.log
+
+    def get_journal(self):
+        return self.journal
+
+    def get_events(self):
+        return self.events
+
+    def get_request_cache(self):
+        return self.request_cache
+
+    def get_batch_window(self):
+        return self.batch_window
+
+    def get_batch_size(self):
+        return self.batch_size
+
+    def set_batch_window(self, window):
+        self.batch_window = window
+
+    def set_batch_size(self, size):
+        self.batch_size = size
+
+    def set_snapshot_interval(self, interval):
+        self.snapshot_interval = interval
+
+    def set_snapshot_rate(self, rate):
+        self.snapshot_rate = rate
+
+    def get_snapshot_interval(self):
+        return self.snapshot_interval
+
+    def get_snapshot_rate(self):
+        return self.snapshot_rate
+
     def get_server_start_time(self):
         return self.server_start_time
 
@@ -643,6 +2446,16 @@ class Server:
     def is_online(self):
         return self.server_online
 
+    def close_channels(self, channels):
+        for channel in channels:
+            try:
+                os.close(channel)
+            except OSError:
+                pass
+
     def close(self):
         # for testing purposes only
+        self.stop_exporter()
+        self.stop_journal()
         self.server.close()
+        self.log.stop()
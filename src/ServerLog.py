@@ -0,0 +1,223 @@
+"""
+The log class of the application.
+
+Every server has its own log, so that the servers of one process (e.g. in the tests)
+can be configured separately and nothing is configured when the module is imported.
+The messages of a server are sorted into categories (e.g. 'ping' or 'election'),
+every category has its own level. A category that logs very often (e.g. 'ping')
+can be sampled, so only every n-th message is written, and limited to a number
+of messages per second.
+While the server is running, the messages are put into a queue and written by
+another thread (-> start), so a thread of the server never waits for the output.
+Otherwise they are written directly.
+"""
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import queue
+import time
+import sys
+
+CATEGORIES = ["server", "client", "election", "ping", "replication", "broadcast"]
+LOG_FORMAT = '%(threadName)s:%(message)s'
+LOG_FILE = None
+# e.g. '../Example/server.log' to write the log of all servers into a file
+QUEUE_SIZE = 10000
+DEFAULT_SAMPLING = {"ping" : 10}
+
+def default_handler():
+    if LOG_FILE is None:
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        # the file is opened with the first message and again after the handler has been closed (-> ServerLog.stop)
+        handler = logging.FileHandler(LOG_FILE, delay=True)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+class ServerLog:
+    """
+    Note:
+    The logging threads only put the message, its arguments, the time and the name
+    of the thread into the queue. The record is created and formatted by the writing
+    thread, so the arguments should not be changed after they have been logged
+    (e.g. pass a copy of a list). If the queue is full, the message is dropped
+    and counted instead of waiting.
+    A handler that the log has created itself is closed when the log is stopped,
+    a given handler is left to its owner.
+    """
+
+    logger = None
+    handler = None
+    own_handler = False
+    levels = {}
+    sampling = {}
+    rate_limits = {}
+    sampled = {}
+    windows = {}
+    suppressed = {}
+    dropped = 0
+    records = None
+    writer = None
+    log_lock = None
+
+    def __init__(self, ip, level=logging.DEBUG, handler=None):
+        self.logger = logging.Logger("Server." + ip)
+        self.own_handler = handler is None
+        self.handler = default_handler() if handler is None else handler
+        self.levels = {category : level for category in CATEGORIES}
+        self.sampling = dict(DEFAULT_SAMPLING)
+        self.rate_limits = {}
+        self.sampled = {}
+        self.windows = {}
+        self.suppressed = {}
+        self.dropped = 0
+        self.records = queue.Queue(QUEUE_SIZE)
+        self.writer = None
+        self.log_lock = threading.Lock()
+
+    def debug(self, category, msg, *args):
+        self.log(category, logging.DEBUG, msg, *args)
+
+    def info(self, category, msg, *args):
+        self.log(category, logging.INFO, msg, *args)
+
+    def warning(self, category, msg, *args):
+        self.log(category, logging.WARNING, msg, *args)
+
+    def log(self, category, level, msg, *args):
+        """
+        Log a message of a category.
+
+        Parameters
+        ----------
+        category : str
+            the category of the message (-> CATEGORIES).
+        level : int
+            the level of the message (e.g. logging.DEBUG).
+        msg : str
+            the message, formatted with the arguments like in the logging module.
+        """
+        if level < self.levels.get(category, logging.DEBUG) or not self.admit(category):
+            return
+        message = (category, level, msg, args, time.time(), threading.current_thread().name)
+        # the lock keeps the message from being put behind the end of the queue (-> stop)
+        self.log_lock.acquire()
+        queued = self.writer is not None
+        if queued:
+            try:
+                self.records.put_nowait(message)
+            except queue.Full:
+                self.dropped += 1
+        self.log_lock.release()
+        if not queued:
+            self.handle(message)
+
+    def admit(self, category):
+        """
+        Check if a message of the category is written, regarding its sampling and rate limit.
+
+        Returns
+        -------
+        bool
+            True if the message is written, False if it is left out.
+        """
+        sampling = self.sampling.get(category)
+        rate_limit = self.rate_limits.get(category)
+        if sampling is None and rate_limit is None:
+            return True
+        self.log_lock.acquire()
+        try:
+            if sampling is not None:
+                self.sampled[category] = self.sampled.get(category, 0) + 1
+                if (self.sampled[category] - 1) % sampling != 0:
+                    return False
+            if rate_limit is not None:
+                second = int(time.monotonic())
+                window = self.windows.get(category)
+                if window is None or window[0] != second:
+                    window = self.windows[category] = [second, 0]
+                if window[1] >= rate_limit:
+                    self.suppressed[category] = self.suppressed.get(category, 0) + 1
+                    return False
+                window[1] += 1
+            return True
+        finally:
+            self.log_lock.release()
+
+    def handle(self, message):
+        # creates the record of a message and passes it to the handler
+        category, level, msg, args, created, thread_name = message
+        record = self.logger.makeRecord(self.logger.name + "." + category, level, "(unknown file)", 0, msg, args, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.threadName = thread_name
+        self.handler.handle(record)
+
+    def write(self):
+        # writes the messages of the queue until 'None' is put into it
+        while True:
+            message = self.records.get()
+            if message is None:
+                break
+            self.handle(message)
+
+    def start(self):
+        """
+        Write the messages by another thread from now on.
+
+        See also
+        --------
+        write   : Write the messages of the queue.
+        """
+        self.log_lock.acquire()
+        if self.writer is None:
+            writer = threading.Thread(target=self.write, name='Log_Writer', daemon=True)
+            writer.start()
+            self.writer = writer
+        self.log_lock.release()
+
+    def stop(self):
+        # writes the remaining messages, closes the own handler and writes the following messages directly
+        self.log_lock.acquire()
+        writer = self.writer
+        self.writer = None
+        if writer is not None:
+            # the writing thread does not need the lock to empty a full queue
+            self.records.put(None)
+        self.log_lock.release()
+        if writer is not None:
+            writer.join()
+        if self.own_handler:
+            self.handler.close()
+
+    def set_level(self, category, level):
+        self.levels[category] = level
+
+    def set_sampling(self, category, sampling):
+        # writes only every n-th message of the category, 'None' writes every message
+        if sampling is None or sampling <= 1:
+            self.sampling.pop(category, None)
+        else:
+            self.sampling[category] = sampling
+
+    def set_rate_limit(self, category, rate_limit):
+        # writes at most the given number of messages of the category per second, 'None' removes the limit
+        if rate_limit is None:
+            self.rate_limits.pop(category, None)
+        else:
+            self.rate_limits[category] = rate_limit
+
+    def get_levels(self):
+        return dict(self.levels)
+
+    def get_sampling(self):
+        return dict(self.sampling)
+
+    def get_rate_limits(self):
+        return dict(self.rate_limits)
+
+    def get_counters(self):
+        self.log_lock.acquire()
+        counters = {"dropped" : self.dropped, "suppressed" : dict(self.suppressed)}
+        self.log_lock.release()
+        return counters
@@ -0,0 +1,346 @@
+"""
+The session classes of the application.
+
+A session is used by 'real' clients of the store, in contrast to the
+client class that is used between the servers. The session keeps its
+connection to a server open and sends further requests without waiting
+for the answers of the former ones (pipelining). Every request carries
+an id and the server answers with it, so the answers are matched to the
+requests, even if they arrive in another order (-> Server.handle_request).
+If a server answers that it is not the master, the request is sent to the
+master again automatically. If the connection is closed before a request
+is answered, the request is sent again with the same id. Together with the
+id of the session, the server recognizes the retry and does not handle it
+twice (-> Server.cached).
+The Session class offers a blocking API that is based on threads, the
+AsyncSession class offers the same for asyncio.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import itertools
+import uuid
+import asyncio
+import concurrent.futures
+import json
+import Client
+
+# copied from Server.py to reproduce the message format
+REQUEST_MESSAGE = "request = "
+WRITE_MESSAGE = "write = "
+READ_MESSAGE = "read = "
+NOT_MASTER_MESSAGE = "not master = "
+LINEARIZABLE_READ = "linearizable"
+STALE_READ = "stale"
+
+MAXIMUM_REDIRECTS = 3
+MAXIMUM_RETRIES = 1
+
+def write_message(key, value):
+    return WRITE_MESSAGE + json.dumps({"key" : key, "value" : value})
+
+def read_message(key, consistency=LINEARIZABLE_READ, max_staleness=None):
+    read = {"key" : key, "consistency" : consistency}
+    if max_staleness is not None:
+        read["max_staleness"] = max_staleness
+    return READ_MESSAGE + json.dumps(read)
+
+def redirect(answer, request):
+    """
+    Return the master a request has to be sent to again.
+
+    Parameters
+    ----------
+    answer : str
+        the answer of the server.
+    request : dict
+        the pending request, its number of redirects is increased.
+
+    Returns
+    -------
+    str
+        The IP address of the master or 'None' if the answer is final.
+    """
+    if not answer.startswith(NOT_MASTER_MESSAGE) or request["redirects"] >= MAXIMUM_REDIRECTS:
+        return None
+    master = answer[len(NOT_MASTER_MESSAGE):]
+    if master == "None":
+        return None
+    request["redirects"] += 1
+    return master
+
+class Session:
+    """
+    Note:
+    Every connection has its own thread that receives the answers.
+    The futures are completed in these threads, so a callback of a future
+    should not block. If a connection is closed, all requests that wait
+    for an answer on it are sent again up to MAXIMUM_RETRIES times,
+    afterwards they fail with a ConnectionError.
+    """
+
+    client_id = None
+    ip = None
+    port = 0
+    connections = {}
+    pending = {}
+    ids = None
+    session_lock = None
+    closed = False
+
+    def __init__(self, ip, port):
+        self.client_id = uuid.uuid4().hex
+        self.ip = ip
+        self.port = port
+        self.connections = {}
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.session_lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, message):
+        """
+        Send a request without waiting for its answer.
+
+        Parameters
+        ----------
+        message : str
+            a write or a read message (-> write_message, read_message).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The future of the answer of the master.
+        """
+        future = concurrent.futures.Future()
+        self.session_lock.acquire()
+        request_id = next(self.ids)
+        self.pending[request_id] = {"future" : future, "message" : message, "redirects" : 0, "retries" : 0, "ip" : None}
+        self.session_lock.release()
+        self.send(request_id)
+        return future
+
+    def write(self, key, value, timeout=None):
+        return self.submit(write_message(key, value)).result(timeout)
+
+    def read(self, key, consistency=LINEARIZABLE_READ, max_staleness=None, timeout=None):
+        return self.submit(read_message(key, consistency, max_staleness)).result(timeout)
+
+    def get_server(self):
+        # the server the requests are sent to, it follows the redirects to the master
+        return self.ip
+
+    def set_server(self, ip):
+        self.session_lock.acquire()
+        self.ip = ip
+        self.session_lock.release()
+
+    def send(self, request_id):
+        # sends the pending request to the current server
+        self.session_lock.acquire()
+        request = self.pending.get(request_id)
+        ip = self.ip
+        try:
+            if request is None:
+                return
+            connection = self.connect(ip)
+            request["ip"] = ip
+            connection["lock"].acquire()
+        except OSError as err:
+            del self.pending[request_id]
+            request["future"].set_exception(ConnectionError(err))
+            return
+        finally:
+            self.session_lock.release()
+        try:
+            connection["socket"].sendall(Client.frame(REQUEST_MESSAGE + json.dumps({"id" : request_id,
+                "client" : self.client_id, "message" : request["message"]})))
+        except OSError:
+            # the receiving thread fails the pending requests of the connection
+            connection["socket"].close()
+        finally:
+            connection["lock"].release()
+
+    def connect(self, ip):
+        """
+        Return the open connection to the server or establish a new one.
+
+        The session lock has to be held by the caller.
+
+        Returns
+        -------
+        dict
+            The socket of the connection and the lock that is held while sending.
+        """
+        connection = self.connections.get(ip)
+        if connection is None:
+            c = Client.Client(None)
+            if not c.connect(ip, self.port):
+                raise ConnectionRefusedError("server " + ip + " is not available")
+            connection = {"socket" : c.client, "lock" : threading.Lock()}
+            self.connections[ip] = connection
+            threading.Thread(target=self.receive, args=(ip, connection), name='Session_Receive', daemon=True).start()
+        return connection
+
+    def receive(self, ip, connection):
+        """
+        Receive the answers of a server and complete the futures of the requests.
+
+        An answer that names another master is sent to it again (-> redirect).
+        """
+        while True:
+            try:
+                answer = Client.receive(connection["socket"])
+            except OSError:
+                answer = None
+            if answer is None:
+                break
+            answer = json.loads(answer)
+            self.session_lock.acquire()
+            request = self.pending.pop(answer["id"], None)
+            if request is not None:
+                master = redirect(answer["answer"], request)
+                if master is not None:
+                    self.ip = master
+                    self.pending[answer["id"]] = request
+            self.session_lock.release()
+            if request is None:
+                continue
+            if master is not None:
+                self.send(answer["id"])
+            else:
+                request["future"].set_result(answer["answer"])
+        self.session_lock.acquire()
+        if self.connections.get(ip) is connection:
+            del self.connections[ip]
+        failed = [request_id for request_id in self.pending if self.pending[request_id]["ip"] == ip]
+        retried = [request_id for request_id in failed
+                   if self.pending[request_id]["retries"] < MAXIMUM_RETRIES and not self.closed]
+        failed = [self.pending.pop(request_id) for request_id in failed if request_id not in retried]
+        for request_id in retried:
+            self.pending[request_id]["retries"] += 1
+        self.session_lock.release()
+        for request in failed:
+            request["future"].set_exception(ConnectionError("connection to " + ip + " has been closed"))
+        for request_id in retried:
+            self.send(request_id)
+
+    def close(self):
+        self.session_lock.acquire()
+        self.closed = True
+        connections = list(self.connections.values())
+        self.session_lock.release()
+        for connection in connections:
+            connection["socket"].close()
+
+class AsyncSession:
+    """
+    Note:
+    The asyncio version of the session. All methods have to be called
+    from the same event loop. Every connection has its own task that
+    receives the answers.
+    """
+
+    client_id = None
+    ip = None
+    port = 0
+    connections = {}
+    pending = {}
+    ids = None
+    connect_lock = None
+    closed = False
+
+    def __init__(self, ip, port):
+        self.client_id = uuid.uuid4().hex
+        self.ip = ip
+        self.port = port
+        self.connections = {}
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.connect_lock = asyncio.Lock()
+        self.closed = False
+
+    async def submit(self, message):
+        """
+        Send a request without waiting for its answer.
+
+        Parameters
+        ----------
+        message : str
+            a write or a read message (-> write_message, read_message).
+
+        Returns
+        -------
+        asyncio.Future
+            The future of the answer of the master.
+        """
+        future = asyncio.get_running_loop().create_future()
+        request_id = next(self.ids)
+        self.pending[request_id] = {"future" : future, "message" : message, "redirects" : 0, "retries" : 0, "ip" : None}
+        await self.send(request_id)
+        return future
+
+    async def write(self, key, value):
+        return await (await self.submit(write_message(key, value)))
+
+    async def read(self, key, consistency=LINEARIZABLE_READ, max_staleness=None):
+        return await (await self.submit(read_message(key, consistency, max_staleness)))
+
+    async def send(self, request_id):
+        # sends the pending request to the current server
+        request = self.pending[request_id]
+        ip = self.ip
+        try:
+            writer = await self.connect(ip)
+            request["ip"] = ip
+            writer.write(Client.frame(REQUEST_MESSAGE + json.dumps({"id" : request_id, "client" : self.client_id,
+                                                                   "message" : request["message"]})))
+            await writer.drain()
+        except OSError as err:
+            if self.pending.pop(request_id, None) is not None:
+                request["future"].set_exception(ConnectionError(err))
+
+    async def connect(self, ip):
+        # returns the writer of the open connection or establishes a new one
+        async with self.connect_lock:
+            if ip not in self.connections:
+                reader, writer = await asyncio.open_connection(ip, self.port)
+                self.connections[ip] = writer
+                asyncio.ensure_future(self.receive(ip, reader, writer))
+            return self.connections[ip]
+
+    async def receive(self, ip, reader, writer):
+        """
+        Receive the answers of a server and complete the futures of the requests.
+
+        An answer that names another master is sent to it again (-> redirect).
+        """
+        while True:
+            try:
+                msg_length = await reader.readexactly(Client.HEADER)
+                answer = json.loads(await reader.readexactly(int(msg_length.decode(Client.FORMAT))))
+            except (asyncio.IncompleteReadError, OSError, ValueError):
+                break
+            request = self.pending.get(answer["id"])
+            if request is None:
+                continue
+            master = redirect(answer["answer"], request)
+            if master is not None:
+                self.ip = master
+                await self.send(answer["id"])
+            else:
+                del self.pending[answer["id"]]
+                request["future"].set_result(answer["answer"])
+        if self.connections.get(ip) is writer:
+            del self.connections[ip]
+        writer.close()
+        for request_id in [request_id for request_id in self.pending if self.pending[request_id]["ip"] == ip]:
+            if self.pending[request_id]["retries"] < MAXIMUM_RETRIES and not self.closed:
+                self.pending[request_id]["retries"] += 1
+                await self.send(request_id)
+            else:
+                self.pending.pop(request_id)["future"].set_exception(ConnectionError("connection to " + ip + " has been closed"))
+
+    async def close(self):
+        self.closed = True
+        for writer in list(self.connections.values()):
+            writer.close()
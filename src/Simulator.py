@@ -0,0 +1,520 @@
+"""
+The discrete-event simulator of the election.
+
+The election of the servers (-> Server.find_network, Server.calc_master,
+Server.handle_votes, Server.ping and Server.ping_check) takes minutes with real
+sockets and sleeps and can only be run with a few loopback addresses. The simulator
+runs the same steps with the same timeouts (-> Server.INITIAL_NETWORK_SEARCH_TIMEOUT,
+Server.MASTER_VOTE_TIMEOUT, Server.SEND_PING_TIME, Server.WAIT_PING_TIME) on a virtual
+clock, so thousands of servers can be simulated in one process within seconds.
+Every server is a node that sends its messages over an in-memory network with a
+given latency and loss. The nodes decide with the rules of the server: the candidate
+(-> Server.candidate), the majority of the server list (-> Server.is_majority) and the
+active master of a network (-> Server.network_master), so a change of a rule changes
+the simulation as well. Nodes can be crashed and restarted at given times.
+The simulation records the changes of the master and the shutdowns of every node
+with the names of the events of a server (-> Events.py).
+
+Usage:
+    python3 Simulator.py <nodes> [<nodes> ...] [-seconds <s>] [-latency <s>] [-loss <p>] [-crash <s>]
+prints how the election went for every number of nodes, '-crash' crashes the master
+at the given time.
+"""
+# -*- coding: utf-8 -*-
+import heapq
+import random
+import time
+import sys
+import Server
+import Events
+
+LATENCY = 0.0005
+# one way in seconds
+JITTER = 0.0
+# a random delay of up to JITTER seconds is added to every message
+LOSS = 0.0
+# the probability that a connection fails like a refused one
+DURATION = 600
+CLIENT_THREAD_DELAY = 0.2
+# the delay between the questions for the master (-> Server.find_network)
+REQUEST_POLL_TIME = 5
+VOTE_POLL_TIME = 1
+# how often the server checks the requests and the votes
+
+def addresses(count):
+    """
+    Return the IP addresses of the given number of nodes.
+
+    The addresses are compared as strings like the servers do (-> Server.candidate),
+    so the master is not necessarily the node with the highest number.
+    """
+    if count <= 3:
+        return Server.DEFAULT_SERVER_LIST[:count]
+    return ["10." + str(i // 65536) + "." + str(i // 256 % 256) + "." + str(i % 256) for i in range(count)]
+
+def majority(count):
+    return int(count / 2) + 1
+
+class Simulation:
+    """
+    Note:
+    A callback is only called if its node has not been shut down or crashed since
+    it has been scheduled, like the threads of a server end with a shutdown.
+    A connection takes a round trip before the sender knows that it has been refused.
+    The simulation does not model the time the servers need to handle the messages.
+    """
+
+    now = 0.0
+    queue = []
+    sequence = 0
+    processed = 0
+    nodes = {}
+    latency = LATENCY
+    jitter = JITTER
+    loss = LOSS
+    random = None
+    timeline = []
+    messages = {}
+    followers = {}
+    agreed = None
+    agreed_time = None
+
+    def __init__(self, count, latency=LATENCY, jitter=JITTER, loss=LOSS, seed=0, start_spread=0.0):
+        self.now = 0.0
+        self.queue = []
+        self.sequence = 0
+        self.processed = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.timeline = []
+        self.messages = {}
+        self.followers = {}
+        self.agreed = None
+        self.agreed_time = None
+        ips = addresses(count)
+        self.nodes = {ip : Node(self, ip, ips) for ip in ips}
+        for node in self.nodes.values():
+            self.at(self.random.uniform(0, start_spread), node.start)
+
+    def schedule(self, delay, node, callback, *args):
+        # calls the callback after the delay, unless the node has been shut down meanwhile
+        self.sequence += 1
+        heapq.heappush(self.queue, (self.now + delay, self.sequence, node, node.incarnation if node else 0,
+                                    callback, args))
+
+    def at(self, when, callback, *args):
+        # calls the callback at the given time in any case (e.g. a crash)
+        self.sequence += 1
+        heapq.heappush(self.queue, (when, self.sequence, None, 0, callback, args))
+
+    def run(self, until=DURATION):
+        """
+        Process the events until the given virtual time.
+
+        Parameters
+        ----------
+        until : float
+            the virtual time in seconds the simulation ends at.
+
+        Returns
+        -------
+        float
+            The wall time the simulation took in seconds.
+        """
+        start = time.perf_counter()
+        while self.queue and self.queue[0][0] <= until:
+            when, sequence, node, incarnation, callback, args = heapq.heappop(self.queue)
+            self.now = when
+            if node is not None and (node.incarnation != incarnation or not node.online):
+                continue
+            self.processed += 1
+            callback(*args)
+        self.now = max(self.now, until)
+        return time.perf_counter() - start
+
+    def delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def send(self, sender, ip, kind, handler, answered, *args):
+        """
+        Send a message over the network and pass the answer to the sender.
+
+        Parameters
+        ----------
+        sender : Node
+            the node that sends the message.
+        ip : str
+            the IP address of the receiving node.
+        kind : str
+            the type of the message (e.g. 'vote').
+        handler : str
+            the name of the method of the receiving node that answers the message.
+        answered : function
+            gets the answer or 'None' if the connection has been refused.
+        args : arguments
+            further arguments of the handler.
+        """
+        self.messages[kind] = self.messages.get(kind, 0) + 1
+        there = self.delay()
+        receiver = self.nodes.get(ip)
+        if receiver is None or self.random.random() < self.loss:
+            self.schedule(there + self.delay(), sender, answered, None)
+            return
+        self.schedule(there, None, self.receive, sender, receiver, handler, answered, args)
+
+    def receive(self, sender, receiver, handler, answered, args):
+        if not receiver.online:
+            self.schedule(self.delay(), sender, answered, None)
+            return
+        getattr(receiver, handler)(sender, answered, *args)
+
+    def answer(self, sender, answered, answer):
+        # sends the answer back to the sender
+        self.schedule(self.delay(), sender, answered, answer)
+
+    def record(self, ip, event_type, detail=None):
+        self.timeline.append((self.now, ip, event_type, detail))
+
+    def follow(self, ip, former, master):
+        # counts the followers of every master to notice when a majority agrees
+        if former is not None:
+            self.followers[former] -= 1
+        if master is not None:
+            self.followers[master] = self.followers.get(master, 0) + 1
+            node = self.nodes[master]
+            if node.online and self.followers[master] >= majority(len(self.nodes)) and self.agreed != master:
+                self.agreed = master
+                self.agreed_time = self.now
+                self.record(master, "majority agreed", master)
+        if former is not None and former == self.agreed and self.followers[former] < majority(len(self.nodes)):
+            self.agreed = None
+
+    def crash(self, ip, when, restart_after=None):
+        """
+        Crash a node at the given time and restart it later.
+
+        Parameters
+        ----------
+        ip : str
+            the IP address of the node.
+        when : float
+            the virtual time of the crash.
+        restart_after : float
+            the seconds after the crash the node is restarted, 'None' to leave it crashed.
+        """
+        self.at(when, self.nodes[ip].shutdown, "crash")
+        if restart_after is not None:
+            self.at(when + restart_after, self.nodes[ip].restart)
+
+    def crash_master(self, when, restart_after=None):
+        # crashes the master the majority agrees on at the given time
+        def crash():
+            if self.agreed is not None:
+                self.crash(self.agreed, self.now, restart_after)
+        self.at(when, crash)
+
+    def times(self, event_type):
+        return [t for t, ip, kind, detail in self.timeline if kind == event_type]
+
+    def summary(self):
+        """
+        Summarize the simulation.
+
+        Returns
+        -------
+        dict
+            The number of nodes, the master the majority agrees on at the end, when a
+            majority agreed on a master, the nodes that are online, the shutdowns by their
+            reason, the sent messages by their type and the number of processed events.
+        """
+        shutdowns = {}
+        for t, ip, kind, detail in self.timeline:
+            if kind == Events.SHUTDOWN:
+                shutdowns[detail] = shutdowns.get(detail, 0) + 1
+        return {"nodes" : len(self.nodes), "master" : self.agreed, "agreed" : self.times("majority agreed"),
+                "online" : [node.online for node in self.nodes.values()].count(True),
+                "shutdowns" : shutdowns, "messages" : dict(self.messages), "events" : self.processed}
+
+class Node:
+    """
+    Note:
+    A node follows the steps of a server (-> Server.py) with the same names, but
+    waits by scheduling the next step instead of sleeping. The lists of the server
+    are kept the same way, even where a set would be faster (e.g. the requests),
+    so that the simulation behaves like the servers. The server list of a node does
+    not change, the changes of the servers (-> Server.handle_membership) are not simulated.
+    """
+
+    simulation = None
+    ip = None
+    server_list = []
+    online = False
+    incarnation = 0
+    master_server = None
+    network = []
+    network_masters = {}
+    requests = []
+    votes = []
+    network_attempts = 0
+    pending = 0
+    vote_check = False
+    waiting_voters = []
+    ping_targets = {}
+
+    def __init__(self, simulation, ip, server_list):
+        self.simulation = simulation
+        self.ip = ip
+        self.server_list = server_list
+        self.reset()
+
+    def reset(self):
+        self.online = False
+        self.master_server = None
+        self.network = []
+        self.network_masters = {}
+        self.requests = []
+        self.votes = []
+        self.network_attempts = 0
+        self.pending = 0
+        self.vote_check = False
+        self.waiting_voters = []
+        self.ping_targets = {}
+
+    def start(self):
+        self.online = True
+        self.simulation.schedule(Server.INITIAL_NETWORK_SEARCH_TIMEOUT, self, self.find_network)
+
+    def restart(self):
+        self.reset()
+        self.incarnation += 1
+        self.start()
+
+    def shutdown(self, reason):
+        if not self.online:
+            return
+        self.set_master(None)
+        self.online = False
+        self.incarnation += 1
+        self.simulation.record(self.ip, Events.SHUTDOWN, reason)
+
+    def set_master(self, master):
+        former = self.master_server
+        self.master_server = master
+        if master == former:
+            return
+        if former is not None:
+            self.simulation.record(self.ip, Events.MASTER_LOST, former)
+        if master is not None:
+            self.simulation.record(self.ip, Events.MASTER_ELECTED, master)
+        self.simulation.follow(self.ip, former, master)
+
+    ####################################### Handle incoming messages ###################################################
+
+    def handle_ask_master(self, sender, answered):
+        self.requests.append(sender.ip)
+        self.simulation.answer(sender, answered, str(self.master_server))
+
+    def handle_ping(self, sender, answered):
+        self.ping_targets[sender.ip] = 1
+        self.simulation.answer(sender, answered, Server.PING_RECEIVED_MESSAGE)
+
+    def handle_votes(self, sender, answered):
+        # the first vote starts the vote check, the others wait for its outcome
+        self.votes.append(sender.ip)
+        self.waiting_voters.append((sender, answered))
+        if not self.vote_check:
+            self.vote_check = True
+            self.check_votes(self.simulation.now)
+
+    def check_votes(self, start_time):
+        if len(self.votes) < len(self.network) and self.simulation.now < start_time + Server.MASTER_VOTE_TIMEOUT:
+            self.votes = list(dict.fromkeys(self.votes))
+            self.simulation.schedule(VOTE_POLL_TIME, self, self.check_votes, start_time)
+            return
+        self.votes = list(dict.fromkeys(self.votes))
+        self.vote_check = False
+        voters = self.waiting_voters
+        self.waiting_voters = []
+        if self.has_majority(self.votes):
+            for sender, answered in voters:
+                self.simulation.answer(sender, answered, Server.MASTER_CONFIRMED_MESSAGE)
+            self.set_master(self.ip)
+            for server in self.network:
+                self.ping_targets[server] = 1
+            self.simulation.schedule(Server.WAIT_PING_TIME, self, self.ping_check)
+        else:
+            for sender, answered in voters:
+                self.simulation.answer(sender, answered, Server.MASTER_DECLINED_MESSAGE)
+            self.shutdown("master declined")
+
+    def ping_check(self):
+        if not self.has_majority([sip for sip in self.ping_targets if self.ping_targets[sip] == 1]):
+            self.shutdown("invalid network")
+            return
+        for ping_target in self.ping_targets:
+            if ping_target not in self.network:
+                self.network.append(ping_target)
+            self.ping_targets[ping_target] = 0
+        self.ping_targets[self.ip] = 1
+        self.simulation.schedule(Server.WAIT_PING_TIME, self, self.ping_check)
+
+    ####################################### Handle outgoing messages ###################################################
+
+    def find_network(self):
+        self.network = list(self.server_list)
+        self.network_masters = {self.ip : str(self.master_server)}
+        others = [sip for sip in self.network if sip != self.ip]
+        self.pending = len(others)
+        if others:
+            self.client_thread(others, 0)
+        else:
+            self.network_found()
+
+    def client_thread(self, others, index):
+        # the next question is scheduled by the former one, so the queue does not hold all of them at once
+        sip = others[index]
+        if index + 1 < len(others):
+            self.simulation.schedule(CLIENT_THREAD_DELAY, self, self.client_thread, others, index + 1)
+        self.simulation.send(self, sip, "ask master", "handle_ask_master",
+                             lambda answer: self.client_answered(sip, answer))
+
+    def client_answered(self, sip, answer):
+        if answer is None:
+            self.network.remove(sip)
+        else:
+            self.network_masters[sip] = answer
+        self.pending -= 1
+        if self.pending == 0:
+            self.network_found()
+
+    def network_found(self):
+        if not self.has_majority(self.network):
+            self.retry_find_network()
+            return
+        active_master = self.check_network_masters()
+        if active_master:
+            if active_master in self.network:
+                self.set_master(active_master)
+                self.simulation.schedule(Server.SEND_PING_TIME, self, self.ping)
+            else:
+                self.retry_find_network()
+        else:
+            self.wait_requests(self.simulation.now)
+
+    def check_network_masters(self):
+        return Server.network_master(self.network_masters)
+
+    def has_majority(self, ips):
+        return Server.is_majority(ips, [self.server_list])
+
+    def wait_requests(self, start_time):
+        # waits until every server of the network has asked for the master (-> Server.find_network)
+        if len(self.requests) >= len(self.network) - 1:
+            self.calc_master()
+        elif self.simulation.now >= start_time + Server.MASTER_VOTE_TIMEOUT:
+            self.retry_find_network()
+        else:
+            self.simulation.schedule(REQUEST_POLL_TIME, self, self.wait_requests, start_time)
+
+    def calc_master(self):
+        master_candidate = Server.candidate(self.network, self.server_list)
+        if master_candidate == self.ip:
+            self.votes.append(self.ip)
+            self.simulation.schedule(Server.MASTER_VOTE_TIMEOUT, self, self.own_vote_expired)
+        else:
+            self.simulation.send(self, master_candidate, "vote", "handle_votes",
+                                 lambda answer: self.vote_answered(master_candidate, answer))
+
+    def own_vote_expired(self):
+        if len(self.votes) < 2:
+            self.shutdown("no votes")
+
+    def vote_answered(self, master_candidate, answer):
+        if answer is None:
+            self.requests = []
+            self.find_network()
+        elif answer == Server.MASTER_CONFIRMED_MESSAGE:
+            self.set_master(master_candidate)
+            self.simulation.schedule(Server.SEND_PING_TIME, self, self.ping)
+        else:
+            self.requests = []
+            self.find_network()
+
+    def ping(self):
+        self.simulation.send(self, self.master_server, "ping", "handle_ping", self.ping_answered)
+
+    def ping_answered(self, answer):
+        if answer is None:
+            # master server is not accessible
+            self.network_attempts = 0
+            self.set_master(None)
+            self.requests = []
+            self.simulation.schedule(Server.INITIAL_NETWORK_SEARCH_TIMEOUT, self, self.find_network)
+        else:
+            self.simulation.schedule(Server.SEND_PING_TIME, self, self.ping)
+
+    def retry_find_network(self):
+        self.network_attempts += 1
+        if self.network_attempts == Server.MAXIMUM_NETWORK_ATTEMPTS:
+            self.shutdown("network attempts")
+        else:
+            self.requests = []
+            self.simulation.schedule(Server.INITIAL_NETWORK_SEARCH_TIMEOUT, self, self.find_network)
+
+def simulate(count, seconds=DURATION, latency=LATENCY, loss=LOSS, crash=None):
+    """
+    Simulate the election of the given number of nodes.
+
+    Parameters
+    ----------
+    count : int
+        the number of nodes.
+    seconds : float
+        the virtual time that is simulated.
+    latency : float
+        the one way latency of the network in seconds.
+    loss : float
+        the probability that a connection fails.
+    crash : float
+        the virtual time the master is crashed at, 'None' for no crash.
+
+    Returns
+    -------
+    tuple
+        The summary of the simulation (-> Simulation.summary) and its wall time.
+    """
+    simulation = Simulation(count, latency=latency, loss=loss)
+    if crash is not None:
+        simulation.crash_master(crash)
+    wall = simulation.run(seconds)
+    return simulation.summary(), wall
+
+def main(counts, seconds=DURATION, latency=LATENCY, loss=LOSS, crash=None):
+    print("nodes ; majority agreed after s ; master ; online ; shutdowns ; messages ; events ; wall s")
+    for count in counts:
+        summary, wall = simulate(count, seconds, latency, loss, crash)
+        agreed = " ".join(str(round(t, 1)) for t in summary["agreed"]) or "-"
+        shutdowns = " ".join(reason + " " + str(n) for reason, n in summary["shutdowns"].items()) or "-"
+        print(str(count) + " ; " + agreed + " ; " + str(summary["master"]) + " ; " + str(summary["online"]) + " ; "
+              + shutdowns + " ; " + str(sum(summary["messages"].values())) + " ; " + str(summary["events"])
+              + " ; " + str(round(wall, 2)))
+
+if __name__ == "__main__":
+    counts = []
+    options = {"-seconds" : DURATION, "-latency" : LATENCY, "-loss" : LOSS, "-crash" : None}
+    arguments = sys.argv[1:]
+    while arguments:
+        argument = arguments.pop(0)
+        if argument in options and arguments:
+            options[argument] = float(arguments.pop(0))
+        elif argument.isdigit():
+            counts.append(int(argument))
+        else:
+            counts = []
+            break
+    if not counts:
+        print("usage: python3 Simulator.py <nodes> [<nodes> ...] [-seconds <s>] [-latency <s>] [-loss <p>] [-crash <s>]")
+    else:
+        main(counts, options["-seconds"], options["-latency"], options["-loss"], options["-crash"])
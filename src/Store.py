@@ -0,0 +1,399 @@
+"""
+The store class of the application.
+
+A store keeps the replicated key-value data of a server. Every write
+is appended to an ordered log first. Only when the master has confirmed
+that a majority of the server list holds an entry, the entry is committed
+and applied to the data. The followers receive the entries and the
+commit index of the master with every replication message (-> Server.replicate).
+If the store is given a write-ahead log, every change is persisted
+in it and the store is recovered from it on creation.
+From time to time the committed data is saved as a snapshot and the
+entries it contains are removed from the log (-> compact).
+"""
+# -*- coding: utf-8 -*-
+import threading
+import json
+import os
+
+SNAPSHOT_FILE = "snapshot.json"
+
+class Store:
+    """
+    Note:
+    Every entry carries the term of the master that created it. The term
+    is used to detect entries of a former master that never reached a majority.
+    These entries are overwritten as soon as the current master replicates
+    its own log (-> append_entries).
+    The write-ahead log contains one record per change of the store:
+    an appended entry, the index from which the log has been cut off,
+    the commit index and the term with the master it belongs to.
+    The snapshot is saved next to the write-ahead log. All records
+    older than the snapshot are removed from the write-ahead log.
+    """
+
+    log = None
+    data = None
+    commit_index = 0
+    snapshot_index = 0
+    snapshot_term = 0
+    snapshot_data = "{}"
+    term = 0
+    master = None
+    wal = None
+    store_lock = None
+
+    def __init__(self, wal=None):
+        self.log = []
+        self.data = {}
+        self.commit_index = 0
+        self.snapshot_index = 0
+        self.snapshot_term = 0
+        self.snapshot_data = "{}"
+        self.term = 0
+        self.master = None
+        self.store_lock = threading.Lock()
+        if wal is not None:
+            self.recover(wal)
+        self.wal = wal
+
+    def recover(self, wal):
+        """
+        Rebuild the store from the snapshot and the records of the write-ahead log.
+
+        Every entry record removes the entries with the same or a higher index,
+        because an entry is only persisted again if the log has been cut off before.
+
+        Parameters
+        ----------
+        wal : WriteAheadLog object
+            the write-ahead log the store has persisted its changes in.
+        """
+        path = os.path.join(wal.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as snapshot:
+                header = json.loads(snapshot.readline())
+                self.snapshot_data = snapshot.read()
+            self.snapshot_index = self.commit_index = header["index"]
+            self.snapshot_term = header["term"]
+            self.data = json.loads(self.snapshot_data)
+        for record in wal.records():
+            record = json.loads(record)
+            if "entry" in record:
+                if record["entry"]["index"] > self.snapshot_index:
+                    del self.log[record["entry"]["index"] - self.snapshot_index - 1:]
+                    self.log.append(record["entry"])
+            elif "truncate" in record:
+                if record["truncate"] > self.snapshot_index:
+                    del self.log[record["truncate"] - self.snapshot_index - 1:]
+            elif "commit" in record:
+                self.apply(record["commit"])
+            elif "term" in record:
+                self.term = record["term"]
+                self.master = record["master"]
+
+    def persist(self, record):
+        # the store lock has to be held by the caller
+        if self.wal is not None:
+            return self.wal.append(json.dumps(record).encode())
+        return None
+
+    def last_index(self):
+        # the store lock has to be held by the caller
+        return self.snapshot_index + len(self.log)
+
+    def term_at(self, index):
+        # the store lock has to be held by the caller
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index:
+            return None
+        return self.log[index - self.snapshot_index - 1]["term"]
+
+    def append(self, term, key, value):
+        """
+        Append a new write to the end of the log.
+
+        This is only called on the master, which decides the order of all writes.
+
+        Parameters
+        ----------
+        term : int
+            the term of the master that appends the entry.
+        key : str
+            the key that is written.
+        value : str
+            the value that is written.
+
+        Returns
+        -------
+        dict
+            The new entry of the log.
+        """
+        self.store_lock.acquire()
+        entry = {"index" : self.last_index() + 1, "term" : term, "key" : key, "value" : value}
+        self.log.append(entry)
+        self.persist({"entry" : entry})
+        self.store_lock.release()
+        return entry
+
+    def append_entries(self, prev_index, prev_term, entries, commit_index):
+        """
+        Append the entries sent by the master to the log.
+
+        The entries are only accepted if the log contains the entry
+        right before them (prev_index, prev_term). Otherwise the master has
+        to send older entries first. Entries that conflict with the master's
+        log are removed together with everything that follows them.
+        Afterwards all entries up to the master's commit index are applied.
+        The changes are synchronized to disk before the master is answered,
+        because the answer confirms that this server holds the entries.
+
+        Parameters
+        ----------
+        prev_index : int
+            the index of the entry that precedes the sent entries.
+        prev_term : int
+            the term of the entry that precedes the sent entries.
+        entries : list of dict
+            the entries to be appended.
+        commit_index : int
+            the commit index of the master.
+
+        Returns
+        -------
+        tuple of bool and int
+            True and the index of the last matching entry if the entries were
+            accepted, False and the index the master should continue with otherwise.
+        """
+        self.store_lock.acquire()
+        try:
+            if prev_index > self.last_index():
+                return False, self.last_index()
+            if prev_index >= self.snapshot_index and self.term_at(prev_index) != prev_term:
+                return False, min(prev_index - 1, self.commit_index)
+            for entry in entries:
+                index = entry["index"]
+                if index <= self.snapshot_index:
+                    # the entry is already part of the snapshot
+                    continue
+                if index <= self.last_index():
+                    if self.term_at(index) == entry["term"]:
+                        continue
+                    # a conflicting entry can never be committed, so it is removed
+                    del self.log[index - self.snapshot_index - 1:]
+                    self.persist({"truncate" : index})
+                self.log.append(entry)
+                self.persist({"entry" : entry})
+            match_index = prev_index + len(entries)
+            self.apply(min(commit_index, match_index))
+            if self.wal is not None:
+                self.wal.sync()
+            return True, match_index
+        finally:
+            self.store_lock.release()
+
+    def adopt(self, entries):
+        """
+        Replace the uncommitted part of the log with the given entries.
+
+        A new master calls this with the most recent log of the network,
+        so that no committed entry is lost during an election (-> Server.sync_store).
+
+        Parameters
+        ----------
+        entries : list of dict
+            the entries following the commit index of this store.
+        """
+        self.store_lock.acquire()
+        del self.log[self.commit_index - self.snapshot_index:]
+        self.persist({"truncate" : self.commit_index + 1})
+        for entry in entries:
+            if entry["index"] == self.last_index() + 1:
+                self.log.append(entry)
+                self.persist({"entry" : entry})
+        self.store_lock.release()
+
+    def commit(self, index):
+        """
+        Commit all entries up to the given index.
+
+        Parameters
+        ----------
+        index : int
+            the index of the last entry that is held by a majority.
+        """
+        self.store_lock.acquire()
+        self.apply(index)
+        self.store_lock.release()
+
+    def apply(self, index):
+        # the store lock has to be held by the caller
+        index = min(index, self.last_index())
+        if self.commit_index >= index:
+            return
+        while self.commit_index < index:
+            entry = self.log[self.commit_index - self.snapshot_index]
+            self.data[entry["key"]] = entry["value"]
+            self.commit_index += 1
+        self.persist({"commit" : self.commit_index})
+
+    def compact(self, interval):
+        """
+        Save a snapshot of the data if enough entries have been committed since the last one.
+
+        The committed entries are removed from the log afterwards. The snapshot
+        is kept serialized, because it is sent to followers that need
+        entries which are not in the log anymore (-> Server.send_snapshot).
+
+        Parameters
+        ----------
+        interval : int
+            the number of committed entries that have to be in the log.
+
+        Returns
+        -------
+        bool
+            True if a snapshot has been saved, False otherwise.
+        """
+        self.store_lock.acquire()
+        try:
+            if self.commit_index - self.snapshot_index < interval:
+                return False
+            term = self.term_at(self.commit_index)
+            del self.log[:self.commit_index - self.snapshot_index]
+            self.snapshot_index = self.commit_index
+            self.snapshot_term = term
+            self.snapshot_data = json.dumps(self.data)
+            self.save_snapshot()
+            return True
+        finally:
+            self.store_lock.release()
+
+    def install_snapshot(self, index, term, snapshot_data):
+        """
+        Replace the data with a snapshot of the master.
+
+        Entries after the snapshot are kept if the log contains the last
+        entry of the snapshot. Otherwise the whole log is replaced.
+
+        Parameters
+        ----------
+        index : int
+            the index of the last entry contained in the snapshot.
+        term : int
+            the term of the last entry contained in the snapshot.
+        snapshot_data : str
+            the serialized data of the snapshot.
+        """
+        self.store_lock.acquire()
+        try:
+            if index <= self.commit_index:
+                return
+            if index <= self.last_index() and self.term_at(index) == term:
+                del self.log[:index - self.snapshot_index]
+            else:
+                self.log = []
+            self.data = json.loads(snapshot_data)
+            self.snapshot_index = self.commit_index = index
+            self.snapshot_term = term
+            self.snapshot_data = snapshot_data
+            self.save_snapshot()
+        finally:
+            self.store_lock.release()
+
+    def save_snapshot(self):
+        """
+        Write the snapshot next to the write-ahead log and remove the older records.
+
+        The snapshot file is replaced atomically. Afterwards the remaining
+        entries of the log and the term are persisted again, so that all
+        older records of the write-ahead log can be removed.
+        The store lock has to be held by the caller.
+        """
+        if self.wal is None:
+            return
+        path = os.path.join(self.wal.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "w", encoding='utf-8') as snapshot:
+            snapshot.write(json.dumps({"index" : self.snapshot_index, "term" : self.snapshot_term}) + "\n")
+            snapshot.write(self.snapshot_data)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(path + ".tmp", path)
+        first = self.persist({"snapshot" : self.snapshot_index})
+        self.persist({"term" : self.term, "master" : self.master})
+        for entry in self.log:
+            self.persist({"entry" : entry})
+        self.wal.sync()
+        self.wal.truncate_before(first)
+
+    def entries_from(self, index):
+        """
+        Return the entry before the given index and all entries starting from it.
+
+        Returns
+        -------
+        tuple of int, int and list of dict
+            The index and term of the previous entry and the entries or 'None'
+            if the entries are only contained in the snapshot anymore.
+        """
+        self.store_lock.acquire()
+        try:
+            if index - 1 < self.snapshot_index:
+                return None
+            prev_index = min(index - 1, self.last_index())
+            return prev_index, self.term_at(prev_index), self.log[prev_index - self.snapshot_index:]
+        finally:
+            self.store_lock.release()
+
+    def last(self):
+        """
+        Return the index and the term of the last entry of the log.
+        """
+        self.store_lock.acquire()
+        last = (self.last_index(), self.term_at(self.last_index()))
+        self.store_lock.release()
+        return last
+
+    def get_snapshot(self):
+        """
+        Return the index and the term of the last entry of the snapshot and its data.
+        """
+        self.store_lock.acquire()
+        snapshot = (self.snapshot_index, self.snapshot_term, self.snapshot_data)
+        self.store_lock.release()
+        return snapshot
+
+    def set_term(self, term, master):
+        """
+        Remember the term of the current master.
+
+        Parameters
+        ----------
+        term : int
+            the term of the master.
+        master : str
+            the IP of the master.
+        """
+        self.store_lock.acquire()
+        self.term = term
+        self.master = master
+        self.persist({"term" : term, "master" : master})
+        self.store_lock.release()
+
+    def sync(self):
+        """
+        Synchronize the write-ahead log to disk.
+        """
+        if self.wal is not None:
+            self.wal.sync()
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def get_commit_index(self):
+        return self.commit_index
@@ -0,0 +1,190 @@
+"""
+The tracer class of the application.
+
+The tracer records the phases of an election (e.g. the search for the network
+or the vote for the master) as spans. A span has a name, the time it started and
+ended, the thread it ran in and the span it is part of (its parent). All spans
+of one election of a server belong to the same trace. A server that votes for
+a master sends the id of its span with the vote (-> Server.calc_master), so the
+span of the master that checks the votes is linked to the spans of the voters.
+The spans can be exported as JSON in the trace event format, which can be opened
+in a timeline viewer (e.g. chrome://tracing or ui.perfetto.dev). The exports of
+all servers can be merged into one file (-> merge).
+If the tracer is disabled, starting a span only returns 'None'.
+"""
+# -*- coding: utf-8 -*-
+import threading
+import itertools
+import collections
+import ipaddress
+import json
+import time
+
+TRACE_CONTEXT = " trace = "
+MAXIMUM_SPANS = 10000
+
+def inject(message, span):
+    """
+    Append the id of the span to a message, so that the receiver can link to it.
+
+    Parameters
+    ----------
+    message : str
+        the message that is sent.
+    span : dict
+        the span the message is sent in or 'None' if tracing is disabled.
+
+    Returns
+    -------
+    str
+        The message with the id of the span.
+    """
+    if span is None:
+        return message
+    return message + TRACE_CONTEXT + span["id"]
+
+def extract(message):
+    """
+    Split a received message into the message itself and the id of the span it was sent in.
+
+    Returns
+    -------
+    tuple of str
+        The message and the id of the span or 'None' if the message does not carry one.
+    """
+    if TRACE_CONTEXT not in message:
+        return message, None
+    message, span_id = message.split(TRACE_CONTEXT, 1)
+    return message, span_id
+
+def merge(paths, path):
+    """
+    Merge the exported traces of several servers into one file.
+
+    Parameters
+    ----------
+    paths : list of str
+        the files of the exported traces (-> Tracer.export).
+    path : str
+        the file of the merged trace.
+    """
+    events = []
+    for p in paths:
+        with open(p) as f:
+            events.extend(json.load(f)["traceEvents"])
+    with open(path, "w") as f:
+        json.dump({"traceEvents" : events, "displayTimeUnit" : "ms"}, f)
+
+class Tracer:
+    """
+    Note:
+    The finished spans are kept in memory, only the latest MAXIMUM_SPANS of them.
+    A span is a dictionary, so further attributes can be added to it
+    until it has ended (e.g. links to other spans).
+    """
+
+    ip = None
+    enabled = False
+    spans = None
+    ids = None
+    tracer_lock = None
+
+    def __init__(self, ip, enabled=False):
+        self.ip = ip
+        self.enabled = enabled
+        self.spans = collections.deque(maxlen=MAXIMUM_SPANS)
+        self.ids = itertools.count(1)
+        self.tracer_lock = threading.Lock()
+
+    def start(self, name, parent=None, **attributes):
+        """
+        Start a span.
+
+        Parameters
+        ----------
+        name : str
+            the name of the span (e.g. 'find_network').
+        parent : dict
+            the span this span is part of or 'None' to start a new trace.
+        attributes : keyword arguments
+            further information about the span (e.g. the IP of a probed server).
+
+        Returns
+        -------
+        dict
+            The started span or 'None' if tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+        span_id = self.ip + "-" + str(next(self.ids))
+        return {"name" : name, "id" : span_id, "trace" : span_id if parent is None else parent["trace"],
+                "parent" : None if parent is None else parent["id"], "start" : time.time(), "end" : None,
+                "thread" : threading.current_thread().name, "links" : [], "attributes" : attributes}
+
+    def link(self, span, span_id):
+        # links the span to a span of another server, e.g. the span of a voter
+        if span is not None and span_id is not None:
+            span["links"].append(span_id)
+
+    def end(self, span, **attributes):
+        """
+        End a span and keep it for the export.
+
+        Parameters
+        ----------
+        span : dict
+            the started span or 'None' if tracing was disabled when it should have been started.
+        attributes : keyword arguments
+            further information about the outcome (e.g. the elected master).
+        """
+        if span is None or span["end"] is not None:
+            return
+        span["end"] = time.time()
+        span["attributes"].update(attributes)
+        self.tracer_lock.acquire()
+        self.spans.append(span)
+        self.tracer_lock.release()
+
+    def get_spans(self):
+        self.tracer_lock.acquire()
+        spans = list(self.spans)
+        self.tracer_lock.release()
+        return spans
+
+    def clear(self):
+        self.tracer_lock.acquire()
+        self.spans.clear()
+        self.tracer_lock.release()
+
+    def export(self, path):
+        """
+        Export the finished spans as JSON in the trace event format.
+
+        Every server is shown as a process named after its IP, every thread
+        of the server as a thread of this process.
+
+        Parameters
+        ----------
+        path : str
+            the file the trace is written to.
+
+        Returns
+        -------
+        int
+            The number of exported spans.
+        """
+        pid = int(ipaddress.ip_address(self.ip))
+        spans = self.get_spans()
+        threads = sorted(set(span["thread"] for span in spans))
+        events = [{"name" : "process_name", "ph" : "M", "pid" : pid, "args" : {"name" : self.ip}}]
+        for tid, thread in enumerate(threads):
+            events.append({"name" : "thread_name", "ph" : "M", "pid" : pid, "tid" : tid, "args" : {"name" : thread}})
+        for span in spans:
+            args = {"id" : span["id"], "trace" : span["trace"], "parent" : span["parent"], "links" : span["links"]}
+            args.update(span["attributes"])
+            events.append({"name" : span["name"], "cat" : "election", "ph" : "X", "pid" : pid,
+                           "tid" : threads.index(span["thread"]), "ts" : int(span["start"] * 1000000),
+                           "dur" : int((span["end"] - span["start"]) * 1000000), "args" : args})
+        with open(path, "w") as f:
+            json.dump({"traceEvents" : events, "displayTimeUnit" : "ms"}, f)
+        return len(spans)
@@ -0,0 +1,43 @@
+"""
+The transport class of the application.
+
+The servers and clients send their messages over TCP connections.
+The sockets of a server and its clients are created by a transport,
+so another transport can be used instead (e.g. to send the messages
+through another network).
+"""
+# -*- coding: utf-8 -*-
+import socket
+
+class Transport:
+    """
+    Note:
+    A socket of another transport must offer the methods the server and the
+    client use: connect, send, sendall, recv, settimeout, shutdown, close and
+    fileno, and for a listening socket setsockopt, bind, listen, setblocking and accept.
+    """
+
+    def socket(self):
+        # a new socket of a connection
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+
+    def listen(self, ip, port):
+        """
+        Create the socket a server listens on.
+
+        Parameters
+        ----------
+        ip : str
+            the IP address of the server.
+        port : int
+            the port number of the server.
+
+        Returns
+        -------
+        socket object
+            The socket bound to the address, it is not listening yet.
+        """
+        listener = self.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((ip, port))
+        return listener
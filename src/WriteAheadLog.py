@@ -0,0 +1,253 @@
+"""
+The write-ahead log class of the application.
+
+A write-ahead log persists the state of a server on disk, so that
+the server can recover its state after a restart. The log only
+appends records. It is split into segments of a fixed size that are
+accessed through mmap. Every record is stored with its length and
+a checksum, so that a record that has only been written partially
+(e.g. because the process crashed) is detected and cut off
+while the log is recovered.
+"""
+# -*- coding: utf-8 -*-
+import os
+import mmap
+import struct
+import zlib
+import threading
+
+SEGMENT_SIZE = 4 * 1024 * 1024
+FSYNC_INTERVAL = 64
+SEGMENT_SUFFIX = ".seg"
+RECORD_HEADER = struct.Struct("<II")
+
+class WriteAheadLog:
+    """
+    Note:
+    The segment files are named after the number of their first record.
+    A segment is created with its full size, so the unused part of a
+    segment contains zeros. A record header with a length of zero
+    therefore marks the end of the records in a segment.
+    The directory is synchronized after a segment has been created or removed,
+    otherwise the file itself could be lost after a crash although its
+    records have been synchronized (-> sync_directory).
+    """
+
+    directory = ""
+    segment_size = 0
+    fsync_interval = 0
+    segments = None
+    index = None
+    first = 0
+    position = 0
+    unsynced = 0
+    wal_lock = None
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, fsync_interval=FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self.segments = []
+        self.index = []
+        self.first = 0
+        self.position = 0
+        self.unsynced = 0
+        self.wal_lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.recover()
+
+    def recover(self):
+        """
+        Open all segments of the directory and rebuild the offset index.
+
+        Every segment is scanned record by record. The first record that
+        exceeds its segment or has an invalid checksum is the end of the log.
+        The rest of this segment is overwritten with zeros and all following
+        segments are removed, because their records cannot be trusted anymore.
+        If there is no segment yet, the first one is created.
+        """
+        names = sorted([name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)])
+        self.first = int(names[0][:-len(SEGMENT_SUFFIX)]) if names else 0
+        for name in names:
+            segment = self.open_segment(int(name[:-len(SEGMENT_SUFFIX)]))
+            position, valid = self.scan(segment)
+            self.segments.append(segment)
+            self.position = position
+            if not valid:
+                segment["map"][position:] = bytes(len(segment["map"]) - position)
+                segment["map"].flush()
+                for later in names[names.index(name) + 1:]:
+                    os.remove(os.path.join(self.directory, later))
+                self.sync_directory()
+                break
+        if not self.segments:
+            self.segments.append(self.open_segment(self.first))
+            self.position = 0
+
+    def scan(self, segment):
+        # adds the records of the segment to the index and returns the end of the records
+        number = len(self.segments)
+        data = segment["map"]
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            length, checksum = RECORD_HEADER.unpack_from(data, position)
+            if length == 0:
+                return position, True
+            end = position + RECORD_HEADER.size + length
+            if end > len(data) or zlib.crc32(data[position + RECORD_HEADER.size:end]) != checksum:
+                return position, False
+            self.index.append((number, position))
+            position = end
+        return position, True
+
+    def open_segment(self, first_record):
+        path = os.path.join(self.directory, "%020d%s" % (first_record, SEGMENT_SUFFIX))
+        created = not os.path.exists(path)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size < self.segment_size:
+            # a new segment or a segment that has been cut off
+            os.ftruncate(fd, self.segment_size)
+        if created:
+            self.sync_directory()
+        data = mmap.mmap(fd, os.fstat(fd).st_size)
+        return {"first" : first_record, "fd" : fd, "map" : data}
+
+    def sync_directory(self):
+        # makes the creation and the removal of segments durable
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close_segment(self, segment):
+        segment["map"].close()
+        os.close(segment["fd"])
+
+    def append(self, payload):
+        """
+        Append a record to the end of the log.
+
+        If the record does not fit into the current segment anymore, the
+        segment is synchronized and a new segment is started (rotation).
+        The record is not synchronized to disk immediately, but after
+        FSYNC_INTERVAL records (-> sync).
+
+        Parameters
+        ----------
+        payload : bytes
+            the content of the record.
+
+        Returns
+        -------
+        int
+            The number of the record.
+        """
+        size = RECORD_HEADER.size + len(payload)
+        if size + RECORD_HEADER.size > self.segment_size:
+            raise ValueError("record exceeds the segment size")
+        self.wal_lock.acquire()
+        try:
+            if self.position + size + RECORD_HEADER.size > self.segment_size:
+                self.rotate()
+            segment = self.segments[-1]
+            segment["map"][self.position:self.position + size] = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+            self.index.append((len(self.segments) - 1, self.position))
+            self.position += size
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_interval:
+                self.flush()
+            return self.first + len(self.index) - 1
+        finally:
+            self.wal_lock.release()
+
+    def rotate(self):
+        # the wal lock has to be held by the caller
+        self.flush()
+        self.segments.append(self.open_segment(self.first + len(self.index)))
+        self.position = 0
+
+    def flush(self):
+        # the wal lock has to be held by the caller
+        if self.unsynced > 0:
+            self.segments[-1]["map"].flush()
+            self.unsynced = 0
+
+    def sync(self):
+        """
+        Synchronize all appended records to disk.
+        """
+        self.wal_lock.acquire()
+        self.flush()
+        self.wal_lock.release()
+
+    def read(self, number):
+        """
+        Read the record with the given number.
+
+        Parameters
+        ----------
+        number : int
+            the number of the record.
+
+        Returns
+        -------
+        bytes
+            The content of the record.
+        """
+        self.wal_lock.acquire()
+        try:
+            segment, position = self.index[number - self.first]
+            data = self.segments[segment]["map"]
+            length = RECORD_HEADER.unpack_from(data, position)[0]
+            return data[position + RECORD_HEADER.size:position + RECORD_HEADER.size + length]
+        finally:
+            self.wal_lock.release()
+
+    def records(self, start=None):
+        """
+        Iterate over the content of all records starting from the given number.
+        """
+        number = self.first if start is None else max(start, self.first)
+        while number < self.end():
+            yield self.read(number)
+            number += 1
+
+    def truncate_before(self, number):
+        """
+        Remove all segments that only contain records before the given number.
+
+        Parameters
+        ----------
+        number : int
+            the number of the first record that has to be kept.
+        """
+        self.wal_lock.acquire()
+        removed = 0
+        while len(self.segments) - removed > 1 and self.segments[removed + 1]["first"] <= number:
+            removed += 1
+        for segment in self.segments[:removed]:
+            self.close_segment(segment)
+            os.remove(os.path.join(self.directory, "%020d%s" % (segment["first"], SEGMENT_SUFFIX)))
+        if removed > 0:
+            self.sync_directory()
+            kept = self.segments[removed]["first"]
+            self.index = [(segment - removed, position) for segment, position in self.index[kept - self.first:]]
+            self.segments = self.segments[removed:]
+            self.first = kept
+        self.wal_lock.release()
+
+    def end(self):
+        # the number the next record will get
+        return self.first + len(self.index)
+
+    def get_first(self):
+        return self.first
+
+    def close(self):
+        self.wal_lock.acquire()
+        self.flush()
+        for segment in self.segments:
+            self.close_segment(segment)
+        self.segments = []
+        self.wal_lock.release()